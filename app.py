@@ -120,8 +120,9 @@ except ImportError:
 
 # Register docs blueprint
 try:
-    from routes.docs import bp as docs_bp
+    from routes.docs import bp as docs_bp, start_doc_cache_warmup
     app.register_blueprint(docs_bp)
+    start_doc_cache_warmup(app)
 except ImportError:
     app.logger.warning("Documentation routes not found")
 
@@ -146,6 +147,13 @@ try:
 except ImportError:
     app.logger.warning("Serial communication routes not found")
 
+# Register expect script automation blueprint
+try:
+    from routes.automation import bp as automation_bp
+    app.register_blueprint(automation_bp)
+except ImportError:
+    app.logger.warning("Automation routes not found")
+
 # Remove old cd helper function - not needed for SSH sessions
 
 # Import SSH communication functions for console
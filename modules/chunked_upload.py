@@ -0,0 +1,325 @@
+import os
+import json
+import time
+import uuid
+import hashlib
+import threading
+from .logging import add_log_entry
+
+# Chunked upload settings
+UPLOAD_CHUNK_SIZE = 4 * 1024 * 1024     # Every chunk but the last is exactly this size
+UPLOAD_STAGING_DIR = '.uploads'         # Staging directory inside the transfer directory
+UPLOAD_EXPIRY = 24 * 60 * 60            # Seconds an idle unfinished upload is kept
+STREAM_BUFFER = 64 * 1024               # Bytes read from the request body at a time
+
+class UploadError(Exception):
+    """Chunked upload failure carrying the HTTP status the route should return"""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+class ChunkedUploadStore:
+    """Resumable uploads into the transfer directory
+
+    An upload is a .part file plus a JSON sidecar in the staging directory.
+    Chunks are written in place with pwrite, so a chunk can be sent again
+    (after a dropped connection or a page reload) without harm. The sidecar
+    records which chunks have arrived and survives restarts. When every chunk
+    is present the file is hash-checked and renamed into place atomically.
+    """
+
+    def __init__(self, transfer_dir, chunk_size=UPLOAD_CHUNK_SIZE, content_store=None):
+        self.transfer_dir = transfer_dir
+        # Optional ContentStore: finished uploads are deduplicated by hash
+        self.content_store = content_store
+        self.staging_dir = os.path.join(transfer_dir, UPLOAD_STAGING_DIR)
+        self.chunk_size = chunk_size
+        self.lock = threading.Lock()
+        self.locks = {}
+        # Running SHA-256 of the contiguous prefix, for uploads sent in order
+        self.hashers = {}
+        self.listeners = []
+
+    def add_listener(self, callback):
+        """Register callback(progress_dict), called after every stored chunk"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def _notify(self, state):
+        progress = self._public(state)
+        for callback in list(self.listeners):
+            try:
+                callback(progress)
+            except Exception as e:
+                add_log_entry(f"Upload progress listener error: {str(e)}", is_error=True)
+
+    def _paths(self, upload_id):
+        if not upload_id or not all(c in '0123456789abcdef' for c in upload_id):
+            raise UploadError("Invalid upload id", 404)
+        base = os.path.join(self.staging_dir, upload_id)
+        return base + '.json', base + '.part'
+
+    def _lock(self, upload_id):
+        """Per-upload lock; raises UploadError before creating one for an unknown upload"""
+        with self.lock:
+            # Checked under self.lock so an abort cannot slip in and leave the lock behind
+            meta_path, _ = self._paths(upload_id)
+            if not os.path.exists(meta_path):
+                raise UploadError("Upload not found", 404)
+            return self.locks.setdefault(upload_id, threading.Lock())
+
+    def _load(self, upload_id):
+        meta_path, _ = self._paths(upload_id)
+        try:
+            with open(meta_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            raise UploadError("Upload not found", 404)
+
+    def _save(self, state):
+        meta_path, _ = self._paths(state['id'])
+        tmp_path = meta_path + '.tmp'
+        with open(tmp_path, 'w') as f:
+            json.dump(state, f)
+        os.replace(tmp_path, meta_path)
+
+    def _chunk_count(self, state):
+        return max(1, -(-state['size'] // state['chunk_size']))
+
+    def _offset(self, state):
+        """Bytes received without a gap from the start of the file"""
+        received = set(state['received'])
+        index = 0
+        while index in received:
+            index += 1
+        return min(index * state['chunk_size'], state['size'])
+
+    def _public(self, state):
+        received_bytes = sum(self._chunk_length(state, index) for index in state['received'])
+        return {
+            "upload_id": state['id'],
+            "filename": state['filename'],
+            "dir": state['dir'],
+            "size": state['size'],
+            "chunk_size": state['chunk_size'],
+            "chunks": self._chunk_count(state),
+            "received": sorted(state['received']),
+            "received_bytes": received_bytes,
+            "offset": self._offset(state),
+            "complete": len(state['received']) == self._chunk_count(state)
+        }
+
+    def _chunk_length(self, state, index):
+        return min(state['chunk_size'], state['size'] - index * state['chunk_size'])
+
+    def _target(self, target_dir, filename):
+        """Resolve the final path, refusing anything outside the transfer directory"""
+        filename = os.path.basename(filename or '')
+        if not filename or filename in ('.', '..'):
+            raise UploadError("Invalid filename")
+        target = os.path.abspath(os.path.join(self.transfer_dir, (target_dir or '').lstrip('/'), filename))
+        root = os.path.abspath(self.transfer_dir)
+        if not target.startswith(root + os.sep) or target.startswith(os.path.abspath(self.staging_dir) + os.sep):
+            raise UploadError("Invalid directory path", 403)
+        return target
+
+    def _expire(self):
+        """Remove uploads nobody has touched for UPLOAD_EXPIRY seconds"""
+        cutoff = time.time() - UPLOAD_EXPIRY
+        for name in os.listdir(self.staging_dir):
+            if not name.endswith('.json'):
+                continue
+            meta_path = os.path.join(self.staging_dir, name)
+            try:
+                if os.path.getmtime(meta_path) < cutoff:
+                    self.abort(name[:-5])
+                    add_log_entry(f"Expired unfinished upload {name[:-5]}")
+            except (OSError, UploadError):
+                continue
+
+    def create(self, filename, target_dir, size, sha256=None):
+        """Start an upload, or return the unfinished one for the same file
+
+        Matching on target, size and (when given) hash lets a client that lost
+        its upload id pick up where it left off.
+        """
+        target = self._target(target_dir, filename)
+        if not isinstance(size, int) or size < 0:
+            raise UploadError("A non-negative size is required")
+        sha256 = sha256.lower() if sha256 else None
+
+        if sha256 and self.content_store and self.content_store.has(sha256) == size:
+            # Content already stored: link it into place, nothing to send
+            self.content_store.link(sha256, target)
+            add_log_entry(f"Upload of {filename} satisfied from content store ({sha256})")
+            chunk_count = max(1, -(-size // self.chunk_size))
+            return {
+                "upload_id": None,
+                "filename": os.path.basename(filename),
+                "dir": (target_dir or '').strip('/'),
+                "size": size,
+                "chunk_size": self.chunk_size,
+                "chunks": chunk_count,
+                "received": list(range(chunk_count)),
+                "received_bytes": size,
+                "offset": size,
+                "complete": True,
+                "deduplicated": True,
+                "sha256": sha256
+            }
+        os.makedirs(self.staging_dir, exist_ok=True)
+        self._expire()
+
+        for name in os.listdir(self.staging_dir):
+            if not name.endswith('.json'):
+                continue
+            try:
+                state = self._load(name[:-5])
+            except (UploadError, ValueError):
+                continue
+            if state['target'] == target and state['size'] == size and state['sha256'] == sha256:
+                add_log_entry(f"Resuming upload {state['id']} of {filename}: "
+                              f"{len(state['received'])}/{self._chunk_count(state)} chunks present")
+                return self._public(state)
+
+        state = {
+            "id": uuid.uuid4().hex,
+            "filename": os.path.basename(filename),
+            "dir": (target_dir or '').strip('/'),
+            "target": target,
+            "size": size,
+            "sha256": sha256,
+            "chunk_size": self.chunk_size,
+            "received": [],
+            "created": time.time()
+        }
+        _, part_path = self._paths(state['id'])
+        with open(part_path, 'wb') as f:
+            # Reserve the full length up front so chunks can land in any order
+            f.truncate(size)
+        self._save(state)
+        add_log_entry(f"Started chunked upload {state['id']}: {filename}, {size} bytes, "
+                      f"{self._chunk_count(state)} chunks of {self.chunk_size} bytes")
+        return self._public(state)
+
+    def status(self, upload_id):
+        return self._public(self._load(upload_id))
+
+    def write_chunk(self, upload_id, index, stream, length, sha256=None):
+        """Store chunk number index from a file-like stream
+
+        The chunk must have its exact expected length. Sending a chunk that is
+        already stored rewrites it with the same bytes, so retries are safe.
+        """
+        with self._lock(upload_id):
+            state = self._load(upload_id)
+            if index < 0 or index >= self._chunk_count(state):
+                raise UploadError(f"Chunk index {index} out of range", 416)
+            expected = self._chunk_length(state, index)
+            if length is not None and length != expected:
+                raise UploadError(f"Chunk {index} must be {expected} bytes, got {length}")
+
+            _, part_path = self._paths(upload_id)
+            chunk_hash = hashlib.sha256()
+            file_hash = self._running_hash(state, index)
+            offset = index * state['chunk_size']
+            written = 0
+            fd = os.open(part_path, os.O_WRONLY)
+            try:
+                while written < expected:
+                    data = stream.read(min(STREAM_BUFFER, expected - written))
+                    if not data:
+                        break
+                    os.pwrite(fd, data, offset + written)
+                    chunk_hash.update(data)
+                    if file_hash is not None:
+                        file_hash.update(data)
+                    written += len(data)
+            finally:
+                os.close(fd)
+            if written != expected or stream.read(1):
+                self.hashers.pop(upload_id, None)
+                raise UploadError(f"Chunk {index} must be {expected} bytes")
+            if sha256 and chunk_hash.hexdigest() != sha256.lower():
+                self.hashers.pop(upload_id, None)
+                raise UploadError(f"Chunk {index} failed its hash check", 422)
+
+            if file_hash is not None:
+                self.hashers[upload_id]['next'] += 1
+            if index not in state['received']:
+                state['received'].append(index)
+            self._save(state)
+        self._notify(state)
+        return self._public(state)
+
+    def _running_hash(self, state, index):
+        """Whole-file hash to feed with this chunk, or None if chunks came out of order"""
+        hasher = self.hashers.get(state['id'])
+        if hasher is None and index == 0 and not state['received']:
+            hasher = self.hashers[state['id']] = {"next": 0, "hash": hashlib.sha256()}
+        if hasher is None:
+            return None
+        if index != hasher['next']:
+            # Out of order or a resend; hash the finished file instead
+            self.hashers.pop(state['id'], None)
+            return None
+        return hasher['hash']
+
+    def _file_hash(self, state):
+        hasher = self.hashers.pop(state['id'], None)
+        if hasher is not None and hasher['next'] == self._chunk_count(state):
+            return hasher['hash'].hexdigest()
+        _, part_path = self._paths(state['id'])
+        digest = hashlib.sha256()
+        with open(part_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b''):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def complete(self, upload_id, sha256=None):
+        """Verify the upload and move it into place; returns the final file info"""
+        with self._lock(upload_id):
+            state = self._load(upload_id)
+            missing = sorted(set(range(self._chunk_count(state))) - set(state['received']))
+            if missing:
+                raise UploadError(f"Upload incomplete, missing chunks: {missing[:20]}", 409)
+            expected = (sha256 or state['sha256'] or '').lower()
+            digest = self._file_hash(state)
+            if expected and digest != expected:
+                # Corrupt data is of no use for resuming; start over
+                self.abort(upload_id)
+                raise UploadError(f"SHA-256 mismatch: expected {expected}, got {digest}", 422)
+
+            meta_path, part_path = self._paths(upload_id)
+            os.makedirs(os.path.dirname(state['target']), exist_ok=True)
+            os.chmod(part_path, 0o666)
+            if self.content_store:
+                deduplicated = self.content_store.place(part_path, state['target'], digest)
+            else:
+                os.replace(part_path, state['target'])
+                deduplicated = False
+            os.remove(meta_path)
+        with self.lock:
+            self.locks.pop(upload_id, None)
+        add_log_entry(f"Chunked upload {upload_id} complete: {state['target']}, {state['size']} bytes, sha256 {digest}"
+                      f"{' (stored once, hardlinked)' if deduplicated else ''}")
+        return {
+            "filename": state['filename'],
+            "size": state['size'],
+            "path": os.path.join(state['dir'], state['filename']),
+            "sha256": digest,
+            "deduplicated": deduplicated,
+            "upload_time": time.time() - state['created']
+        }
+
+    def abort(self, upload_id):
+        """Discard an unfinished upload"""
+        for path in self._paths(upload_id):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+        self.hashers.pop(upload_id, None)
+        with self.lock:
+            self.locks.pop(upload_id, None)
@@ -0,0 +1,249 @@
+import os
+import time
+import queue
+import sqlite3
+import hashlib
+import tempfile
+import threading
+import traceback
+from .logging import add_log_entry
+
+# Content store settings
+STORE_DIR = '.store'            # Object directory inside the transfer directory
+INDEX_DB = 'index.sqlite3'      # Hash index, keyed by inode
+HASH_BUFFER = 1024 * 1024       # Bytes read at a time when hashing
+LOOKUP_BATCH = 500              # Inodes per index query (SQLite variable limit)
+
+def is_sha256(value):
+    return isinstance(value, str) and len(value) == 64 and all(c in '0123456789abcdef' for c in value)
+
+def hash_file(path):
+    """SHA-256 of a file, read in HASH_BUFFER blocks"""
+    digest = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for block in iter(lambda: f.read(HASH_BUFFER), b''):
+            digest.update(block)
+            # Let other green threads run between blocks of a large file
+            time.sleep(0)
+    return digest.hexdigest()
+
+class ContentStore:
+    """Content-addressed storage for the transfer directory
+
+    Every file placed through the store is hardlinked to .store/<aa>/<sha256>,
+    so identical uploads into different folders share one copy on disk. A
+    SQLite index maps (inode, size, mtime) to SHA-256; all hardlinks share an
+    inode, so one row covers every path of an object and listings never need
+    to re-read file contents. Files that arrive some other way (TFTP, SSH)
+    are hashed by a background thread the first time they are listed.
+    """
+
+    def __init__(self, transfer_dir):
+        self.transfer_dir = transfer_dir
+        self.store_dir = os.path.join(transfer_dir, STORE_DIR)
+        self.db_path = os.path.join(self.store_dir, INDEX_DB)
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pid = None
+        self.pending = set()
+        self.hash_queue = queue.Queue()
+        self.worker = None
+        self.worker_pid = None
+
+    def _connect(self):
+        # A connection made before gunicorn forks must not be shared with the child
+        if self.conn is None or self.pid != os.getpid():
+            os.makedirs(self.store_dir, exist_ok=True)
+            self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS hashes (
+                inode INTEGER PRIMARY KEY, size INTEGER, mtime_ns INTEGER, sha256 TEXT)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS hashes_sha256 ON hashes (sha256)")
+            self.conn.commit()
+            self.pid = os.getpid()
+        return self.conn
+
+    def object_path(self, sha256):
+        return os.path.join(self.store_dir, sha256[:2], sha256)
+
+    def _valid_object(self, sha256):
+        """Stat of the stored object, or None if missing or changed since it was stored
+
+        Something writing into one of its hardlinks in place (tftpd-hpa
+        overwrites existing files) changes the object too; such an object is
+        dropped from the store rather than handed out under the wrong hash.
+        """
+        if not is_sha256(sha256):
+            return None
+        obj = self.object_path(sha256)
+        try:
+            st = os.stat(obj)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            row = self._connect().execute(
+                "SELECT size, mtime_ns, sha256 FROM hashes WHERE inode = ?", (st.st_ino,)).fetchone()
+        if row is None:
+            # place() links the object before it records it, and the index may
+            # have been lost; neither means the object is bad, so hash it again
+            self.queue_hash(obj)
+            return None
+        if row == (st.st_size, st.st_mtime_ns, sha256):
+            return st
+        add_log_entry(f"Content store object {sha256} changed on disk, dropping it", is_error=True)
+        os.remove(obj)
+        return None
+
+    def has(self, sha256):
+        """Size of the stored object with this hash, or None"""
+        st = self._valid_object(sha256)
+        return st.st_size if st else None
+
+    def record(self, sha256, st):
+        """Remember the hash of the inode described by a stat result"""
+        with self.lock:
+            conn = self._connect()
+            conn.execute("INSERT OR REPLACE INTO hashes (inode, size, mtime_ns, sha256) VALUES (?, ?, ?, ?)",
+                         (st.st_ino, st.st_size, st.st_mtime_ns, sha256))
+            conn.commit()
+
+    def lookup(self, entries):
+        """Map inode -> sha256 for listing entries whose index row is current
+
+        entries need inode, size and mtime_ns. Stale rows (the file changed
+        in place) are ignored.
+        """
+        wanted = {entry['inode']: entry for entry in entries if entry.get('type') == 'file'}
+        found = {}
+        inodes = list(wanted)
+        with self.lock:
+            conn = self._connect()
+            for start in range(0, len(inodes), LOOKUP_BATCH):
+                batch = inodes[start:start + LOOKUP_BATCH]
+                rows = conn.execute(
+                    f"SELECT inode, size, mtime_ns, sha256 FROM hashes WHERE inode IN ({','.join('?' * len(batch))})",
+                    batch).fetchall()
+                for inode, size, mtime_ns, sha256 in rows:
+                    entry = wanted[inode]
+                    if entry['size'] == size and entry['mtime_ns'] == mtime_ns:
+                        found[inode] = sha256
+        return found
+
+    def place(self, source, target, sha256):
+        """Move a finished file to target, sharing storage with identical content
+
+        Returns True when an existing object was reused. Falls back to a plain
+        rename on filesystems without hardlinks.
+        """
+        obj = self.object_path(sha256)
+        os.makedirs(os.path.dirname(obj), exist_ok=True)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        try:
+            if self._valid_object(sha256):
+                # Link the stored copy into place and drop the new one
+                tmp = target + '.link.tmp'
+                os.link(obj, tmp)
+                os.replace(tmp, target)
+                os.remove(source)
+                reused = True
+            else:
+                os.link(source, obj)
+                os.replace(source, target)
+                reused = False
+        except OSError as e:
+            add_log_entry(f"Content store hardlink failed, storing {target} without dedup: {str(e)}", is_error=True)
+            os.replace(source, target)
+            reused = False
+        self.record(sha256, os.stat(target))
+        return reused
+
+    def link(self, sha256, target):
+        """Create target as another link to a stored object; returns its size or None"""
+        if not self._valid_object(sha256):
+            return None
+        obj = self.object_path(sha256)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        tmp = target + '.link.tmp'
+        os.link(obj, tmp)
+        os.replace(tmp, target)
+        st = os.stat(target)
+        self.record(sha256, st)
+        return st.st_size
+
+    def save_stream(self, stream, target, staging_dir):
+        """Write a stream to target via a temp file, hashing it on the way in
+
+        Returns (sha256, reused).
+        """
+        os.makedirs(staging_dir, exist_ok=True)
+        digest = hashlib.sha256()
+        fd, tmp = tempfile.mkstemp(dir=staging_dir, suffix='.part')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                for block in iter(lambda: stream.read(HASH_BUFFER), b''):
+                    f.write(block)
+                    digest.update(block)
+            os.chmod(tmp, 0o666)
+            sha256 = digest.hexdigest()
+            return sha256, self.place(tmp, target, sha256)
+        except BaseException:
+            if os.path.exists(tmp):
+                os.remove(tmp)
+            raise
+
+    def collect_garbage(self):
+        """Remove objects no path links to any more; returns the number removed"""
+        removed = 0
+        if not os.path.isdir(self.store_dir):
+            return 0
+        for prefix in os.listdir(self.store_dir):
+            prefix_dir = os.path.join(self.store_dir, prefix)
+            if len(prefix) != 2 or not os.path.isdir(prefix_dir):
+                continue
+            with os.scandir(prefix_dir) as it:
+                for entry in it:
+                    try:
+                        st = entry.stat()
+                        if st.st_nlink == 1:
+                            os.remove(entry.path)
+                            with self.lock:
+                                conn = self._connect()
+                                conn.execute("DELETE FROM hashes WHERE inode = ?", (st.st_ino,))
+                                conn.commit()
+                            removed += 1
+                    except OSError:
+                        continue
+        if removed:
+            add_log_entry(f"Content store removed {removed} unreferenced objects")
+        return removed
+
+    def queue_hash(self, path):
+        """Hash a file in the background so later listings can show it"""
+        with self.lock:
+            if path in self.pending:
+                return
+            self.pending.add(path)
+            if self.worker is None or not self.worker.is_alive() or self.worker_pid != os.getpid():
+                self.worker = threading.Thread(target=self._hash_worker, name='content-hasher', daemon=True)
+                self.worker_pid = os.getpid()
+                self.worker.start()
+        self.hash_queue.put(path)
+
+    def _hash_worker(self):
+        while True:
+            path = self.hash_queue.get()
+            try:
+                before = os.stat(path)
+                sha256 = hash_file(path)
+                after = os.stat(path)
+                # Only trust the hash if the file did not change while it was read
+                if (before.st_size, before.st_mtime_ns) == (after.st_size, after.st_mtime_ns):
+                    self.record(sha256, after)
+            except FileNotFoundError:
+                pass
+            except Exception as e:
+                error_trace = traceback.format_exc()
+                add_log_entry(f"Error hashing {path}: {str(e)}\n{error_trace}", is_error=True)
+            finally:
+                with self.lock:
+                    self.pending.discard(path)
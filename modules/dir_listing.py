@@ -0,0 +1,107 @@
+import os
+import stat
+import time
+import fnmatch
+import threading
+from collections import OrderedDict
+
+# Directory listing cache settings
+LISTING_CACHE_SIZE = 64         # Directories kept in the cache
+LISTING_CACHE_TTL = 10.0        # Seconds before a cached listing is rescanned anyway
+SORT_KEYS = ('name', 'size', 'mtime', 'type')
+
+class DirectoryCache:
+    """Cached os.scandir listings, invalidated by the directory's mtime
+
+    Adding, removing or renaming an entry changes the directory mtime, which
+    triggers a rescan on the next listing. A file growing in place (a
+    tftpd-hpa upload still being written) does not, so listings are also
+    rescanned after LISTING_CACHE_TTL seconds.
+    """
+
+    def __init__(self, max_entries=LISTING_CACHE_SIZE, ttl=LISTING_CACHE_TTL):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.cache = OrderedDict()
+        self.lock = threading.Lock()
+
+    def scan(self, path):
+        """Return a list of {name, type, size, mtime, mtime_ns, inode} with one stat per entry"""
+        dir_mtime = os.stat(path).st_mtime_ns
+        now = time.monotonic()
+        with self.lock:
+            cached = self.cache.get(path)
+            if cached and cached[0] == dir_mtime and now - cached[1] < self.ttl:
+                self.cache.move_to_end(path)
+                return cached[2]
+
+        entries = []
+        with os.scandir(path) as it:
+            for entry in it:
+                try:
+                    st = entry.stat()
+                except OSError:
+                    # Dangling symlink or removed while scanning
+                    continue
+                is_dir = stat.S_ISDIR(st.st_mode)
+                entries.append({
+                    "name": entry.name,
+                    "type": "directory" if is_dir else "file",
+                    "size": 0 if is_dir else st.st_size,
+                    "mtime": st.st_mtime,
+                    "mtime_ns": st.st_mtime_ns,
+                    "inode": st.st_ino
+                })
+
+        with self.lock:
+            self.cache[path] = (dir_mtime, now, entries)
+            self.cache.move_to_end(path)
+            while len(self.cache) > self.max_entries:
+                self.cache.popitem(last=False)
+        return entries
+
+    def invalidate(self, path=None):
+        """Drop one directory, or everything, from the cache"""
+        with self.lock:
+            if path is None:
+                self.cache.clear()
+            else:
+                self.cache.pop(path, None)
+
+    def list(self, path, sort_by='name', sort_order='asc', filter_text='', entry_type=None,
+             page=1, limit=None, hidden=()):
+        """Sorted, filtered and paginated listing; returns (entries, total)
+
+        Directories always come before files. filter_text is a
+        case-insensitive substring, or a glob when it contains * or ?.
+        limit=None returns every matching entry.
+        """
+        entries = [entry for entry in self.scan(path) if entry['name'] not in hidden]
+        if entry_type in ('file', 'directory'):
+            entries = [entry for entry in entries if entry['type'] == entry_type]
+        if filter_text:
+            pattern = filter_text.lower()
+            if '*' in pattern or '?' in pattern:
+                entries = [entry for entry in entries if fnmatch.fnmatchcase(entry['name'].lower(), pattern)]
+            else:
+                entries = [entry for entry in entries if pattern in entry['name'].lower()]
+
+        if sort_by not in SORT_KEYS:
+            sort_by = 'name'
+        reverse = sort_order == 'desc'
+        if sort_by == 'name' or sort_by == 'type':
+            key = lambda entry: entry['name'].lower()
+        else:
+            key = lambda entry: (entry[sort_by], entry['name'].lower())
+        entries = sorted(entries, key=key, reverse=reverse)
+        # Stable sort keeps the chosen order within each group
+        entries.sort(key=lambda entry: entry['type'] != 'directory')
+
+        total = len(entries)
+        if limit:
+            start = (max(page, 1) - 1) * limit
+            entries = entries[start:start + limit]
+        return entries, total
+
+# Shared cache for the file browser and TFTP listings
+directory_cache = DirectoryCache()
@@ -0,0 +1,231 @@
+import os
+import re
+import math
+import time
+import bisect
+import threading
+from .logging import add_log_entry
+
+# Documentation search settings
+SEARCH_CHECK_INTERVAL = 2.0     # Seconds between checks of docs/ for changed files
+SEARCH_MAX_RESULTS = 50         # Most results one query may ask for
+PREFIX_MIN_LENGTH = 2           # Shorter query terms only match whole words
+PREFIX_MAX_EXPANSIONS = 50      # Vocabulary words one prefix may expand to
+PREFIX_WEIGHT = 0.6             # Score factor for prefix matches against whole-word matches
+HEADING_WEIGHT = 3              # A word in a section heading counts this many times
+SNIPPET_CHARS = 160             # Length of the text shown around the first match
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+TOKEN_PATTERN = re.compile(r'[a-z0-9]+')
+HEADING_PATTERN = re.compile(r'^(#{1,6})\s+(.*?)\s*#*\s*$')
+LINK_PATTERN = re.compile(r'!?\[([^\]]*)\]\([^)]*\)')
+MARKUP_PATTERN = re.compile(r'[*`>|]+|^\s*[-+]\s+|^\s*\d+\.\s+', re.MULTILINE)
+
+def tokenize(text):
+    """Lowercase word tokens with their character offsets"""
+    return [(match.group(0), match.start()) for match in TOKEN_PATTERN.finditer(text.lower())]
+
+def markdown_to_text(md_text):
+    """Strip the markdown markup that would otherwise show up in snippets"""
+    text = LINK_PATTERN.sub(r'\1', md_text)
+    text = text.replace('```', '')
+    text = MARKUP_PATTERN.sub('', text)
+    return re.sub(r'[ \t]+', ' ', text)
+
+def split_sections(md_text):
+    """Split a markdown document into (heading, text) sections at each heading"""
+    sections = []
+    heading = ''
+    lines = []
+    in_code = False
+    for line in md_text.splitlines():
+        if line.lstrip().startswith('```'):
+            in_code = not in_code
+        match = None if in_code else HEADING_PATTERN.match(line)
+        if match:
+            if heading or ''.join(lines).strip():
+                sections.append((heading, '\n'.join(lines)))
+            heading = match.group(2)
+            lines = []
+        else:
+            lines.append(line)
+    if heading or ''.join(lines).strip():
+        sections.append((heading, '\n'.join(lines)))
+    return sections
+
+class DocSearchIndex:
+    """In-memory inverted index over the markdown files in a directory
+
+    Documents are split into sections at their headings, and each section is
+    scored with BM25. The index maps every word to the sections containing it,
+    with the word count and the offset of its first occurrence for the
+    snippet, so a query never touches the files. The index is rebuilt when a
+    file in the directory is added, removed or modified.
+    """
+
+    def __init__(self, docs_dir):
+        self.docs_dir = docs_dir
+        self.lock = threading.Lock()
+        self.stamp = None
+        self.checked = 0
+        self.sections = []          # [{file, title, heading, text, length}]
+        self.postings = {}          # word -> {section id: (count, first offset)}
+        self.vocabulary = []        # Sorted words, for prefix lookups
+        self.average_length = 0
+
+    def _stamp(self):
+        stamp = []
+        with os.scandir(self.docs_dir) as it:
+            for entry in it:
+                if entry.name.lower().endswith('.md') and entry.is_file():
+                    st = entry.stat()
+                    stamp.append((entry.name, st.st_mtime_ns, st.st_size))
+        return tuple(sorted(stamp))
+
+    def refresh(self, force=False):
+        """Rebuild the index if any markdown file changed since the last build"""
+        now = time.monotonic()
+        if not force and self.stamp is not None and now - self.checked < SEARCH_CHECK_INTERVAL:
+            return
+        with self.lock:
+            self.checked = now
+            try:
+                stamp = self._stamp()
+            except OSError as e:
+                add_log_entry(f"Error scanning documentation directory: {str(e)}", is_error=True)
+                return
+            if stamp != self.stamp or force:
+                self._build(stamp)
+
+    def _build(self, stamp):
+        start = time.monotonic()
+        sections = []
+        postings = {}
+        for name, _, _ in stamp:
+            try:
+                with open(os.path.join(self.docs_dir, name), 'r', encoding='utf-8') as f:
+                    md_text = f.read()
+            except (OSError, UnicodeDecodeError) as e:
+                add_log_entry(f"Error indexing documentation file {name}: {str(e)}", is_error=True)
+                continue
+            parts = split_sections(md_text)
+            title = next((heading for heading, _ in parts if heading), os.path.splitext(name)[0])
+            for heading, body in parts:
+                text = markdown_to_text(body).strip()
+                section_id = len(sections)
+                counts = {}
+                for word, offset in tokenize(text):
+                    count, first = counts.get(word, (0, offset))
+                    counts[word] = (count + 1, first)
+                heading_words = tokenize(heading)
+                for word, _ in heading_words:
+                    # Heading matches rank higher; offset -1 means the snippet starts the section
+                    count, first = counts.get(word, (0, -1))
+                    counts[word] = (count + HEADING_WEIGHT, first)
+                for word, entry in counts.items():
+                    postings.setdefault(word, {})[section_id] = entry
+                sections.append({
+                    "file": name,
+                    "title": title,
+                    "heading": heading,
+                    "text": text,
+                    "length": sum(count for count, _ in counts.values())
+                })
+
+        self.sections = sections
+        self.postings = postings
+        self.vocabulary = sorted(postings)
+        self.average_length = sum(section['length'] for section in sections) / len(sections) if sections else 0
+        self.stamp = stamp
+        add_log_entry(f"Indexed {len(stamp)} documentation files ({len(sections)} sections, "
+                      f"{len(postings)} words) in {(time.monotonic() - start) * 1000:.0f} ms")
+
+    def _expand(self, term):
+        """Words matching a query term: itself at full weight, longer words sharing its prefix at less"""
+        matches = {}
+        if term in self.postings:
+            matches[term] = 1.0
+        if len(term) >= PREFIX_MIN_LENGTH:
+            position = bisect.bisect_right(self.vocabulary, term)
+            for word in self.vocabulary[position:position + PREFIX_MAX_EXPANSIONS]:
+                if not word.startswith(term):
+                    break
+                matches[word] = PREFIX_WEIGHT
+        return matches
+
+    def search(self, query, limit=10):
+        """Ranked sections matching every query word (or any, if none match all)
+
+        Returns (results, total). Each result has file, title, heading,
+        score, snippet and highlights ([start, end] character spans of
+        matched words within the snippet).
+        """
+        self.refresh()
+        limit = max(1, min(int(limit), SEARCH_MAX_RESULTS))
+        terms = list(dict.fromkeys(word for word, _ in tokenize(query)))
+        if not terms:
+            return [], 0
+
+        # Capture one consistent view; a rebuild swaps these attributes wholesale
+        with self.lock:
+            sections = self.sections
+            postings = self.postings
+            expansions = [self._expand(term) for term in terms]
+            average_length = self.average_length or 1
+        section_count = len(sections)
+
+        scores = {}
+        matched_terms = {}
+        words_by_section = {}
+        for position, expansion in enumerate(expansions):
+            for word, weight in expansion.items():
+                entries = postings[word]
+                idf = math.log(1 + (section_count - len(entries) + 0.5) / (len(entries) + 0.5))
+                for section_id, (count, first) in entries.items():
+                    length = sections[section_id]['length']
+                    tf = count * (BM25_K1 + 1) / (count + BM25_K1 * (1 - BM25_B + BM25_B * length / average_length))
+                    scores[section_id] = scores.get(section_id, 0) + weight * idf * tf
+                    matched_terms.setdefault(section_id, set()).add(position)
+                    words_by_section.setdefault(section_id, []).append((word, first))
+
+        candidates = [section_id for section_id, found in matched_terms.items() if len(found) == len(terms)]
+        if not candidates:
+            candidates = list(scores)
+        candidates.sort(key=lambda section_id: -scores[section_id])
+
+        results = []
+        for section_id in candidates[:limit]:
+            section = sections[section_id]
+            snippet, highlights = self._snippet(section['text'], words_by_section[section_id])
+            results.append({
+                "file": section['file'],
+                "title": section['title'],
+                "heading": section['heading'],
+                "score": round(scores[section_id], 4),
+                "snippet": snippet,
+                "highlights": highlights
+            })
+        return results, len(candidates)
+
+    def _snippet(self, text, words):
+        """Text around the earliest matched word, with the spans of matched words"""
+        offsets = [first for _, first in words if first >= 0]
+        center = min(offsets) if offsets else 0
+        start = max(0, center - SNIPPET_CHARS // 4)
+        if start:
+            # Start on a word boundary
+            space = text.find(' ', start)
+            start = space + 1 if 0 <= space < center else start
+        end = min(len(text), start + SNIPPET_CHARS)
+        snippet = text[start:end].replace('\n', ' ')
+        prefix = '...' if start else ''
+        suffix = '...' if end < len(text) else ''
+
+        matched = {word for word, _ in words}
+        highlights = [[match.start() + len(prefix), match.end() + len(prefix)]
+                      for match in TOKEN_PATTERN.finditer(snippet.lower()) if match.group(0) in matched]
+        return prefix + snippet + suffix, highlights
+
+# Shared index of the docs/ directory
+doc_search = DocSearchIndex('docs')
@@ -0,0 +1,558 @@
+import re
+import time
+import string
+import itertools
+import threading
+import traceback
+from collections import OrderedDict
+from .logging import add_log_entry
+
+try:
+    from .serial_comm import serial_manager
+except ImportError:
+    serial_manager = None
+
+try:
+    from .ssh_comm import ssh_manager
+except ImportError:
+    ssh_manager = None
+
+# Expect script settings
+EXPECT_TIMEOUT = 10.0           # Default seconds an expect step waits for one of its patterns
+EXPECT_MAX_TIMEOUT = 3600       # Longest timeout a step may ask for
+EXPECT_BUFFER_LIMIT = 64 * 1024 # Characters of unmatched output kept for matching; the oldest are dropped
+EXPECT_LOOKBEHIND = 256         # Characters before new output searched again, so a prompt split across reads matches
+EXPECT_WAIT_SLICE = 1.0         # Most seconds between checks for cancel and a closed session while waiting
+SCRIPT_MAX_STEPS = 10000        # Steps one run may execute, which stops a goto loop that never ends
+SCRIPT_MAX_TARGETS = 100        # Sessions one job may run on
+SCRIPT_TRANSCRIPT_LIMIT = 64 * 1024  # Characters of each session's output kept in its result
+SCRIPT_HISTORY = 20             # Finished jobs kept for listing
+
+# Run states
+RUNNING = 'running'
+COMPLETE = 'complete'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Checked in this order, so an "if" step (which has a "goto" too) is not taken for a plain goto
+STEP_KINDS = ('send', 'expect', 'label', 'if', 'set', 'sleep', 'fail', 'end', 'goto')
+
+class ScriptError(Exception):
+    pass
+
+class ScriptCancelled(ScriptError):
+    pass
+
+def _label(value, index):
+    if not isinstance(value, str) or not value:
+        raise ScriptError(f"Step {index + 1}: a label must be a non-empty string")
+    return value
+
+def _check_pattern(pattern, index):
+    if not isinstance(pattern, str) or not pattern:
+        raise ScriptError(f"Step {index + 1}: a pattern must be a non-empty string")
+    if '${' not in pattern:
+        try:
+            re.compile(pattern)
+        except re.error as e:
+            raise ScriptError(f"Step {index + 1}: bad pattern {pattern!r}: {str(e)}")
+    return pattern
+
+def compile_script(steps):
+    """Validate a script and resolve its labels; returns (normalized steps, {label: step index})
+
+    A script is a list of steps, each an object with one of these keys:
+
+        {"send": "show version"}                    send a line (${var} is expanded;
+                                                     "newline": false sends it as is)
+        {"expect": "#\\s*$", "timeout": 10}          wait for a regex in the output;
+                                                     "capture": "name" stores the output
+                                                     before the match, named groups are
+                                                     stored as variables, and "on_timeout"
+                                                     names a label to go to instead of failing
+        {"expect": [{"pattern": "[Pp]assword:", "goto": "login"}, "#"]}
+                                                     wait for the first of several patterns
+                                                     and branch on which one matched
+        {"if": "version", "match": "15\\.", "goto": "new", "else": "old"}
+        {"label": "new"}, {"goto": "done"}
+        {"set": {"name": "value ${other}"}}
+        {"sleep": 1.5}
+        {"fail": "Unexpected version ${version}"}, {"end": true}
+    """
+    if not isinstance(steps, list) or not steps:
+        raise ScriptError("A script needs a non-empty list of steps")
+
+    normalized = []
+    labels = {}
+    for index, step in enumerate(steps):
+        if not isinstance(step, dict):
+            raise ScriptError(f"Step {index + 1} is not an object")
+        kind = next((kind for kind in STEP_KINDS if kind in step), None)
+        if kind is None:
+            raise ScriptError(f"Step {index + 1} has none of: {', '.join(STEP_KINDS)}")
+        entry = dict(step, kind=kind)
+
+        if kind == 'send':
+            if not isinstance(step['send'], str):
+                raise ScriptError(f"Step {index + 1}: send needs a string")
+        elif kind == 'expect':
+            items = step['expect'] if isinstance(step['expect'], list) else [step['expect']]
+            if not items:
+                raise ScriptError(f"Step {index + 1}: expect needs at least one pattern")
+            patterns = []
+            for item in items:
+                if isinstance(item, dict):
+                    goto = item.get('goto')
+                    patterns.append((_check_pattern(item.get('pattern'), index),
+                                     _label(goto, index) if goto is not None else None))
+                else:
+                    patterns.append((_check_pattern(item, index), None))
+            entry['patterns'] = patterns
+            try:
+                entry['timeout'] = float(step.get('timeout', EXPECT_TIMEOUT))
+            except (TypeError, ValueError):
+                raise ScriptError(f"Step {index + 1}: timeout must be a number")
+            if not 0 < entry['timeout'] <= EXPECT_MAX_TIMEOUT:
+                raise ScriptError(f"Step {index + 1}: timeout must be between 0 and {EXPECT_MAX_TIMEOUT} seconds")
+        elif kind == 'label':
+            label = _label(step['label'], index)
+            if label in labels:
+                raise ScriptError(f"Step {index + 1}: label {label!r} is defined twice")
+            labels[label] = index
+        elif kind == 'if':
+            if not isinstance(step['if'], str):
+                raise ScriptError(f"Step {index + 1}: if needs a variable name")
+            _check_pattern(step.get('match'), index)
+            if step.get('goto') is None and step.get('else') is None:
+                raise ScriptError(f"Step {index + 1}: if needs a goto or an else label")
+        elif kind == 'set':
+            if not isinstance(step['set'], dict):
+                raise ScriptError(f"Step {index + 1}: set needs an object of variables")
+        elif kind == 'sleep':
+            try:
+                entry['sleep'] = float(step['sleep'])
+            except (TypeError, ValueError):
+                raise ScriptError(f"Step {index + 1}: sleep must be a number")
+            if not 0 <= entry['sleep'] <= EXPECT_MAX_TIMEOUT:
+                raise ScriptError(f"Step {index + 1}: sleep must be between 0 and {EXPECT_MAX_TIMEOUT} seconds")
+        elif kind == 'goto':
+            _label(step['goto'], index)
+        normalized.append(entry)
+
+    # Every branch has to land somewhere
+    for index, entry in enumerate(normalized):
+        targets = [goto for _, goto in entry.get('patterns', ())]
+        targets += [entry.get(key) for key in ('goto', 'else', 'on_timeout') if entry['kind'] != 'label']
+        for label in targets:
+            if label is not None and label not in labels:
+                raise ScriptError(f"Step {index + 1}: no label named {label!r}")
+    return normalized, labels
+
+class RollingMatcher:
+    """Output buffer that is searched incrementally as text arrives
+
+    Each search only looks at what arrived since the last one, plus
+    EXPECT_LOOKBEHIND characters before it for a match that straddles two
+    reads, so waiting on a chatty session costs the same per read however
+    much output has piled up. A match consumes the buffer up to its end.
+    """
+
+    def __init__(self, limit=EXPECT_BUFFER_LIMIT, lookbehind=EXPECT_LOOKBEHIND):
+        self.limit = limit
+        self.lookbehind = lookbehind
+        self.buffer = ''
+        self.scanned = 0    # Characters of the buffer already searched with the current patterns
+        self.dropped = 0
+
+    def feed(self, text):
+        self.buffer += text
+        overflow = len(self.buffer) - self.limit
+        if overflow > 0:
+            self.buffer = self.buffer[overflow:]
+            self.scanned = max(0, self.scanned - overflow)
+            self.dropped += overflow
+
+    def restart(self):
+        """New patterns: the whole buffer has to be searched once"""
+        self.scanned = 0
+
+    def search(self, patterns):
+        """Earliest match of any pattern in the new output; returns (pattern index, match) or None"""
+        if self.scanned and self.scanned == len(self.buffer):
+            return None
+        start = max(0, self.scanned - self.lookbehind)
+        best = None
+        for index, pattern in enumerate(patterns):
+            match = pattern.search(self.buffer, start)
+            if match and (best is None or match.start() < best[1].start()):
+                best = (index, match)
+        self.scanned = len(self.buffer)
+        return best
+
+    def consume(self, match):
+        """Drop the buffer through the match; returns the output that came before it"""
+        before = self.buffer[:match.start()]
+        self.buffer = self.buffer[match.end():]
+        self.scanned = 0
+        return before
+
+class SerialTarget:
+    """A connected SerialDevice as a script target"""
+
+    kind = 'serial'
+
+    def __init__(self, device):
+        self.device = device
+        self.name = device.device_path
+        self.key = (self.kind, self.name)
+
+    @property
+    def connected(self):
+        return self.device.is_connected
+
+    def attach(self, callback):
+        self.device.add_tap(callback)
+
+    def detach(self, callback):
+        self.device.remove_tap(callback)
+
+    def send(self, text):
+        return self.device.write(text)
+
+class SSHTarget:
+    """A connected SSHSession as a script target"""
+
+    kind = 'ssh'
+
+    def __init__(self, session_id, session):
+        self.session = session
+        self.name = f"{session.username}@{session.host}:{session.port}"
+        self.key = (self.kind, session_id)
+
+    @property
+    def connected(self):
+        return self.session.is_connected
+
+    def attach(self, callback):
+        self.session.add_tap(callback)
+
+    def detach(self, callback):
+        self.session.remove_tap(callback)
+
+    def send(self, text):
+        return self.session.write(text)
+
+class ScriptRun:
+    """One script running on one session"""
+
+    def __init__(self, spec, steps, labels, newline):
+        self.spec = spec
+        self.steps = steps
+        self.labels = labels
+        self.newline = newline
+        self.target = None
+        self.name = str(spec.get('device') or spec.get('session_id') or 'unknown')
+        self.kind = spec.get('type', 'serial')
+        self.vars = {key: str(value) for key, value in (spec.get('vars') or {}).items()}
+        self.state = RUNNING
+        self.error = None
+        self.step = 0
+        self.steps_run = 0
+        self.matcher = RollingMatcher()
+        self.transcript = ''
+        self.output_ready = threading.Condition(threading.Lock())
+        self.cancel_requested = False
+        self.started_at = time.time()
+        self.finished_at = None
+
+    def bind(self, target):
+        self.target = target
+        self.name = target.name
+        self.vars.setdefault('target', target.name)
+
+    def fail(self, error):
+        self.state = FAILED
+        self.error = error
+        self.finished_at = time.time()
+
+    def cancel(self):
+        with self.output_ready:
+            self.cancel_requested = True
+            self.output_ready.notify_all()
+
+    def _on_output(self, text):
+        # Called on the session's reader thread: append and wake the run, nothing more
+        with self.output_ready:
+            self.matcher.feed(text)
+            self.transcript = (self.transcript + text)[-SCRIPT_TRANSCRIPT_LIMIT:]
+            self.output_ready.notify_all()
+
+    def _expand(self, text):
+        return string.Template(str(text)).safe_substitute(self.vars)
+
+    def _expand_pattern(self, pattern):
+        # Only ${name} is expanded in patterns, since a bare $ is the end-of-line anchor
+        if '${' not in pattern:
+            return pattern
+        return re.sub(r'\$\{(\w+)\}', lambda m: re.escape(self.vars.get(m.group(1), '')), pattern)
+
+    def execute(self):
+        """Run the steps to the end; raises ScriptError on failure"""
+        self.target.attach(self._on_output)
+        try:
+            index = 0
+            while index < len(self.steps):
+                if self.cancel_requested:
+                    raise ScriptCancelled("Cancelled")
+                self.steps_run += 1
+                if self.steps_run > SCRIPT_MAX_STEPS:
+                    raise ScriptError(f"Stopped after {SCRIPT_MAX_STEPS} steps; does a goto loop forever?")
+                step = self.steps[index]
+                self.step = index + 1
+                kind = step['kind']
+                goto = None
+
+                if kind == 'send':
+                    text = self._expand(step['send'])
+                    if step.get('newline', True):
+                        text += self.newline
+                    success, message = self.target.send(text)
+                    if not success:
+                        raise ScriptError(message)
+                elif kind == 'expect':
+                    goto = self._expect(step)
+                elif kind == 'if':
+                    value = self.vars.get(step['if'], '')
+                    matched = re.search(self._expand_pattern(step['match']), value) is not None
+                    goto = step.get('goto') if matched else step.get('else')
+                elif kind == 'set':
+                    for name, value in step['set'].items():
+                        self.vars[name] = self._expand(value)
+                elif kind == 'sleep':
+                    with self.output_ready:
+                        self.output_ready.wait_for(lambda: self.cancel_requested, step['sleep'])
+                elif kind == 'fail':
+                    raise ScriptError(self._expand(step['fail']))
+                elif kind == 'end':
+                    break
+                elif kind == 'goto':
+                    goto = step['goto']
+
+                index = self.labels[goto] if goto is not None else index + 1
+        finally:
+            self.target.detach(self._on_output)
+
+    def _expect(self, step):
+        patterns = [re.compile(self._expand_pattern(pattern)) for pattern, _ in step['patterns']]
+        deadline = time.monotonic() + step['timeout']
+        with self.output_ready:
+            self.matcher.restart()
+            while True:
+                hit = self.matcher.search(patterns)
+                if hit:
+                    break
+                if self.cancel_requested:
+                    raise ScriptCancelled("Cancelled")
+                if not self.target.connected:
+                    raise ScriptError("Session closed while waiting for output")
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    if step.get('on_timeout') is not None:
+                        return step['on_timeout']
+                    expected = ' or '.join(repr(pattern.pattern) for pattern in patterns)
+                    raise ScriptError(f"Timed out after {step['timeout']:g}s waiting for {expected}")
+                self.output_ready.wait(min(remaining, EXPECT_WAIT_SLICE))
+            index, match = hit
+            before = self.matcher.consume(match)
+
+        self.vars.update({name: value for name, value in match.groupdict().items() if value is not None})
+        if step.get('capture'):
+            self.vars[step['capture']] = before.replace('\r', '')
+        return step['patterns'][index][1]
+
+    def to_dict(self, transcript=False):
+        result = {
+            "target": self.name,
+            "type": self.kind,
+            "state": self.state,
+            "error": self.error,
+            "step": self.step,
+            "steps_run": self.steps_run,
+            "vars": dict(self.vars),
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "elapsed": round((self.finished_at or time.time()) - self.started_at, 3)
+        }
+        if transcript:
+            result["transcript"] = self.transcript
+        return result
+
+class ScriptJob:
+    """One script started on a set of sessions"""
+
+    def __init__(self, job_id, name, runs):
+        self.id = job_id
+        self.name = name
+        self.runs = runs
+        self.started_at = time.time()
+        self.finished = False  # Set by the run that finishes last
+
+    @property
+    def state(self):
+        return RUNNING if any(run.state == RUNNING for run in self.runs) else 'finished'
+
+    def to_dict(self, transcripts=False):
+        summary = {state: 0 for state in (RUNNING, COMPLETE, FAILED, CANCELLED)}
+        for run in self.runs:
+            summary[run.state] += 1
+        return {
+            "id": self.id,
+            "name": self.name,
+            "state": self.state,
+            "summary": summary,
+            "started_at": self.started_at,
+            "runs": [run.to_dict(transcripts) for run in self.runs]
+        }
+
+class ScriptEngine:
+    """Runs expect scripts on serial devices and SSH sessions
+
+    Every session already has a reader feeding its console; a run taps
+    that reader instead of adding another, and waits on a condition the
+    tap signals, so a script costs nothing while its session is quiet.
+    Each run is a thread (a green thread on the app's eventlet hub), so
+    one job drives dozens of sessions at once. A session runs one script
+    at a time. Listeners are called with the job dict when it starts and
+    whenever one of its runs finishes.
+    """
+
+    def __init__(self):
+        self.jobs = OrderedDict()
+        self.ids = itertools.count(1)
+        self.busy = set()       # target keys with a script running
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Register callback(job_dict) for job updates"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify(self, job):
+        snapshot = job.to_dict()
+        for callback in list(self.listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                add_log_entry(f"Script engine listener error: {str(e)}", is_error=True)
+
+    def _resolve(self, spec):
+        """Find the connected session a target spec names; returns (target, error)"""
+        kind = spec.get('type', 'serial')
+        if kind == 'serial':
+            if serial_manager is None:
+                return None, "Serial module not available"
+            device = serial_manager.get_device(spec.get('device'))
+            if device is None:
+                return None, f"Serial device {spec.get('device')} is not connected"
+            return SerialTarget(device), None
+        if kind == 'ssh':
+            if ssh_manager is None:
+                return None, "SSH module not available"
+            with ssh_manager.lock:
+                session = ssh_manager.sessions.get(spec.get('session_id'))
+            if session is None or not session.is_connected:
+                return None, f"SSH session {spec.get('session_id')} is not connected"
+            return SSHTarget(spec['session_id'], session), None
+        return None, f"Unknown target type: {kind}"
+
+    def start(self, steps, targets, name=None, newline='\n'):
+        """Start a script on each target ({"type": "serial", "device": path} or
+        {"type": "ssh", "session_id": id}, with optional "vars"); returns the job"""
+        steps, labels = compile_script(steps)
+        if not isinstance(targets, list) or not targets:
+            raise ScriptError("A script needs at least one target")
+        if len(targets) > SCRIPT_MAX_TARGETS:
+            raise ScriptError(f"A script can run on at most {SCRIPT_MAX_TARGETS} sessions")
+
+        runs = []
+        with self.lock:
+            job = ScriptJob(str(next(self.ids)), name or 'script', runs)
+            for spec in targets:
+                spec = spec if isinstance(spec, dict) else {'device': spec}
+                run = ScriptRun(spec, steps, labels, newline)
+                runs.append(run)
+                target, error = self._resolve(spec)
+                if target is not None and target.key in self.busy:
+                    error = f"{target.name} is already running a script"
+                if error:
+                    # Reported with the device's result rather than failing the whole job
+                    run.fail(error)
+                    continue
+                run.bind(target)
+                self.busy.add(target.key)
+            self.jobs[job.id] = job
+            self._prune()
+
+        for run in runs:
+            if run.target is not None:
+                threading.Thread(target=self._run, args=(job, run), daemon=True).start()
+        add_log_entry(f"Started script {job.name} on {len(runs)} sessions")
+        self._notify(job)
+        return job
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self.jobs.items() if job.state != RUNNING]
+        for job_id in finished[:max(len(finished) - SCRIPT_HISTORY, 0)]:
+            del self.jobs[job_id]
+
+    def _run(self, job, run):
+        try:
+            run.execute()
+            run.state = COMPLETE
+        except ScriptCancelled:
+            run.state = CANCELLED
+        except ScriptError as e:
+            run.state = FAILED
+            run.error = str(e)
+            add_log_entry(f"Script {job.name} failed on {run.name} at step {run.step}: {str(e)}", is_error=True)
+        except Exception as e:
+            run.state = FAILED
+            run.error = str(e)
+            error_trace = traceback.format_exc()
+            add_log_entry(f"Error running script {job.name} on {run.name}: {str(e)}\n{error_trace}", is_error=True)
+        finally:
+            run.finished_at = time.time()
+            with self.lock:
+                self.busy.discard(run.target.key)
+                last = job.state != RUNNING and not job.finished
+                job.finished = job.finished or last
+            if last:
+                summary = job.to_dict()['summary']
+                add_log_entry(f"Script {job.name} finished: {summary[COMPLETE]} complete, "
+                              f"{summary[FAILED]} failed, {summary[CANCELLED]} cancelled")
+            self._notify(job)
+
+    def cancel(self, job_id):
+        job = self.jobs.get(job_id)
+        if job is None or job.state != RUNNING:
+            return False
+        for run in job.runs:
+            if run.state == RUNNING:
+                run.cancel()
+        return True
+
+    def get(self, job_id, transcripts=True):
+        job = self.jobs.get(job_id)
+        return job.to_dict(transcripts) if job else None
+
+    def list(self):
+        with self.lock:
+            return [job.to_dict() for job in reversed(self.jobs.values())]
+
+# Shared engine for expect scripts
+script_engine = ScriptEngine()
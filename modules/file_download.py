@@ -0,0 +1,127 @@
+import os
+import mimetypes
+import unicodedata
+from urllib.parse import quote
+from flask import request, Response
+from werkzeug.http import http_date, parse_date
+from werkzeug.wsgi import wrap_file
+
+# Bytes read per iteration when the server cannot send the file itself
+READ_BUFFER = 256 * 1024
+
+def file_etag(st):
+    """Strong ETag from inode, size and modification time"""
+    return f'"{st.st_ino:x}-{st.st_size:x}-{st.st_mtime_ns:x}"'
+
+def parse_range(header, size):
+    """Parse a single 'bytes=' range into (start, end) inclusive
+
+    Returns None when the header should be ignored (absent, malformed or
+    multiple ranges, which are served as the full file) and 'unsatisfiable'
+    when the range lies outside the file.
+    """
+    if not header or not header.startswith('bytes='):
+        return None
+    spec = header[6:].strip()
+    if ',' in spec or '-' not in spec:
+        return None
+    first, _, last = spec.partition('-')
+    try:
+        if first == '':
+            # Suffix range: the last N bytes
+            length = int(last)
+            if length <= 0:
+                return 'unsatisfiable'
+            return max(size - length, 0), size - 1
+        start = int(first)
+        end = int(last) if last else size - 1
+    except ValueError:
+        return None
+    if start >= size:
+        return 'unsatisfiable'
+    if end < start:
+        return None
+    return start, min(end, size - 1)
+
+def _if_range_matches(header, etag, st):
+    """If-Range holds either a strong ETag or the exact Last-Modified date"""
+    if header.startswith('"') or header.startswith('W/'):
+        return header == etag
+    date = parse_date(header)
+    return date is not None and int(date.timestamp()) == int(st.st_mtime)
+
+def _read_range(f, start, length):
+    try:
+        f.seek(start)
+        while length > 0:
+            data = f.read(min(READ_BUFFER, length))
+            if not data:
+                break
+            length -= len(data)
+            yield data
+    finally:
+        f.close()
+
+def send_file_ranged(path, download_name=None, mimetype=None, as_attachment=True):
+    """Send a file with ETag, conditional GET and single Range support
+
+    Resumed downloads (Range: bytes=N-) and full downloads are handed to the
+    WSGI server's file_wrapper. Under gunicorn that is sent with sendfile(),
+    starting from the seek position and limited to Content-Length, so the
+    bytes never pass through Python. Bounded ranges are read in Python,
+    because file wrappers elsewhere send to end of file.
+    """
+    st = os.stat(path)
+    size = st.st_size
+    etag = file_etag(st)
+    download_name = download_name or os.path.basename(path)
+    if mimetype is None:
+        mimetype = mimetypes.guess_type(download_name)[0] or 'application/octet-stream'
+
+    headers = {
+        'ETag': etag,
+        'Last-Modified': http_date(st.st_mtime),
+        'Accept-Ranges': 'bytes',
+        'Cache-Control': 'no-cache'
+    }
+
+    if_none_match = request.headers.get('If-None-Match')
+    if if_none_match and (if_none_match.strip() == '*' or etag in [tag.strip() for tag in if_none_match.split(',')]):
+        return Response(status=304, headers=headers)
+
+    byte_range = parse_range(request.headers.get('Range'), size)
+    if_range = request.headers.get('If-Range')
+    if byte_range is not None and if_range and not _if_range_matches(if_range.strip(), etag, st):
+        # The file changed since the client's partial copy; send all of it
+        byte_range = None
+
+    if byte_range == 'unsatisfiable':
+        headers['Content-Range'] = f'bytes */{size}'
+        return Response(status=416, headers=headers)
+
+    if byte_range is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        start, end = byte_range
+        status = 206
+        headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+    length = end - start + 1 if size else 0
+    headers['Content-Length'] = str(length)
+
+    f = open(path, 'rb')
+    if end == size - 1 and 'wsgi.file_wrapper' in request.environ:
+        f.seek(start)
+        body = wrap_file(request.environ, f, READ_BUFFER)
+    else:
+        body = _read_range(f, start, length)
+
+    response = Response(body, status=status, headers=headers, mimetype=mimetype, direct_passthrough=True)
+    if as_attachment:
+        try:
+            download_name.encode('ascii')
+            names = {'filename': download_name}
+        except UnicodeEncodeError:
+            simple = unicodedata.normalize('NFKD', download_name).encode('ascii', 'ignore').decode('ascii')
+            names = {'filename': simple, 'filename*': f"UTF-8''{quote(download_name, safe='!#$&+-.^_`|~')}"}
+        response.headers.set('Content-Disposition', 'attachment', **names)
+    return response
@@ -0,0 +1,169 @@
+import os
+import json
+import uuid
+import sqlite3
+import threading
+from datetime import datetime
+from .logging import add_log_entry
+
+# Issue store settings
+ISSUES_DB = 'data/issues.sqlite3'
+LEGACY_ISSUES_FILE = 'data/issues.json'    # Imported once into the database
+SCHEMA_VERSION = 1
+ISSUE_PAGE_SIZE = 100                       # Default page size for listings
+ISSUE_MAX_PAGE_SIZE = 500
+
+# Issue status enum
+class IssueStatus:
+    PENDING = 'pending'
+    SUBMITTED = 'submitted'
+    FAILED = 'failed'
+
+ISSUE_STATUSES = (IssueStatus.PENDING, IssueStatus.SUBMITTED, IssueStatus.FAILED)
+ISSUE_FIELDS = ('id', 'title', 'description', 'type', 'timestamp', 'status', 'retries', 'updated')
+
+class IssueStore:
+    """Offline issue queue in SQLite (WAL mode)
+
+    Every change is a single-row statement in its own transaction, so
+    concurrent clients and gunicorn workers never overwrite each other's
+    records. IDs are random UUIDs; a client may also send its own client_id
+    with a create, which makes retried creates return the existing issue
+    instead of adding a duplicate.
+    """
+
+    def __init__(self, db_path=ISSUES_DB, legacy_file=LEGACY_ISSUES_FILE):
+        self.db_path = db_path
+        self.legacy_file = legacy_file
+        self.lock = threading.Lock()
+        self.conn = None
+        self.pid = None
+
+    def _connect(self):
+        # A connection made before gunicorn forks must not be shared with the child
+        if self.conn is None or self.pid != os.getpid():
+            os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+            self.conn = sqlite3.connect(self.db_path, timeout=10, check_same_thread=False)
+            self.conn.row_factory = sqlite3.Row
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS issues (
+                seq INTEGER PRIMARY KEY AUTOINCREMENT,
+                id TEXT NOT NULL UNIQUE,
+                client_id TEXT UNIQUE,
+                title TEXT NOT NULL,
+                description TEXT NOT NULL,
+                type TEXT NOT NULL,
+                timestamp TEXT NOT NULL,
+                status TEXT NOT NULL,
+                retries INTEGER NOT NULL DEFAULT 0,
+                updated TEXT)""")
+            self.conn.execute("CREATE INDEX IF NOT EXISTS issues_status ON issues (status, seq)")
+            self.conn.commit()
+            self.pid = os.getpid()
+            if self.conn.execute("PRAGMA user_version").fetchone()[0] < SCHEMA_VERSION:
+                self._import_legacy()
+        return self.conn
+
+    def _import_legacy(self):
+        """Copy issues from the old JSON file into the database, once"""
+        conn = self.conn
+        imported = 0
+        try:
+            if os.path.exists(self.legacy_file):
+                with open(self.legacy_file, 'r') as f:
+                    legacy = json.load(f)
+                for issue in legacy:
+                    cursor = conn.execute(
+                        """INSERT OR IGNORE INTO issues (id, title, description, type, timestamp, status, retries)
+                           VALUES (?, ?, ?, ?, ?, ?, ?)""",
+                        (str(issue.get('id') or uuid.uuid4().hex), issue.get('title', ''), issue.get('description', ''),
+                         issue.get('type', 'bug'), issue.get('timestamp') or datetime.now().isoformat(),
+                         issue.get('status', IssueStatus.PENDING), int(issue.get('retries', 0))))
+                    imported += cursor.rowcount
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            add_log_entry(f"Error importing {self.legacy_file} into the issue store: {str(e)}", is_error=True)
+        conn.execute(f"PRAGMA user_version = {SCHEMA_VERSION}")
+        conn.commit()
+        if imported:
+            add_log_entry(f"Imported {imported} issues from {self.legacy_file} into {self.db_path}")
+
+    def _issue(self, row):
+        return {field: row[field] for field in ISSUE_FIELDS} if row else None
+
+    def list(self, status=None, page=1, limit=ISSUE_PAGE_SIZE):
+        """Issues in creation order, optionally with one status; returns (issues, total)"""
+        limit = max(1, min(int(limit), ISSUE_MAX_PAGE_SIZE))
+        offset = (max(int(page), 1) - 1) * limit
+        where, args = ("WHERE status = ?", (status,)) if status else ("", ())
+        with self.lock:
+            conn = self._connect()
+            total = conn.execute(f"SELECT COUNT(*) FROM issues {where}", args).fetchone()[0]
+            rows = conn.execute(f"SELECT * FROM issues {where} ORDER BY seq LIMIT ? OFFSET ?",
+                                args + (limit, offset)).fetchall()
+        return [self._issue(row) for row in rows], total
+
+    def counts(self):
+        """Number of issues per status"""
+        with self.lock:
+            conn = self._connect()
+            rows = conn.execute("SELECT status, COUNT(*) FROM issues GROUP BY status").fetchall()
+        return {status: count for status, count in rows}
+
+    def get(self, issue_id):
+        with self.lock:
+            conn = self._connect()
+            row = conn.execute("SELECT * FROM issues WHERE id = ?", (issue_id,)).fetchone()
+        return self._issue(row)
+
+    def create(self, title, description, issue_type='bug', status=IssueStatus.PENDING, client_id=None):
+        """Add an issue; returns (issue, created)
+
+        created is False when an issue with the same client_id already exists.
+        """
+        issue = {
+            'id': uuid.uuid4().hex,
+            'title': title,
+            'description': description,
+            'type': issue_type,
+            'timestamp': datetime.now().isoformat(),
+            'status': status,
+            'retries': 0,
+            'updated': None
+        }
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    """INSERT OR IGNORE INTO issues (id, client_id, title, description, type, timestamp, status, retries)
+                       VALUES (?, ?, ?, ?, ?, ?, ?, 0)""",
+                    (issue['id'], client_id, title, description, issue_type, issue['timestamp'], status))
+            if cursor.rowcount:
+                return issue, True
+            row = conn.execute("SELECT * FROM issues WHERE client_id = ?", (client_id,)).fetchone()
+        return self._issue(row), False
+
+    def update(self, issue_id, status=None, retries=None):
+        """Change status and/or retry count of one issue; returns the issue or None"""
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute(
+                    """UPDATE issues SET status = COALESCE(?, status), retries = COALESCE(?, retries), updated = ?
+                       WHERE id = ?""",
+                    (status, retries, datetime.now().isoformat(), issue_id))
+            if not cursor.rowcount:
+                return None
+            row = conn.execute("SELECT * FROM issues WHERE id = ?", (issue_id,)).fetchone()
+        return self._issue(row)
+
+    def delete(self, issue_id):
+        """Remove one issue; returns False if it did not exist"""
+        with self.lock:
+            conn = self._connect()
+            with conn:
+                cursor = conn.execute("DELETE FROM issues WHERE id = ?", (issue_id,))
+        return cursor.rowcount > 0
+
+# Shared issue store
+issue_store = IssueStore()
@@ -0,0 +1,350 @@
+import os
+import re
+import json
+import gzip
+import sqlite3
+import threading
+from .logging import LOG_DIR, log_segments, _archive_sort_key
+
+# SQLite index of log lines, kept in a subdirectory so the log list skips it
+INDEX_DIR = os.path.join(LOG_DIR, ".index")
+INDEX_DB = os.path.join(INDEX_DIR, "logs.sqlite3")
+
+# Lines inserted per transaction while indexing
+INDEX_BATCH_SIZE = 5000
+
+# Sort priority of log levels (lower is more severe)
+LEVEL_RANK = {'ERROR': 0, 'WARNING': 1, 'INFO': 2, 'DEBUG': 3}
+UNKNOWN_RANK = 4
+
+TEXT_TIMESTAMP_PATTERN = re.compile(r'\[([\d\-\s:\.]+)\]')
+TEXT_LEVEL_PATTERN = re.compile(r'\[(INFO|ERROR|WARNING|DEBUG)\]', re.IGNORECASE)
+DATETIME_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2}(?:\.\d+)?)')
+# Trigram matching needs at least three characters
+FTS_MIN_TERM = 3
+
+def is_json_log(filename):
+    """Check whether a log file holds one JSON entry per line"""
+    return filename.endswith('.json') or filename == 'app_log.txt'
+
+def _sort_timestamp(value):
+    """Normalise a timestamp so that plain string comparison orders it chronologically"""
+    match = DATETIME_PATTERN.search(value or '')
+    if not match:
+        return ''
+    # Render the separator consistently; fractions compare correctly as text
+    return match.group(1).replace('\t', ' ')
+
+def parse_log_line(line, json_format):
+    """Parse one raw log line into the fields stored in the index
+
+    Returns a tuple (timestamp, sort_timestamp, level, level_rank, message,
+    mentions_error), or None for blank lines.
+    """
+    text = line.strip()
+    if not text:
+        return None
+    mentions_error = 'error' in text.lower()
+
+    if json_format:
+        try:
+            entry = json.loads(text)
+            timestamp = str(entry.get('timestamp', ''))
+            level = str(entry.get('level', '')).upper()
+            message = str(entry.get('message', ''))
+            return (timestamp, _sort_timestamp(timestamp), level,
+                    LEVEL_RANK.get(level, UNKNOWN_RANK), message, mentions_error)
+        except (ValueError, AttributeError):
+            return ('', '', 'UNKNOWN', UNKNOWN_RANK, text, mentions_error)
+
+    timestamp_match = TEXT_TIMESTAMP_PATTERN.search(text)
+    level_match = TEXT_LEVEL_PATTERN.search(text)
+    timestamp = timestamp_match.group(1) if timestamp_match else ""
+    level = level_match.group(1).upper() if level_match else "INFO"
+
+    if level == "ERROR" or mentions_error:
+        level = "ERROR"
+    elif level == "WARNING" or "warning" in text.lower():
+        level = "WARNING"
+
+    sort_timestamp = _sort_timestamp(timestamp) or _sort_timestamp(text)
+    return (timestamp, sort_timestamp, level, LEVEL_RANK.get(level, UNKNOWN_RANK), text, mentions_error)
+
+class LogIndex:
+    """Incremental SQLite index over the files in the logs directory
+
+    Each log file is tracked by the inode and byte offset of its live segment,
+    so a sync only parses lines appended since the previous one. Rotated
+    segments keep their rows; rows of pruned archives are dropped. Counters
+    for totals, errors and warnings live in the files table, so listing and
+    paging never scan the log itself.
+    """
+
+    def __init__(self, db_path=INDEX_DB):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = None
+        self.fts_available = False
+
+    def _connect(self):
+        if self.conn is not None:
+            return self.conn
+        os.makedirs(os.path.dirname(self.db_path), exist_ok=True)
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript("""
+            CREATE TABLE IF NOT EXISTS files (
+                path TEXT PRIMARY KEY,
+                inode INTEGER,
+                offset INTEGER,
+                last_archive TEXT,
+                next_seq INTEGER,
+                line_count INTEGER,
+                error_count INTEGER,
+                warning_count INTEGER,
+                error_mentions INTEGER
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                id INTEGER PRIMARY KEY,
+                path TEXT,
+                segment TEXT,
+                seq INTEGER,
+                timestamp TEXT,
+                sort_ts TEXT,
+                level TEXT,
+                level_rank INTEGER,
+                message TEXT,
+                raw TEXT
+            );
+            CREATE INDEX IF NOT EXISTS entries_path_seq ON entries(path, seq);
+            CREATE INDEX IF NOT EXISTS entries_path_ts ON entries(path, sort_ts, seq);
+            CREATE INDEX IF NOT EXISTS entries_path_rank ON entries(path, level_rank, seq);
+            CREATE INDEX IF NOT EXISTS entries_segment ON entries(path, segment);
+        """)
+        try:
+            conn.execute("""
+                CREATE VIRTUAL TABLE IF NOT EXISTS entries_fts
+                USING fts5(message, level, content='entries', content_rowid='id', tokenize='trigram')
+            """)
+            conn.executescript("""
+                CREATE TRIGGER IF NOT EXISTS entries_fts_insert AFTER INSERT ON entries BEGIN
+                    INSERT INTO entries_fts(rowid, message, level) VALUES (new.id, new.message, new.level);
+                END;
+                CREATE TRIGGER IF NOT EXISTS entries_fts_delete AFTER DELETE ON entries BEGIN
+                    INSERT INTO entries_fts(entries_fts, rowid, message, level) VALUES ('delete', old.id, old.message, old.level);
+                END;
+            """)
+            self.fts_available = True
+        except sqlite3.OperationalError:
+            # SQLite without FTS5 trigram support - searches fall back to a scan
+            self.fts_available = False
+        conn.commit()
+        self.conn = conn
+        return conn
+
+    def sync(self, path):
+        """Bring the index for one log file up to date with what is on disk"""
+        with self.lock:
+            conn = self._connect()
+            state = conn.execute(
+                "SELECT inode, offset, last_archive, next_seq, line_count, error_count, warning_count, error_mentions "
+                "FROM files WHERE path = ?", (path,)).fetchone()
+
+            segments = log_segments(path)
+            live_exists = bool(segments) and segments[-1] == path
+            archives = segments[:-1] if live_exists else segments
+            live_stat = os.stat(path) if live_exists else None
+
+            if state is None or not self._archives_are_stamped(path, archives):
+                if state is not None and live_stat and state[0] == live_stat.st_ino and live_stat.st_size >= state[1]:
+                    # Numbered backups: only rebuild once the live file rotates
+                    self._index_live(conn, path, state, live_stat)
+                    return
+                self._rebuild(conn, path, archives, live_stat)
+                return
+
+            inode, offset, last_archive = state[0], state[1], state[2]
+            counters = list(state[3:])
+
+            if live_stat is None or live_stat.st_ino != inode or live_stat.st_size < offset:
+                base = os.path.basename(path)
+                last_key = _archive_sort_key(base, last_archive or '')
+                new_archives = [a for a in archives
+                                if last_key is None or _archive_sort_key(base, os.path.basename(a)) > last_key]
+                if new_archives:
+                    # The old live segment is now the first new archive: finish it from
+                    # where we stopped and move its rows over, then take any others whole
+                    conn.execute("UPDATE entries SET segment = ? WHERE path = ? AND segment = ?",
+                                 (new_archives[0], path, path))
+                    self._index_segment(conn, path, new_archives[0], offset, counters)
+                    for archive in new_archives[1:]:
+                        self._index_segment(conn, path, archive, 0, counters)
+                    last_archive = os.path.basename(new_archives[-1])
+                else:
+                    # Truncated in place - its old rows are gone from disk
+                    self._drop_segment(conn, path, path, counters)
+                offset = 0
+
+            if live_stat is not None:
+                offset = self._index_segment(conn, path, path, offset, counters)
+
+            # Follow archives that were compressed since they were indexed, and
+            # drop rows of archives removed by retention
+            on_disk = {_uncompressed_name(segment): segment for segment in segments}
+            for (segment,) in conn.execute("SELECT DISTINCT segment FROM entries WHERE path = ?", (path,)).fetchall():
+                current = on_disk.get(_uncompressed_name(segment))
+                if current is None:
+                    self._drop_segment(conn, path, segment, counters)
+                elif current != segment:
+                    conn.execute("UPDATE entries SET segment = ? WHERE path = ? AND segment = ?",
+                                 (current, path, segment))
+
+            self._save_state(conn, path, live_stat.st_ino if live_stat else None, offset, last_archive, counters)
+            conn.commit()
+
+    def _archives_are_stamped(self, path, archives):
+        """Whether archives use stamped names, which keep their name once written"""
+        base = os.path.basename(path)
+        return all(_archive_sort_key(base, os.path.basename(a))[0] == 1 for a in archives)
+
+    def _index_live(self, conn, path, state, live_stat):
+        counters = list(state[3:])
+        offset = self._index_segment(conn, path, path, state[1], counters)
+        self._save_state(conn, path, live_stat.st_ino, offset, state[2], counters)
+        conn.commit()
+
+    def _rebuild(self, conn, path, archives, live_stat):
+        conn.execute("DELETE FROM entries WHERE path = ?", (path,))
+        counters = [0, 0, 0, 0, 0]
+        for archive in archives:
+            self._index_segment(conn, path, archive, 0, counters)
+        offset = 0
+        if live_stat is not None:
+            offset = self._index_segment(conn, path, path, 0, counters)
+        last_archive = os.path.basename(archives[-1]) if archives else ''
+        self._save_state(conn, path, live_stat.st_ino if live_stat else None, offset, last_archive, counters)
+        conn.commit()
+
+    def _save_state(self, conn, path, inode, offset, last_archive, counters):
+        conn.execute(
+            "INSERT OR REPLACE INTO files (path, inode, offset, last_archive, next_seq, line_count, "
+            "error_count, warning_count, error_mentions) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (path, inode, offset, last_archive, *counters))
+
+    def _drop_segment(self, conn, path, segment, counters):
+        row = conn.execute(
+            "SELECT COUNT(*), SUM(level_rank = 0), SUM(level_rank = 1), SUM(instr(lower(raw), 'error') > 0) "
+            "FROM entries WHERE path = ? AND segment = ?", (path, segment)).fetchone()
+        conn.execute("DELETE FROM entries WHERE path = ? AND segment = ?", (path, segment))
+        # Blank lines are not stored, so line totals only shrink by the stored rows
+        counters[1] -= row[0] or 0
+        counters[2] -= row[1] or 0
+        counters[3] -= row[2] or 0
+        counters[4] -= row[3] or 0
+
+    def _index_segment(self, conn, path, segment, offset, counters):
+        """Index a segment from a byte offset; returns the offset after the last complete line
+
+        counters is [next_seq, line_count, error_count, warning_count, error_mentions]
+        and is updated in place.
+        """
+        json_format = is_json_log(os.path.basename(path))
+        batch = []
+        try:
+            with _open_segment_bytes(segment) as handle:
+                handle.seek(offset)
+                for raw_line in handle:
+                    if not raw_line.endswith(b'\n') and segment == path:
+                        # Partial line still being written; pick it up next time
+                        break
+                    offset += len(raw_line)
+                    line = raw_line.decode('utf-8', errors='replace')
+                    counters[1] += 1
+                    parsed = parse_log_line(line, json_format)
+                    if parsed is None:
+                        continue
+                    timestamp, sort_ts, level, rank, message, mentions_error = parsed
+                    if rank == 0:
+                        counters[2] += 1
+                    elif rank == 1:
+                        counters[3] += 1
+                    if mentions_error:
+                        counters[4] += 1
+                    batch.append((path, segment, counters[0], timestamp, sort_ts, level, rank, message, line.rstrip('\n')))
+                    counters[0] += 1
+                    if len(batch) >= INDEX_BATCH_SIZE:
+                        self._insert(conn, batch)
+                        batch = []
+        except (OSError, EOFError):
+            pass
+        if batch:
+            self._insert(conn, batch)
+        return offset
+
+    def _insert(self, conn, batch):
+        conn.executemany(
+            "INSERT INTO entries (path, segment, seq, timestamp, sort_ts, level, level_rank, message, raw) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", batch)
+
+    def summary(self, path):
+        """Counters for a log file: total lines, errors, warnings and lines mentioning errors"""
+        self.sync(path)
+        with self.lock:
+            row = self.conn.execute(
+                "SELECT line_count, error_count, warning_count, error_mentions FROM files WHERE path = ?",
+                (path,)).fetchone()
+        if not row:
+            return {'total': 0, 'error_count': 0, 'warning_count': 0, 'error_mentions': 0}
+        return {'total': row[0], 'error_count': row[1], 'warning_count': row[2], 'error_mentions': row[3]}
+
+    def query(self, path, page=1, limit=100, sort_by='timestamp', sort_order='desc',
+              filter_level='all', search_term=''):
+        """Return one page of indexed entries plus the filtered count"""
+        self.sync(path)
+
+        where = ["path = ?"]
+        params = [path]
+        if filter_level == 'error':
+            where.append("level_rank = 0")
+        elif filter_level == 'warning':
+            where.append("level_rank <= 1")
+
+        if search_term:
+            if self.fts_available and len(search_term) >= FTS_MIN_TERM:
+                # Trigram index gives case-insensitive substring matches
+                where.append("id IN (SELECT rowid FROM entries_fts WHERE entries_fts MATCH ?)")
+                params.append('"' + search_term.replace('"', '""') + '"')
+            else:
+                where.append("(instr(lower(message), ?) > 0 OR instr(lower(level), ?) > 0)")
+                params.extend([search_term.lower(), search_term.lower()])
+
+        direction = 'DESC' if sort_order == 'desc' else 'ASC'
+        if sort_by == 'level':
+            # Descending severity shows errors first
+            order = f"level_rank {'ASC' if sort_order == 'desc' else 'DESC'}, seq"
+        else:
+            order = f"sort_ts {direction}, seq {direction}"
+
+        where_sql = ' AND '.join(where)
+        page = max(page, 1)
+        with self.lock:
+            filtered_count = self.conn.execute(
+                f"SELECT COUNT(*) FROM entries WHERE {where_sql}", params).fetchone()[0]
+            rows = self.conn.execute(
+                f"SELECT timestamp, sort_ts, level, raw FROM entries WHERE {where_sql} "
+                f"ORDER BY {order} LIMIT ? OFFSET ?", params + [limit, (page - 1) * limit]).fetchall()
+        return rows, filtered_count
+
+def _uncompressed_name(segment):
+    """An archive keeps its identity when rotation gzips it: X and X.gz are the same segment"""
+    return segment[:-3] if segment.endswith('.gz') else segment
+
+def _open_segment_bytes(path):
+    """Open a log segment for reading bytes so offsets match the file on disk"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    return open(path, 'rb')
+
+# Shared index used by the log routes
+log_index = LogIndex()
@@ -3,6 +3,14 @@ import os
 import datetime
 import traceback
 import sys
+import threading
+import queue
+import atexit
+import gzip
+import re
+import time
+import itertools
+from collections import deque
 
 # Set up the log directory and file
 LOG_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "logs")
@@ -12,16 +20,397 @@ if not os.path.exists(LOG_DIR):
 LOG_FILE = os.path.join(LOG_DIR, "app_log.txt")
 DEBUG_LOG_FILE = os.path.join(LOG_DIR, "debug_log.txt")
 
-# Keep an in-memory log for the UI
+# Keep an in-memory log for the UI (newest first)
 MAX_LOG_ENTRIES = 50
-log_entries = []
+log_entries = deque(maxlen=MAX_LOG_ENTRIES)
+
+# Recent entries kept for live tail subscribers, oldest first. Each carries a
+# sequence number so a client can resume from the last entry it saw.
+LOG_TAIL_SIZE = 1000
+tail_entries = deque(maxlen=LOG_TAIL_SIZE)
+_tail_sequence = itertools.count(1)
+# Distinguishes sequence numbers of this process from those of a previous run
+LOG_EPOCH = format(int(time.time()), 'x')
+
+# Callables run by the writer thread after each batch reaches disk
+log_listeners = []
+
+# Asynchronous writer settings
+LOG_QUEUE_SIZE = 10000        # Maximum records waiting to be written
+LOG_BATCH_SIZE = 500          # Maximum records written per flush
+LOG_FLUSH_INTERVAL = 0.5      # Seconds between flushes when the queue is idle
+LOG_BLOCK_TIMEOUT = 1.0       # Seconds a caller may wait under the 'block' policy
+LOG_CONSOLE_OUTPUT = True     # Echo entries to stdout/stderr
+
+# What to do when the write queue is full:
+#   'drop_oldest' - discard the oldest queued record to make room (default)
+#   'drop_new'    - discard the record being logged
+#   'block'       - wait up to LOG_BLOCK_TIMEOUT for room, then drop the new record
+LOG_OVERFLOW_POLICY = 'drop_oldest'
+
+# Rotation of app_log.txt and debug_log.txt into gzip'd archives
+LOG_MAX_BYTES = 5 * 1024 * 1024     # Rotate once a segment reaches this size
+LOG_ROTATE_INTERVAL = 24 * 3600     # ...or once it is this many seconds old (0 disables)
+LOG_BACKUP_COUNT = 14               # Archives kept per log file
+LOG_RETENTION_DAYS = 30             # Archives older than this are deleted (0 disables)
+
+# Archives are named <log file>.<YYYYmmdd-HHMMSS>[-n].gz so they sort chronologically
+ARCHIVE_STAMP_PATTERN = re.compile(r'\d{8}-\d{6}(-\d+)?')
+SEGMENT_TIMESTAMP_PATTERN = re.compile(r'(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})')
+
+class LogWriter:
+    """Drains queued log records to disk from a background thread
+
+    Log files are kept open between writes and flushed once per batch, so
+    callers of add_log_entry never touch the filesystem themselves.
+    """
+
+    def __init__(self, queue_size=LOG_QUEUE_SIZE):
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+        self.dropped = 0
+        self.written = 0
+        self.log_file = None
+        self.debug_file = None
+        self.segment_started = {}  # log path -> epoch of its first entry
+
+    def ensure_started(self):
+        """Start the writer thread, restarting it in a forked child process"""
+        if self.pid == os.getpid() and self.thread and self.thread.is_alive():
+            return
+        with self.lock:
+            if self.pid == os.getpid() and self.thread and self.thread.is_alive():
+                return
+            if self.pid != os.getpid():
+                # Threads and buffered handles do not survive a fork
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                self.log_file = None
+                self.debug_file = None
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, name="log-writer", daemon=True)
+            self.thread.start()
+
+    def submit(self, record):
+        """Queue a record for writing according to LOG_OVERFLOW_POLICY"""
+        self.ensure_started()
+        try:
+            self.queue.put_nowait(record)
+            return True
+        except queue.Full:
+            pass
+
+        if LOG_OVERFLOW_POLICY == 'block':
+            try:
+                self.queue.put(record, timeout=LOG_BLOCK_TIMEOUT)
+                return True
+            except queue.Full:
+                pass
+        elif LOG_OVERFLOW_POLICY == 'drop_oldest':
+            try:
+                oldest = self.queue.get_nowait()
+                self.queue.task_done()
+                if isinstance(oldest, threading.Event):
+                    oldest.set()  # Never leave a flush_logs() caller waiting
+                else:
+                    self.dropped += 1
+                self.queue.put_nowait(record)
+                return True
+            except (queue.Empty, queue.Full):
+                pass
+
+        self.dropped += 1
+        return False
+
+    def flush(self, timeout=5.0):
+        """Wait until every queued record has been written"""
+        if not self.thread or not self.thread.is_alive():
+            return self.queue.empty()
+        done = threading.Event()
+        try:
+            self.queue.put(done, timeout=timeout)
+        except queue.Full:
+            return False
+        return done.wait(timeout)
+
+    def _open_files(self):
+        if self.log_file is None:
+            self.log_file = self._open_segment(LOG_FILE)
+        if self.debug_file is None:
+            self.debug_file = self._open_segment(DEBUG_LOG_FILE)
+
+    def _open_segment(self, path):
+        handle = open(path, "a", buffering=64 * 1024)
+        self.segment_started[path] = _segment_start_time(path)
+        return handle
+
+    def _rotate_if_needed(self):
+        """Rotate segments that are too big or too old, and follow rotations done elsewhere"""
+        now = time.time()
+        for attr, path in (('log_file', LOG_FILE), ('debug_file', DEBUG_LOG_FILE)):
+            handle = getattr(self, attr)
+            try:
+                # Another process (e.g. the serial bridge) may have rotated the file
+                if os.stat(path).st_ino != os.fstat(handle.fileno()).st_ino:
+                    handle.close()
+                    setattr(self, attr, self._open_segment(path))
+                    continue
+            except FileNotFoundError:
+                handle.close()
+                setattr(self, attr, self._open_segment(path))
+                continue
+
+            size = handle.tell()
+            age = now - self.segment_started.get(path, now)
+            if size >= LOG_MAX_BYTES or (LOG_ROTATE_INTERVAL and size and age >= LOG_ROTATE_INTERVAL):
+                handle.close()
+                rotate_log_file(path)
+                setattr(self, attr, self._open_segment(path))
+
+    def _run(self):
+        while True:
+            try:
+                item = self.queue.get(timeout=LOG_FLUSH_INTERVAL)
+            except queue.Empty:
+                continue
+
+            # Gather whatever else is already waiting into the same batch
+            batch = [item]
+            while len(batch) < LOG_BATCH_SIZE:
+                try:
+                    batch.append(self.queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            self._write_batch(batch)
+            for _ in batch:
+                self.queue.task_done()
+
+    def _write_batch(self, batch):
+        waiters = []
+        try:
+            self._open_files()
+            self._rotate_if_needed()
+            if self.dropped:
+                dropped, self.dropped = self.dropped, 0
+                self.debug_file.write(f"LOGGING OVERFLOW: {dropped} log entries dropped\n")
+
+            for record in batch:
+                if isinstance(record, threading.Event):
+                    waiters.append(record)
+                    continue
+                log_entry, caller_info = record
+                debug_line = f"[{log_entry['timestamp']}] {log_entry['level']} {caller_info} {log_entry['message']}"
+                self.log_file.write(json.dumps(log_entry) + "\n")
+                self.debug_file.write(debug_line + "\n")
+                if LOG_CONSOLE_OUTPUT:
+                    print(debug_line, file=sys.stderr if log_entry['level'] == "ERROR" else sys.stdout)
+                self.written += 1
+
+            self.log_file.flush()
+            self.debug_file.flush()
+        except Exception as e:
+            print(f"ERROR IN LOGGING: {str(e)}, while writing {len(batch)} log entries", file=sys.stderr)
+            self._close_files()
+        finally:
+            for waiter in waiters:
+                waiter.set()
+        for listener in list(log_listeners):
+            try:
+                listener()
+            except Exception as e:
+                print(f"ERROR IN LOG LISTENER: {str(e)}", file=sys.stderr)
+
+    def _close_files(self):
+        for handle in (self.log_file, self.debug_file):
+            try:
+                if handle:
+                    handle.close()
+            except Exception:
+                pass
+        self.log_file = None
+        self.debug_file = None
+
+def _segment_start_time(path):
+    """Time of the first entry in a log segment, or now for an empty one"""
+    try:
+        with open(path, 'r', errors='replace') as f:
+            first_line = f.readline(4096)
+        match = SEGMENT_TIMESTAMP_PATTERN.search(first_line)
+        if match:
+            return time.mktime(time.strptime(match.group(1), "%Y-%m-%d %H:%M:%S"))
+    except (OSError, ValueError, OverflowError):
+        pass
+    return time.time()
+
+def rotate_log_file(path):
+    """Move a log file into a gzip'd archive next to it and apply retention
+
+    Returns the archive path, or None if there was nothing to rotate.
+    """
+    try:
+        if not os.path.exists(path) or os.path.getsize(path) == 0:
+            return None
+
+        stamp = datetime.datetime.now().strftime("%Y%m%d-%H%M%S")
+        rotated = f"{path}.{stamp}"
+        suffix = 1
+        while os.path.exists(rotated) or os.path.exists(rotated + ".gz"):
+            rotated = f"{path}.{stamp}-{suffix}"
+            suffix += 1
+        os.rename(path, rotated)
+
+        # Compress under a name log_segments ignores, so nobody reads a partial archive
+        archive = rotated + ".gz"
+        partial = archive + ".tmp"
+        try:
+            with open(rotated, 'rb') as src, gzip.open(partial, 'wb', compresslevel=6) as dst:
+                while True:
+                    chunk = src.read(256 * 1024)
+                    if not chunk:
+                        break
+                    dst.write(chunk)
+                    time.sleep(0)  # Let other green threads run under eventlet
+            os.replace(partial, archive)
+        except Exception:
+            if os.path.exists(partial):
+                os.remove(partial)
+            raise
+        os.remove(rotated)
+
+        prune_log_archives(path)
+        return archive
+    except Exception as e:
+        print(f"ERROR IN LOGGING: failed to rotate {path}: {str(e)}", file=sys.stderr)
+        return None
+
+def prune_log_archives(path):
+    """Delete archives of a log file beyond LOG_BACKUP_COUNT or older than LOG_RETENTION_DAYS"""
+    archives = [segment for segment in log_segments(path) if segment != path]
+    cutoff = time.time() - LOG_RETENTION_DAYS * 86400 if LOG_RETENTION_DAYS else None
+    excess = max(0, len(archives) - LOG_BACKUP_COUNT)
+
+    for index, archive in enumerate(archives):
+        try:
+            if index < excess or (cutoff and os.path.getmtime(archive) < cutoff):
+                os.remove(archive)
+        except OSError:
+            pass
+
+def _archive_sort_key(base, name):
+    """Sort key for an archive of base, or None if name is not one"""
+    if not name.startswith(base + '.'):
+        return None
+    suffix = name[len(base) + 1:]
+    if suffix.endswith('.gz'):
+        suffix = suffix[:-3]
+    if suffix.isdigit():
+        # RotatingFileHandler numbering (app.log.1 is the newest backup)
+        return (0, -int(suffix), '')
+    match = ARCHIVE_STAMP_PATTERN.fullmatch(suffix)
+    if match:
+        # The -n counter is numeric, so STAMP-10 comes after STAMP-9
+        counter = match.group(1)
+        return (1, suffix[:15], int(counter[1:]) if counter else 0)
+    return None
+
+def is_log_archive(name, names):
+    """Check whether a file name is a rotated segment of another file in names"""
+    return any(_archive_sort_key(base, name) is not None for base in names if base != name)
+
+def log_segments(path):
+    """All segments of a log file, oldest first, ending with the live file if it exists"""
+    directory, base = os.path.split(path)
+    archives = {}
+    try:
+        for name in os.listdir(directory or '.'):
+            key = _archive_sort_key(base, name)
+            # Right after compression X and X.gz both exist for a moment; they are one segment
+            if key is not None and (key not in archives or name.endswith('.gz')):
+                archives[key] = os.path.join(directory, name)
+    except OSError:
+        pass
+    segments = [archives[key] for key in sorted(archives)]
+    if os.path.exists(path):
+        segments.append(path)
+    return segments
+
+def open_log_segment(path):
+    """Open a log segment for reading text, decompressing archives"""
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', errors='replace')
+    return open(path, 'r', errors='replace')
+
+def iter_log_lines(path):
+    """Iterate over the lines of a log file across all of its segments, oldest first"""
+    for segment in log_segments(path):
+        try:
+            with open_log_segment(segment) as f:
+                for line in f:
+                    yield line
+        except (OSError, EOFError):
+            # A segment rotated or pruned while reading is simply skipped
+            continue
+
+log_writer = LogWriter()
+
+def flush_logs(timeout=5.0):
+    """Block until all queued log entries have been written to disk"""
+    return log_writer.flush(timeout)
+
+atexit.register(flush_logs, 2.0)
+
+def add_log_listener(listener):
+    """Call listener() from the writer thread whenever new entries are written"""
+    if listener not in log_listeners:
+        log_listeners.append(listener)
+
+def remove_log_listener(listener):
+    """Stop calling a listener registered with add_log_listener"""
+    if listener in log_listeners:
+        log_listeners.remove(listener)
+
+def format_tail_cursor(seq):
+    """Encode a tail sequence number as a cursor a client can hand back later"""
+    return f"{LOG_EPOCH}:{seq}"
+
+def parse_tail_cursor(cursor):
+    """Decode a tail cursor into a sequence number
+
+    Returns (seq, valid). A missing cursor or one issued by an earlier run of
+    the application is not valid and resumes from the start of the tail.
+    """
+    try:
+        epoch, seq = str(cursor).split(':', 1)
+        if epoch == LOG_EPOCH:
+            return int(seq), True
+    except (ValueError, TypeError):
+        pass
+    return 0, False
+
+def read_tail(after_seq=0):
+    """Entries from the in-memory tail newer than after_seq, oldest first
+
+    Returns (entries, missed) where missed counts entries after after_seq that
+    have already left the tail.
+    """
+    entries = [entry for entry in list(tail_entries) if entry["seq"] > after_seq]
+    missed = 0
+    if entries and after_seq and entries[0]["seq"] > after_seq + 1:
+        missed = entries[0]["seq"] - after_seq - 1
+    return entries, missed
 
 def add_log_entry(message, is_error=False):
-    """Add a log entry to the application log."""
+    """Add a log entry to the application log.
+
+    The entry is added to the in-memory log immediately and queued for the
+    background writer, which handles the console and log files.
+    """
     try:
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
         log_level = "ERROR" if is_error else "INFO"
-        
+
         # Construct the log entry
         log_entry = {
             "timestamp": timestamp,
@@ -29,37 +418,27 @@ def add_log_entry(message, is_error=False):
             "message": message,
             "type": "error" if is_error else "info"  # For backward compatibility
         }
-        
-        # Add to in-memory log for UI
-        log_entries.insert(0, log_entry)  # Add to beginning of list
-        
-        # Trim log to max size
-        while len(log_entries) > MAX_LOG_ENTRIES:
-            log_entries.pop()
-        
+
+        # Add to in-memory log for UI (the deque drops the oldest entry itself)
+        log_entries.appendleft(log_entry)
+
         # Get calling function/file information for debugging
-        caller_info = ""
         try:
             frame = sys._getframe(1)
-            filename = os.path.basename(frame.f_code.co_filename)
-            function_name = frame.f_code.co_name
-            line_number = frame.f_lineno
-            caller_info = f"[{filename}:{function_name}:{line_number}]"
+            caller_info = f"[{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}]"
+            source = frame.f_globals.get('__name__', 'unknown')
         except Exception:
             caller_info = "[unknown]"
-        
-        # Print to console for immediate feedback
-        console_message = f"[{timestamp}] {log_level} {caller_info} {message}"
-        print(console_message, file=sys.stderr if is_error else sys.stdout)
-        
-        # Save to log file
-        with open(LOG_FILE, "a") as f:
-            f.write(json.dumps(log_entry) + "\n")
-            
-        # Save detailed version to debug log
-        with open(DEBUG_LOG_FILE, "a") as f:
-            f.write(f"[{timestamp}] {log_level} {caller_info} {message}\n")
-            
+            source = "unknown"
+
+        tail_entries.append({
+            "seq": next(_tail_sequence),
+            "timestamp": timestamp,
+            "level": log_level,
+            "message": message,
+            "source": source
+        })
+        log_writer.submit((log_entry, caller_info))
         return log_entry
     except Exception as e:
         # Last resort - print to stderr if something fails in the logging
@@ -69,4 +448,4 @@ def add_log_entry(message, is_error=False):
             with open(DEBUG_LOG_FILE, "a") as f:
                 f.write(f"LOGGING FAILURE: {error_msg}\n")
         except:
-            pass  # Nothing more we can do 
\ No newline at end of file
+            pass  # Nothing more we can do
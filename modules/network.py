@@ -2,6 +2,7 @@ import subprocess
 import re
 import os
 from .logging import add_log_entry
+from .serial_registry import serial_registry
 import time
 import threading
 from pathlib import Path
@@ -13,52 +14,41 @@ def get_usb_serial_devices():
     """
     serial_devices = []
     try:
-        # Check for USB serial devices using ls command
-        # Common patterns for USB serial devices are /dev/ttyUSB*, /dev/ttyACM*, etc.
-        devices_cmd = "ls -l /dev/ttyUSB* /dev/ttyACM* /dev/ttyS* 2>/dev/null || true"
-        devices_output = subprocess.check_output(devices_cmd, shell=True).decode().strip().splitlines()
-        
-        for line in devices_output:
-            parts = line.split()
-            if len(parts) >= 10:  # ls -l output format has at least 10 parts for a valid entry
-                device_path = parts[-1]
-                device_name = os.path.basename(device_path)
-                
-                # Get more details if possible
-                details = {}
-                
-                # Try to get USB device details
-                try:
-                    # Get the device information using udevadm
-                    udev_cmd = f"udevadm info --name={device_path} --query=property"
-                    udev_output = subprocess.check_output(udev_cmd, shell=True).decode().strip().splitlines()
-                    
-                    for prop_line in udev_output:
-                        if '=' in prop_line:
-                            key, value = prop_line.split('=', 1)
-                            if key in ['ID_VENDOR', 'ID_MODEL', 'ID_VENDOR_ID', 'ID_MODEL_ID', 'ID_USB_DRIVER']:
-                                details[key] = value
-                    
-                    # Create a friendly name from vendor and model if available
-                    if 'ID_VENDOR' in details and 'ID_MODEL' in details:
-                        details['friendly_name'] = f"{details['ID_VENDOR']} {details['ID_MODEL']}"
-                    elif 'ID_VENDOR' in details:
-                        details['friendly_name'] = details['ID_VENDOR']
-                    elif 'ID_MODEL' in details:
-                        details['friendly_name'] = details['ID_MODEL']
-                    else:
-                        details['friendly_name'] = device_name
-                except Exception as e:
-                    add_log_entry(f"Error getting details for {device_path}: {str(e)}", is_error=True)
-                    details['friendly_name'] = device_name
-                
-                serial_devices.append({
-                    'device': device_path,
-                    'name': device_name,
-                    'details': details
-                })
-                
-                add_log_entry(f"Found USB serial device: {device_path}")
+        # Device nodes from the hotplug registry; details come from sysfs, so no udevadm per device
+        for device in serial_registry.list_devices():
+            device_path = device['path']
+            device_name = device['name']
+            if device_path != device['target'] or not device_name.startswith(('ttyUSB', 'ttyACM', 'ttyS')):
+                continue
+            
+            # Same keys udevadm reported, for the devices that have them
+            details = {}
+            if device['manufacturer'] != 'Unknown':
+                details['ID_VENDOR'] = device['manufacturer']
+            if device['product'] != 'Unknown':
+                details['ID_MODEL'] = device['product']
+            if device['vid'] != 'Unknown':
+                details['ID_VENDOR_ID'] = f"{int(device['vid'], 16):04x}"
+            if device['pid'] != 'Unknown':
+                details['ID_MODEL_ID'] = f"{int(device['pid'], 16):04x}"
+            if device['driver'] and device['vid'] != 'Unknown':
+                details['ID_USB_DRIVER'] = device['driver']
+            
+            # Create a friendly name from vendor and model if available
+            if 'ID_VENDOR' in details and 'ID_MODEL' in details:
+                details['friendly_name'] = f"{details['ID_VENDOR']} {details['ID_MODEL']}"
+            elif 'ID_VENDOR' in details:
+                details['friendly_name'] = details['ID_VENDOR']
+            elif 'ID_MODEL' in details:
+                details['friendly_name'] = details['ID_MODEL']
+            else:
+                details['friendly_name'] = device_name
+            
+            serial_devices.append({
+                'device': device_path,
+                'name': device_name,
+                'details': details
+            })
         
         return serial_devices
     except Exception as e:
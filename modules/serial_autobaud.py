@@ -0,0 +1,177 @@
+import time
+import select
+import termios
+import threading
+import serial
+from .logging import add_log_entry
+
+# Auto-baud settings
+AUTOBAUD_CANDIDATES = [9600, 115200, 38400, 57600, 19200, 4800, 2400, 1200, 230400, 460800, 921600]
+AUTOBAUD_SAMPLE_TIME = 0.3      # Seconds of input sampled at each candidate rate
+AUTOBAUD_SAMPLE_BYTES = 256     # ... or until this many bytes arrived
+AUTOBAUD_IDLE_GAP = 0.05        # ... or until input has been quiet this long after the first byte
+AUTOBAUD_TIMEOUT = 10.0         # Most seconds one detection may take, for all ports together
+AUTOBAUD_MIN_SCORE = 0.8        # Best score needed to report a match
+AUTOBAUD_SURE_SCORE = 0.97      # A candidate this good ends the search for its port early
+AUTOBAUD_FULL_CONFIDENCE = 8    # Bytes needed before a score counts in full
+AUTOBAUD_PROBE = b'\r'          # Sent at each rate to make a quiet console print its prompt
+
+PRINTABLE = frozenset(range(32, 127)) | {9, 10, 13}
+
+def unmark_errors(data):
+    """Split PARMRK-marked input into (bytes, error count)
+
+    With PARMRK set, a byte received with a framing or parity error arrives
+    as 0xFF 0x00 <byte>, a break as 0xFF 0x00 0x00, and a real 0xFF as
+    0xFF 0xFF.
+    """
+    if 0xFF not in data:
+        return data, 0
+    chars = bytearray()
+    errors = 0
+    i = 0
+    length = len(data)
+    while i < length:
+        byte = data[i]
+        if byte == 0xFF and i + 1 < length:
+            if data[i + 1] == 0xFF:
+                chars.append(0xFF)
+                i += 2
+                continue
+            if data[i + 1] == 0x00 and i + 2 < length:
+                errors += 1
+                i += 3
+                continue
+        chars.append(byte)
+        i += 1
+    return bytes(chars), errors
+
+def score_sample(data):
+    """How much a sample looks like console text: printable share, minus framing errors, scaled by size"""
+    chars, errors = unmark_errors(data)
+    total = len(chars) + errors
+    if not total:
+        return 0.0, 0, 0
+    printable = sum(1 for byte in chars if byte in PRINTABLE)
+    score = printable / total
+    # A two-byte sample that happens to be printable proves little
+    score *= min(1.0, total / AUTOBAUD_FULL_CONFIDENCE)
+    return score, len(chars), errors
+
+class BaudProbe:
+    """Samples one port at each candidate rate and scores what it receives"""
+
+    def __init__(self, device_path, candidates=None, probe=True, sample_time=AUTOBAUD_SAMPLE_TIME):
+        self.device_path = device_path
+        self.candidates = list(candidates or AUTOBAUD_CANDIDATES)
+        self.probe = probe
+        self.sample_time = sample_time
+        self.results = []
+        self.error = None
+        self.elapsed = 0.0
+
+    def _mark_errors(self, port):
+        """Have the tty driver mark framing and parity errors in the input instead of hiding them"""
+        try:
+            fd = port.fileno()
+            attrs = termios.tcgetattr(fd)
+            attrs[0] |= termios.INPCK | termios.PARMRK
+            attrs[0] &= ~(termios.IGNPAR | termios.IGNBRK | termios.ISTRIP)
+            termios.tcsetattr(fd, termios.TCSANOW, attrs)
+        except (AttributeError, termios.error, OSError, ValueError):
+            # Not a tty (or not POSIX): score on printable characters alone
+            pass
+
+    def _sample(self, port, deadline):
+        """Read the reply to the probe without touching the port settings
+
+        Setting port.timeout makes pyserial rewrite the termios flags (and
+        drop PARMRK), so the idle gap is waited out with select() and the
+        port itself stays non-blocking.
+        """
+        data = bytearray()
+        end = min(time.monotonic() + self.sample_time, deadline)
+        if self.probe:
+            port.write(AUTOBAUD_PROBE)
+        fd = port.fileno()
+        while len(data) < AUTOBAUD_SAMPLE_BYTES:
+            remaining = end - time.monotonic()
+            if remaining <= 0:
+                break
+            ready, _, _ = select.select([fd], [], [], min(remaining, AUTOBAUD_IDLE_GAP))
+            if not ready:
+                if data:
+                    # The reply (a prompt, usually) is complete
+                    break
+                continue
+            chunk = port.read(min(max(1, port.in_waiting), AUTOBAUD_SAMPLE_BYTES - len(data)))
+            if not chunk:
+                break
+            data += chunk
+        return bytes(data)
+
+    def run(self, deadline):
+        start = time.monotonic()
+        try:
+            with serial.Serial(self.device_path, self.candidates[0], timeout=0) as port:
+                for baudrate in self.candidates:
+                    if time.monotonic() >= deadline:
+                        break
+                    port.baudrate = baudrate
+                    port.timeout = 0
+                    # pyserial rewrites the input flags on every rate or timeout
+                    # change, so mark errors after both and touch neither while sampling
+                    self._mark_errors(port)
+                    port.reset_input_buffer()
+                    data = self._sample(port, deadline)
+                    score, count, errors = score_sample(data)
+                    self.results.append({
+                        "baudrate": baudrate,
+                        "score": round(score, 3),
+                        "bytes": count,
+                        "framing_errors": errors,
+                        "sample": data[:64].decode('ascii', errors='replace')
+                    })
+                    if score >= AUTOBAUD_SURE_SCORE:
+                        break
+        except (serial.SerialException, OSError, ValueError) as e:
+            self.error = str(e)
+        self.elapsed = time.monotonic() - start
+
+    def to_dict(self):
+        best = max(self.results, key=lambda result: result['score'], default=None)
+        matched = best is not None and best['score'] >= AUTOBAUD_MIN_SCORE
+        return {
+            "device": self.device_path,
+            "baudrate": best['baudrate'] if matched else None,
+            "score": best['score'] if best else 0.0,
+            "candidates": self.results,
+            "error": self.error,
+            "elapsed": round(self.elapsed, 3)
+        }
+
+def detect_baudrates(device_paths, candidates=None, probe=True, timeout=AUTOBAUD_TIMEOUT):
+    """Find the baud rate of several ports at once; returns {path: result}
+
+    Each port is probed in its own thread, so the whole detection takes
+    about as long as the slowest port, never more than timeout. A port
+    stops early at the first rate that scores AUTOBAUD_SURE_SCORE.
+    """
+    deadline = time.monotonic() + timeout
+    probes = [BaudProbe(path, candidates, probe) for path in dict.fromkeys(device_paths)]
+    threads = [threading.Thread(target=probe_port.run, args=(deadline,), daemon=True) for probe_port in probes]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join(max(0.0, deadline - time.monotonic()) + 1.0)
+
+    results = {}
+    for probe_port in probes:
+        result = probe_port.to_dict()
+        results[probe_port.device_path] = result
+        if result['baudrate']:
+            add_log_entry(f"Auto-baud: {probe_port.device_path} looks like {result['baudrate']} baud "
+                          f"(score {result['score']})")
+        elif result['error']:
+            add_log_entry(f"Auto-baud failed for {probe_port.device_path}: {result['error']}", is_error=True)
+    return results
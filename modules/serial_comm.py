@@ -4,29 +4,61 @@ import threading
 import time
 import queue
 import select
-import glob
 import serial
-import serial.tools.list_ports
 from .logging import add_log_entry
+from .serial_registry import serial_registry
 import json
 import pty
 import fcntl
 import termios
 import struct
+import codecs
+
+# Serial settings
+RAW_BUFFER_LIMIT = 1024 * 1024      # Raw output kept for readers before the oldest bytes are dropped
+SERIAL_READ_POLL = 0.1              # Most seconds the reader waits for data before checking for disconnect
 
 class SerialDevice:
-    """Represents a single serial device connection"""
+    """Represents a single serial device connection
+
+    In line mode (the default) output is split into lines and decoded to
+    text. In raw mode the exact bytes from the port are kept in one
+    bytearray for read_raw(), which binary protocols need; read_output()
+    then returns the same bytes decoded as they arrived, without line
+    splitting or [HEX] substitution.
+    
+    A file transfer can claim() the device: it then has the raw output and
+    the port to itself until it calls release(). read_raw() takes bytes out
+    of the one shared buffer, so only the claim owner may call it; while the
+    device is unclaimed the raw bytes belong to read_output() and the
+    console it feeds. Anything else that watches the output uses a tap.
+    
+    Taps added with add_tap() are called with every read decoded as text,
+    in either mode and without waiting for a newline, so a script can see a
+    prompt as soon as it arrives. They run on the reader thread and must
+    not block.
+    """
     
-    def __init__(self, device_path, baudrate=9600, timeout=1):
+    def __init__(self, device_path, baudrate=9600, timeout=1, raw=False):
         self.device_path = device_path
         self.baudrate = baudrate
         self.timeout = timeout
+        self.raw = raw
         self.connection = None
         self.is_connected = False
         self.read_thread = None
         self.output_queue = queue.Queue()
         self.stop_flag = threading.Event()
         self.lock = threading.Lock()
+        self.line_buffer = bytearray()
+        self.raw_buffer = bytearray()
+        self.raw_dropped = 0
+        self.raw_ready = threading.Condition(threading.Lock())
+        self.raw_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        self.owner = None
+        self.owner_raw = False
+        self.taps = []
+        self.tap_decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
         
     def connect(self):
         """Connect to the serial device"""
@@ -91,12 +123,14 @@ class SerialDevice:
             add_log_entry(error_msg, is_error=True)
             return False, error_msg
     
-    def write(self, data):
+    def write(self, data, owner=None):
         """Write data to the serial device"""
         try:
             with self.lock:
                 if not self.is_connected or not self.connection:
                     return False, "Device not connected"
+                if self.owner is not None and owner is not self.owner:
+                    return False, "Device is busy with a file transfer"
                 
                 if isinstance(data, str):
                     data = data.encode('utf-8')
@@ -117,6 +151,8 @@ class SerialDevice:
             with self.lock:
                 if not self.is_connected or not self.connection:
                     return False, "Device not connected"
+                if self.owner is not None:
+                    return False, "Device is busy with a file transfer"
                 
                 self.connection.send_break(duration)
                 add_log_entry(f"Sent break signal to {self.device_path}")
@@ -135,27 +171,125 @@ class SerialDevice:
                 output.append(self.output_queue.get_nowait())
         except queue.Empty:
             pass
+        if (self.raw or self.raw_buffer) and self.owner is None:
+            text = self.raw_decoder.decode(self.read_raw())
+            if text:
+                output.append(text)
         return output
     
+    def read_raw(self, max_bytes=None, timeout=0):
+        """Take up to max_bytes of raw output, waiting up to timeout seconds for some to arrive"""
+        with self.raw_ready:
+            if not self.raw_buffer and timeout:
+                self.raw_ready.wait_for(lambda: self.raw_buffer or not self.is_connected, timeout)
+            count = len(self.raw_buffer) if max_bytes is None else min(max_bytes, len(self.raw_buffer))
+            if not count:
+                return b''
+            with memoryview(self.raw_buffer) as view:
+                data = view[:count].tobytes()
+            del self.raw_buffer[:count]
+            return data
+    
+    def set_raw(self, enabled):
+        """Switch between raw and line mode while connected"""
+        with self.lock:
+            if enabled and not self.raw and self.line_buffer:
+                # A partial line read in line mode comes first in the raw stream
+                self._buffer_raw(bytes(self.line_buffer))
+                self.line_buffer.clear()
+            self.raw = enabled
+    
+    def claim(self, owner):
+        """Give owner the port and its raw output until release(); False if already claimed"""
+        with self.lock:
+            if self.owner is not None:
+                return False
+            self.owner = owner
+            self.owner_raw = self.raw
+        self.set_raw(True)
+        with self.raw_ready:
+            # Console output from before the claim is not an answer to the owner
+            self.raw_buffer.clear()
+        return True
+    
+    def release(self, owner):
+        """End a claim and return to the mode the device was in before it"""
+        with self.lock:
+            if self.owner is not owner:
+                return
+            self.owner = None
+        self.set_raw(self.owner_raw)
+    
+    def add_tap(self, callback):
+        """Call callback(text) with all output read from now on"""
+        with self.lock:
+            if not self.taps:
+                self.tap_decoder.reset()
+            self.taps.append(callback)
+    
+    def remove_tap(self, callback):
+        with self.lock:
+            if callback in self.taps:
+                self.taps.remove(callback)
+    
+    def _feed_taps(self, data):
+        text = self.tap_decoder.decode(data)
+        if not text:
+            return
+        for callback in list(self.taps):
+            try:
+                callback(text)
+            except Exception as e:
+                add_log_entry(f"Serial output tap error on {self.device_path}: {str(e)}", is_error=True)
+    
+    def _buffer_raw(self, data):
+        with self.raw_ready:
+            self.raw_buffer += data
+            overflow = len(self.raw_buffer) - RAW_BUFFER_LIMIT
+            if overflow > 0:
+                # Nobody is reading; keep the newest bytes
+                del self.raw_buffer[:overflow]
+                self.raw_dropped += overflow
+            self.raw_ready.notify_all()
+    
     def _read_loop(self):
         """Background thread to read from serial device"""
-        buffer = b""
+        buffer = self.line_buffer
+        try:
+            fd = self.connection.fileno()
+        except (AttributeError, OSError, ValueError):
+            fd = None
         
         while not self.stop_flag.is_set() and self.is_connected:
             try:
+                if fd is not None:
+                    # Wake as soon as data arrives instead of polling, without holding the lock
+                    readable = select.select([fd], [], [], SERIAL_READ_POLL)[0]
+                
                 with self.lock:
                     if not self.connection or not self.connection.is_open:
                         break
                     
-                    # Check if data is available to read
-                    if self.connection.in_waiting > 0:
-                        data = self.connection.read(self.connection.in_waiting)
-                        if data:
+                    # Check if data is available to read; a readable port with nothing
+                    # waiting has gone away, and the read raises
+                    waiting = self.connection.in_waiting
+                    if fd is not None and readable:
+                        waiting = max(waiting, 1)
+                    if waiting > 0:
+                        data = self.connection.read(waiting)
+                        if data and self.taps:
+                            self._feed_taps(data)
+                        if data and self.raw:
+                            # Exact bytes, no line splitting or decoding
+                            self._buffer_raw(data)
+                        elif data:
                             buffer += data
                             
                             # Process complete lines
                             while b'\n' in buffer:
-                                line, buffer = buffer.split(b'\n', 1)
+                                end = buffer.index(b'\n')
+                                line = bytes(buffer[:end])
+                                del buffer[:end + 1]
                                 try:
                                     decoded_line = line.decode('utf-8', errors='replace').rstrip('\r')
                                     self.output_queue.put(decoded_line + '\n')
@@ -164,13 +298,18 @@ class SerialDevice:
                                     hex_line = ' '.join(f'{b:02x}' for b in line)
                                     self.output_queue.put(f"[HEX] {hex_line}\n")
                 
-                time.sleep(0.01)  # Small delay to prevent excessive CPU usage
+                if fd is None:
+                    time.sleep(0.01)  # Small delay to prevent excessive CPU usage
                 
             except Exception as e:
                 if self.is_connected:  # Only log if we're supposed to be connected
                     add_log_entry(f"Error reading from {self.device_path}: {str(e)}", is_error=True)
                 break
         
+        with self.raw_ready:
+            # Wake readers waiting in read_raw()
+            self.raw_ready.notify_all()
+        
         # If there's remaining data in buffer, add it
         if buffer:
             try:
@@ -179,6 +318,7 @@ class SerialDevice:
             except Exception:
                 hex_buffer = ' '.join(f'{b:02x}' for b in buffer)
                 self.output_queue.put(f"[HEX] {hex_buffer}")
+            buffer.clear()
 
 class SerialManager:
     """Manages multiple serial device connections"""
@@ -189,69 +329,21 @@ class SerialManager:
         self.lock = threading.Lock()
         
     def scan_devices(self):
-        """Scan for available serial devices"""
-        devices = []
-        
+        """List available serial devices from the hotplug registry"""
         try:
-            # Use pyserial's built-in device listing
-            ports = serial.tools.list_ports.comports()
-            for port in ports:
-                device_info = {
-                    'path': port.device,
-                    'name': port.name,
-                    'description': port.description or 'Unknown device',
-                    'manufacturer': port.manufacturer or 'Unknown',
-                    'product': port.product or 'Unknown',
-                    'serial_number': port.serial_number or 'Unknown',
-                    'vid': hex(port.vid) if port.vid else 'Unknown',
-                    'pid': hex(port.pid) if port.pid else 'Unknown',
-                    'connected': port.device in self.devices and self.devices[port.device].is_connected
-                }
-                devices.append(device_info)
-                self.device_info[port.device] = device_info
-            
-            # Also check common serial device paths manually
-            common_paths = [
-                '/dev/ttyUSB*',
-                '/dev/ttyACM*', 
-                '/dev/ttyS*',
-                '/dev/ttyAMA*',
-                '/dev/serial/by-id/*',
-                '/dev/serial/by-path/*'
-            ]
-            
-            for pattern in common_paths:
-                for device_path in glob.glob(pattern):
-                    if not any(d['path'] == device_path for d in devices):
-                        # Check if device exists and is accessible
-                        if os.path.exists(device_path):
-                            try:
-                                # Try to get device info
-                                device_info = {
-                                    'path': device_path,
-                                    'name': os.path.basename(device_path),
-                                    'description': f'Serial device at {device_path}',
-                                    'manufacturer': 'Unknown',
-                                    'product': 'Unknown',
-                                    'serial_number': 'Unknown',
-                                    'vid': 'Unknown',
-                                    'pid': 'Unknown',
-                                    'connected': device_path in self.devices and self.devices[device_path].is_connected
-                                }
-                                devices.append(device_info)
-                                self.device_info[device_path] = device_info
-                            except Exception:
-                                pass
-            
-            add_log_entry(f"Found {len(devices)} serial devices")
+            devices = serial_registry.list_devices()
+            for device_info in devices:
+                device = self.devices.get(device_info['path'])
+                device_info['connected'] = device is not None and device.is_connected
+                self.device_info[device_info['path']] = device_info
             return devices
             
         except Exception as e:
-            add_log_entry(f"Error scanning serial devices: {str(e)}", is_error=True)
+            add_log_entry(f"Error listing serial devices: {str(e)}", is_error=True)
             return []
     
-    def connect_device(self, device_path, baudrate=9600):
-        """Connect to a specific serial device"""
+    def connect_device(self, device_path, baudrate=9600, raw=False):
+        """Connect to a specific serial device; raw keeps the exact output bytes"""
         try:
             with self.lock:
                 if device_path in self.devices:
@@ -263,7 +355,7 @@ class SerialManager:
                         del self.devices[device_path]
                 
                 # Create new device connection
-                device = SerialDevice(device_path, baudrate)
+                device = SerialDevice(device_path, baudrate, raw=raw)
                 success, message = device.connect()
                 
                 if success:
@@ -364,6 +456,23 @@ class SerialManager:
             add_log_entry(f"Error getting output from {device_path}: {str(e)}", is_error=True)
             return []
     
+    def get_device(self, device_path):
+        """The connected SerialDevice for a path, or None"""
+        with self.lock:
+            device = self.devices.get(device_path)
+        return device if device and device.is_connected else None
+    
+    def set_raw_mode(self, device_path, enabled):
+        """Switch a connected device between raw and line mode"""
+        with self.lock:
+            device = self.devices.get(device_path)
+        if not device or not device.is_connected:
+            return False, "Device not connected"
+        if device.owner is not None:
+            return False, "Device is busy with a file transfer"
+        device.set_raw(enabled)
+        return True, f"{device_path} is in {'raw' if enabled else 'line'} mode"
+    
     def get_connected_devices(self):
         """Get list of currently connected devices"""
         try:
@@ -378,6 +487,7 @@ class SerialManager:
                             'baudrate': device.baudrate
                         })
                         info['baudrate'] = device.baudrate
+                        info['raw'] = device.raw
                         info['connected'] = True
                         connected.append(info)
                 return connected
@@ -412,9 +522,9 @@ def get_serial_devices():
     """Get list of available serial devices"""
     return serial_manager.scan_devices()
 
-def connect_serial_device(device_path, baudrate=9600):
+def connect_serial_device(device_path, baudrate=9600, raw=False):
     """Connect to a serial device"""
-    return serial_manager.connect_device(device_path, baudrate)
+    return serial_manager.connect_device(device_path, baudrate, raw)
 
 def disconnect_serial_device(device_path):
     """Disconnect from a serial device"""
@@ -436,6 +546,10 @@ def get_serial_output(device_path):
     """Get output from a serial device"""
     return serial_manager.get_device_output(device_path)
 
+def set_serial_raw_mode(device_path, enabled):
+    """Switch a serial device between raw and line mode"""
+    return serial_manager.set_raw_mode(device_path, enabled)
+
 def get_connected_serial_devices():
     """Get list of connected serial devices"""
     return serial_manager.get_connected_devices()
@@ -469,10 +583,15 @@ def test_serial_device_connection(device_path, baudrate=9600, test_duration=2):
         if success:
             # Send a simple test command (carriage return)
             test_device.write('\r\n')
-            time.sleep(0.5)
             
-            # Try to read any response
-            output = test_device.read_output()
+            # Wait for the first line of a response rather than a fixed delay
+            output = []
+            try:
+                output.append(test_device.output_queue.get(timeout=0.5))
+                time.sleep(0.05)  # Let the rest of the reply arrive
+            except queue.Empty:
+                pass
+            output += test_device.read_output()
             test_device.disconnect()
             
             response_info = f"Device responds with {len(output)} lines" if output else "No immediate response"
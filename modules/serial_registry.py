@@ -0,0 +1,299 @@
+import os
+import glob
+import time
+import errno
+import socket
+import struct
+import fnmatch
+import threading
+from .logging import add_log_entry
+
+try:
+    from serial.tools.list_ports_linux import SysFS
+except ImportError:
+    SysFS = None
+
+# Serial device registry settings
+REGISTRY_DEVICE_PATTERNS = [
+    '/dev/ttyUSB*',
+    '/dev/ttyACM*',
+    '/dev/ttyS*',
+    '/dev/ttyAMA*',
+    '/dev/ttyXRUSB*',
+    '/dev/ttyAP*',
+    '/dev/rfcomm*'
+]
+REGISTRY_LINK_PATTERNS = ['/dev/serial/by-id/*', '/dev/serial/by-path/*']
+REGISTRY_LINK_SETTLE = 1.0          # Seconds udev gets to create /dev/serial links after a kernel add event
+REGISTRY_POLL_INTERVAL = 5          # Seconds between rescans when uevents cannot be received
+REGISTRY_RECV_BUFFER = 1024 * 1024  # Socket buffer for bursts of uevents (a hub full of adapters)
+REGISTRY_SCAN_TIMEOUT = 5           # Most seconds a listing waits for the first scan
+
+NETLINK_KOBJECT_UEVENT = 15
+UEVENT_GROUP_KERNEL = 1
+UEVENT_GROUP_UDEV = 2
+UDEV_MONITOR_PREFIX = b'libudev\0'
+UDEV_MONITOR_MAGIC = 0xfeedcafe
+
+def parse_uevent(data):
+    """Parse one netlink uevent into a property dict, or None if it is not one
+
+    The kernel sends "action@devpath" followed by KEY=VALUE strings; udevd
+    sends the same properties behind a libudev header once it has finished
+    with the device (node permissions set, /dev/serial links created).
+    """
+    if data.startswith(UDEV_MONITOR_PREFIX):
+        if len(data) < 24 or struct.unpack_from('>I', data, 8)[0] != UDEV_MONITOR_MAGIC:
+            return None
+        offset, length = struct.unpack_from('=II', data, 16)
+        fields = data[offset:offset + length].split(b'\0')
+        source = 'udev'
+    elif b'@' in data.split(b'\0', 1)[0]:
+        fields = data.split(b'\0')[1:]
+        source = 'kernel'
+    else:
+        return None
+
+    props = {'SOURCE': source}
+    for field in fields:
+        key, sep, value = field.partition(b'=')
+        if sep:
+            props[key.decode('ascii', errors='replace')] = value.decode('utf-8', errors='replace')
+    return props
+
+def is_serial_path(device_path):
+    return any(fnmatch.fnmatchcase(device_path, pattern) for pattern in REGISTRY_DEVICE_PATTERNS)
+
+def describe_device(device_path):
+    """Registry entry for a serial device node or /dev/serial link, read from sysfs"""
+    target = os.path.realpath(device_path)
+    info = {
+        'path': device_path,
+        'name': os.path.basename(device_path),
+        'target': target,
+        'description': f'Serial device at {device_path}',
+        'manufacturer': 'Unknown',
+        'product': 'Unknown',
+        'serial_number': 'Unknown',
+        'vid': 'Unknown',
+        'pid': 'Unknown',
+        'driver': None,
+        'subsystem': None
+    }
+    if SysFS is None:
+        return info
+
+    try:
+        port = SysFS(target)
+    except (OSError, ValueError):
+        return info
+    info['subsystem'] = port.subsystem
+    if port.subsystem:
+        info['description'] = port.description or 'Unknown device'
+        info['manufacturer'] = port.manufacturer or 'Unknown'
+        info['product'] = port.product or 'Unknown'
+        info['serial_number'] = port.serial_number or 'Unknown'
+        info['vid'] = hex(port.vid) if port.vid else 'Unknown'
+        info['pid'] = hex(port.pid) if port.pid else 'Unknown'
+        driver = os.path.join('/sys/class/tty', os.path.basename(target), 'device', 'driver')
+        if os.path.exists(driver):
+            info['driver'] = os.path.basename(os.path.realpath(driver))
+    return info
+
+class SerialDeviceRegistry:
+    """Cached list of serial devices, kept current from hotplug events
+
+    One full scan at start, then the kernel's uevent netlink socket reports
+    tty devices as they come and go, so listing devices is a dictionary
+    read. Listeners are called with ("added" | "removed" | "changed", entry).
+    Without netlink (not Linux, or a sandbox that blocks it) the registry
+    rescans every REGISTRY_POLL_INTERVAL seconds instead.
+    """
+
+    def __init__(self, poll_interval=REGISTRY_POLL_INTERVAL):
+        self.poll_interval = poll_interval
+        self.devices = {}  # device path -> entry
+        self.listeners = []
+        self.mode = None   # 'netlink' or 'poll' once started
+        self.thread = None
+        self.pid = None    # Process the watcher thread belongs to
+        self.ready = threading.Event()  # Set once the first scan is in the cache
+        self.stop_flag = threading.Event()
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Register a callback(event, entry) for hotplug changes"""
+        self.listeners.append(callback)
+
+    def _running(self):
+        return self.pid == os.getpid() and self.thread is not None and self.thread.is_alive()
+
+    def start(self):
+        """Scan once and start watching for hotplug events, again in a forked child process"""
+        if self._running():
+            return
+        with self.lock:
+            if self._running():
+                return
+            if self.pid != os.getpid():
+                # A fork (and eventlet's new hub in a gunicorn worker) leaves the
+                # parent's watcher behind; wait for this process's own first scan
+                self.ready = threading.Event()
+                self.stop_flag = threading.Event()
+            self.stop_flag.clear()
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+
+    def stop(self):
+        """Stop the watcher thread"""
+        self.stop_flag.set()
+
+    def list_devices(self):
+        """Current serial devices, sorted by path"""
+        self.start()
+        self.ready.wait(REGISTRY_SCAN_TIMEOUT)
+        with self.lock:
+            return [dict(self.devices[path]) for path in sorted(self.devices)]
+
+    def get(self, device_path):
+        with self.lock:
+            entry = self.devices.get(device_path)
+            return dict(entry) if entry else None
+
+    def rescan(self):
+        """Walk /dev for serial devices and report differences from the cache"""
+        found = {}
+        for pattern in REGISTRY_DEVICE_PATTERNS + REGISTRY_LINK_PATTERNS:
+            for device_path in glob.glob(pattern):
+                found[device_path] = describe_device(device_path)
+        with self.lock:
+            gone = [path for path in self.devices if path not in found]
+        for device_path in gone:
+            self._update(device_path, None)
+        for device_path, entry in found.items():
+            self._update(device_path, entry)
+
+    def _refresh_links(self):
+        """Pick up /dev/serial links that udev created or removed"""
+        links = {path for pattern in REGISTRY_LINK_PATTERNS for path in glob.glob(pattern)}
+        with self.lock:
+            known = {path for path, entry in self.devices.items() if path != entry['target']}
+        for link in known - links:
+            self._update(link, None)
+        for link in links:
+            self._update(link, describe_device(link))
+
+    def _update(self, device_path, entry):
+        """Store or drop one entry and tell the listeners if anything changed"""
+        with self.lock:
+            previous = self.devices.get(device_path)
+            if entry is None:
+                if previous is None:
+                    return
+                del self.devices[device_path]
+                event, entry = 'removed', previous
+            elif previous == entry:
+                return
+            else:
+                self.devices[device_path] = entry
+                event = 'changed' if previous else 'added'
+
+        if event != 'changed':
+            add_log_entry(f"Serial device {event}: {device_path}")
+        for callback in list(self.listeners):
+            try:
+                callback(event, dict(entry))
+            except Exception as e:
+                add_log_entry(f"Error reporting serial device {event}: {str(e)}", is_error=True)
+
+    def _handle_uevent(self, props):
+        """Apply one parsed uevent; returns True if /dev/serial links should be rechecked later"""
+        if props.get('SUBSYSTEM') != 'tty' or not props.get('DEVNAME'):
+            return False
+        device_path = props['DEVNAME']
+        if not device_path.startswith('/'):
+            device_path = '/dev/' + device_path
+        if not is_serial_path(device_path):
+            return False
+
+        action = props.get('ACTION')
+        if action == 'remove':
+            self._update(device_path, None)
+            # Links to a removed node are dead even before udev deletes them
+            with self.lock:
+                links = [path for path, entry in self.devices.items()
+                         if path != device_path and entry['target'] == device_path]
+            for link in links:
+                self._update(link, None)
+            return False
+        if action in ('add', 'change', 'bind'):
+            self._update(device_path, describe_device(device_path))
+            if props['SOURCE'] == 'udev':
+                self._refresh_links()
+                return False
+            return True
+        return False
+
+    def _run(self):
+        try:
+            sock = socket.socket(socket.AF_NETLINK, socket.SOCK_RAW, NETLINK_KOBJECT_UEVENT)
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, REGISTRY_RECV_BUFFER)
+            sock.bind((0, UEVENT_GROUP_KERNEL | UEVENT_GROUP_UDEV))
+        except (AttributeError, OSError) as e:
+            add_log_entry(f"Hotplug events unavailable, polling for serial devices: {str(e)}", is_error=True)
+            self.mode = 'poll'
+            self._scan_once()
+            self._poll_loop()
+            return
+
+        self.mode = 'netlink'
+        try:
+            # Scan after subscribing so a device plugged in meanwhile is not missed
+            self._scan_once()
+            self._netlink_loop(sock)
+        except Exception as e:
+            add_log_entry(f"Serial hotplug watcher failed, falling back to polling: {str(e)}", is_error=True)
+            self.mode = 'poll'
+            self._poll_loop()
+        finally:
+            sock.close()
+
+    def _scan_once(self):
+        try:
+            self.rescan()
+        finally:
+            self.ready.set()
+
+    def _poll_loop(self):
+        while not self.stop_flag.wait(self.poll_interval):
+            self.rescan()
+
+    def _netlink_loop(self, sock):
+        links_due = None
+        while not self.stop_flag.is_set():
+            if links_due is not None and time.monotonic() >= links_due:
+                links_due = None
+                self._refresh_links()
+            # Wake up at least once a second to notice stop(), sooner if links are due
+            wait = 1.0 if links_due is None else max(0.0, min(1.0, links_due - time.monotonic()))
+            sock.settimeout(wait)
+            try:
+                data = sock.recv(REGISTRY_RECV_BUFFER)
+            except socket.timeout:
+                continue
+            except OSError as e:
+                if e.errno != errno.ENOBUFS:
+                    raise
+                # The kernel dropped events while we were busy: start over from /dev
+                add_log_entry("Serial hotplug events overflowed, rescanning devices", is_error=True)
+                self.rescan()
+                continue
+
+            props = parse_uevent(data)
+            if props and self._handle_uevent(props) and links_due is None:
+                # No udevd announcement may follow (containers), so look for its links shortly
+                links_due = time.monotonic() + REGISTRY_LINK_SETTLE
+
+# Global serial device registry
+serial_registry = SerialDeviceRegistry()
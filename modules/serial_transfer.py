@@ -0,0 +1,386 @@
+import os
+import time
+import struct
+import binascii
+import itertools
+import threading
+import traceback
+from collections import OrderedDict
+from .logging import add_log_entry
+
+# Serial file transfer settings
+TRANSFER_ROOT = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'transfers')
+MODEM_PROTOCOLS = ('xmodem', 'xmodem1k', 'ymodem')
+START_TIMEOUT = 60.0            # Seconds to wait for the receiver to ask for the first block
+BLOCK_TIMEOUT = 10.0            # Seconds to wait for the answer to one block
+MAX_RETRIES = 10                # Times one block is resent before the transfer fails
+PROGRESS_INTERVAL = 0.25        # Minimum seconds between progress events for one transfer
+TRANSFER_HISTORY = 50           # Finished transfers kept for listing
+
+# Transfer states
+RUNNING = 'running'
+COMPLETE = 'complete'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+
+# Control bytes (XMODEM, YMODEM)
+SOH, STX, EOT, ACK, NAK, CAN = 0x01, 0x02, 0x04, 0x06, 0x15, 0x18
+CRC_START = 0x43                # 'C': receiver wants CRC-16 blocks
+STREAM_START = 0x47             # 'G': YMODEM-g, receiver takes blocks without acknowledging them
+PAD = 0x1A                      # CP/M end of file, pads the last data block
+
+class TransferError(Exception):
+    pass
+
+class TransferCancelled(TransferError):
+    pass
+
+def build_block(number, payload, size, crc, pad=PAD):
+    """One XMODEM block: header, block number and complement, padded payload, CRC-16 or checksum"""
+    data = bytes(payload).ljust(size, bytes((pad,)))
+    if crc:
+        trailer = struct.pack('>H', binascii.crc_hqx(data, 0))
+    else:
+        trailer = bytes((sum(data) & 0xFF,))
+    number &= 0xFF
+    return bytes((STX if size == 1024 else SOH, number, 0xFF - number)) + data + trailer
+
+def ymodem_header(name, size, mtime):
+    """Payload of YMODEM block 0: file name, then size and modification time"""
+    return name.encode('utf-8') + b'\0' + f"{size} {int(mtime):o}".encode('ascii') + b'\0'
+
+class DeviceChannel:
+    """Byte channel to a SerialDevice claimed for a transfer"""
+
+    def __init__(self, device, owner):
+        self.device = device
+        self.owner = owner
+
+    def write(self, data):
+        success, message = self.device.write(data, owner=self.owner)
+        if not success:
+            raise TransferError(message)
+
+    def read(self, timeout):
+        if not self.device.is_connected:
+            raise TransferError(f"{self.device.device_path} disconnected")
+        return self.device.read_raw(timeout=timeout)
+
+class ModemSender:
+    """XMODEM, XMODEM-1K and YMODEM (batch of one file, with YMODEM-g) sender
+
+    channel needs write(bytes) and read(timeout) -> bytes. The next block is
+    built while the receiver checks the current one, so the only gap between
+    blocks is the receiver's turnaround; a YMODEM-g receiver gets blocks
+    back to back with no turnaround at all.
+    """
+
+    def __init__(self, channel, protocol='xmodem1k', progress=None, cancelled=None):
+        if protocol not in MODEM_PROTOCOLS:
+            raise ValueError(f"Unknown protocol: {protocol}")
+        self.channel = channel
+        self.protocol = protocol
+        self.block_size = 128 if protocol == 'xmodem' else 1024
+        self.progress = progress
+        self.cancelled = cancelled
+        self.pending = bytearray()
+        self.crc = True
+        self.streaming = False
+        self.stats = {'blocks': 0, 'retries': 0, 'bytes': 0, 'mode': None}
+
+    def _read_byte(self, timeout):
+        """Next byte from the receiver, or None after timeout; a double CAN aborts"""
+        deadline = time.monotonic() + timeout
+        while True:
+            if self.cancelled and self.cancelled():
+                self._abort()
+                raise TransferCancelled("Transfer cancelled")
+            if not self.pending:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return None
+                # Short waits so a cancel request is noticed promptly
+                self.pending += self.channel.read(min(remaining, 0.5))
+                continue
+            byte = self.pending.pop(0)
+            if byte == CAN:
+                if not self.pending:
+                    self.pending += self.channel.read(1.0)
+                if self.pending and self.pending[0] == CAN:
+                    raise TransferError("Receiver cancelled the transfer")
+                continue
+            return byte
+
+    def _abort(self):
+        try:
+            self.channel.write(bytes((CAN,)) * 8)
+        except TransferError:
+            pass
+
+    def _wait_start(self, allowed):
+        """Wait for the receiver's start request; returns the byte it sent"""
+        deadline = time.monotonic() + START_TIMEOUT
+        while time.monotonic() < deadline:
+            byte = self._read_byte(deadline - time.monotonic())
+            if byte in allowed:
+                return byte
+        raise TransferError("Receiver did not start the transfer")
+
+    def _send_block(self, block, prepare=None, header=False):
+        """Send one block until the receiver acknowledges it; returns what prepare() built meanwhile
+
+        header marks a YMODEM block 0, which a receiver that lost it asks for
+        again with 'C' or 'G' instead of a NAK.
+        """
+        prepared = None
+        for attempt in range(MAX_RETRIES + 1):
+            if attempt:
+                self.stats['retries'] += 1
+            if header and not self.streaming:
+                # Start requests queued up before this attempt are not asking for a resend
+                self._poll()
+                self.pending = bytearray(byte for byte in self.pending if byte not in (CRC_START, STREAM_START))
+            self.channel.write(block)
+            if prepare is not None:
+                # Build the next block while this one is on the wire
+                prepared = prepare()
+                prepare = None
+            if self.streaming:
+                # YMODEM-g: nothing comes back unless the receiver gives up
+                if self.pending or self._poll():
+                    byte = self._read_byte(0)
+                    if byte is not None and byte != ACK:
+                        raise TransferError(f"Receiver aborted streaming transfer (0x{byte:02x})")
+                return prepared
+            # One deadline per attempt, so a stream of other bytes cannot put off the retry
+            deadline = time.monotonic() + BLOCK_TIMEOUT
+            while True:
+                byte = self._read_byte(deadline - time.monotonic())
+                if byte == ACK:
+                    return prepared
+                if byte is None or byte == NAK:
+                    break
+                if header and byte in (CRC_START, STREAM_START):
+                    # Block 0 got lost and the receiver is still asking for it
+                    break
+                # Line noise: keep waiting for ACK/NAK until the deadline
+        raise TransferError(f"Block not acknowledged after {MAX_RETRIES} retries")
+
+    def _poll(self):
+        """Collect whatever the receiver sent without waiting"""
+        data = self.channel.read(0)
+        self.pending += data
+        return bool(data)
+
+    def _send_eot(self):
+        for _ in range(MAX_RETRIES + 1):
+            self.channel.write(bytes((EOT,)))
+            byte = self._read_byte(BLOCK_TIMEOUT)
+            while byte not in (ACK, NAK, None):
+                byte = self._read_byte(BLOCK_TIMEOUT)
+            if byte == ACK:
+                return
+            # YMODEM receivers NAK the first EOT to make sure it is not noise
+        raise TransferError("End of transfer not acknowledged")
+
+    def send(self, path, name=None):
+        """Send one file; returns the stats dict"""
+        total = os.path.getsize(path)
+        start = time.monotonic()
+        ymodem = self.protocol == 'ymodem'
+        with open(path, 'rb') as f:
+            allowed = (CRC_START, STREAM_START) if ymodem else (CRC_START, NAK)
+            request = self._wait_start(allowed)
+            self.crc = request != NAK
+            self.streaming = request == STREAM_START
+            self.stats['mode'] = 'ymodem-g' if self.streaming else ('crc' if self.crc else 'checksum')
+
+            if ymodem:
+                st = os.fstat(f.fileno())
+                header = ymodem_header(name or os.path.basename(path), total, st.st_mtime)
+                self._send_block(build_block(0, header, 128 if len(header) <= 128 else 1024, True, pad=0), header=True)
+                # The receiver asks again before the data blocks
+                self._wait_start((CRC_START, STREAM_START))
+
+            number = 1
+            sent = 0
+            block, length = self._data_block(f, number)
+            while block:
+                prepared = self._send_block(block, lambda: self._data_block(f, number + 1))
+                sent += length
+                self.stats['blocks'] += 1
+                self.stats['bytes'] = sent
+                if self.progress:
+                    self.progress(sent, total)
+                number += 1
+                block, length = prepared
+
+            self._send_eot()
+            if ymodem:
+                # An empty block 0 ends the batch
+                self._wait_start((CRC_START, STREAM_START))
+                self._send_block(build_block(0, b'', 128, True, pad=0), header=True)
+
+        self.stats['seconds'] = time.monotonic() - start
+        self.stats['rate'] = sent / self.stats['seconds'] if self.stats['seconds'] > 0 else 0
+        return self.stats
+
+    def _data_block(self, f, number):
+        """Next data block from the file and its payload length, or (None, 0) at the end"""
+        payload = f.read(self.block_size)
+        if not payload:
+            return None, 0
+        # A short last block goes out as 128 bytes so the receiver strips less padding
+        size = 128 if len(payload) <= 128 else self.block_size
+        return build_block(number, payload, size, self.crc), len(payload)
+
+class SerialTransfer:
+    """One file pushed to a serial device"""
+
+    def __init__(self, transfer_id, device_path, filename, path, protocol):
+        self.id = transfer_id
+        self.device_path = device_path
+        self.filename = filename
+        self.path = path
+        self.protocol = protocol
+        self.state = RUNNING
+        self.error = None
+        self.bytes = 0
+        self.total = os.path.getsize(path)
+        self.stats = None
+        self.started_at = time.time()
+        self.finished_at = None
+        self.cancel_requested = False
+        self.last_emit = 0.0
+
+    def to_dict(self):
+        elapsed = (self.finished_at or time.time()) - self.started_at
+        return {
+            "id": self.id,
+            "device": self.device_path,
+            "filename": self.filename,
+            "protocol": self.protocol,
+            "state": self.state,
+            "error": self.error,
+            "bytes": self.bytes,
+            "total": self.total,
+            "rate": self.bytes / elapsed if elapsed > 0 else 0,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stats": self.stats
+        }
+
+class SerialTransferManager:
+    """Runs file pushes to serial devices in background threads
+
+    A transfer claims its device, which puts the device in raw mode and
+    keeps the console from reading the receiver's answers or writing into
+    the middle of a block. Listeners are called with the transfer dict on
+    every state change and, throttled, on progress.
+    """
+
+    def __init__(self, root=TRANSFER_ROOT):
+        self.root = os.path.realpath(root)
+        self.transfers = OrderedDict()
+        self.ids = itertools.count(1)
+        self.listeners = []
+        self.lock = threading.Lock()
+
+    def add_listener(self, callback):
+        """Register callback(transfer_dict) for transfer updates"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify(self, transfer):
+        transfer.last_emit = time.monotonic()
+        snapshot = transfer.to_dict()
+        for callback in list(self.listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                add_log_entry(f"Serial transfer listener error: {str(e)}", is_error=True)
+
+    def resolve(self, filename):
+        """Map a file name into the transfer directory, or None if it escapes it or does not exist"""
+        path = os.path.realpath(os.path.join(self.root, filename.lstrip('/')))
+        if not path.startswith(self.root + os.sep) or not os.path.isfile(path):
+            return None
+        return path
+
+    def start(self, device, filename, protocol='xmodem1k'):
+        """Start sending filename (relative to the transfer directory) to a connected SerialDevice"""
+        if protocol not in MODEM_PROTOCOLS:
+            raise ValueError(f"Unknown protocol: {protocol}")
+        path = self.resolve(filename)
+        if path is None:
+            raise ValueError(f"File not found: {filename}")
+        with self.lock:
+            transfer = SerialTransfer(str(next(self.ids)), device.device_path, filename, path, protocol)
+            if not device.claim(transfer):
+                raise TransferError(f"{device.device_path} is busy with another transfer")
+            self.transfers[transfer.id] = transfer
+            self._prune()
+        threading.Thread(target=self._run, args=(device, transfer), daemon=True).start()
+        add_log_entry(f"Sending {filename} to {device.device_path} with {protocol}")
+        self._notify(transfer)
+        return transfer
+
+    def _prune(self):
+        finished = [transfer_id for transfer_id, transfer in self.transfers.items() if transfer.state != RUNNING]
+        for transfer_id in finished[:max(len(finished) - TRANSFER_HISTORY, 0)]:
+            del self.transfers[transfer_id]
+
+    def _run(self, device, transfer):
+        def progress(done, total):
+            transfer.bytes = done
+            if time.monotonic() - transfer.last_emit >= PROGRESS_INTERVAL:
+                self._notify(transfer)
+
+        sender = ModemSender(DeviceChannel(device, transfer), transfer.protocol, progress,
+                             cancelled=lambda: transfer.cancel_requested)
+        try:
+            transfer.stats = sender.send(transfer.path, os.path.basename(transfer.filename))
+            transfer.state = COMPLETE
+            add_log_entry(f"Sent {transfer.filename} to {transfer.device_path}: {transfer.total} bytes "
+                          f"in {transfer.stats['seconds']:.1f}s ({transfer.stats['retries']} retries)")
+        except TransferCancelled:
+            transfer.state = CANCELLED
+            transfer.stats = sender.stats
+            add_log_entry(f"Cancelled sending {transfer.filename} to {transfer.device_path}")
+        except TransferError as e:
+            transfer.state = FAILED
+            transfer.error = str(e)
+            transfer.stats = sender.stats
+            add_log_entry(f"Sending {transfer.filename} to {transfer.device_path} failed: {str(e)}", is_error=True)
+        except Exception as e:
+            transfer.state = FAILED
+            transfer.error = str(e)
+            error_trace = traceback.format_exc()
+            add_log_entry(f"Error sending {transfer.filename} to {transfer.device_path}: {str(e)}\n{error_trace}",
+                          is_error=True)
+        finally:
+            transfer.finished_at = time.time()
+            device.release(transfer)
+            self._notify(transfer)
+
+    def cancel(self, transfer_id):
+        transfer = self.transfers.get(transfer_id)
+        if transfer is None or transfer.state != RUNNING:
+            return False
+        transfer.cancel_requested = True
+        return True
+
+    def get(self, transfer_id):
+        transfer = self.transfers.get(transfer_id)
+        return transfer.to_dict() if transfer else None
+
+    def list(self):
+        with self.lock:
+            return [transfer.to_dict() for transfer in reversed(self.transfers.values())]
+
+# Shared manager for serial file transfers
+serial_transfers = SerialTransferManager()
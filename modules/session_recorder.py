@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import uuid
+import bisect
+import struct
+import threading
+from .logging import add_log_entry
+
+# Session recording settings
+RECORDINGS_DIR = 'data/recordings'
+RECORDING_INDEX_INTERVAL = 1.0      # Seconds of session time between index points
+RECORDING_INDEX_BYTES = 64 * 1024   # ... or bytes of recording, whichever comes first
+REPLAY_MAX_EVENTS = 5000            # Most events returned by one replay request
+REPLAY_MAX_BYTES = 1024 * 1024      # Most recording bytes read by one replay request
+INDEX_RECORD = struct.Struct('<dQ')  # (session time, byte offset of the event line)
+
+class SessionRecorder:
+    """Append-only asciicast v2 recording of one console session
+
+    The .cast file is a JSON header line followed by one [time, code, data]
+    line per event ('o' for output, 'i' for input), so it plays in asciinema
+    as is. A .idx sidecar holds fixed-size (time, offset) records at least
+    every RECORDING_INDEX_INTERVAL seconds, which lets a replay start at any
+    point in time with a binary search instead of reading the file from the
+    beginning.
+    """
+
+    def __init__(self, recording_id, title, width=80, height=24, directory=RECORDINGS_DIR):
+        os.makedirs(directory, exist_ok=True)
+        self.id = recording_id
+        self.path = os.path.join(directory, recording_id + '.cast')
+        self.index_path = os.path.join(directory, recording_id + '.idx')
+        self.started = time.time()
+        self.clock = time.monotonic()
+        self.lock = threading.Lock()
+        self.file = open(self.path, 'ab')
+        self.index = open(self.index_path, 'ab')
+        self.last_index_time = None
+        self.last_index_offset = 0
+        header = {
+            "version": 2,
+            "width": width,
+            "height": height,
+            "timestamp": int(self.started),
+            "title": title,
+            "env": {"TERM": "xterm"}
+        }
+        self.file.write(json.dumps(header).encode('utf-8') + b'\n')
+        self.file.flush()
+        self.offset = self.file.tell()
+
+    def record(self, code, data):
+        """Append one event; code is 'o' for output or 'i' for input"""
+        if not data:
+            return
+        with self.lock:
+            if self.file.closed:
+                return
+            elapsed = round(time.monotonic() - self.clock, 6)
+            if (self.last_index_time is None or elapsed - self.last_index_time >= RECORDING_INDEX_INTERVAL
+                    or self.offset - self.last_index_offset >= RECORDING_INDEX_BYTES):
+                self.index.write(INDEX_RECORD.pack(elapsed, self.offset))
+                self.index.flush()
+                self.last_index_time = elapsed
+                self.last_index_offset = self.offset
+            line = json.dumps([elapsed, code, data], ensure_ascii=False).encode('utf-8') + b'\n'
+            self.file.write(line)
+            # Flushed per event so a live session can be replayed while it runs
+            self.file.flush()
+            self.offset += len(line)
+
+    def close(self):
+        with self.lock:
+            if not self.file.closed:
+                self.file.close()
+                self.index.close()
+
+class RecordingStore:
+    """Lists, replays and deletes recordings in RECORDINGS_DIR"""
+
+    def __init__(self, directory=RECORDINGS_DIR):
+        self.directory = directory
+
+    def start(self, title, width=80, height=24):
+        recording_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:8]
+        recorder = SessionRecorder(recording_id, title, width, height, self.directory)
+        add_log_entry(f"Recording console session {title} to {recorder.path}")
+        return recorder
+
+    def path(self, recording_id):
+        """Path of a recording's .cast file, or None if there is no such recording"""
+        if not recording_id or not all(c.isalnum() or c == '-' for c in recording_id):
+            return None
+        path = os.path.join(self.directory, recording_id + '.cast')
+        return path if os.path.isfile(path) else None
+
+    def _index_entries(self, recording_id):
+        """Number of index records, and a reader for record i"""
+        index_path = os.path.join(self.directory, recording_id + '.idx')
+        try:
+            count = os.path.getsize(index_path) // INDEX_RECORD.size
+        except OSError:
+            return 0, None
+
+        def read(f, i):
+            f.seek(i * INDEX_RECORD.size)
+            return INDEX_RECORD.unpack(f.read(INDEX_RECORD.size))
+        return count, (index_path, read)
+
+    def _seek(self, recording_id, at):
+        """Byte offset of the last index point at or before session time at"""
+        count, reader = self._index_entries(recording_id)
+        if not count:
+            return None
+        index_path, read = reader
+        with open(index_path, 'rb') as f:
+            # Binary search over the fixed-size records without loading the index
+            times = _IndexTimes(f, read, count)
+            position = bisect.bisect_right(times, at) - 1
+            if position < 0:
+                return None
+            return read(f, position)[1]
+
+    def _header(self, path):
+        with open(path, 'rb') as f:
+            line = f.readline()
+            return json.loads(line), f.tell()
+
+    def list(self):
+        recordings = []
+        if not os.path.isdir(self.directory):
+            return recordings
+        with os.scandir(self.directory) as it:
+            for entry in it:
+                if not entry.name.endswith('.cast'):
+                    continue
+                recording_id = entry.name[:-5]
+                try:
+                    header, _ = self._header(entry.path)
+                    st = entry.stat()
+                except (OSError, ValueError):
+                    continue
+                count, reader = self._index_entries(recording_id)
+                duration = None
+                if count:
+                    with open(reader[0], 'rb') as f:
+                        duration = reader[1](f, count - 1)[0]
+                recordings.append({
+                    "id": recording_id,
+                    "title": header.get('title', ''),
+                    "started": header.get('timestamp'),
+                    "size": st.st_size,
+                    "duration": duration,
+                    "modified": st.st_mtime
+                })
+        recordings.sort(key=lambda recording: recording['started'] or 0, reverse=True)
+        return recordings
+
+    def replay(self, recording_id, at=0.0, offset=None, limit=REPLAY_MAX_EVENTS):
+        """Events from session time at (or a byte offset from a previous call)
+
+        Returns header, events, next_offset and eof. Starting at a time
+        reads from the nearest index point before it, so the cost does not
+        grow with the length of the recording.
+        """
+        path = self.path(recording_id)
+        if path is None:
+            return None
+        limit = max(1, min(int(limit), REPLAY_MAX_EVENTS))
+        header, data_start = self._header(path)
+        if offset is None:
+            offset = self._seek(recording_id, at) if at > 0 else None
+            offset = data_start if offset is None else offset
+        else:
+            offset = max(int(offset), data_start)
+            at = 0.0
+
+        events = []
+        read = 0
+        size = os.path.getsize(path)
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            while len(events) < limit and read < REPLAY_MAX_BYTES:
+                line = f.readline()
+                if not line.endswith(b'\n'):
+                    # End of file, or an event still being written
+                    break
+                read += len(line)
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event[0] >= at:
+                    events.append(event)
+            next_offset = offset + read
+
+        return {
+            "header": header,
+            "events": events,
+            "next_offset": next_offset,
+            "size": size,
+            "eof": next_offset >= size
+        }
+
+    def delete(self, recording_id):
+        path = self.path(recording_id)
+        if path is None:
+            return False
+        os.remove(path)
+        try:
+            os.remove(path[:-5] + '.idx')
+        except FileNotFoundError:
+            pass
+        return True
+
+class _IndexTimes:
+    """Sequence view of the times in an index file, for bisect"""
+
+    def __init__(self, f, read, count):
+        self.f = f
+        self.read = read
+        self.count = count
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, i):
+        return self.read(self.f, i)[0]
+
+# Shared store for console session recordings
+recording_store = RecordingStore()
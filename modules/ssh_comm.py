@@ -7,28 +7,239 @@ import select
 import paramiko
 import socket
 from .logging import add_log_entry
+from .session_recorder import recording_store
 import json
 import pty
 import fcntl
 import termios
 import struct
+import hmac
+import codecs
+import hashlib
+
+# SSH transport pool settings
+SSH_POOL_IDLE_TIMEOUT = 300         # Seconds a transport with no open channels is kept
+SSH_KEEPALIVE_INTERVAL = 30         # Seconds between keepalives on pooled transports
+SSH_MAX_CHANNELS = 8                # Channels per transport (OpenSSH allows 10 sessions by default)
+SSH_POOL_REAP_INTERVAL = 30         # Seconds between idle transport checks
+
+# SSH session reader settings
+SSH_RECV_SIZE = 32768               # Bytes asked of the channel per recv
+SSH_FRAME_MAX = 256 * 1024          # Most bytes coalesced into one output frame
+SSH_COALESCE_DELAY = 0.005          # Seconds to wait for more data while output is streaming
+SSH_READ_POLL = 1.0                 # Seconds between stop checks while the channel is quiet
+
+# Set whenever a session queues output, so the broadcaster can wake at once
+ssh_output_ready = threading.Event()
+
+class PooledTransport:
+    """One authenticated SSH connection shared by several shell channels"""
+    
+    def __init__(self, key, client, credential):
+        self.key = key
+        self.client = client
+        self.credential = credential
+        self.channels = 0
+        self.accepting = True   # False once the server refuses another channel
+        self.last_used = time.monotonic()
+        self.created = time.time()
+    
+    @property
+    def is_active(self):
+        transport = self.client.get_transport()
+        return transport is not None and transport.is_active()
+
+class SSHTransportPool:
+    """Authenticated SSH transports, keyed by (host, port, username)
+    
+    A console tab to a host that already has a connection opens another
+    shell channel on it instead of repeating the key exchange and login.
+    Reuse requires the same password as the original login. Transports
+    send keepalives, and are closed once they have had no open channels
+    for SSH_POOL_IDLE_TIMEOUT seconds.
+    """
+    
+    def __init__(self, idle_timeout=SSH_POOL_IDLE_TIMEOUT, max_channels=SSH_MAX_CHANNELS):
+        self.idle_timeout = idle_timeout
+        self.max_channels = max_channels
+        self.transports = {}    # key -> [PooledTransport]
+        self.key_locks = {}     # key -> lock held while connecting
+        self.lock = threading.Lock()
+        self.secret = os.urandom(16)
+        self.reaper = None
+    
+    def _credential(self, password):
+        # Passwords are only kept as a keyed digest for comparing later logins
+        return hmac.new(self.secret, (password or '').encode('utf-8'), hashlib.sha256).digest()
+    
+    def _key_lock(self, key):
+        with self.lock:
+            return self.key_locks.setdefault(key, threading.Lock())
+    
+    def _find(self, key, credential, need_channel=True):
+        """A live pooled transport for key with room for a channel, dropping dead ones"""
+        with self.lock:
+            for pooled in list(self.transports.get(key, [])):
+                if not pooled.is_active:
+                    self._remove(pooled)
+                    continue
+                if not hmac.compare_digest(pooled.credential, credential):
+                    continue
+                if need_channel and (pooled.channels >= self.max_channels or not pooled.accepting):
+                    continue
+                return pooled
+        return None
+    
+    def _remove(self, pooled):
+        # Caller holds self.lock
+        entries = self.transports.get(pooled.key, [])
+        if pooled in entries:
+            entries.remove(pooled)
+        if not entries:
+            self.transports.pop(pooled.key, None)
+        try:
+            pooled.client.close()
+        except Exception:
+            pass
+    
+    def _connect(self, key, password, timeout, credential):
+        host, port, username = key
+        client = paramiko.SSHClient()
+        client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
+        client.connect(
+            hostname=host,
+            port=port,
+            username=username,
+            password=password,
+            timeout=timeout,
+            allow_agent=False,
+            look_for_keys=False
+        )
+        client.get_transport().set_keepalive(SSH_KEEPALIVE_INTERVAL)
+        pooled = PooledTransport(key, client, credential)
+        with self.lock:
+            self.transports.setdefault(key, []).append(pooled)
+        self._start_reaper()
+        add_log_entry(f"Opened pooled SSH transport to {username}@{host}:{port}")
+        return pooled
+    
+    def get_transport(self, host, port, username, password, timeout=10, need_channel=True):
+        """Return a live authenticated transport, connecting only if none can be reused"""
+        key = (host, int(port), username)
+        credential = self._credential(password)
+        pooled = self._find(key, credential, need_channel)
+        if pooled:
+            return pooled
+        # One handshake per key at a time; a second tab waits and then reuses it
+        with self._key_lock(key):
+            pooled = self._find(key, credential, need_channel)
+            if pooled:
+                return pooled
+            return self._connect(key, password, timeout, credential)
+    
+    def open_shell(self, host, port, username, password, timeout=10):
+        """Open an interactive shell channel; returns (pooled transport, channel)"""
+        for attempt in range(2):
+            pooled = self.get_transport(host, port, username, password, timeout)
+            with self.lock:
+                pooled.channels += 1
+            try:
+                channel = pooled.client.invoke_shell()
+                pooled.last_used = time.monotonic()
+                return pooled, channel
+            except (paramiko.SSHException, EOFError, OSError) as e:
+                with self.lock:
+                    pooled.channels -= 1
+                    if not pooled.is_active:
+                        self._remove(pooled)
+                    else:
+                        # The server refused another channel; leave this transport to the tabs using it
+                        pooled.accepting = False
+                if attempt == 1:
+                    raise
+                add_log_entry(f"Pooled SSH transport to {username}@{host}:{port} could not open a channel "
+                              f"({str(e)}), opening another connection")
+    
+    def release(self, pooled):
+        """Mark one channel of a pooled transport as closed"""
+        with self.lock:
+            pooled.channels = max(0, pooled.channels - 1)
+            pooled.last_used = time.monotonic()
+    
+    def _start_reaper(self):
+        with self.lock:
+            if self.reaper and self.reaper.is_alive():
+                return
+            self.reaper = threading.Thread(target=self._reap_loop, name='ssh-pool-reaper', daemon=True)
+            self.reaper.start()
+    
+    def _reap_loop(self):
+        while True:
+            time.sleep(SSH_POOL_REAP_INTERVAL)
+            self.evict_idle()
+            with self.lock:
+                if not self.transports:
+                    self.reaper = None
+                    return
+    
+    def evict_idle(self):
+        """Close dead transports and those idle for longer than idle_timeout"""
+        now = time.monotonic()
+        evicted = []
+        with self.lock:
+            for entries in list(self.transports.values()):
+                for pooled in list(entries):
+                    idle = pooled.channels == 0 and now - pooled.last_used > self.idle_timeout
+                    if idle or not pooled.is_active:
+                        evicted.append(pooled.key)
+                        self._remove(pooled)
+        for host, port, username in evicted:
+            add_log_entry(f"Closed idle SSH transport to {username}@{host}:{port}")
+        return len(evicted)
+    
+    def close_all(self):
+        with self.lock:
+            for entries in list(self.transports.values()):
+                for pooled in list(entries):
+                    self._remove(pooled)
+    
+    def stats(self):
+        """Open transports with their channel counts"""
+        now = time.monotonic()
+        with self.lock:
+            return [{
+                'host': pooled.key[0],
+                'port': pooled.key[1],
+                'username': pooled.key[2],
+                'channels': pooled.channels,
+                'active': pooled.is_active,
+                'idle_seconds': round(now - pooled.last_used, 1) if pooled.channels == 0 else 0,
+                'created': pooled.created
+            } for entries in self.transports.values() for pooled in entries]
+
+# Shared transport pool for console sessions
+ssh_pool = SSHTransportPool()
 
 class SSHSession:
     """Represents a single SSH session connection"""
     
-    def __init__(self, host='localhost', port=22, username=None, password=None, timeout=10):
+    def __init__(self, host='localhost', port=22, username=None, password=None, timeout=10, record=False):
         self.host = host
         self.port = port
         self.username = username
         self.password = password
         self.timeout = timeout
         self.client = None
+        self.pooled = None
         self.channel = None
         self.is_connected = False
         self.output_queue = queue.Queue()
         self.stop_flag = threading.Event()
         self.read_thread = None
         self.lock = threading.Lock()
+        self.record = record
+        self.recorder = None    # SessionRecorder while recording
+        self.taps = []          # callback(text) for every output frame, e.g. a running script
         
     def connect(self):
         """Connect to the SSH server"""
@@ -37,28 +248,18 @@ class SSHSession:
                 if self.is_connected:
                     return True, "Already connected"
                 
-                # Create SSH client
-                self.client = paramiko.SSHClient()
-                self.client.set_missing_host_key_policy(paramiko.AutoAddPolicy())
-                
-                # Connect to SSH server
-                self.client.connect(
-                    hostname=self.host,
-                    port=self.port,
-                    username=self.username,
-                    password=self.password,
-                    timeout=self.timeout,
-                    allow_agent=False,
-                    look_for_keys=False
-                )
-                
-                # Create interactive shell channel
-                self.channel = self.client.invoke_shell()
+                # Open a shell channel, reusing a pooled transport when possible
+                self.pooled, self.channel = ssh_pool.open_shell(
+                    self.host, self.port, self.username, self.password, self.timeout)
+                self.client = self.pooled.client
                 self.channel.settimeout(0.1)  # Non-blocking
                 
                 self.is_connected = True
                 self.stop_flag.clear()
                 
+                if self.record:
+                    self.recorder = recording_store.start(f"{self.username}@{self.host}:{self.port}")
+                
                 # Start reading thread
                 self.read_thread = threading.Thread(target=self._read_loop, daemon=True)
                 self.read_thread.start()
@@ -85,14 +286,18 @@ class SSHSession:
                 self.stop_flag.set()
                 self.is_connected = False
                 
-                # Close channel and client
+                # Close the channel; the transport stays in the pool for other tabs
                 if self.channel:
                     self.channel.close()
                     self.channel = None
                 
-                if self.client:
-                    self.client.close()
-                    self.client = None
+                if self.pooled:
+                    ssh_pool.release(self.pooled)
+                    self.pooled = None
+                self.client = None
+                
+                if self.recorder:
+                    self.recorder.close()
                 
                 # Wait for read thread to finish
                 if self.read_thread and self.read_thread.is_alive():
@@ -114,12 +319,22 @@ class SSHSession:
                 
                 # Send data to SSH channel
                 self.channel.send(data)
+                if self.recorder:
+                    self.recorder.record('i', data)
                 return True, "Data sent successfully"
                 
         except Exception as e:
             add_log_entry(f"Error sending data to SSH session: {str(e)}", is_error=True)
             return False, f"Send error: {str(e)}"
     
+    def add_tap(self, callback):
+        """Call callback(text) with all output read from now on; it runs on the reader thread"""
+        self.taps.append(callback)
+    
+    def remove_tap(self, callback):
+        if callback in self.taps:
+            self.taps.remove(callback)
+    
     def read_output(self):
         """Get available output from the SSH session"""
         output = []
@@ -131,28 +346,61 @@ class SSHSession:
         return output
     
     def _read_loop(self):
-        """Background thread to read from SSH session"""
+        """Background thread to read from SSH session
+        
+        Blocks in select() on the channel instead of polling, and never takes
+        self.lock, so write() is not held up by the reader. Whatever the
+        channel has buffered is read in one go. A keystroke echo goes out as
+        soon as it arrives; while output is streaming (a read filled the
+        buffer) the reader waits SSH_COALESCE_DELAY for more and sends it as
+        one frame of up to SSH_FRAME_MAX bytes.
+        """
+        channel = self.channel
+        # Multi-byte characters may be split across reads
+        decoder = codecs.getincrementaldecoder('utf-8')(errors='replace')
         while not self.stop_flag.is_set() and self.is_connected:
             try:
-                with self.lock:
-                    if not self.channel or self.channel.closed:
+                if channel.closed:
+                    break
+                readable, _, _ = select.select([channel], [], [], SSH_READ_POLL)
+                if not readable:
+                    continue
+                
+                data = channel.recv(SSH_RECV_SIZE)
+                if not data:
+                    # Remote end closed the shell
+                    break
+                chunks = [data]
+                size = len(data)
+                streaming = len(data) == SSH_RECV_SIZE
+                while size < SSH_FRAME_MAX:
+                    if not channel.recv_ready():
+                        if not streaming:
+                            break
+                        time.sleep(SSH_COALESCE_DELAY)
+                        streaming = False
+                        continue
+                    data = channel.recv(min(SSH_RECV_SIZE, SSH_FRAME_MAX - size))
+                    if not data:
                         break
-                    
-                    # Check if data is available to read
-                    if self.channel.recv_ready():
-                        data = self.channel.recv(4096)
-                        if data:
-                            try:
-                                # Decode data as UTF-8
-                                decoded_data = data.decode('utf-8', errors='replace')
-                                self.output_queue.put(decoded_data)
-                            except Exception:
-                                # If decoding fails, put raw bytes as hex
-                                hex_data = ' '.join(f'{b:02x}' for b in data)
-                                self.output_queue.put(f"[HEX] {hex_data}")
-                
-                time.sleep(0.01)  # Small delay to prevent excessive CPU usage
+                    chunks.append(data)
+                    size += len(data)
+                    streaming = streaming or len(data) == SSH_RECV_SIZE
+                
+                text = decoder.decode(b''.join(chunks))
+                if text:
+                    self.output_queue.put(text)
+                    ssh_output_ready.set()
+                    if self.recorder:
+                        self.recorder.record('o', text)
+                    for callback in list(self.taps):
+                        try:
+                            callback(text)
+                        except Exception as e:
+                            add_log_entry(f"SSH output tap error: {str(e)}", is_error=True)
                 
+            except socket.timeout:
+                continue
             except Exception as e:
                 if self.is_connected:  # Only log if we're supposed to be connected
                     add_log_entry(f"Error reading from SSH session: {str(e)}", is_error=True)
@@ -166,8 +414,8 @@ class SSHManager:
         self.session_info = {}  # session_id -> session info dict
         self.lock = threading.Lock()
         
-    def create_session(self, session_id, host='localhost', port=22, username=None, password=None):
-        """Create a new SSH session"""
+    def create_session(self, session_id, host='localhost', port=22, username=None, password=None, record=False):
+        """Create a new SSH session, optionally recording it"""
         try:
             with self.lock:
                 if session_id in self.sessions:
@@ -179,7 +427,7 @@ class SSHManager:
                         del self.sessions[session_id]
                 
                 # Create new SSH session
-                session = SSHSession(host, port, username, password)
+                session = SSHSession(host, port, username, password, record=record)
                 success, message = session.connect()
                 
                 if success:
@@ -189,7 +437,8 @@ class SSHManager:
                         'port': port,
                         'username': username,
                         'connected': True,
-                        'session_id': session_id
+                        'session_id': session_id,
+                        'recording_id': session.recorder.id if session.recorder else None
                     }
                     
                 return success, message
@@ -285,6 +534,7 @@ class SSHManager:
                 
                 self.sessions.clear()
                 self.session_info.clear()
+                ssh_pool.close_all()
                 
         except Exception as e:
             add_log_entry(f"Error disconnecting all SSH sessions: {str(e)}", is_error=True)
@@ -294,9 +544,9 @@ class SSHManager:
 # Global SSH manager instance
 ssh_manager = SSHManager()
 
-def create_ssh_session(session_id, host='localhost', port=22, username=None, password=None):
+def create_ssh_session(session_id, host='localhost', port=22, username=None, password=None, record=False):
     """Create a new SSH session"""
-    return ssh_manager.create_session(session_id, host, port, username, password)
+    return ssh_manager.create_session(session_id, host, port, username, password, record)
 
 def disconnect_ssh_session(session_id):
     """Disconnect an SSH session"""
@@ -319,17 +569,19 @@ def disconnect_all_ssh_sessions():
     return ssh_manager.disconnect_all()
 
 def test_ssh_connection(host='localhost', port=22, username=None, password=None, timeout=5):
-    """Test if SSH connection can be established"""
+    """Test if SSH connection can be established
+    
+    The authenticated transport is kept in the pool, so the console opened
+    right after a successful test does not log in again.
+    """
     try:
-        # Test SSH connection
-        test_session = SSHSession(host, port, username, password, timeout)
-        success, message = test_session.connect()
-        
-        if success:
-            test_session.disconnect()
-            return True, f"Successfully tested SSH connection to {username}@{host}:{port}"
-        else:
-            return False, message
-            
+        ssh_pool.get_transport(host, port, username, password, timeout, need_channel=False)
+        return True, f"Successfully tested SSH connection to {username}@{host}:{port}"
+    except paramiko.AuthenticationException:
+        return False, "Authentication failed - invalid username or password"
+    except paramiko.SSHException as e:
+        return False, f"SSH connection error: {str(e)}"
+    except socket.timeout:
+        return False, "Connection timeout"
     except Exception as e:
-        return False, f"Test failed for {username}@{host}:{port}: {str(e)}" 
\ No newline at end of file
+        return False, f"Test failed for {username}@{host}:{port}: {str(e)}"
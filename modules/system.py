@@ -1,7 +1,18 @@
 import subprocess
 import os
+import re
+import threading
 from .logging import add_log_entry
 
+# Optional pure-Python D-Bus client used to subscribe to systemd unit changes
+try:
+    from jeepney import DBusAddress, MatchRule, new_method_call, message_bus
+    from jeepney.low_level import HeaderFields
+    from jeepney.io.blocking import open_dbus_connection, Proxy
+    JEEPNEY_AVAILABLE = True
+except ImportError:
+    JEEPNEY_AVAILABLE = False
+
 def get_usb_info():
     try:
         return subprocess.check_output("lsusb", shell=True).decode().strip().splitlines()
@@ -44,6 +55,101 @@ def test_serial_device(device_path, baudrate=9600):
         add_log_entry(error_msg, is_error=True)
         return False, error_msg
 
+# Properties fetched for every unit in one `systemctl show` call
+SERVICE_SHOW_PROPERTIES = [
+    'Id', 'Description', 'LoadState', 'ActiveState', 'SubState',
+    'UnitFileState', 'MainPID', 'MemoryCurrent', 'ActiveEnterTimestamp', 'FragmentPath'
+]
+
+def query_services(service_names, timeout=5):
+    """
+    Query the state of several services with a single systemctl call
+    Parameters:
+        service_names: Iterable of service names (with or without .service suffix)
+        timeout: Seconds to wait for systemctl
+    Returns:
+        dict mapping each requested service name to a dict of unit properties
+    """
+    names = [name for name in dict.fromkeys(service_names) if name]
+    if not names:
+        return {}
+    
+    units = [name if name.endswith('.service') else f"{name}.service" for name in names]
+    cmd = ['systemctl', 'show', '--no-pager', '-p', ','.join(SERVICE_SHOW_PROPERTIES)] + units
+    try:
+        output = subprocess.run(cmd, capture_output=True, text=True, timeout=timeout).stdout
+    except Exception as e:
+        add_log_entry(f"Error querying services with systemctl show: {str(e)}", is_error=True)
+        return {}
+    
+    # systemctl prints one block of KEY=value lines per unit, separated by a blank line,
+    # in the same order the units were given on the command line
+    blocks = []
+    current = {}
+    for line in output.splitlines():
+        if not line.strip():
+            if current:
+                blocks.append(current)
+                current = {}
+            continue
+        if '=' in line:
+            key, value = line.split('=', 1)
+            current[key] = value
+    if current:
+        blocks.append(current)
+    
+    if len(blocks) == len(names):
+        return dict(zip(names, blocks))
+    
+    # Fall back to matching on the unit Id if the block count is off
+    by_id = {block.get('Id', ''): block for block in blocks}
+    return {name: by_id[unit] for name, unit in zip(names, units) if unit in by_id}
+
+def _format_memory(value):
+    """Format a MemoryCurrent value the way systemctl status does"""
+    try:
+        memory = int(value)
+    except (TypeError, ValueError):
+        return "N/A"
+    # systemd reports UINT64_MAX when memory accounting is not available
+    if memory >= 2 ** 64 - 1:
+        return "N/A"
+    if memory < 1024:
+        return f"{memory}B"
+    for unit in ['K', 'M', 'G', 'T']:
+        memory /= 1024
+        if memory < 1024 or unit == 'T':
+            return f"{memory:.1f}{unit}"
+
+def service_entry(service_name, props):
+    """Build the service status dict used by the dashboard from unit properties"""
+    status = props.get('ActiveState') or "unknown"
+    sub_state = props.get('SubState', '')
+    enabled_status = props.get('UnitFileState') or "unknown"
+    pid = props.get('MainPID', '')
+    if not pid or pid == '0':
+        pid = "N/A"
+    
+    # Summary in the same shape as the first lines of `systemctl status`
+    details = f"{props.get('Id', service_name)} - {props.get('Description', '')}".rstrip(' -')
+    details += f"\n   Loaded: {props.get('LoadState', 'unknown')}"
+    if props.get('FragmentPath'):
+        details += f" ({props['FragmentPath']}; {enabled_status})"
+    details += f"\n   Active: {status}"
+    if sub_state:
+        details += f" ({sub_state})"
+    if props.get('ActiveEnterTimestamp'):
+        details += f" since {props['ActiveEnterTimestamp']}"
+    
+    return {
+        'name': service_name,
+        'status': status,
+        'details': details,
+        'enabled': enabled_status,
+        'memory': _format_memory(props.get('MemoryCurrent')),
+        'pid': pid
+    }
+
 def get_available_services():
     # List of potential services to check
     potential_services = [
@@ -60,73 +166,128 @@ def get_available_services():
         'webpage'  # Our own service
     ]
     
-    available_services = []
-    
-    for service in potential_services:
-        try:
-            # Check if the service exists in systemd
-            output = subprocess.check_output(f"systemctl list-unit-files {service}.service", shell=True, stderr=subprocess.DEVNULL).decode().strip()
-            if service in output:
-                available_services.append(service)
-        except subprocess.CalledProcessError:
-            # Service might not exist, skip it
-            continue
-            
-    return available_services
+    # A single systemctl call tells us which of the units are installed
+    units = query_services(potential_services)
+    return [service for service in potential_services
+            if units.get(service, {}).get('LoadState') == 'loaded']
 
 def get_service_status():
-    available_services = get_available_services()
+    units = query_services(get_available_services())
+    return [service_entry(service_name, props) for service_name, props in units.items()]
+
+class ServiceStateWatcher:
+    """Watches systemd units and reports state changes to a callback
     
-    result = []
-    for service_name in available_services:
-        try:
-            status = subprocess.check_output(f"systemctl is-active {service_name}", shell=True).decode().strip()
-            details = subprocess.check_output(f"systemctl status {service_name}", shell=True).decode().strip()
-            
-            # Get additional service information
+    Uses systemd's D-Bus PropertiesChanged signals when the optional jeepney
+    package is available, otherwise falls back to a batched systemctl poll.
+    The callback receives a list of service_entry() dicts for changed units.
+    """
+    
+    def __init__(self, callback, poll_interval=5):
+        self.callback = callback
+        self.poll_interval = poll_interval
+        self.services = set()
+        self.snapshot = {}  # service name -> last reported entry
+        self.thread = None
+        self.stop_flag = threading.Event()
+        self.lock = threading.Lock()
+    
+    def watch(self, service_names):
+        """Set the services whose changes should be reported"""
+        with self.lock:
+            self.services = set(service_names)
+    
+    def start(self):
+        """Start the watcher thread"""
+        if self.thread and self.thread.is_alive():
+            return
+        self.stop_flag.clear()
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+    
+    def stop(self):
+        """Stop the watcher thread"""
+        self.stop_flag.set()
+    
+    def check(self, service_names=None):
+        """Re-query services and report the ones whose state changed"""
+        with self.lock:
+            names = self.services if service_names is None else self.services & set(service_names)
+        if not names:
+            return []
+        
+        changed = []
+        for service_name, props in query_services(sorted(names)).items():
+            entry = service_entry(service_name, props)
+            # Details carry timestamps only, so compare the fields the dashboard shows
+            key = (entry['status'], entry['enabled'], entry['pid'])
+            previous = self.snapshot.get(service_name)
+            self.snapshot[service_name] = entry
+            if previous is None or (previous['status'], previous['enabled'], previous['pid']) != key:
+                changed.append(entry)
+        
+        if changed:
             try:
-                # Get service enabled status
-                enabled_status = subprocess.check_output(f"systemctl is-enabled {service_name}", shell=True).decode().strip()
-            except:
-                enabled_status = "unknown"
-                
-            # Get service uptime/memory info from status
-            memory_usage = "N/A"
-            pid = "N/A"
+                self.callback(changed)
+            except Exception as e:
+                add_log_entry(f"Error reporting service state changes: {str(e)}", is_error=True)
+        return changed
+    
+    def _run(self):
+        # Prime the snapshot so only real transitions are reported
+        self.check()
+        if JEEPNEY_AVAILABLE:
             try:
-                # Extract PID and memory from status output
-                for line in details.split('\n'):
-                    if 'Main PID:' in line:
-                        pid = line.split('Main PID:')[1].split('(')[0].strip()
-                    elif 'Memory:' in line:
-                        memory_usage = line.split('Memory:')[1].strip()
-            except:
-                pass
-                
-        except:
-            status = "unknown"
-            details = "Could not fetch details"
-            enabled_status = "unknown"
-            memory_usage = "N/A"
-            pid = "N/A"
+                self._dbus_loop()
+                return
+            except Exception as e:
+                add_log_entry(f"D-Bus unit watcher unavailable, falling back to polling: {str(e)}", is_error=True)
+        self._poll_loop()
+    
+    def _poll_loop(self):
+        while not self.stop_flag.wait(self.poll_interval):
+            self.check()
+    
+    def _dbus_loop(self):
+        connection = open_dbus_connection(bus='SYSTEM')
+        try:
+            manager = DBusAddress('/org/freedesktop/systemd1',
+                                  bus_name='org.freedesktop.systemd1',
+                                  interface='org.freedesktop.systemd1.Manager')
+            # systemd only emits unit signals while at least one client is subscribed
+            connection.send_and_get_reply(new_method_call(manager, 'Subscribe'))
+            rule = MatchRule(type='signal', interface='org.freedesktop.DBus.Properties',
+                             member='PropertiesChanged', path_namespace='/org/freedesktop/systemd1/unit')
+            Proxy(message_bus, connection).AddMatch(rule)
+            add_log_entry("Watching systemd unit state changes over D-Bus")
             
-        result.append({
-            'name': service_name,
-            'status': status,
-            'details': details,
-            'enabled': enabled_status,
-            'memory': memory_usage,
-            'pid': pid
-        })
-        
-    return result
+            with connection.filter(rule, bufsize=256) as signals:
+                while not self.stop_flag.is_set():
+                    try:
+                        message = connection.recv_until_filtered(signals, timeout=self.poll_interval)
+                    except TimeoutError:
+                        continue
+                    
+                    changed_units = {_unescape_unit_path(message.header.fields[HeaderFields.path])}
+                    # Drain the burst of signals a single state transition produces
+                    while signals:
+                        changed_units.add(_unescape_unit_path(signals.popleft().header.fields[HeaderFields.path]))
+                    self.check(unit[:-len('.service')] for unit in changed_units if unit.endswith('.service'))
+        finally:
+            connection.close()
+
+def _unescape_unit_path(path):
+    """Turn /org/freedesktop/systemd1/unit/ssh_2eservice into ssh.service"""
+    name = path.rsplit('/', 1)[-1]
+    return re.sub(r'_([0-9a-f]{2})', lambda m: chr(int(m.group(1), 16)), name)
 
 def get_service_details(service_name):
     """Get detailed information about a specific service"""
     try:
         # Get basic status information
-        status = subprocess.check_output(f"systemctl is-active {service_name}", shell=True).decode().strip()
-        enabled = subprocess.check_output(f"systemctl is-enabled {service_name}", shell=True).decode().strip()
+        props = query_services([service_name]).get(service_name, {})
+        status = props.get('ActiveState') or "unknown"
+        enabled = props.get('UnitFileState') or "unknown"
         full_status = subprocess.check_output(f"systemctl status {service_name}", shell=True).decode().strip()
         
         # Get service unit file information
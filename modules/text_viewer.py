@@ -0,0 +1,233 @@
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+
+# Text viewer settings
+LINE_INDEX_STRIDE = 1000        # Byte offset of every Nth line is kept in the index
+INDEX_CACHE_SIZE = 16           # Files whose line index is kept in memory
+READ_BLOCK = 1024 * 1024        # Bytes read at a time while indexing or searching
+MAX_WINDOW_LINES = 2000         # Most lines returned by one line window
+MAX_WINDOW_BYTES = 1024 * 1024  # Most bytes returned by one byte window
+MAX_LINE_CHARS = 4096           # Longer lines are cut in windows and search results
+GREP_MAX_MATCHES = 1000         # Most matches returned by one search request
+GREP_TIME_LIMIT = 5.0           # Seconds one search request may scan before returning
+
+class LineIndex:
+    """Sparse line-offset index for one file
+
+    offsets[i] is the byte offset of line i * LINE_INDEX_STRIDE (0-based), so
+    memory stays small however long the file is. The index is only extended
+    as far as a request needs, and picks up where it stopped when the file
+    grows.
+    """
+
+    def __init__(self, path, st):
+        self.path = path
+        self.inode = st.st_ino
+        self.size = 0
+        self.offsets = [0]
+        self.scanned = 0        # Bytes examined so far
+        self.lines = 0          # Newlines seen in those bytes
+        self.lock = threading.Lock()
+
+    def matches(self, st):
+        # An append keeps the inode and grows the file; anything else is a rewrite
+        return st.st_ino == self.inode and st.st_size >= self.scanned
+
+    def extend(self, size, until_line=None):
+        """Scan forward until until_line is indexed (or to the end of the file)"""
+        self.size = size
+        with open(self.path, 'rb') as f:
+            f.seek(self.scanned)
+            while self.scanned < size and (until_line is None or self.lines <= until_line):
+                block = f.read(min(READ_BLOCK, size - self.scanned))
+                if not block:
+                    break
+                count = block.count(b'\n')
+                next_mark = len(self.offsets) * LINE_INDEX_STRIDE
+                if self.lines + count >= next_mark:
+                    # Only walk newline by newline in blocks that cross a stride mark
+                    pos = -1
+                    line = self.lines
+                    while True:
+                        pos = block.find(b'\n', pos + 1)
+                        if pos < 0:
+                            break
+                        line += 1
+                        if line == next_mark:
+                            self.offsets.append(self.scanned + pos + 1)
+                            next_mark += LINE_INDEX_STRIDE
+                self.lines += count
+                self.scanned += len(block)
+                # Let other green threads run while a large file is indexed
+                time.sleep(0)
+
+    @property
+    def complete(self):
+        return self.scanned >= self.size
+
+    def total_lines(self):
+        """Line count once fully scanned; a final line without newline counts"""
+        if not self.complete:
+            return None
+        if self.size == 0:
+            return 0
+        with open(self.path, 'rb') as f:
+            f.seek(self.size - 1)
+            last = f.read(1)
+        return self.lines + (0 if last == b'\n' else 1)
+
+class TextViewer:
+    """Windowed reads and search over large text files with bounded memory"""
+
+    def __init__(self):
+        self.indexes = OrderedDict()
+        self.lock = threading.Lock()
+
+    def _index(self, path):
+        st = os.stat(path)
+        with self.lock:
+            index = self.indexes.get(path)
+            if index is None or not index.matches(st):
+                index = LineIndex(path, st)
+                self.indexes[path] = index
+            self.indexes.move_to_end(path)
+            while len(self.indexes) > INDEX_CACHE_SIZE:
+                self.indexes.popitem(last=False)
+        return index, st
+
+    def read_lines(self, path, start=1, count=200):
+        """Lines start .. start+count-1 (1-based) with their byte offsets"""
+        start = max(int(start), 1)
+        count = max(1, min(int(count), MAX_WINDOW_LINES))
+        index, st = self._index(path)
+        with index.lock:
+            index.extend(st.st_size, until_line=start + count)
+            checkpoint = min((start - 1) // LINE_INDEX_STRIDE, len(index.offsets) - 1)
+            offset = index.offsets[checkpoint]
+            line_number = checkpoint * LINE_INDEX_STRIDE + 1
+            total = index.total_lines()
+
+        lines = []
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            # Skip to the first requested line from the nearest checkpoint
+            while line_number < start:
+                raw = f.readline()
+                if not raw:
+                    break
+                offset += len(raw)
+                line_number += 1
+            while len(lines) < count and offset < st.st_size:
+                raw = f.readline()
+                if not raw:
+                    break
+                text = raw.rstrip(b'\r\n').decode('utf-8', errors='replace')
+                lines.append({
+                    "line": line_number,
+                    "offset": offset,
+                    "text": text[:MAX_LINE_CHARS],
+                    "truncated": len(text) > MAX_LINE_CHARS
+                })
+                offset += len(raw)
+                line_number += 1
+
+        return {
+            "start": start,
+            "lines": lines,
+            "next_line": line_number,
+            "next_offset": offset,
+            "size": st.st_size,
+            "total_lines": total,
+            "eof": offset >= st.st_size
+        }
+
+    def read_bytes(self, path, offset=0, length=65536):
+        """Raw byte window decoded as UTF-8 with replacement characters"""
+        size = os.path.getsize(path)
+        offset = max(0, min(int(offset), size))
+        length = max(0, min(int(length), MAX_WINDOW_BYTES))
+        with open(path, 'rb') as f:
+            f.seek(offset)
+            data = f.read(length)
+        return {
+            "offset": offset,
+            "length": len(data),
+            "next_offset": offset + len(data),
+            "size": size,
+            "eof": offset + len(data) >= size,
+            "text": data.decode('utf-8', errors='replace')
+        }
+
+    def grep(self, path, pattern, regex=False, ignore_case=True, offset=0, line=1, max_matches=200):
+        """Find lines matching pattern, starting at byte offset (the start of line number line)
+
+        Returns matches with line number, byte offset of the line, the match
+        span within the decoded line and the line text. Scanning stops after
+        max_matches or GREP_TIME_LIMIT seconds; next_offset and next_line
+        continue the search.
+        """
+        flags = re.MULTILINE | (re.IGNORECASE if ignore_case else 0)
+        source = pattern.encode('utf-8')
+        compiled = re.compile(source if regex else re.escape(source), flags)
+        max_matches = max(1, min(int(max_matches), GREP_MAX_MATCHES))
+        size = os.path.getsize(path)
+        offset = max(0, min(int(offset), size))
+        line = max(int(line), 1)
+        matches = []
+        deadline = time.monotonic() + GREP_TIME_LIMIT
+
+        with open(path, 'rb') as f:
+            while offset < size and len(matches) < max_matches and time.monotonic() < deadline:
+                f.seek(offset)
+                data = f.read(READ_BLOCK)
+                if not data:
+                    break
+                # Search whole lines only; a partial last line is read again with the next block
+                end = len(data) if offset + len(data) >= size else data.rfind(b'\n') + 1
+                if end == 0:
+                    # One line longer than the block; search what there is
+                    end = len(data)
+                pos = 0
+                while pos < end and len(matches) < max_matches:
+                    found = compiled.search(data, pos, end)
+                    if not found:
+                        line += data.count(b'\n', pos, end)
+                        pos = end
+                        break
+                    line_start = data.rfind(b'\n', 0, found.start()) + 1
+                    line_end = data.find(b'\n', found.start(), end)
+                    if line_end < 0:
+                        line_end = end
+                    line += data.count(b'\n', pos, line_start)
+                    before = data[line_start:found.start()].decode('utf-8', errors='replace')
+                    matched = data[found.start():min(found.end(), line_end)].decode('utf-8', errors='replace')
+                    matches.append({
+                        "line": line,
+                        "offset": offset + line_start,
+                        "match_start": len(before),
+                        "match_end": len(before) + len(matched),
+                        "text": data[line_start:line_end].rstrip(b'\r').decode('utf-8', errors='replace')[:MAX_LINE_CHARS]
+                    })
+                    # One result per line; carry on with the next one
+                    if line_end < end:
+                        pos = line_end + 1
+                        line += 1
+                    else:
+                        pos = end
+                offset += pos
+                # Let other green threads run between blocks
+                time.sleep(0)
+
+        return {
+            "matches": matches,
+            "next_offset": offset,
+            "next_line": line,
+            "size": size,
+            "done": offset >= size
+        }
+
+# Shared viewer for the transfer directory
+text_viewer = TextViewer()
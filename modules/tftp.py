@@ -5,6 +5,9 @@ import sys
 import traceback
 import re
 from .logging import add_log_entry
+from .tftp_client import TFTPClient, TFTPError, tftp_engine
+from .tftp_server import get_embedded_server, TFTP_SERVER_HOST, TFTP_SERVER_PORT
+from .tftp_jobs import tftp_jobs
 
 class TFTPManager:
     """Manages TFTP server and client operations."""
@@ -223,61 +226,67 @@ class TFTPManager:
             add_log_entry(f"Failed to stop TFTP server: {str(e)}\n{error_trace}", is_error=True)
             return False
     
-    def download_file(self, server, filename, target_dir=''):
-        """Download a file from a remote TFTP server."""
+    def start_embedded_server(self, host=TFTP_SERVER_HOST, port=TFTP_SERVER_PORT):
+        """Start the built-in TFTP server instead of tftpd-hpa."""
+        try:
+            add_log_entry(f"Starting embedded TFTP server on {host}:{port}")
+            get_embedded_server(self.transfer_dir, host, port).start()
+            return True
+        except OSError as e:
+            # Usually the port is taken (tftpd-hpa running) or needs root
+            add_log_entry(f"Failed to start embedded TFTP server on {host}:{port}: {str(e)}", is_error=True)
+            return False
+    
+    def stop_embedded_server(self):
+        """Stop the built-in TFTP server."""
+        server = get_embedded_server(self.transfer_dir)
+        if server.running:
+            server.stop()
+        return True
+    
+    def get_embedded_status(self):
+        """Check if the built-in TFTP server is running."""
+        return get_embedded_server(self.transfer_dir).running
+    
+    def download_file(self, server, filename, target_dir='', progress=None):
+        """Download a file from a remote TFTP server.
+        
+        Runs on the shared TFTP engine; progress(bytes_done, total_bytes) is
+        called from the engine thread as blocks arrive.
+        """
         target_path = os.path.join(self.transfer_dir, target_dir.lstrip('/'))
+        # Remote names may contain directories; save under the base name only
+        local_file = os.path.join(target_path, os.path.basename(filename))
         
         add_log_entry(f"TFTP download: server={server}, filename={filename}, target_dir={target_dir}")
         add_log_entry(f"Full target path: {target_path}")
         
         # Ensure target directory exists
         os.makedirs(target_path, exist_ok=True)
-        add_log_entry(f"Ensured target directory exists")
         
         try:
-            # Save current directory
-            current_dir = os.getcwd()
-            add_log_entry(f"Current working directory: {current_dir}")
-            
-            # Change to target directory
-            add_log_entry(f"Changing to target directory: {target_path}")
-            os.chdir(target_path)
-            
-            # Run TFTP client command
-            cmd = ['tftp', server, '-c', 'get', filename]
-            add_log_entry(f"Running TFTP download command: {' '.join(cmd)}")
-            
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            add_log_entry(f"TFTP download result - stdout: {result.stdout}, stderr: {result.stderr}")
-            
-            # Check if file was downloaded
-            expected_file = os.path.join(target_path, filename)
-            if os.path.exists(expected_file):
-                add_log_entry(f"Downloaded file exists at {expected_file}, size: {os.path.getsize(expected_file)} bytes")
-            else:
-                add_log_entry(f"Warning: Command succeeded but file not found at {expected_file}", is_error=True)
-            
-            # Return to original directory
-            add_log_entry(f"Changing back to original directory: {current_dir}")
-            os.chdir(current_dir)
+            client = TFTPClient()
+            future = tftp_engine.submit(client.get(server, filename, local_file, progress=progress))
+            stats = future.result()
             
-            add_log_entry(f"Downloaded {filename} from {server} via TFTP")
+            add_log_entry(f"Downloaded {filename} from {server} via TFTP: {stats['bytes']} bytes in "
+                          f"{stats['duration']:.2f}s ({stats['rate'] / 1024:.1f} KB/s, blksize {stats['blksize']}, "
+                          f"windowsize {stats['windowsize']}, {stats['retransmits']} retransmits)")
             return True
-        except subprocess.CalledProcessError as e:
-            add_log_entry(f"TFTP download failed: stdout: {e.stdout}, stderr: {e.stderr}", is_error=True)
-            # Return to original directory
-            os.chdir(current_dir)
+        except TFTPError as e:
+            add_log_entry(f"TFTP download failed: {str(e)}", is_error=True)
             return False
         except Exception as e:
             error_trace = traceback.format_exc()
             add_log_entry(f"TFTP error: {str(e)}\n{error_trace}", is_error=True)
-            # Return to original directory in case of any error
-            if 'current_dir' in locals():
-                os.chdir(current_dir)
             return False
     
-    def upload_file(self, server, filename, source_dir=''):
-        """Upload a file to a remote TFTP server."""
+    def upload_file(self, server, filename, source_dir='', progress=None):
+        """Upload a file to a remote TFTP server.
+        
+        Runs on the shared TFTP engine; progress(bytes_done, total_bytes) is
+        called from the engine thread as blocks are acknowledged.
+        """
         source_path = os.path.join(self.transfer_dir, source_dir.lstrip('/'))
         file_path = os.path.join(source_path, filename)
         
@@ -291,36 +300,31 @@ class TFTPManager:
         add_log_entry(f"File exists, size: {os.path.getsize(file_path)} bytes")
         
         try:
-            # Save current directory
-            current_dir = os.getcwd()
-            add_log_entry(f"Current working directory: {current_dir}")
-            
-            # Change to source directory
-            add_log_entry(f"Changing to source directory: {source_path}")
-            os.chdir(source_path)
-            
-            # Run TFTP client command
-            cmd = ['tftp', server, '-c', 'put', filename]
-            add_log_entry(f"Running TFTP upload command: {' '.join(cmd)}")
+            client = TFTPClient()
+            future = tftp_engine.submit(client.put(server, file_path, filename, progress=progress))
+            stats = future.result()
             
-            result = subprocess.run(cmd, capture_output=True, text=True, check=True)
-            add_log_entry(f"TFTP upload result - stdout: {result.stdout}, stderr: {result.stderr}")
-            
-            # Return to original directory
-            add_log_entry(f"Changing back to original directory: {current_dir}")
-            os.chdir(current_dir)
-            
-            add_log_entry(f"Uploaded {filename} to {server} via TFTP")
+            add_log_entry(f"Uploaded {filename} to {server} via TFTP: {stats['bytes']} bytes in "
+                          f"{stats['duration']:.2f}s ({stats['rate'] / 1024:.1f} KB/s, blksize {stats['blksize']}, "
+                          f"windowsize {stats['windowsize']}, {stats['retransmits']} retransmits)")
             return True
-        except subprocess.CalledProcessError as e:
-            add_log_entry(f"TFTP upload failed: stdout: {e.stdout}, stderr: {e.stderr}", is_error=True)
-            # Return to original directory
-            os.chdir(current_dir)
+        except TFTPError as e:
+            add_log_entry(f"TFTP upload failed: {str(e)}", is_error=True)
             return False
         except Exception as e:
             error_trace = traceback.format_exc()
             add_log_entry(f"TFTP error: {str(e)}\n{error_trace}", is_error=True)
-            # Return to original directory in case of any error
-            if 'current_dir' in locals():
-                os.chdir(current_dir)
-            return False 
\ No newline at end of file
+            return False
+    
+    def queue_download(self, server, filename, target_dir=''):
+        """Queue a background download from a remote TFTP server; returns the job dict."""
+        target_path = os.path.join(self.transfer_dir, target_dir.lstrip('/'))
+        local_file = os.path.join(target_path, os.path.basename(filename))
+        add_log_entry(f"Queueing TFTP download: server={server}, filename={filename}, target={local_file}")
+        return tftp_jobs.submit('get', server, filename, local_file).to_dict()
+    
+    def queue_upload(self, server, filename, source_dir=''):
+        """Queue a background upload to a remote TFTP server; returns the job dict."""
+        file_path = os.path.join(self.transfer_dir, source_dir.lstrip('/'), filename)
+        add_log_entry(f"Queueing TFTP upload: server={server}, filename={filename}, source={file_path}")
+        return tftp_jobs.submit('put', server, filename, file_path).to_dict()
@@ -0,0 +1,513 @@
+import os
+import time
+import struct
+import socket
+import asyncio
+import threading
+import tempfile
+
+# TFTP opcodes (RFC 1350, RFC 2347)
+OP_RRQ = 1
+OP_WRQ = 2
+OP_DATA = 3
+OP_ACK = 4
+OP_ERROR = 5
+OP_OACK = 6
+
+# TFTP error codes
+ERR_UNDEFINED = 0
+ERR_FILE_NOT_FOUND = 1
+ERR_ACCESS_VIOLATION = 2
+ERR_DISK_FULL = 3
+ERR_ILLEGAL_OPERATION = 4
+ERR_UNKNOWN_TID = 5
+ERR_FILE_EXISTS = 6
+ERR_NO_SUCH_USER = 7
+ERR_OPTION_REFUSED = 8
+
+DEFAULT_PORT = 69
+DEFAULT_BLKSIZE = 512       # RFC 1350 block size, used when options are refused
+TFTP_BLKSIZE = 1468         # Largest block that fits a 1500 byte Ethernet MTU (RFC 2348)
+TFTP_WINDOWSIZE = 8         # Blocks in flight per acknowledgement (RFC 7440)
+TFTP_TIMEOUT = 2.0          # Seconds to wait before retransmitting
+TFTP_RETRIES = 5            # Retransmissions before a transfer is abandoned
+
+MIN_BLKSIZE = 8
+MAX_BLKSIZE = 65464
+MAX_WINDOWSIZE = 65535
+
+class TFTPError(Exception):
+    """A TFTP transfer failed
+
+    code is the TFTP error code to report, and remote is True when the error
+    came from the other side in an ERROR packet (which must not be answered).
+    """
+
+    def __init__(self, message, code=None, remote=False):
+        super().__init__(message)
+        self.code = code
+        self.remote = remote
+
+def split_server(server, default_port=DEFAULT_PORT):
+    """Split 'host', 'host:port' or '[v6addr]:port' into (host, port)"""
+    server = server.strip()
+    if server.startswith('['):
+        host, _, rest = server[1:].partition(']')
+        port = rest.lstrip(':')
+        return host, int(port) if port else default_port
+    if server.count(':') == 1:
+        host, port = server.split(':')
+        return host, int(port)
+    return server, default_port
+
+def build_request(opcode, filename, options=None):
+    """Build an RRQ or WRQ packet in octet mode with optional RFC 2347 options"""
+    packet = struct.pack('!H', opcode) + filename.encode('utf-8') + b'\0octet\0'
+    for name, value in (options or {}).items():
+        packet += name.encode('ascii') + b'\0' + str(value).encode('ascii') + b'\0'
+    return packet
+
+def build_data(block, payload):
+    return struct.pack('!HH', OP_DATA, block & 0xFFFF) + payload
+
+def build_ack(block):
+    return struct.pack('!HH', OP_ACK, block & 0xFFFF)
+
+def build_oack(options):
+    packet = struct.pack('!H', OP_OACK)
+    for name, value in options.items():
+        packet += name.encode('ascii') + b'\0' + str(value).encode('ascii') + b'\0'
+    return packet
+
+def build_error(code, message):
+    return struct.pack('!HH', OP_ERROR, code) + message.encode('utf-8', errors='replace') + b'\0'
+
+def parse_options(data):
+    """Parse NUL separated name/value pairs into a dict with lower-case names"""
+    fields = data.split(b'\0')
+    if fields and fields[-1] == b'':
+        fields = fields[:-1]
+    options = {}
+    for i in range(0, len(fields) - 1, 2):
+        options[fields[i].decode('ascii', errors='replace').lower()] = fields[i + 1].decode('ascii', errors='replace')
+    return options
+
+def parse_request(data):
+    """Parse an RRQ/WRQ packet into (opcode, filename, mode, options)"""
+    opcode = struct.unpack('!H', data[:2])[0]
+    fields = data[2:].split(b'\0')
+    if len(fields) < 3:
+        raise TFTPError("Malformed request", ERR_ILLEGAL_OPERATION)
+    filename = fields[0].decode('utf-8', errors='replace')
+    mode = fields[1].decode('ascii', errors='replace').lower()
+    options = parse_options(b'\0'.join(fields[2:]))
+    return opcode, filename, mode, options
+
+def parse_error(data):
+    """Return (code, message) from an ERROR packet"""
+    code = struct.unpack('!H', data[2:4])[0] if len(data) >= 4 else ERR_UNDEFINED
+    return code, data[4:].split(b'\0', 1)[0].decode('utf-8', errors='replace')
+
+def block_distance(block, base):
+    """Distance from absolute block base to the 16 bit wire block number, modulo 65536"""
+    return (block - base) & 0xFFFF
+
+class _TFTPProtocol(asyncio.DatagramProtocol):
+    """Queues incoming datagrams for the transfer coroutine"""
+
+    def __init__(self):
+        self.queue = asyncio.Queue()
+        self.transport = None
+
+    def connection_made(self, transport):
+        self.transport = transport
+
+    def datagram_received(self, data, addr):
+        self.queue.put_nowait((data, addr))
+
+    def error_received(self, exc):
+        self.queue.put_nowait((exc, None))
+
+class _Session:
+    """One UDP socket talking to one remote transfer ID (host and port)"""
+
+    def __init__(self, transport, protocol, host_address, timeout, sock=None, peer=None):
+        self.transport = transport
+        self.protocol = protocol
+        self.host_address = host_address
+        self.peer = peer
+        self.timeout = timeout
+        self.sock = sock
+
+    def send(self, packet, addr=None):
+        self.transport.sendto(packet, addr or self.peer)
+
+    def send_data(self, block, payload):
+        """Send a DATA packet, gathering header and payload without a copy when possible"""
+        header = struct.pack('!HH', OP_DATA, block & 0xFFFF)
+        if self.sock is not None:
+            try:
+                self.sock.sendmsg([header, payload], [], 0, self.peer)
+                return
+            except (BlockingIOError, InterruptedError):
+                pass
+        self.transport.sendto(header + bytes(payload), self.peer)
+
+    async def recv(self):
+        """Wait for the next packet from the peer; raises asyncio.TimeoutError"""
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.timeout
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            if not self.protocol.queue.empty():
+                # Skip the wait_for task when packets are already waiting
+                data, addr = self.protocol.queue.get_nowait()
+            else:
+                data, addr = await asyncio.wait_for(self.protocol.queue.get(), remaining)
+            if addr is None:
+                # ICMP errors mean nobody is listening; retransmits would not help
+                raise TFTPError(f"Network error: {data}")
+            if len(data) < 4:
+                continue
+            if self.peer is None:
+                if addr[0] != self.host_address:
+                    continue
+                self.peer = addr
+            elif addr != self.peer:
+                # Packet from a stale or foreign transfer (RFC 1350 section 4)
+                self.send(build_error(ERR_UNKNOWN_TID, "Unknown transfer ID"), addr)
+                continue
+            return data
+
+    def close(self):
+        self.transport.close()
+
+async def receive_blocks(session, write, blksize, windowsize, retries_allowed, stats, progress=None, total=None,
+                         pending=None, initial=None):
+    """Receive DATA blocks, acknowledging once per window (RFC 7440)
+
+    write(payload) is called for each in-order block. pending is a DATA packet
+    that has already been read, such as block 1 answering a plain request.
+    initial is the packet to repeat while block 1 is outstanding, when that is
+    not ACK 0 (a server's OACK). Counters in stats are updated as the transfer
+    proceeds.
+    """
+    expected = 1           # Absolute number of the next block we need
+    in_window = 0          # In-order blocks received since our last ACK
+    reacked = False        # Whether we already re-acknowledged the current gap
+    retries = 0
+    while True:
+        if pending is not None:
+            data, pending = pending, None
+        else:
+            try:
+                data = await session.recv()
+            except asyncio.TimeoutError:
+                retries += 1
+                if retries > retries_allowed:
+                    raise TFTPError(f"Timed out waiting for block {expected}")
+                session.send(initial if initial is not None and expected == 1 else build_ack(expected - 1))
+                stats['retransmits'] += 1
+                in_window = 0
+                continue
+
+        opcode, block = struct.unpack('!HH', data[:4])
+        if opcode == OP_ERROR:
+            code, message = parse_error(data)
+            raise TFTPError(f"Peer error {code}: {message}", code, remote=True)
+        if opcode == OP_OACK and expected == 1:
+            # Our ACK of the OACK was lost
+            session.send(build_ack(0))
+            continue
+        if opcode != OP_DATA:
+            continue
+
+        if block == expected & 0xFFFF:
+            payload = data[4:]
+            write(payload)
+            stats['bytes'] += len(payload)
+            stats['blocks'] += 1
+            expected += 1
+            in_window += 1
+            retries = 0
+            reacked = False
+            last = len(payload) < blksize
+            if last or in_window >= windowsize:
+                session.send(build_ack(expected - 1))
+                in_window = 0
+                if progress:
+                    progress(stats['bytes'], total)
+            if last:
+                return
+        elif not reacked:
+            # Gap or duplicate: acknowledge the last in-order block once so
+            # the sender restarts the window from there (RFC 7440)
+            session.send(build_ack(expected - 1))
+            stats['retransmits'] += 1
+            in_window = 0
+            reacked = True
+
+async def send_blocks(session, read_block, size, blksize, windowsize, retries_allowed, stats, progress=None):
+    """Send size bytes as DATA blocks with up to windowsize blocks in flight
+
+    read_block(offset, length) returns the payload for a block and may be a
+    memoryview, which is sent without copying.
+    """
+    # The final block is shorter than blksize, and empty when size is a multiple of it
+    last_block = size // blksize + 1
+    base = 1          # Oldest unacknowledged block
+    next_block = 1    # Next block to put on the wire
+    retries = 0
+    while base <= last_block:
+        while next_block < base + windowsize and next_block <= last_block:
+            session.send_data(next_block, read_block((next_block - 1) * blksize, blksize))
+            next_block += 1
+
+        try:
+            data = await session.recv()
+        except asyncio.TimeoutError:
+            retries += 1
+            if retries > retries_allowed:
+                raise TFTPError(f"Timed out waiting for acknowledgement of block {base}")
+            stats['retransmits'] += next_block - base
+            next_block = base
+            continue
+
+        opcode, block = struct.unpack('!HH', data[:4])
+        if opcode == OP_ERROR:
+            code, message = parse_error(data)
+            raise TFTPError(f"Peer error {code}: {message}", code, remote=True)
+        if opcode != OP_ACK:
+            continue
+
+        distance = block_distance(block, base - 1)
+        if distance > next_block - base:
+            continue  # Stale ACK from an earlier window
+        acked = base - 1 + distance
+        if acked >= base:
+            stats['bytes'] = min(acked * blksize, size)
+            stats['blocks'] = acked
+            base = acked + 1
+            retries = 0
+            if progress:
+                progress(stats['bytes'], size)
+        if acked < next_block - 1:
+            # Receiver saw a gap - resend everything after its last good block
+            stats['retransmits'] += next_block - 1 - acked
+            next_block = acked + 1
+
+class TFTPClient:
+    """In-process TFTP client (RFC 1350) with blksize, tsize and windowsize options
+
+    Transfers are coroutines, so any number can share one event loop. Each
+    returns a stats dict; progress(bytes_done, total_bytes) is called as
+    blocks are acknowledged, with total_bytes None when the size is unknown.
+    """
+
+    def __init__(self, blksize=TFTP_BLKSIZE, windowsize=TFTP_WINDOWSIZE, timeout=TFTP_TIMEOUT, retries=TFTP_RETRIES):
+        self.blksize = max(MIN_BLKSIZE, min(blksize, MAX_BLKSIZE))
+        self.windowsize = max(1, min(windowsize, MAX_WINDOWSIZE))
+        self.timeout = timeout
+        self.retries = retries
+
+    async def _open(self, host, port):
+        loop = asyncio.get_running_loop()
+        infos = await loop.getaddrinfo(host, port, type=socket.SOCK_DGRAM)
+        if not infos:
+            raise TFTPError(f"Cannot resolve {host}")
+        family, _, _, _, server_addr = infos[0]
+        transport, protocol = await loop.create_datagram_endpoint(_TFTPProtocol, family=family)
+        return _Session(transport, protocol, server_addr[0], self.timeout), server_addr
+
+    def _requested_options(self, tsize):
+        options = {}
+        if self.blksize != DEFAULT_BLKSIZE:
+            options['blksize'] = self.blksize
+        options['tsize'] = tsize
+        if self.windowsize != 1:
+            options['windowsize'] = self.windowsize
+        return options
+
+    def _accept_oack(self, session, requested, data):
+        """Validate an OACK against what we asked for; returns (blksize, windowsize, tsize)"""
+        offered = parse_options(data[2:])
+        unknown = set(offered) - set(requested)
+        if unknown:
+            session.send(build_error(ERR_OPTION_REFUSED, "Unrequested option"))
+            raise TFTPError(f"Server acknowledged unrequested options: {', '.join(sorted(unknown))}", ERR_OPTION_REFUSED)
+        try:
+            blksize = int(offered.get('blksize', DEFAULT_BLKSIZE))
+            windowsize = int(offered.get('windowsize', 1))
+            tsize = int(offered['tsize']) if 'tsize' in offered else None
+        except ValueError:
+            session.send(build_error(ERR_OPTION_REFUSED, "Invalid option value"))
+            raise TFTPError("Server sent an invalid option value", ERR_OPTION_REFUSED)
+        if not MIN_BLKSIZE <= blksize <= requested.get('blksize', DEFAULT_BLKSIZE) or \
+                not 1 <= windowsize <= requested.get('windowsize', 1):
+            session.send(build_error(ERR_OPTION_REFUSED, "Option value out of range"))
+            raise TFTPError("Server negotiated options outside the requested range", ERR_OPTION_REFUSED)
+        return blksize, windowsize, tsize
+
+    async def _request(self, session, server_addr, packet):
+        """Send a request until the server answers; returns its first packet"""
+        for attempt in range(self.retries + 1):
+            session.send(packet, server_addr)
+            try:
+                return await session.recv()
+            except asyncio.TimeoutError:
+                continue
+        raise TFTPError(f"No response from {server_addr[0]}:{server_addr[1]}")
+
+    async def get(self, server, remote_name, local_path, progress=None):
+        """Download remote_name from server into local_path"""
+        host, port = split_server(server)
+        options = self._requested_options(0)
+        stats = {'bytes': 0, 'blocks': 0, 'retransmits': 0}
+        started = time.monotonic()
+
+        session, server_addr = await self._open(host, port)
+        target_dir = os.path.dirname(os.path.abspath(local_path))
+        fd, temp_path = tempfile.mkstemp(dir=target_dir, prefix='.' + os.path.basename(local_path) + '.', suffix='.part')
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                reply = await self._request(session, server_addr, build_request(OP_RRQ, remote_name, options))
+                opcode = struct.unpack('!H', reply[:2])[0]
+                if opcode == OP_ERROR and parse_error(reply)[0] == ERR_OPTION_REFUSED:
+                    # Server refused the options - retry as a plain RFC 1350 request
+                    session.close()
+                    session, server_addr = await self._open(host, port)
+                    options = {}
+                    reply = await self._request(session, server_addr, build_request(OP_RRQ, remote_name))
+                    opcode = struct.unpack('!H', reply[:2])[0]
+
+                total = None
+                blksize, windowsize = DEFAULT_BLKSIZE, 1
+                pending = None
+                if opcode == OP_OACK and options:
+                    blksize, windowsize, total = self._accept_oack(session, options, reply)
+                    session.send(build_ack(0))
+                elif opcode == OP_DATA:
+                    # Options ignored by the server; this is already block 1
+                    pending = reply
+                elif opcode == OP_ERROR:
+                    code, message = parse_error(reply)
+                    raise TFTPError(f"Server error {code}: {message}", code, remote=True)
+                else:
+                    session.send(build_error(ERR_ILLEGAL_OPERATION, "Unexpected packet"))
+                    raise TFTPError(f"Unexpected opcode {opcode} from server", ERR_ILLEGAL_OPERATION)
+
+                stats.update(blksize=blksize, windowsize=windowsize)
+                await receive_blocks(session, out.write, blksize, windowsize, self.retries, stats, progress, total, pending)
+            os.replace(temp_path, local_path)
+            completed = True
+        finally:
+            if not completed:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+                session.close()
+            else:
+                # Linger to re-acknowledge a retransmitted final block
+                asyncio.ensure_future(self._dally(session))
+
+        return self._finish(stats, started)
+
+    async def _dally(self, session):
+        try:
+            while True:
+                data = await session.recv()
+                opcode, block = struct.unpack('!HH', data[:4])
+                if opcode == OP_DATA:
+                    session.send(build_ack(block))
+        except (asyncio.TimeoutError, TFTPError):
+            pass
+        finally:
+            session.close()
+
+    async def put(self, server, local_path, remote_name, progress=None):
+        """Upload local_path to server as remote_name"""
+        host, port = split_server(server)
+        size = os.path.getsize(local_path)
+        options = self._requested_options(size)
+        stats = {'bytes': 0, 'blocks': 0, 'retransmits': 0}
+        started = time.monotonic()
+
+        session, server_addr = await self._open(host, port)
+        fd = os.open(local_path, os.O_RDONLY)
+        try:
+            reply = await self._request(session, server_addr, build_request(OP_WRQ, remote_name, options))
+            opcode = struct.unpack('!H', reply[:2])[0]
+            if opcode == OP_ERROR and parse_error(reply)[0] == ERR_OPTION_REFUSED:
+                session.close()
+                session, server_addr = await self._open(host, port)
+                options = {}
+                reply = await self._request(session, server_addr, build_request(OP_WRQ, remote_name))
+                opcode = struct.unpack('!H', reply[:2])[0]
+
+            blksize, windowsize = DEFAULT_BLKSIZE, 1
+            if opcode == OP_OACK and options:
+                blksize, windowsize, _ = self._accept_oack(session, options, reply)
+            elif opcode == OP_ACK and struct.unpack('!H', reply[2:4])[0] == 0:
+                pass
+            elif opcode == OP_ERROR:
+                code, message = parse_error(reply)
+                raise TFTPError(f"Server error {code}: {message}", code, remote=True)
+            else:
+                session.send(build_error(ERR_ILLEGAL_OPERATION, "Unexpected packet"))
+                raise TFTPError(f"Unexpected opcode {opcode} from server", ERR_ILLEGAL_OPERATION)
+
+            stats.update(blksize=blksize, windowsize=windowsize)
+            await send_blocks(session, lambda offset, length: os.pread(fd, length, offset),
+                              size, blksize, windowsize, self.retries, stats, progress)
+        finally:
+            os.close(fd)
+            session.close()
+
+        return self._finish(stats, started)
+
+    def _finish(self, stats, started):
+        stats['duration'] = time.monotonic() - started
+        stats['rate'] = stats['bytes'] / stats['duration'] if stats['duration'] > 0 else 0
+        return stats
+
+class TFTPEngine:
+    """Runs TFTP transfers on one asyncio event loop in a background thread
+
+    Under eventlet the thread is a green thread, so the loop cooperates with
+    request handlers instead of blocking them.
+    """
+
+    def __init__(self):
+        self.loop = None
+        self.thread = None
+        self.pid = None
+        self.lock = threading.Lock()
+
+    def ensure_started(self):
+        """Start the event loop thread, restarting it in a forked child process"""
+        with self.lock:
+            if self.pid == os.getpid() and self.thread and self.thread.is_alive():
+                return self.loop
+            ready = threading.Event()
+            self.loop = asyncio.new_event_loop()
+            self.pid = os.getpid()
+            self.thread = threading.Thread(target=self._run, args=(self.loop, ready), name='tftp-engine', daemon=True)
+            self.thread.start()
+            ready.wait()
+            return self.loop
+
+    def _run(self, loop, ready):
+        asyncio.set_event_loop(loop)
+        loop.call_soon(ready.set)
+        loop.run_forever()
+
+    def submit(self, coro):
+        """Schedule a coroutine on the engine loop; returns a concurrent.futures.Future"""
+        return asyncio.run_coroutine_threadsafe(coro, self.ensure_started())
+
+# Shared engine for all TFTP transfers in this process
+tftp_engine = TFTPEngine()
@@ -0,0 +1,250 @@
+import os
+import time
+import asyncio
+import itertools
+import threading
+import traceback
+from collections import OrderedDict
+from .logging import add_log_entry
+from .tftp_client import TFTPClient, TFTPError, tftp_engine, split_server
+
+# Job queue settings
+JOBS_PER_SERVER = 2             # Transfers run at once against one remote server
+JOB_HISTORY = 100               # Finished jobs kept for listing and retry
+PROGRESS_INTERVAL = 0.25        # Minimum seconds between progress events for one job
+RATE_WINDOW = 2.0               # Seconds of progress samples used for the rate estimate
+
+# Job states
+QUEUED = 'queued'
+RUNNING = 'running'
+COMPLETE = 'complete'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATES = (COMPLETE, FAILED, CANCELLED)
+
+class TFTPJob:
+    """One remote transfer: a download into or an upload from the transfer directory"""
+
+    def __init__(self, job_id, direction, server, filename, local_path):
+        self.id = job_id
+        self.direction = direction
+        self.server = server
+        self.filename = filename
+        self.local_path = local_path
+        self.attempts = 0
+        self.future = None
+        self.task = None
+        self.reset()
+
+    def reset(self):
+        """Clear per-attempt state before the job is (re)queued"""
+        self.state = QUEUED
+        self.cancel_requested = False
+        self.error = None
+        self.bytes = 0
+        self.total = None
+        self.rate = 0.0
+        self.stats = None
+        self.queued_at = time.time()
+        self.started_at = None
+        self.finished_at = None
+        self.samples = []
+        self.last_emit = 0.0
+
+    def record_progress(self, done, total):
+        """Store a progress sample and refresh the rate over the last RATE_WINDOW seconds"""
+        now = time.monotonic()
+        self.bytes = done
+        self.total = total
+        self.samples.append((now, done))
+        while len(self.samples) > 2 and now - self.samples[0][0] > RATE_WINDOW:
+            self.samples.pop(0)
+        first_time, first_bytes = self.samples[0]
+        if now > first_time:
+            self.rate = (done - first_bytes) / (now - first_time)
+
+    def to_dict(self):
+        eta = None
+        if self.state == RUNNING and self.total and self.rate > 0:
+            eta = max(self.total - self.bytes, 0) / self.rate
+        return {
+            "id": self.id,
+            "direction": self.direction,
+            "server": self.server,
+            "filename": self.filename,
+            "local_path": self.local_path,
+            "state": self.state,
+            "error": self.error,
+            "bytes": self.bytes,
+            "total": self.total,
+            "rate": self.rate,
+            "eta": eta,
+            "attempts": self.attempts,
+            "queued_at": self.queued_at,
+            "started_at": self.started_at,
+            "finished_at": self.finished_at,
+            "stats": self.stats
+        }
+
+class TFTPJobQueue:
+    """Background queue for remote TFTP transfers
+
+    Jobs run on the shared TFTP engine loop. Each remote server has its own
+    semaphore, so at most JOBS_PER_SERVER transfers hit it at once while jobs
+    for other servers proceed. Listeners are called with the job dict on every
+    state change and, throttled, on progress.
+    """
+
+    def __init__(self, per_server=JOBS_PER_SERVER):
+        self.per_server = per_server
+        self.jobs = OrderedDict()
+        self.ids = itertools.count(1)
+        self.listeners = []
+        self.lock = threading.Lock()
+        self.limits = {}
+        self.limits_loop = None
+
+    def add_listener(self, callback):
+        """Register callback(job_dict) for job updates"""
+        if callback not in self.listeners:
+            self.listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self.listeners:
+            self.listeners.remove(callback)
+
+    def _notify(self, job):
+        job.last_emit = time.monotonic()
+        snapshot = job.to_dict()
+        for callback in list(self.listeners):
+            try:
+                callback(snapshot)
+            except Exception as e:
+                add_log_entry(f"TFTP job listener error: {str(e)}", is_error=True)
+
+    def submit(self, direction, server, filename, local_path):
+        """Queue a download ('get') or upload ('put') and return the job"""
+        if direction not in ('get', 'put'):
+            raise ValueError(f"Unknown transfer direction: {direction}")
+        with self.lock:
+            job = TFTPJob(str(next(self.ids)), direction, server, filename, local_path)
+            self.jobs[job.id] = job
+            self._prune()
+        self._start(job)
+        return job
+
+    def _prune(self):
+        """Drop the oldest finished jobs beyond JOB_HISTORY"""
+        finished = [job_id for job_id, job in self.jobs.items() if job.state in FINISHED_STATES]
+        for job_id in finished[:max(len(finished) - JOB_HISTORY, 0)]:
+            del self.jobs[job_id]
+
+    def _start(self, job):
+        job.attempts += 1
+        add_log_entry(f"TFTP job {job.id} queued: {job.direction} {job.filename} "
+                      f"{'from' if job.direction == 'get' else 'to'} {job.server} (attempt {job.attempts})")
+        self._notify(job)
+        job.future = tftp_engine.submit(self._run(job))
+
+    def get(self, job_id):
+        return self.jobs.get(job_id)
+
+    def list(self):
+        with self.lock:
+            return [job.to_dict() for job in self.jobs.values()]
+
+    def cancel(self, job_id):
+        """Cancel a queued or running job; returns False if it already finished"""
+        job = self.jobs.get(job_id)
+        if job is None or job.state in FINISHED_STATES:
+            return False
+        # The flag covers a job whose coroutine has not started on the loop yet
+        job.cancel_requested = True
+        task = job.task
+        if task is not None:
+            tftp_engine.loop.call_soon_threadsafe(task.cancel)
+        return True
+
+    def retry(self, job_id):
+        """Queue a failed or cancelled job again with the same parameters"""
+        job = self.jobs.get(job_id)
+        if job is None or job.state not in (FAILED, CANCELLED):
+            return None
+        job.reset()
+        self._start(job)
+        return job
+
+    def wait(self, job_id, timeout=None):
+        """Block until the job finishes; returns its dict"""
+        job = self.jobs[job_id]
+        try:
+            job.future.result(timeout)
+        except Exception:
+            # Cancellation and failures are recorded on the job itself
+            pass
+        return job.to_dict()
+
+    def _limit(self, server):
+        """Per-server semaphore, created on the engine loop"""
+        loop = asyncio.get_running_loop()
+        if self.limits_loop is not loop:
+            # The engine loop was replaced (e.g. after a fork); old semaphores belong to it
+            self.limits = {}
+            self.limits_loop = loop
+        key = split_server(server)
+        if key not in self.limits:
+            self.limits[key] = asyncio.Semaphore(self.per_server)
+        return self.limits[key]
+
+    async def _run(self, job):
+        def progress(done, total):
+            # Task.cancel() can be lost when it races a completed wait_for, so
+            # busy transfers also check the flag on every block
+            if job.cancel_requested:
+                raise asyncio.CancelledError()
+            job.record_progress(done, total)
+            if time.monotonic() - job.last_emit >= PROGRESS_INTERVAL:
+                self._notify(job)
+
+        job.task = asyncio.current_task()
+        try:
+            if job.cancel_requested:
+                raise asyncio.CancelledError()
+            async with self._limit(job.server):
+                job.state = RUNNING
+                job.started_at = time.time()
+                self._notify(job)
+                client = TFTPClient()
+                if job.direction == 'get':
+                    os.makedirs(os.path.dirname(job.local_path), exist_ok=True)
+                    stats = await client.get(job.server, job.filename, job.local_path, progress=progress)
+                else:
+                    stats = await client.put(job.server, job.local_path, job.filename, progress=progress)
+            job.stats = stats
+            job.bytes = stats['bytes']
+            job.total = stats['bytes']
+            job.rate = stats['rate']
+            job.state = COMPLETE
+            add_log_entry(f"TFTP job {job.id} complete: {stats['bytes']} bytes in {stats['duration']:.2f}s "
+                          f"({stats['rate'] / 1024:.1f} KB/s, {stats['retransmits']} retransmits)")
+        except asyncio.CancelledError:
+            job.state = CANCELLED
+            add_log_entry(f"TFTP job {job.id} cancelled")
+            raise
+        except TFTPError as e:
+            job.state = FAILED
+            job.error = str(e)
+            add_log_entry(f"TFTP job {job.id} failed: {str(e)}", is_error=True)
+        except Exception as e:
+            job.state = FAILED
+            job.error = str(e)
+            error_trace = traceback.format_exc()
+            add_log_entry(f"TFTP job {job.id} error: {str(e)}\n{error_trace}", is_error=True)
+        finally:
+            job.task = None
+            job.finished_at = time.time()
+            self._notify(job)
+        return job.stats
+
+# Shared queue for all remote TFTP transfers in this process
+tftp_jobs = TFTPJobQueue()
@@ -0,0 +1,317 @@
+import os
+import mmap
+import time
+import socket
+import struct
+import asyncio
+import itertools
+import tempfile
+from collections import deque
+from .logging import add_log_entry
+from .tftp_client import (_TFTPProtocol, _Session, TFTPError, tftp_engine, receive_blocks, send_blocks,
+                          parse_request, build_oack, build_ack, build_error, OP_RRQ, OP_WRQ, OP_ACK,
+                          DEFAULT_BLKSIZE, MIN_BLKSIZE, ERR_UNDEFINED, ERR_FILE_NOT_FOUND,
+                          ERR_ACCESS_VIOLATION, ERR_ILLEGAL_OPERATION, ERR_DISK_FULL)
+
+# Embedded server settings
+TFTP_SERVER_HOST = '0.0.0.0'
+TFTP_SERVER_PORT = 69
+SERVER_MAX_BLKSIZE = 65464      # Largest blksize granted to clients (RFC 2348 maximum)
+SERVER_MAX_WINDOWSIZE = 64      # Largest windowsize granted to clients
+SERVER_TIMEOUT = 2.0            # Seconds before retransmitting, unless the client negotiates one
+SERVER_RETRIES = 5
+SERVER_MAX_TRANSFERS = 256      # Concurrent transfers before new requests are refused
+SERVER_ALLOW_WRITE = True       # Accept uploads (WRQ), like tftpd-hpa --create
+TRANSFER_HISTORY = 100          # Finished transfers kept for the stats view
+
+class _ListenerProtocol(asyncio.DatagramProtocol):
+    """Receives requests on the well-known port and hands them to the server"""
+
+    def __init__(self, server):
+        self.server = server
+
+    def datagram_received(self, data, addr):
+        self.server.handle_request(data, addr)
+
+class EmbeddedTFTPServer:
+    """TFTP server running on the shared TFTP engine event loop
+
+    Every transfer gets its own socket (transfer ID) and coroutine, so one
+    thread serves any number of clients. Reads come from an mmap of the file
+    and are gathered into datagrams with sendmsg, so file data is not copied
+    in Python. Per-transfer stats are available from get_stats().
+    """
+
+    def __init__(self, root, host=TFTP_SERVER_HOST, port=TFTP_SERVER_PORT, allow_write=SERVER_ALLOW_WRITE):
+        self.root = os.path.realpath(root)
+        self.host = host
+        self.port = port
+        self.allow_write = allow_write
+        self.listener = None
+        self.started = None
+        self.transfers = {}                     # id -> stats of active transfers
+        self.history = deque(maxlen=TRANSFER_HISTORY)
+        self.totals = {'transfers': 0, 'failed': 0, 'bytes_sent': 0, 'bytes_received': 0}
+        self._ids = itertools.count(1)
+
+    @property
+    def running(self):
+        return self.listener is not None
+
+    def start(self):
+        """Bind the listening socket; raises OSError if the port is unavailable"""
+        if not self.running:
+            tftp_engine.submit(self._start()).result()
+
+    def stop(self):
+        """Close the listening socket; transfers in progress run to completion"""
+        if self.running:
+            tftp_engine.submit(self._stop()).result()
+
+    async def _start(self):
+        loop = asyncio.get_running_loop()
+        self.listener, _ = await loop.create_datagram_endpoint(
+            lambda: _ListenerProtocol(self), local_addr=(self.host, self.port))
+        self.started = time.time()
+        add_log_entry(f"Embedded TFTP server listening on {self.host}:{self.port}, serving {self.root}")
+
+    async def _stop(self):
+        self.listener.close()
+        self.listener = None
+        self.started = None
+        add_log_entry("Embedded TFTP server stopped")
+
+    def get_stats(self):
+        """Snapshot of active and recent transfers plus server totals"""
+        now = time.time()
+        active = []
+        for stats in list(self.transfers.values()):
+            entry = self._public(stats)
+            elapsed = now - entry['started']
+            entry['rate'] = entry['bytes'] / elapsed if elapsed > 0 else 0
+            active.append(entry)
+        return {
+            'running': self.running,
+            'host': self.host,
+            'port': self.port,
+            'root': self.root,
+            'uptime': now - self.started if self.started else 0,
+            'active': active,
+            'recent': [self._public(stats) for stats in reversed(self.history)],
+            'totals': dict(self.totals)
+        }
+
+    def _public(self, stats):
+        entry = dict(stats)
+        entry.pop('client_addr', None)
+        return entry
+
+    def handle_request(self, data, addr):
+        if len(data) < 4:
+            return
+        # A retransmitted request from a client we are already serving
+        for stats in self.transfers.values():
+            if stats['client_addr'] == addr:
+                return
+        asyncio.ensure_future(self._serve(data, addr))
+
+    def _resolve(self, filename):
+        """Map a requested file name into the served directory, or None if it escapes it"""
+        path = os.path.realpath(os.path.join(self.root, filename.lstrip('/')))
+        if path != self.root and path.startswith(self.root + os.sep):
+            return path
+        return None
+
+    def _negotiate(self, options, tsize):
+        """Pick option values to acknowledge; returns (accepted, blksize, windowsize, timeout)"""
+        accepted = {}
+        blksize, windowsize, timeout = DEFAULT_BLKSIZE, 1, SERVER_TIMEOUT
+        try:
+            if 'blksize' in options:
+                blksize = accepted['blksize'] = max(MIN_BLKSIZE, min(int(options['blksize']), SERVER_MAX_BLKSIZE))
+            if 'windowsize' in options:
+                windowsize = accepted['windowsize'] = max(1, min(int(options['windowsize']), SERVER_MAX_WINDOWSIZE))
+            if 'timeout' in options and 1 <= int(options['timeout']) <= 255:
+                timeout = int(options['timeout'])
+                accepted['timeout'] = timeout
+            if 'tsize' in options:
+                accepted['tsize'] = tsize if tsize is not None else int(options['tsize'])
+        except ValueError:
+            # Malformed option values are ignored as a whole (RFC 2347)
+            return {}, DEFAULT_BLKSIZE, 1, SERVER_TIMEOUT
+        return accepted, blksize, windowsize, timeout
+
+    async def _open_session(self, addr):
+        loop = asyncio.get_running_loop()
+        family = socket.AF_INET6 if ':' in addr[0] else socket.AF_INET
+        sock = socket.socket(family, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind((self.host if family == socket.AF_INET else '::', 0))
+        transport, protocol = await loop.create_datagram_endpoint(_TFTPProtocol, sock=sock)
+        return _Session(transport, protocol, addr[0], SERVER_TIMEOUT, sock=sock, peer=addr)
+
+    async def _serve(self, data, addr):
+        try:
+            opcode, filename, mode, options = parse_request(data)
+        except (TFTPError, struct.error):
+            return
+
+        stats = {
+            'id': next(self._ids),
+            'client': f"{addr[0]}:{addr[1]}",
+            'client_addr': addr,
+            'filename': filename,
+            'direction': 'read' if opcode == OP_RRQ else 'write',
+            'status': 'active',
+            'bytes': 0,
+            'total': None,
+            'blocks': 0,
+            'retransmits': 0,
+            'blksize': DEFAULT_BLKSIZE,
+            'windowsize': 1,
+            'started': time.time(),
+            'finished': None,
+            'error': None
+        }
+        # Registered before any await so a retransmitted request is recognised
+        self.transfers[stats['id']] = stats
+        session = None
+        try:
+            session = await self._open_session(addr)
+            if len(self.transfers) > SERVER_MAX_TRANSFERS:
+                raise TFTPError("Server busy", ERR_UNDEFINED)
+            if mode not in ('octet', 'netascii'):
+                raise TFTPError(f"Unsupported mode {mode}", ERR_ILLEGAL_OPERATION)
+            path = self._resolve(filename)
+            if path is None:
+                raise TFTPError("Access violation", ERR_ACCESS_VIOLATION)
+
+            if opcode == OP_RRQ:
+                await self._serve_read(session, path, options, stats)
+                self.totals['bytes_sent'] += stats['bytes']
+            elif opcode == OP_WRQ:
+                if not self.allow_write:
+                    raise TFTPError("Uploads are disabled", ERR_ACCESS_VIOLATION)
+                await self._serve_write(session, path, options, stats)
+                self.totals['bytes_received'] += stats['bytes']
+            else:
+                raise TFTPError("Illegal TFTP operation", ERR_ILLEGAL_OPERATION)
+            stats['status'] = 'complete'
+        except TFTPError as e:
+            stats['status'] = 'failed'
+            stats['error'] = str(e)
+            if e.code is not None and not e.remote:
+                session.send(build_error(e.code, str(e)))
+        except OSError as e:
+            stats['status'] = 'failed'
+            stats['error'] = str(e)
+            if session is not None:
+                session.send(build_error(ERR_DISK_FULL if opcode == OP_WRQ else ERR_UNDEFINED, str(e)))
+        finally:
+            if session is not None:
+                session.close()
+            stats['finished'] = time.time()
+            elapsed = stats['finished'] - stats['started']
+            stats['rate'] = stats['bytes'] / elapsed if elapsed > 0 else 0
+            del self.transfers[stats['id']]
+            self.history.append(stats)
+            self.totals['transfers'] += 1
+            if stats['status'] == 'failed':
+                self.totals['failed'] += 1
+                add_log_entry(f"TFTP {stats['direction']} of {filename} by {stats['client']} failed: {stats['error']}",
+                              is_error=True)
+            else:
+                add_log_entry(f"TFTP {stats['direction']} of {filename} by {stats['client']}: {stats['bytes']} bytes "
+                              f"in {elapsed:.2f}s, blksize {stats['blksize']}, windowsize {stats['windowsize']}, "
+                              f"{stats['retransmits']} retransmits")
+
+    async def _offer_options(self, session, accepted):
+        """Send an OACK until the client acknowledges it with ACK 0"""
+        for attempt in range(SERVER_RETRIES + 1):
+            session.send(build_oack(accepted))
+            try:
+                reply = await session.recv()
+            except asyncio.TimeoutError:
+                continue
+            opcode, block = struct.unpack('!HH', reply[:4])
+            if opcode == OP_ACK and block == 0:
+                return
+            raise TFTPError("Expected acknowledgement of options", ERR_ILLEGAL_OPERATION)
+        raise TFTPError("Client did not acknowledge options")
+
+    async def _serve_read(self, session, path, options, stats):
+        try:
+            fd = os.open(path, os.O_RDONLY)
+        except FileNotFoundError:
+            raise TFTPError("File not found", ERR_FILE_NOT_FOUND)
+        except (PermissionError, IsADirectoryError):
+            raise TFTPError("Access violation", ERR_ACCESS_VIOLATION)
+
+        mapped = view = None
+        try:
+            size = os.fstat(fd).st_size
+            stats['total'] = size
+            if size:
+                mapped = mmap.mmap(fd, 0, access=mmap.ACCESS_READ)
+                view = memoryview(mapped)
+            accepted, blksize, windowsize, session.timeout = self._negotiate(options, size)
+            stats.update(blksize=blksize, windowsize=windowsize)
+            if accepted:
+                await self._offer_options(session, accepted)
+
+            def read_block(offset, length):
+                return view[offset:offset + length] if view is not None else b''
+
+            await send_blocks(session, read_block, size, blksize, windowsize, SERVER_RETRIES, stats)
+        finally:
+            if view is not None:
+                view.release()
+                mapped.close()
+            os.close(fd)
+
+    async def _serve_write(self, session, path, options, stats):
+        target_dir = os.path.dirname(path)
+        if not os.path.isdir(target_dir):
+            raise TFTPError("Directory not found", ERR_FILE_NOT_FOUND)
+        accepted, blksize, windowsize, session.timeout = self._negotiate(options, None)
+        stats.update(blksize=blksize, windowsize=windowsize, total=accepted.get('tsize'))
+
+        fd, temp_path = tempfile.mkstemp(dir=target_dir, prefix='.' + os.path.basename(path) + '.', suffix='.part')
+        completed = False
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                # The client answers with DATA block 1, so a lost OACK is only
+                # noticed by the timeout - repeat the OACK rather than ACK 0
+                first_reply = build_oack(accepted) if accepted else build_ack(0)
+                session.send(first_reply)
+                await receive_blocks(session, out.write, blksize, windowsize, SERVER_RETRIES, stats,
+                                     initial=first_reply)
+            os.chmod(temp_path, 0o666)
+            os.replace(temp_path, path)
+            completed = True
+        finally:
+            if not completed:
+                try:
+                    os.remove(temp_path)
+                except OSError:
+                    pass
+
+        # Linger to re-acknowledge a retransmitted final block
+        final_ack = build_ack(stats['blocks'])
+        try:
+            while True:
+                await session.recv()
+                session.send(final_ack)
+        except (asyncio.TimeoutError, TFTPError):
+            pass
+
+# Embedded server instance, created on first use
+embedded_server = None
+
+def get_embedded_server(root, host=TFTP_SERVER_HOST, port=TFTP_SERVER_PORT):
+    """Return the embedded server, reconfiguring it if it is stopped"""
+    global embedded_server
+    if embedded_server is None or (not embedded_server.running and
+                                   (embedded_server.port != port or embedded_server.host != host)):
+        embedded_server = EmbeddedTFTPServer(root, host=host, port=port)
+    return embedded_server
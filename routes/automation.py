@@ -0,0 +1,81 @@
+from flask import Blueprint, jsonify, request
+from flask_socketio import emit
+import traceback
+
+from modules.expect_engine import script_engine, ScriptError
+
+try:
+    from modules.logging import add_log_entry
+except ImportError:
+    def add_log_entry(message, is_error=False):
+        print(f"Log: {'ERROR' if is_error else 'INFO'} - {message}")
+
+bp = Blueprint('automation', __name__, url_prefix='/automation')
+
+@bp.route('/run', methods=['POST'])
+def run_script():
+    """Run an expect script on connected serial devices and SSH sessions"""
+    try:
+        data = request.get_json() or {}
+        steps = data.get('steps')
+        targets = data.get('targets')
+        newline = data.get('newline', '\n')
+
+        if not isinstance(newline, str):
+            return jsonify({'success': False, 'error': 'newline must be a string'})
+
+        job = script_engine.start(steps, targets, name=data.get('name'), newline=newline)
+        return jsonify({
+            'success': True,
+            'job': job.to_dict(),
+            'message': f"Script started on {len(job.runs)} sessions"
+        })
+
+    except ScriptError as e:
+        return jsonify({'success': False, 'error': str(e)})
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error starting script: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({'success': False, 'error': str(e)})
+
+@bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """Recent and running script jobs, without transcripts"""
+    return jsonify({
+        'success': True,
+        'jobs': script_engine.list()
+    })
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """One job with each session's result, variables and output transcript"""
+    job = script_engine.get(job_id)
+    if job is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    return jsonify({'success': True, 'job': job})
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Stop every run of a job that is still going"""
+    if script_engine.get(job_id, transcripts=False) is None:
+        return jsonify({'success': False, 'error': 'Job not found'}), 404
+    if not script_engine.cancel(job_id):
+        return jsonify({'success': False, 'error': 'Job has already finished'})
+    return jsonify({
+        'success': True,
+        'message': 'Cancelling script'
+    })
+
+# WebSocket Events
+from app import socketio
+
+def emit_job_update(job):
+    """Script engine hook: broadcast job starts and per-session results to the /automation namespace"""
+    socketio.emit('automation_job', job, namespace='/automation')
+
+script_engine.add_listener(emit_job_update)
+
+@socketio.on('connect', namespace='/automation')
+def automation_connect():
+    """Send the current jobs to a newly connected client"""
+    emit('automation_jobs', {'jobs': script_engine.list()})
@@ -1,7 +1,8 @@
-from flask import Blueprint, jsonify, request, render_template, send_file
+from flask import Blueprint, jsonify, request, render_template
 from modules.capture import list_captures, start_capture, stop_capture, get_capture_output, delete_capture, view_capture, rename_capture
 from modules.network import get_interfaces
 from modules.logging import add_log_entry
+from modules.file_download import send_file_ranged
 import os
 
 bp = Blueprint('capture', __name__)
@@ -69,9 +70,8 @@ def download_capture(capture_id):
         if capture["id"] == capture_id:
             if os.path.exists(capture["file_path"]):
                 download_name = f"{capture['name']}.pcap"
-                return send_file(
+                return send_file_ranged(
                     capture["file_path"],
-                    as_attachment=True,
                     download_name=download_name,
                     mimetype="application/vnd.tcpdump.pcap"
                 )
@@ -11,19 +11,21 @@ try:
 except ImportError:
     NETIFACES_AVAILABLE = False
 from modules.logging import add_log_entry
+from modules.session_recorder import recording_store
+from modules.file_download import send_file_ranged
 
 # Import SSH communication functions
 try:
     from modules.ssh_comm import (
         create_ssh_session, disconnect_ssh_session, send_ssh_data, 
         get_ssh_output, get_connected_ssh_sessions, disconnect_all_ssh_sessions,
-        test_ssh_connection, ssh_manager
+        test_ssh_connection, ssh_manager, ssh_output_ready
     )
     SSH_AVAILABLE = True
 except ImportError as e:
     print(f"Error importing SSH communication module: {e}")
     # Fallback functions for when module is not available
-    def create_ssh_session(session_id, host='localhost', port=22, username=None, password=None):
+    def create_ssh_session(session_id, host='localhost', port=22, username=None, password=None, record=False):
         return False, "SSH module not available"
     def disconnect_ssh_session(session_id):
         return False, "SSH module not available"
@@ -42,6 +44,7 @@ except ImportError as e:
         def __init__(self):
             pass
     ssh_manager = DummySSHManager()
+    ssh_output_ready = threading.Event()
     SSH_AVAILABLE = False
 
 # Create blueprint
@@ -86,7 +89,9 @@ def broadcast_ssh_output():
                             'data': line
                         }, namespace='/console')
             
-            time.sleep(0.05)  # Small delay to prevent excessive CPU usage
+            # Sessions signal new output; the timeout covers sessions opened meanwhile
+            ssh_output_ready.wait(0.05)
+            ssh_output_ready.clear()
             
         except Exception as e:
             add_log_entry(f"Error broadcasting SSH output: {str(e)}", is_error=True)
@@ -108,6 +113,7 @@ def ssh_connect():
         port = data.get('port', 22)
         username = data.get('username')
         password = data.get('password')
+        record = bool(data.get('record', False))
         
         if not session_id or not username or not password:
             return jsonify({
@@ -123,7 +129,7 @@ def ssh_connect():
                 'error': test_message
             })
         
-        success, message = create_ssh_session(session_id, host, port, username, password)
+        success, message = create_ssh_session(session_id, host, port, username, password, record)
         
         if success:
             # Start output broadcasting if not already started
@@ -219,6 +225,62 @@ def get_ssh_sessions():
             'sessions': []
         }), 500
 
+@bp.route('/ssh/recordings', methods=['GET'])
+def list_recordings():
+    """List recorded console sessions"""
+    try:
+        return jsonify({
+            'success': True,
+            'recordings': recording_store.list()
+        })
+    except Exception as e:
+        add_log_entry(f"Error listing SSH recordings: {str(e)}", is_error=True)
+        return jsonify({
+            'success': False,
+            'error': str(e),
+            'recordings': []
+        }), 500
+
+@bp.route('/ssh/recordings/<recording_id>/events', methods=['GET'])
+def replay_recording(recording_id):
+    """Events of a recording from a point in time (at, seconds) or a byte offset"""
+    try:
+        try:
+            at = float(request.args.get('at', 0))
+            offset = request.args.get('offset', type=int)
+            limit = int(request.args.get('limit', 1000))
+        except ValueError:
+            return jsonify({'success': False, 'error': 'at, offset and limit must be numbers'}), 400
+        
+        result = recording_store.replay(recording_id, at=at, offset=offset, limit=limit)
+        if result is None:
+            return jsonify({'success': False, 'error': 'Recording not found'}), 404
+        result['success'] = True
+        return jsonify(result)
+    except Exception as e:
+        add_log_entry(f"Error replaying SSH recording {recording_id}: {str(e)}", is_error=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
+@bp.route('/ssh/recordings/<recording_id>.cast', methods=['GET'])
+def download_recording(recording_id):
+    """Download a recording as an asciicast v2 file"""
+    path = recording_store.path(recording_id)
+    if path is None:
+        return jsonify({'success': False, 'error': 'Recording not found'}), 404
+    return send_file_ranged(path, download_name=f"{recording_id}.cast", mimetype='application/x-asciicast')
+
+@bp.route('/ssh/recordings/<recording_id>', methods=['DELETE'])
+def delete_recording(recording_id):
+    """Delete a recording"""
+    try:
+        if not recording_store.delete(recording_id):
+            return jsonify({'success': False, 'error': 'Recording not found'}), 404
+        add_log_entry(f"Deleted SSH recording {recording_id}")
+        return jsonify({'success': True})
+    except Exception as e:
+        add_log_entry(f"Error deleting SSH recording {recording_id}: {str(e)}", is_error=True)
+        return jsonify({'success': False, 'error': str(e)}), 500
+
 @bp.route('/get_system_ips', methods=['GET'])
 def get_system_ips():
     """Get all system IP addresses for VNC connection display."""
@@ -1,9 +1,14 @@
-from flask import Blueprint, render_template, send_from_directory, abort, redirect, url_for
+from flask import Blueprint, render_template, send_from_directory, abort, redirect, url_for, request, Response, jsonify
 import os
 import codecs
 import re
 import json
 import datetime
+import hashlib
+import threading
+import time
+from werkzeug.http import http_date
+from modules.doc_search import doc_search
 
 # Try to import markdown, but provide fallback if not available
 try:
@@ -100,6 +105,156 @@ def index():
     """Render the documentation index page."""
     return redirect(url_for('docs.show_doc', doc_name='index'))
 
+# Rendered documentation cache
+# Markdown is converted once per source change; pages are then served from memory
+WARM_CACHE_ON_STARTUP = os.environ.get('DOCS_WARM_CACHE', '1') != '0'
+PAGE_CACHE_SIZE = 64            # Full pages kept, one per (document, host)
+_doc_cache = {}                 # doc key -> (stamp, html)
+_page_cache = {}                # (doc key, host) -> (stamp, page, etag)
+_cache_lock = threading.Lock()
+
+def _file_stamp(path):
+    try:
+        st = os.stat(path)
+        return (st.st_mtime_ns, st.st_size)
+    except OSError:
+        return None
+
+def find_extra_doc(doc_name):
+    """Route key of a docs/ markdown file outside DOC_FILES (guides such as Network-Recovery-Monitor)"""
+    try:
+        names = os.listdir('docs')
+    except OSError:
+        return None
+    for name in names:
+        if name.lower().endswith('.md') and os.path.splitext(name)[0].lower() == doc_name:
+            return doc_name
+    return None
+
+def doc_filename(doc_key):
+    """Markdown file behind a route key, or the _generated_ marker"""
+    if doc_key in DOC_FILES:
+        return DOC_FILES[doc_key]
+    for name in os.listdir('docs'):
+        if name.lower().endswith('.md') and os.path.splitext(name)[0].lower() == doc_key:
+            return name
+    raise IOError(f"No documentation file for {doc_key}")
+
+def doc_url(filename):
+    """URL of the page showing a docs/ markdown file"""
+    route_name = MD_TO_ROUTE.get(filename.lower(), os.path.splitext(filename)[0].lower())
+    return url_for('docs.show_doc', doc_name=route_name)
+
+def doc_source_stamp(doc_key):
+    """Modification stamp of everything a rendered document depends on"""
+    source = doc_filename(doc_key)
+    if source.startswith('_generated_'):
+        return (_file_stamp('version.json'),)
+    stamp = (_file_stamp(os.path.join('docs', source)),)
+    if doc_key == 'about':
+        # The About page has the version number substituted in
+        stamp += (_file_stamp('version.json'),)
+    return stamp
+
+def replace_md_links(match):
+    """Turn [text](file.md) links into /docs/<route> links"""
+    link_text = match.group(1)
+    link_target = match.group(2).lower()
+    
+    # If it's a markdown file, convert to route
+    if link_target.endswith('.md'):
+        base_name = os.path.basename(link_target)
+        if base_name.lower() in MD_TO_ROUTE:
+            route_name = MD_TO_ROUTE[base_name.lower()]
+            return f'[{link_text}]({url_for("docs.show_doc", doc_name=route_name)})'
+    
+    return match.group(0)
+
+def render_markdown(md_content):
+    """Convert documentation markdown to HTML, with the fallback converter if needed"""
+    # Fix markdown links: change [text](file.md) to [text](/docs/route)
+    if MARKDOWN_AVAILABLE:
+        try:
+            md_content = re.sub(r'\[(.*?)\]\((.*?\.md)\)', replace_md_links, md_content)
+            return markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
+        except Exception as e:
+            return f"<pre>Error rendering markdown: {str(e)}\n\n{md_content}</pre>"
+    try:
+        md_content = re.sub(r'\[(.*?)\]\((.*?\.md)\)', replace_md_links, md_content)
+        # Use our simple fallback conversion
+        return simple_markdown_to_html(md_content)
+    except Exception as e:
+        return f"<pre>{md_content}</pre>"
+
+def render_doc(doc_key):
+    """Render one document to HTML, bypassing the cache; raises IOError if unreadable"""
+    source = doc_filename(doc_key)
+    # Special handling for dynamically generated content
+    if source.startswith('_generated_'):
+        if doc_key == 'changelog':
+            md_content = generate_changelog_content()
+        else:
+            abort(404)
+    else:
+        doc_path = os.path.join('docs', source)
+        with codecs.open(doc_path, 'r', encoding='utf-8') as f:
+            md_content = f.read()
+    
+    # If it's the About page, inject version information
+    if doc_key == 'about':
+        version_info = load_version_info()
+        md_content = md_content.replace('{{VERSION}}', version_info['version'])
+    
+    return render_markdown(md_content)
+
+def get_rendered_doc(doc_key):
+    """Return (stamp, html) for a document, rendering only when its sources changed"""
+    stamp = doc_source_stamp(doc_key)
+    with _cache_lock:
+        cached = _doc_cache.get(doc_key)
+    if cached and cached[0] == stamp:
+        return cached
+    html = render_doc(doc_key)
+    with _cache_lock:
+        _doc_cache[doc_key] = (stamp, html)
+    return stamp, html
+
+def warm_doc_cache(app):
+    """Render every document and build the search index ahead of the first request"""
+    doc_search.refresh()
+    # url_for in the link rewriting needs a request context
+    with app.test_request_context('/docs/'):
+        for doc_key in DOC_FILES:
+            try:
+                get_rendered_doc(doc_key)
+            except Exception as e:
+                print(f"Error pre-rendering documentation page {doc_key}: {e}")
+
+def start_doc_cache_warmup(app):
+    """Warm the cache in the background if enabled, so startup is not delayed"""
+    if WARM_CACHE_ON_STARTUP:
+        threading.Thread(target=warm_doc_cache, args=(app,), name='docs-warmup', daemon=True).start()
+
+@bp.route('/search')
+def search_docs():
+    """Full-text search over the docs/ directory"""
+    query = request.args.get('q', '').strip()
+    try:
+        limit = int(request.args.get('limit', 10))
+    except ValueError:
+        return jsonify({"error": "limit must be a number"}), 400
+    
+    started = time.perf_counter()
+    results, total = doc_search.search(query, limit)
+    for result in results:
+        result['url'] = doc_url(result['file'])
+    return jsonify({
+        "query": query,
+        "results": results,
+        "total": total,
+        "took_ms": round((time.perf_counter() - started) * 1000, 2)
+    })
+
 @bp.route('/<doc_name>')
 def show_doc(doc_name):
     """Render a specific documentation file."""
@@ -120,86 +275,45 @@ def show_doc(doc_name):
             matched_key = key
             break
     
+    if not matched_key:
+        matched_key = find_extra_doc(doc_name_lower)
     if not matched_key:
         abort(404)
     
-    # Special handling for dynamically generated content
-    if DOC_FILES[matched_key].startswith('_generated_'):
-        if matched_key.lower() == 'changelog':
-            md_content = generate_changelog_content()
-        else:
-            abort(404)
-    else:
-        # Normal file reading
-        doc_path = os.path.join('docs', DOC_FILES[matched_key])
-        
-        try:
-            # Read the markdown file
-            with codecs.open(doc_path, 'r', encoding='utf-8') as f:
-                md_content = f.read()
-        except IOError as e:
-            return render_template(
-                'docs.html',
-                doc_name=doc_name,
-                doc_files=DOC_FILES,
-                content=f"<p>Error: Could not read documentation file: {str(e)}</p>"
-            )
-    
-    # If it's the About page, inject version information
-    if matched_key.lower() == 'about':
-        version_info = load_version_info()
-        md_content = md_content.replace('{{VERSION}}', version_info['version'])
+    try:
+        stamp, html_content = get_rendered_doc(matched_key)
+    except IOError as e:
+        return render_template(
+            'docs.html',
+            doc_name=doc_name,
+            doc_files=DOC_FILES,
+            content=f"<p>Error: Could not read documentation file: {str(e)}</p>"
+        )
     
-    # Fix markdown links: change [text](file.md) to [text](/docs/route)
-    if MARKDOWN_AVAILABLE:
-        try:
-            # Process links before converting to HTML
-            def replace_md_links(match):
-                link_text = match.group(1)
-                link_target = match.group(2).lower()
-                
-                # If it's a markdown file, convert to route
-                if link_target.endswith('.md'):
-                    base_name = os.path.basename(link_target)
-                    if base_name.lower() in MD_TO_ROUTE:
-                        route_name = MD_TO_ROUTE[base_name.lower()]
-                        return f'[{link_text}]({url_for("docs.show_doc", doc_name=route_name)})'
-                
-                return match.group(0)
-            
-            # Replace markdown links
-            md_content = re.sub(r'\[(.*?)\]\((.*?\.md)\)', replace_md_links, md_content)
-            
-            html_content = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
-        except Exception as e:
-            html_content = f"<pre>Error rendering markdown: {str(e)}\n\n{md_content}</pre>"
+    # The page also shows the request host, so full pages are cached per host
+    host = request.host
+    page_key = (matched_key, host)
+    with _cache_lock:
+        cached = _page_cache.get(page_key)
+    if cached and cached[0] == stamp:
+        page, etag = cached[1], cached[2]
     else:
-        try:
-            # Process links first
-            def replace_md_links(match):
-                link_text = match.group(1)
-                link_target = match.group(2).lower()
-                
-                # If it's a markdown file, convert to route
-                if link_target.endswith('.md'):
-                    base_name = os.path.basename(link_target)
-                    if base_name.lower() in MD_TO_ROUTE:
-                        route_name = MD_TO_ROUTE[base_name.lower()]
-                        return f'[{link_text}]({url_for("docs.show_doc", doc_name=route_name)})'
-                
-                return match.group(0)
-            
-            # Replace markdown links
-            md_content = re.sub(r'\[(.*?)\]\((.*?\.md)\)', replace_md_links, md_content)
-            
-            # Use our simple fallback conversion
-            html_content = simple_markdown_to_html(md_content)
-        except Exception as e:
-            html_content = f"<pre>{md_content}</pre>"
-    
-    return render_template(
-        'docs.html',
-        doc_name=doc_name,
-        doc_files=DOC_FILES,
-        content=html_content
-    ) 
\ No newline at end of file
+        page = render_template(
+            'docs.html',
+            doc_name=doc_name,
+            doc_files=DOC_FILES,
+            content=html_content
+        )
+        etag = '"' + hashlib.sha1(page.encode('utf-8')).hexdigest() + '"'
+        with _cache_lock:
+            if len(_page_cache) >= PAGE_CACHE_SIZE:
+                _page_cache.clear()
+            _page_cache[page_key] = (stamp, page, etag)
+    
+    headers = {'ETag': etag, 'Cache-Control': 'no-cache'}
+    mtimes = [part[0] for part in stamp if part]
+    if mtimes:
+        headers['Last-Modified'] = http_date(max(mtimes) / 1e9)
+    if etag in [tag.strip() for tag in request.headers.get('If-None-Match', '').split(',')]:
+        return Response(status=304, headers=headers)
+    return Response(page, headers=headers, mimetype='text/html')
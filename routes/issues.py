@@ -1,51 +1,32 @@
 from flask import Blueprint, request, jsonify, current_app
-import os
-import json
-import time
-from datetime import datetime
+from modules.issue_store import issue_store, IssueStatus, ISSUE_STATUSES, ISSUE_PAGE_SIZE
 
 bp = Blueprint('issues', __name__, url_prefix='/api/issues')
 
-# Define the storage path for issues
-ISSUES_FILE = 'data/issues.json'
-
-# Ensure the data directory exists
-os.makedirs(os.path.dirname(ISSUES_FILE), exist_ok=True)
-
-# Issue status enum
-class IssueStatus:
-    PENDING = 'pending'
-    SUBMITTED = 'submitted'
-    FAILED = 'failed'
-
-def load_issues():
-    """Load issues from the issues file"""
+@bp.route('/', methods=['GET'])
+def get_issues():
+    """Get a page of issues, optionally only those with one status"""
     try:
-        if os.path.exists(ISSUES_FILE):
-            with open(ISSUES_FILE, 'r') as f:
-                issues = json.load(f)
-                return issues
-        return []
+        status = request.args.get('status')
+        if status and status not in ISSUE_STATUSES:
+            return jsonify({"error": f"Invalid status: {status}"}), 400
+        try:
+            page = int(request.args.get('page', 1))
+            limit = int(request.args.get('limit', ISSUE_PAGE_SIZE))
+        except ValueError:
+            return jsonify({"error": "page and limit must be numbers"}), 400
+        
+        issues, total = issue_store.list(status=status, page=page, limit=limit)
+        return jsonify({
+            "issues": issues,
+            "total": total,
+            "page": max(page, 1),
+            "limit": limit,
+            "counts": issue_store.counts()
+        })
     except Exception as e:
         current_app.logger.error(f"Error loading issues: {str(e)}")
-        return []
-
-def save_issues(issues):
-    """Save issues to the issues file"""
-    try:
-        os.makedirs(os.path.dirname(ISSUES_FILE), exist_ok=True)
-        with open(ISSUES_FILE, 'w') as f:
-            json.dump(issues, f, indent=2)
-        return True
-    except Exception as e:
-        current_app.logger.error(f"Error saving issues: {str(e)}")
-        return False
-
-@bp.route('/', methods=['GET'])
-def get_issues():
-    """Get all issues"""
-    issues = load_issues()
-    return jsonify(issues)
+        return jsonify({"error": str(e)}), 500
 
 @bp.route('/', methods=['POST'])
 def create_issue():
@@ -57,56 +38,50 @@ def create_issue():
         if not data or not data.get('title') or not data.get('description'):
             return jsonify({"error": "Missing required fields"}), 400
         
-        issues = load_issues()
-        
-        # Create new issue
-        new_issue = {
-            'id': str(int(time.time() * 1000)),  # Unique ID based on timestamp
-            'title': data.get('title'),
-            'description': data.get('description'),
-            'type': data.get('type', 'bug'),
-            'timestamp': datetime.now().isoformat(),
-            'status': IssueStatus.PENDING,
-            'retries': 0
-        }
+        status = data.get('status', IssueStatus.PENDING)
+        if status not in ISSUE_STATUSES:
+            return jsonify({"error": f"Invalid status: {status}"}), 400
         
-        issues.append(new_issue)
-        
-        if save_issues(issues):
-            return jsonify(new_issue), 201
-        else:
-            return jsonify({"error": "Failed to save issue"}), 500
-            
+        # client_id makes a retried create return the issue it already made
+        issue, created = issue_store.create(
+            data.get('title'),
+            data.get('description'),
+            data.get('type', 'bug'),
+            status,
+            client_id=data.get('client_id')
+        )
+        return jsonify(issue), 201 if created else 200
+    
     except Exception as e:
         current_app.logger.error(f"Error creating issue: {str(e)}")
         return jsonify({"error": str(e)}), 500
 
+@bp.route('/<issue_id>', methods=['GET'])
+def get_issue(issue_id):
+    """Get one issue"""
+    issue = issue_store.get(issue_id)
+    if not issue:
+        return jsonify({"error": "Issue not found"}), 404
+    return jsonify(issue)
+
 @bp.route('/<issue_id>', methods=['PUT'])
 def update_issue(issue_id):
     """Update an issue's status"""
     try:
-        data = request.json
-        issues = load_issues()
+        data = request.json or {}
         
-        # Find the issue
-        issue = next((i for i in issues if i['id'] == issue_id), None)
+        status = data.get('status')
+        if status is not None and status not in ISSUE_STATUSES:
+            return jsonify({"error": f"Invalid status: {status}"}), 400
+        retries = data.get('retries')
+        if retries is not None and (not isinstance(retries, int) or retries < 0):
+            return jsonify({"error": "retries must be a non-negative integer"}), 400
         
+        issue = issue_store.update(issue_id, status=status, retries=retries)
         if not issue:
             return jsonify({"error": "Issue not found"}), 404
-            
-        # Update issue status
-        if 'status' in data:
-            issue['status'] = data['status']
-        
-        # Update other fields if provided
-        if 'retries' in data:
-            issue['retries'] = data['retries']
-        
-        if save_issues(issues):
-            return jsonify(issue)
-        else:
-            return jsonify({"error": "Failed to save issue"}), 500
-            
+        return jsonify(issue)
+    
     except Exception as e:
         current_app.logger.error(f"Error updating issue: {str(e)}")
         return jsonify({"error": str(e)}), 500
@@ -115,19 +90,10 @@ def update_issue(issue_id):
 def delete_issue(issue_id):
     """Delete an issue"""
     try:
-        issues = load_issues()
-        
-        # Remove the issue
-        new_issues = [i for i in issues if i['id'] != issue_id]
-        
-        if len(new_issues) == len(issues):
+        if not issue_store.delete(issue_id):
             return jsonify({"error": "Issue not found"}), 404
-            
-        if save_issues(new_issues):
-            return jsonify({"success": True, "message": "Issue deleted"})
-        else:
-            return jsonify({"error": "Failed to save issues"}), 500
-            
+        return jsonify({"success": True, "message": "Issue deleted"})
+    
     except Exception as e:
         current_app.logger.error(f"Error deleting issue: {str(e)}")
-        return jsonify({"error": str(e)}), 500 
\ No newline at end of file
+        return jsonify({"error": str(e)}), 500
@@ -1,8 +1,12 @@
 from flask import Blueprint, render_template, jsonify, request
+from flask_socketio import emit
 import os
 import json
-import re
+import threading
 from datetime import datetime
+from modules.logging import (log_segments, is_log_archive, add_log_entry, add_log_listener,
+                             read_tail, format_tail_cursor, parse_tail_cursor)
+from modules.log_index import log_index, is_json_log
 
 bp = Blueprint('logs', __name__, url_prefix='/logs')
 
@@ -21,11 +25,16 @@ def list_logs():
         return jsonify({"error": "Logs directory not found"}), 404
     
     log_files = []
-    for filename in os.listdir(LOGS_DIR):
+    filenames = os.listdir(LOGS_DIR)
+    for filename in filenames:
         file_path = os.path.join(LOGS_DIR, filename)
+        # Rotated segments are shown as part of the log they came from
+        if is_log_archive(filename, filenames):
+            continue
         if os.path.isfile(file_path):
             try:
-                file_size = os.path.getsize(file_path)
+                segments = log_segments(file_path)
+                file_size = sum(os.path.getsize(segment) for segment in segments)
                 size_str = f"{file_size/1024:.1f} KB" if file_size < 1024*1024 else f"{file_size/(1024*1024):.1f} MB"
                 
                 # Get modification time
@@ -33,14 +42,7 @@ def list_logs():
                 mod_time = datetime.fromtimestamp(mtime).strftime('%Y-%m-%d %H:%M:%S')
                 
                 # Count number of error lines
-                error_count = 0
-                try:
-                    with open(file_path, 'r') as f:
-                        for line in f:
-                            if 'error' in line.lower() or '[error]' in line.lower():
-                                error_count += 1
-                except:
-                    pass
+                error_count = log_index.summary(file_path)['error_mentions']
                 
                 log_files.append({
                     "name": filename,
@@ -48,7 +50,8 @@ def list_logs():
                     "raw_size": file_size,
                     "modified": mod_time,
                     "modified_timestamp": mtime,
-                    "error_count": error_count
+                    "error_count": error_count,
+                    "segments": len(segments)
                 })
             except Exception as e:
                 continue
@@ -81,193 +84,126 @@ def view_log(filename):
     # Cap the limit to prevent loading too much at once
     limit = min(limit, 1000)
     
-    # Handle different log formats
-    if filename.endswith('.json') or filename == 'app_log.txt':
-        # JSON format logs
-        try:
-            entries = []
-            line_count = 0
-            error_count = 0
-            warning_count = 0
-            
-            with open(file_path, 'r') as f:
-                for line in f:
-                    line_count += 1
-                    if line.strip():
-                        try:
-                            entry = json.loads(line)
-                            
-                            # Check level for counting
-                            level = entry.get('level', '').lower()
-                            if level == 'error':
-                                error_count += 1
-                            elif level == 'warning':
-                                warning_count += 1
-                                
-                            # Apply level filtering
-                            if filter_level != 'all':
-                                if filter_level == 'error' and level != 'error':
-                                    continue
-                                if filter_level == 'warning' and level not in ['error', 'warning']:
-                                    continue
-                            
-                            # Apply search term filtering
-                            if search_term and not (
-                                search_term.lower() in entry.get('message', '').lower() or
-                                search_term.lower() in entry.get('level', '').lower()
-                            ):
-                                continue
-                            
-                            entries.append(entry)
-                        except:
-                            # Handle non-JSON lines
-                            entry = {"timestamp": "", "message": line.strip(), "level": "UNKNOWN"}
-                            entries.append(entry)
-            
-            # Sort entries
-            if sort_by == 'timestamp':
-                # Try to parse timestamps for sorting
-                def get_timestamp(entry):
-                    ts = entry.get('timestamp', '')
-                    try:
-                        return datetime.strptime(ts, '%Y-%m-%d %H:%M:%S.%f')
-                    except:
-                        try:
-                            return datetime.strptime(ts, '%Y-%m-%d %H:%M:%S')
-                        except:
-                            return datetime.min
-                
-                entries.sort(key=get_timestamp, reverse=(sort_order == 'desc'))
-            elif sort_by == 'level':
-                # Custom sort order for log levels
-                def get_level_priority(entry):
-                    level = entry.get('level', '').lower()
-                    if level == 'error':
-                        return 0
-                    elif level == 'warning':
-                        return 1
-                    elif level == 'info':
-                        return 2
-                    elif level == 'debug':
-                        return 3
-                    else:
-                        return 4
-                
-                entries.sort(key=get_level_priority, reverse=(sort_order == 'asc'))
-            
-            # Handle pagination after filtering and sorting
-            filtered_count = len(entries)
-            start = (page - 1) * limit
-            end = start + limit
-            
-            return jsonify({
-                "entries": entries[start:end],
-                "total": line_count,
-                "filtered_count": filtered_count,
-                "error_count": error_count,
-                "warning_count": warning_count,
-                "page": page,
-                "limit": limit,
-                "format": "json"
-            })
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500
+    json_format = is_json_log(filename)
+    try:
+        rows, filtered_count = log_index.query(
+            file_path, page=page, limit=limit, sort_by=sort_by, sort_order=sort_order,
+            filter_level=filter_level, search_term=search_term)
+        summary = log_index.summary(file_path)
+    except Exception as e:
+        return jsonify({"error": str(e)}), 500
+    
+    response = {
+        "total": summary['total'],
+        "filtered_count": filtered_count,
+        "error_count": summary['error_count'],
+        "warning_count": summary['warning_count'],
+        "page": page,
+        "limit": limit,
+        "format": "json" if json_format else "text"
+    }
+    
+    if json_format:
+        entries = []
+        for timestamp, sort_ts, level, raw in rows:
+            if level == 'UNKNOWN':
+                # Handle non-JSON lines
+                entries.append({"timestamp": "", "message": raw.strip(), "level": "UNKNOWN"})
+            else:
+                entries.append(json.loads(raw))
+        response["entries"] = entries
     else:
-        # Text format logs
-        try:
-            lines = []
-            line_count = 0
-            error_count = 0
-            warning_count = 0
-            
-            with open(file_path, 'r') as f:
-                for line in f:
-                    line_count += 1
-                    line_text = line.strip()
-                    
-                    # Try to extract timestamp and level using common log patterns
-                    timestamp_match = re.search(r'\[([\d\-\s:\.]+)\]', line)
-                    level_match = re.search(r'\[(INFO|ERROR|WARNING|DEBUG)\]', line, re.IGNORECASE)
-                    
-                    timestamp = timestamp_match.group(1) if timestamp_match else ""
-                    level = level_match.group(1).upper() if level_match else "INFO"
-                    
-                    # Count errors and warnings
-                    if level == "ERROR" or "error" in line_text.lower():
-                        error_count += 1
-                        level = "ERROR"  # Ensure consistency
-                    elif level == "WARNING" or "warning" in line_text.lower():
-                        warning_count += 1
-                        level = "WARNING"  # Ensure consistency
-                    
-                    # Apply level filtering
-                    if filter_level != 'all':
-                        if filter_level == 'error' and level != 'ERROR':
-                            continue
-                        if filter_level == 'warning' and level not in ['ERROR', 'WARNING']:
-                            continue
-                    
-                    # Apply search term filtering
-                    if search_term and search_term.lower() not in line_text.lower():
-                        continue
-                    
-                    # Extract additional timestamp for sorting
-                    try:
-                        if timestamp:
-                            dt = datetime.strptime(timestamp, '%Y-%m-%d %H:%M:%S.%f')
-                        else:
-                            # Try to find a timestamp in the text
-                            date_match = re.search(r'(\d{4}-\d{2}-\d{2}\s\d{2}:\d{2}:\d{2})', line_text)
-                            if date_match:
-                                dt = datetime.strptime(date_match.group(1), '%Y-%m-%d %H:%M:%S')
-                            else:
-                                dt = None
-                    except:
-                        dt = None
-                    
-                    entry = {
-                        "line": line_text,
-                        "timestamp": timestamp,
-                        "level": level,
-                        "dt": dt
-                    }
-                    lines.append(entry)
-            
-            # Sort entries
-            if sort_by == 'timestamp' and any(entry["dt"] for entry in lines):
-                lines.sort(key=lambda x: x["dt"] if x["dt"] else datetime.min, reverse=(sort_order == 'desc'))
-            elif sort_by == 'level':
-                # Custom sort order for log levels
-                def get_level_priority(entry):
-                    level = entry.get('level', '').upper()
-                    if level == 'ERROR':
-                        return 0
-                    elif level == 'WARNING':
-                        return 1
-                    elif level == 'INFO':
-                        return 2
-                    elif level == 'DEBUG':
-                        return 3
-                    else:
-                        return 4
-                
-                lines.sort(key=get_level_priority, reverse=(sort_order == 'asc'))
-            
-            # Handle pagination after filtering and sorting
-            filtered_count = len(lines)
-            start = (page - 1) * limit
-            end = start + limit
-            paginated_lines = lines[start:end]
-            
-            return jsonify({
-                "lines": paginated_lines,
-                "total": line_count,
-                "filtered_count": filtered_count,
-                "error_count": error_count, 
-                "warning_count": warning_count,
-                "page": page,
-                "limit": limit,
-                "format": "text"
-            })
-        except Exception as e:
-            return jsonify({"error": str(e)}), 500 
\ No newline at end of file
+        response["lines"] = [{
+            "line": raw.strip(),
+            "timestamp": timestamp,
+            "level": level,
+            "dt": sort_ts or None
+        } for timestamp, sort_ts, level, raw in rows]
+    
+    return jsonify(response)
+
+# WebSocket events for the live log tail
+from app import socketio
+
+# Tail subscribers: session id -> {filters, seq of the last entry sent, lock}
+tail_subscribers = {}
+
+def tail_entry_matches(entry, filters):
+    """Apply a subscriber's level, substring and source module filters"""
+    level = entry['level']
+    if filters['level'] == 'error' and level != 'ERROR':
+        return False
+    if filters['level'] == 'warning' and level not in ['ERROR', 'WARNING']:
+        return False
+    if filters['search'] and filters['search'] not in entry['message'].lower():
+        return False
+    if filters['modules']:
+        source = entry['source']
+        if not any(source == module or source.startswith(module + '.') or source.endswith('.' + module)
+                   for module in filters['modules']):
+            return False
+    return True
+
+def send_tail(sid, subscriber, reset=False):
+    """Push entries the subscriber has not seen yet and advance its cursor"""
+    with subscriber['lock']:
+        entries, missed = read_tail(subscriber['seq'])
+        if not entries and not reset:
+            return
+        if entries:
+            subscriber['seq'] = entries[-1]['seq']
+        matching = [entry for entry in entries if tail_entry_matches(entry, subscriber['filters'])]
+        # Skip batches the filters emptied, the cursor is still advanced server-side
+        if not matching and not missed and not reset:
+            return
+        socketio.emit('log_entries', {
+            'entries': matching,
+            'cursor': format_tail_cursor(subscriber['seq']),
+            'missed': missed,
+            'reset': reset
+        }, namespace='/logs', to=sid)
+
+def dispatch_tail():
+    """Writer thread hook: forward newly written entries to every subscriber"""
+    for sid, subscriber in list(tail_subscribers.items()):
+        send_tail(sid, subscriber)
+
+add_log_listener(dispatch_tail)
+
+@socketio.on('subscribe', namespace='/logs')
+def logs_subscribe(data=None):
+    """Start or update a live tail subscription
+
+    Accepts level ('all', 'warning' or 'error'), search (substring),
+    modules (list or comma-separated source modules such as 'tftp' or
+    'routes.serial') and cursor (from a previous log_entries event). With a
+    valid cursor only newer entries are sent; otherwise the in-memory tail is
+    replayed.
+    """
+    try:
+        data = data or {}
+        modules = data.get('modules') or []
+        if isinstance(modules, str):
+            modules = modules.split(',')
+        filters = {
+            'level': data.get('level', 'all'),
+            'search': (data.get('search') or '').lower(),
+            'modules': [module.strip() for module in modules if module.strip()]
+        }
+        seq, valid = parse_tail_cursor(data.get('cursor'))
+        subscriber = {'filters': filters, 'seq': seq, 'lock': threading.Lock()}
+        tail_subscribers[request.sid] = subscriber
+        send_tail(request.sid, subscriber, reset=not valid)
+    except Exception as e:
+        add_log_entry(f"Error in log tail subscribe: {str(e)}", is_error=True)
+        emit('error', {'message': str(e)})
+
+@socketio.on('unsubscribe', namespace='/logs')
+def logs_unsubscribe(data=None):
+    """Stop pushing entries to this client"""
+    tail_subscribers.pop(request.sid, None)
+
+@socketio.on('disconnect', namespace='/logs')
+def logs_disconnect():
+    """Drop the subscription of a disconnected client"""
+    tail_subscribers.pop(request.sid, None)
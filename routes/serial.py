@@ -10,14 +10,14 @@ try:
         get_serial_devices, connect_serial_device, disconnect_serial_device,
         send_serial_command, send_serial_break, send_serial_raw_data, get_serial_output, get_connected_serial_devices,
         disconnect_all_serial_devices, get_common_baudrates,
-        test_serial_device_connection, serial_manager
+        test_serial_device_connection, set_serial_raw_mode, serial_manager
     )
 except ImportError as e:
     print(f"Error importing serial communication module: {e}")
     # Fallback functions for when module is not available
     def get_serial_devices():
         return []
-    def connect_serial_device(device_path, baudrate=9600):
+    def connect_serial_device(device_path, baudrate=9600, raw=False):
         return False, "Serial module not available"
     def disconnect_serial_device(device_path):
         return False, "Serial module not available"
@@ -37,12 +37,23 @@ except ImportError as e:
         return [9600, 115200]
     def test_serial_device_connection(device_path, baudrate=9600):
         return False, "Serial module not available"
+    def set_serial_raw_mode(device_path, enabled):
+        return False, "Serial module not available"
     
     class DummySerialManager:
         def __init__(self):
             pass
     serial_manager = DummySerialManager()
 
+from modules.serial_transfer import serial_transfers, MODEM_PROTOCOLS, TransferError
+from modules.serial_registry import serial_registry
+
+try:
+    from modules.serial_autobaud import detect_baudrates, AUTOBAUD_TIMEOUT
+except ImportError:
+    detect_baudrates = None
+    AUTOBAUD_TIMEOUT = 10.0
+
 try:
     from modules.logging import add_log_entry
 except ImportError:
@@ -151,6 +162,8 @@ def connect_device():
         data = request.get_json()
         device_path = data.get('device_path')
         baudrate = data.get('baudrate', 9600)
+        # Raw mode keeps the exact bytes (binary protocols) instead of decoded lines
+        raw = bool(data.get('raw', False))
         
         if not device_path:
             return jsonify({
@@ -158,7 +171,7 @@ def connect_device():
                 'error': 'Device path is required'
             }), 400
         
-        success, message = connect_serial_device(device_path, baudrate)
+        success, message = connect_serial_device(device_path, baudrate, raw)
         
         if success:
             # Start output broadcasting if not already started
@@ -177,6 +190,33 @@ def connect_device():
             'error': str(e)
         }), 500
 
+@bp.route('/raw_mode', methods=['POST'])
+def raw_mode():
+    """Switch a connected device between raw byte and line mode"""
+    try:
+        data = request.get_json()
+        device_path = data.get('device_path')
+        
+        if not device_path:
+            return jsonify({
+                'success': False,
+                'error': 'Device path is required'
+            }), 400
+        
+        success, message = set_serial_raw_mode(device_path, bool(data.get('raw', True)))
+        
+        return jsonify({
+            'success': success,
+            'message': message
+        })
+        
+    except Exception as e:
+        add_log_entry(f"Error changing serial mode: {str(e)}", is_error=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @bp.route('/disconnect', methods=['POST'])
 def disconnect_device():
     """Disconnect from a serial device"""
@@ -294,6 +334,64 @@ def test_device():
             'error': str(e)
         }), 500
 
+@bp.route('/autobaud', methods=['POST'])
+def autobaud():
+    """Detect the baud rate of one or more devices, probing all of them at once"""
+    try:
+        if detect_baudrates is None:
+            return jsonify({
+                'success': False,
+                'error': 'Serial module not available'
+            }), 500
+        
+        data = request.get_json() or {}
+        device_paths = data.get('device_paths') or ([data['device_path']] if data.get('device_path') else [])
+        if not device_paths:
+            return jsonify({
+                'success': False,
+                'error': 'Device path is required'
+            }), 400
+        
+        candidates = data.get('candidates')
+        if candidates is not None and (not isinstance(candidates, list)
+                                       or not all(isinstance(rate, int) and rate > 0 for rate in candidates)):
+            return jsonify({
+                'success': False,
+                'error': 'candidates must be a list of baud rates'
+            }), 400
+        timeout = min(float(data.get('timeout', AUTOBAUD_TIMEOUT)), AUTOBAUD_TIMEOUT)
+        
+        # An open connection owns its port; probing it would change its baud rate under it
+        connected = {device['path'] for device in get_connected_serial_devices()}
+        results = {path: {
+            'device': path,
+            'baudrate': None,
+            'score': 0.0,
+            'candidates': [],
+            'error': 'Device is connected; disconnect it first',
+            'elapsed': 0.0
+        } for path in device_paths if path in connected}
+        probe_paths = [path for path in device_paths if path not in connected]
+        if probe_paths:
+            results.update(detect_baudrates(probe_paths, candidates, bool(data.get('probe', True)), timeout))
+        
+        return jsonify({
+            'success': True,
+            'results': [results[path] for path in dict.fromkeys(device_paths)]
+        })
+        
+    except (TypeError, ValueError) as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except Exception as e:
+        add_log_entry(f"Error detecting serial baud rate: {str(e)}", is_error=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
 @bp.route('/connected_devices', methods=['GET'])
 def get_connected():
     """Get list of currently connected devices"""
@@ -375,15 +473,107 @@ def download_output(device_path):
             'error': str(e)
         }), 500
 
+@bp.route('/transfer', methods=['POST'])
+def start_transfer():
+    """Send a file from the transfer directory to a connected device with XMODEM or YMODEM"""
+    try:
+        data = request.get_json() or {}
+        device_path = data.get('device_path')
+        filename = data.get('filename')
+        protocol = data.get('protocol', 'xmodem1k')
+        
+        if not device_path or not filename:
+            return jsonify({
+                'success': False,
+                'error': 'Device path and file name are required'
+            }), 400
+        if protocol not in MODEM_PROTOCOLS:
+            return jsonify({
+                'success': False,
+                'error': f"Protocol must be one of: {', '.join(MODEM_PROTOCOLS)}"
+            }), 400
+        
+        device = serial_manager.get_device(device_path) if hasattr(serial_manager, 'get_device') else None
+        if device is None:
+            return jsonify({
+                'success': False,
+                'error': 'Device not connected'
+            }), 400
+        
+        transfer = serial_transfers.start(device, filename, protocol)
+        return jsonify({
+            'success': True,
+            'transfer': transfer.to_dict()
+        })
+        
+    except ValueError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+    except TransferError as e:
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 409
+    except Exception as e:
+        add_log_entry(f"Error starting serial file transfer: {str(e)}", is_error=True)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 500
+
+@bp.route('/transfers', methods=['GET'])
+def list_transfers():
+    """List running and recent serial file transfers"""
+    return jsonify({
+        'success': True,
+        'transfers': serial_transfers.list()
+    })
+
+@bp.route('/transfers/<transfer_id>/cancel', methods=['POST'])
+def cancel_transfer(transfer_id):
+    """Cancel a running serial file transfer"""
+    if serial_transfers.get(transfer_id) is None:
+        return jsonify({
+            'success': False,
+            'error': 'Transfer not found'
+        }), 404
+    if not serial_transfers.cancel(transfer_id):
+        return jsonify({
+            'success': False,
+            'error': 'Transfer is not running'
+        }), 409
+    return jsonify({
+        'success': True,
+        'message': 'Cancelling transfer'
+    })
+
 # WebSocket Events
 from app import socketio
 
+def emit_transfer_update(transfer):
+    """Transfer manager hook: broadcast file transfer state and progress to the /serial namespace"""
+    socketio.emit('serial_transfer', transfer, namespace='/serial')
+
+serial_transfers.add_listener(emit_transfer_update)
+
+def emit_device_event(event, device):
+    """Registry hook: push serial devices being plugged in or removed to the /serial namespace"""
+    device['connected'] = event != 'removed' and serial_manager.get_device(device['path']) is not None
+    socketio.emit('serial_device', {'event': event, 'device': device}, namespace='/serial')
+
+# Not started here: with preload_app the import runs in the gunicorn master,
+# and the watcher is started per worker by the first listing or /serial client
+serial_registry.add_listener(emit_device_event)
+
 @socketio.on('connect', namespace='/serial')
 def serial_connect():
     """Handle client connection to serial namespace"""
     try:
         add_log_entry("Client connected to serial interface")
         emit('connection_status', {'connected': True})
+        serial_registry.start()
         
         # Send current device list
         devices = get_serial_devices()
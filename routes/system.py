@@ -1,12 +1,17 @@
 from flask import Blueprint, jsonify, request, render_template
+from flask_socketio import emit
 import subprocess
 import platform
 import os
 import re
+from modules.serial_registry import serial_registry
 
 # Import modules with try-except to catch import errors
 try:
-    from modules.system import get_usb_info, get_service_status, restart_service, test_serial_device, get_service_details
+    from modules.system import (
+        get_usb_info, get_service_status, restart_service, test_serial_device, get_service_details,
+        query_services, service_entry, ServiceStateWatcher
+    )
 except ImportError as e:
     print(f"Error importing system module: {e}")
     # Fallback functions
@@ -50,6 +55,11 @@ except ImportError as e:
     
     def restart_service(service):
         return False, f"Unable to restart {service}, service module not available"
+    
+    def query_services(service_names, timeout=5):
+        return {}
+    
+    ServiceStateWatcher = None
 
 try:
     from modules.network import get_interfaces, get_listening_ports, check_internet_connectivity
@@ -364,64 +374,18 @@ def get_serial_devices():
     """Get information about connected serial devices"""
     serial_devices = []
     
-    # Define the run_command helper if it's not already defined in this scope
-    def run_command(cmd, default=""):
-        try:
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                capture_output=True, 
-                text=True, 
-                timeout=2  # 2 second timeout
-            )
-            if result.returncode == 0:
-                return result.stdout.strip()
-            return default
-        except (subprocess.SubprocessError, subprocess.TimeoutExpired) as e:
-            print(f"Command failed: {cmd} - {str(e)}")
-            return default
-    
     try:
-        # Check /dev for serial devices
-        output = run_command("ls -l /dev/tty*")
-        if output:
-            # Look for common serial devices
-            for line in output.splitlines():
-                if any(device in line for device in ["ttyUSB", "ttyACM", "ttyS", "ttyAMA"]):
-                    parts = line.split()
-                    if len(parts) >= 10:
-                        device_path = parts[-1]  # Last part is the device path
-                        
-                        # Get additional device info if available
-                        device_info = run_command(f"udevadm info --name={device_path} --attribute-walk | grep -i 'manufacturer\\|product\\|serial'")
-                        
-                        manufacturer = "Unknown"
-                        product = "Serial Device"
-                        serial = "Unknown"
-                        
-                        # Parse the udevadm output
-                        if device_info:
-                            for info_line in device_info.splitlines():
-                                if "manufacturer" in info_line.lower():
-                                    manufacturer_match = info_line.split("==")
-                                    if len(manufacturer_match) > 1:
-                                        manufacturer = manufacturer_match[1].strip().strip('"')
-                                elif "product" in info_line.lower():
-                                    product_match = info_line.split("==")
-                                    if len(product_match) > 1:
-                                        product = product_match[1].strip().strip('"')
-                                elif "serial" in info_line.lower():
-                                    serial_match = info_line.split("==")
-                                    if len(serial_match) > 1:
-                                        serial = serial_match[1].strip().strip('"')
-                        
-                        # Add device to the list
-                        serial_devices.append({
-                            "path": device_path,
-                            "manufacturer": manufacturer,
-                            "product": product,
-                            "serial": serial
-                        })
+        # The hotplug registry keeps this current, so the dashboard poll is a dictionary read
+        for device in serial_registry.list_devices():
+            # Device nodes only; /dev/serial links name the same devices again
+            if device['path'] != device['target']:
+                continue
+            serial_devices.append({
+                "path": device['path'],
+                "manufacturer": device['manufacturer'],
+                "product": device['product'] if device['product'] != 'Unknown' else "Serial Device",
+                "serial": device['serial_number']
+            })
     except Exception as e:
         print(f"Error detecting serial devices: {str(e)}")
         # Add a placeholder in case of error
@@ -441,28 +405,19 @@ def get_serial_devices():
             "serial": "N/A"
         }]
     
-    print(f"Detected serial devices: {serial_devices}")  # Debug log
     return serial_devices
 
 def get_available_services():
     """Improved function to detect available services on Raspberry Pi"""
-    # Helper function to safely run commands
-    def run_command(cmd, default=""):
-        try:
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                capture_output=True, 
-                text=True, 
-                timeout=2
-            )
-            if result.returncode == 0:
-                return result.stdout.strip()
-            return default
-        except Exception as e:
-            print(f"Command failed: {cmd} - {str(e)}")
-            return default
+    return [service['name'] for service in get_service_status()]
 
+def get_service_status():
+    """Get the status of system services
+    
+    Uses two systemctl calls in total no matter how many services are listed:
+    one to list the active units and one batched `systemctl show` for every
+    candidate, which returns state, enablement, PID and memory together.
+    """
     # List of potential services commonly found on Raspberry Pi
     potential_services = [
         # System services
@@ -495,69 +450,38 @@ def get_available_services():
         'node-red'
     ]
     
-    available_services = []
+    candidates = []
     
     # First, try to get a list of active services
-    active_services = run_command("systemctl list-units --type=service --state=active,running | grep '\.service' | awk '{print $1}'")
-    if active_services:
-        for line in active_services.splitlines():
-            service_name = line.replace('.service', '')
-            if service_name and service_name not in available_services:
-                available_services.append(service_name)
+    try:
+        result = subprocess.run(
+            "systemctl list-units --type=service --state=active,running --no-legend --plain",
+            shell=True,
+            capture_output=True,
+            text=True,
+            timeout=2
+        )
+        for line in result.stdout.splitlines():
+            parts = line.split()
+            if parts and parts[0].endswith('.service'):
+                candidates.append(parts[0][:-len('.service')])
+    except Exception as e:
+        print(f"Command failed: systemctl list-units - {str(e)}")
     
     # Then check specific services of interest that might not be active
-    for service in potential_services:
-        if service not in available_services:
-            # Check if the service exists in systemd
-            exists = run_command(f"systemctl list-unit-files {service}.service 2>/dev/null | grep {service}.service")
-            if exists:
-                available_services.append(service)
+    candidates.extend(service for service in potential_services if service not in candidates)
     
-    # Ensure we have at least one service
-    if not available_services:
-        print("No services detected, adding system as a fallback")
-        available_services.append('system')
-    
-    return available_services
-
-def get_service_status():
-    """Get the status of system services"""
     services = []
-    available_services = get_available_services()
+    for service_name, props in query_services(candidates).items():
+        if props.get('LoadState') != 'loaded':
+            continue
+        services.append(service_entry(service_name, props))
     
-    # Helper function to safely run commands
-    def run_command(cmd, default=""):
-        try:
-            result = subprocess.run(
-                cmd, 
-                shell=True, 
-                capture_output=True, 
-                text=True, 
-                timeout=2
-            )
-            return result.stdout.strip(), result.returncode
-        except Exception as e:
-            print(f"Command failed: {cmd} - {str(e)}")
-            return default, -1
+    # Ensure we have at least one service
+    if not services:
+        print("No services detected, adding system as a fallback")
+        services.append({'name': 'system', 'status': 'unknown', 'details': 'Service details unavailable'})
     
-    for service_name in available_services:
-        try:
-            # Get service status
-            status_output, status_code = run_command(f"systemctl is-active {service_name}")
-            status = status_output if status_output else "unknown"
-            
-            # Get service details
-            details_output, _ = run_command(f"systemctl status {service_name} | head -3")
-            details = details_output if details_output else f"Service: {service_name}"
-            
-            services.append({
-                'name': service_name,
-                'status': status,
-                'details': details
-            })
-        except Exception as e:
-            print(f"Error getting status for {service_name}: {str(e)}")
-            
     # Sort services by status (active first) then by name
     services.sort(key=lambda x: (x['status'] != 'active', x['name']))
     
@@ -624,7 +548,7 @@ def get_updates():
         'interfaces': get_interfaces(),
         'services': get_service_status(),
         'serial_devices': get_serial_devices(),
-        'logs': log_entries
+        'logs': list(log_entries)
     })
 
 @bp.route("/get_interface_details/<iface>", methods=["GET"])
@@ -770,4 +694,36 @@ def test_serial():
     except Exception as e:
         error_msg = f"Error testing serial device: {str(e)}"
         add_log_entry(error_msg, is_error=True)
-        return jsonify({"success": False, "message": error_msg}), 500 
\ No newline at end of file
+        return jsonify({"success": False, "message": error_msg}), 500 
+# WebSocket events for live service state updates
+from app import socketio
+
+# Watcher pushing systemd unit state changes to dashboard clients
+service_watcher = None
+
+def emit_service_changes(services):
+    """Broadcast changed services to all dashboard clients"""
+    socketio.emit('service_update', {'services': services}, namespace='/services')
+
+def start_service_watcher(services):
+    """Start watching the given services for state changes"""
+    global service_watcher
+    
+    if ServiceStateWatcher is None:
+        return
+    
+    if service_watcher is None:
+        service_watcher = ServiceStateWatcher(emit_service_changes)
+    service_watcher.watch(service['name'] for service in services)
+    service_watcher.start()
+
+@socketio.on('connect', namespace='/services')
+def services_connect():
+    """Send the current service list and subscribe the client to changes"""
+    try:
+        services = get_service_status()
+        emit('service_list', {'services': services})
+        start_service_watcher(services)
+    except Exception as e:
+        add_log_entry(f"Error in services connect: {str(e)}", is_error=True)
+        emit('error', {'message': str(e)})
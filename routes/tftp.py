@@ -1,4 +1,4 @@
-from flask import Blueprint, render_template, request, jsonify, send_file, abort
+from flask import Blueprint, render_template, request, jsonify, abort
 import os
 import subprocess
 import json
@@ -6,6 +6,11 @@ import traceback
 import time
 import sys
 from modules.logging import add_log_entry
+from modules.file_download import send_file_ranged
+from modules.dir_listing import directory_cache
+from modules.text_viewer import text_viewer
+from modules.chunked_upload import ChunkedUploadStore, UploadError, UPLOAD_STAGING_DIR
+from modules.content_store import ContentStore, STORE_DIR
 import re
 
 bp = Blueprint('tftp', __name__, url_prefix='/tftp')
@@ -16,21 +21,50 @@ TRANSFER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__fi
 if not os.path.exists(TRANSFER_DIR):
     os.makedirs(TRANSFER_DIR)
 
+# Identical files are stored once and hardlinked into every folder that holds them
+content_store = ContentStore(TRANSFER_DIR)
+
+# Resumable chunked uploads, staged inside TRANSFER_DIR so the final rename is atomic
+upload_store = ChunkedUploadStore(TRANSFER_DIR, content_store=content_store)
+
 @bp.route('/')
 def index():
     """Render the TFTP interface."""
     add_log_entry(f"TFTP interface accessed")
     return render_template('tftp.html')
 
+def listing_args():
+    """Sort, filter and pagination query parameters shared by the listing routes"""
+    return {
+        "sort_by": request.args.get('sort_by', 'name'),
+        "sort_order": request.args.get('sort_order', 'asc'),
+        "filter_text": request.args.get('filter', ''),
+        "entry_type": request.args.get('type'),
+        "page": request.args.get('page', 1, type=int),
+        "limit": request.args.get('limit', type=int),
+        "hidden": (UPLOAD_STAGING_DIR, STORE_DIR)
+    }
+
+def with_hashes(entries):
+    """Add sha256 from the content index; unknown files are hashed in the background"""
+    hashes = content_store.lookup(entries)
+    return [{**entry, "sha256": hashes.get(entry['inode'])} for entry in entries]
+
+def queue_missing_hashes(target_dir, entries):
+    for entry in entries:
+        if entry['type'] == 'file' and entry['sha256'] is None:
+            content_store.queue_hash(os.path.join(target_dir, entry['name']))
+
 @bp.route('/list', methods=['GET'])
 def list_files():
-    """List files in the transfer directory or specified subdirectory."""
+    """List files in the transfer directory or specified subdirectory.
+
+    Supports sort_by (name, size, mtime, type), sort_order, filter (substring
+    or glob), type (file or directory), page and limit.
+    """
     subdir = request.args.get('dir', '')
     target_dir = os.path.join(TRANSFER_DIR, subdir.lstrip('/'))
     
-    add_log_entry(f"TFTP file list requested for subdirectory: '{subdir}'")
-    add_log_entry(f"Full target path: {target_dir}")
-    
     # Ensure the requested path is within TRANSFER_DIR or is a parent of TRANSFER_DIR
     abs_target = os.path.abspath(target_dir)
     abs_transfer = os.path.abspath(TRANSFER_DIR)
@@ -40,21 +74,15 @@ def list_files():
         add_log_entry(f"Security error: Attempted directory traversal to {target_dir}", is_error=True)
         return jsonify({"error": "Invalid directory path"}), 403
     
-    if not os.path.exists(target_dir):
+    if not os.path.isdir(target_dir):
         add_log_entry(f"Directory not found: {target_dir}", is_error=True)
         return jsonify({"error": "Directory not found"}), 404
     
     try:
-        # Always ensure TFTP directory has the right permissions
-        try:
-            # Ensure the directory has correct permissions
-            if subdir == '':  # Only for the root TFTP directory
-                # Set 777 permissions for the transfer directory
-                os.chmod(TRANSFER_DIR, 0o777)
-                add_log_entry(f"Set permissions for TFTP root directory: {TRANSFER_DIR}")
-        except Exception as e:
-            add_log_entry(f"Warning: Failed to set permissions on TFTP directory: {str(e)}", is_error=True)
-        
+        args = listing_args()
+        entries, total = directory_cache.list(target_dir, **args)
+        entries = with_hashes(entries)
+        queue_missing_hashes(target_dir, entries)
         files = []
         
         # Add parent directory if we're in a subdirectory
@@ -67,24 +95,14 @@ def list_files():
                 "size": 0
             })
         
-        for item in os.listdir(target_dir):
-            if item == "." or item == "..":
-                continue  # Skip . and .. entries
-                
-            item_path = os.path.join(target_dir, item)
-            item_type = "directory" if os.path.isdir(item_path) else "file"
-            item_size = os.path.getsize(item_path) if os.path.isfile(item_path) else 0
-            item_rel_path = os.path.join(subdir, item).lstrip('/')
-            
+        for entry in entries:
             files.append({
-                "name": item,
-                "path": item_rel_path,
-                "type": item_type,
-                "size": item_size
+                **entry,
+                "path": os.path.join(subdir, entry['name']).lstrip('/')
             })
         
-        add_log_entry(f"Found {len(files)} files/directories in {target_dir}")
-        return jsonify({"files": files, "current_dir": subdir})
+        return jsonify({"files": files, "current_dir": subdir, "total": total,
+                        "page": args['page'], "limit": args['limit']})
     except Exception as e:
         error_trace = traceback.format_exc()
         add_log_entry(f"Error listing files in {target_dir}: {str(e)}\n{error_trace}", is_error=True)
@@ -110,7 +128,8 @@ def download_file():
     
     try:
         add_log_entry(f"Sending file: {full_path}, size: {os.path.getsize(full_path)} bytes")
-        return send_file(full_path, as_attachment=True)
+        # Range requests let interrupted downloads resume
+        return send_file_ranged(full_path)
     except Exception as e:
         error_trace = traceback.format_exc()
         add_log_entry(f"Error downloading file {full_path}: {str(e)}\n{error_trace}", is_error=True)
@@ -160,10 +179,11 @@ def upload_file():
             except Exception as e:
                 add_log_entry(f"Warning: Could not set directory permissions: {str(e)}", is_error=True)
         
-        # Save the file
+        # Save the file, hashing it as it is written so duplicates share storage
         file_path = os.path.join(upload_dir, uploaded_file.filename)
         add_log_entry(f"Saving file to: {file_path}")
-        uploaded_file.save(file_path)
+        sha256, deduplicated = content_store.save_stream(uploaded_file.stream, file_path,
+                                                         os.path.join(TRANSFER_DIR, UPLOAD_STAGING_DIR))
         
         # Make sure file has the correct permissions for TFTP access
         try:
@@ -185,6 +205,8 @@ def upload_file():
                 "filename": uploaded_file.filename,
                 "size": file_size,
                 "path": os.path.join(target_dir, uploaded_file.filename),
+                "sha256": sha256,
+                "deduplicated": deduplicated,
                 "upload_time": elapsed_time
             })
         else:
@@ -196,6 +218,86 @@ def upload_file():
         add_log_entry(f"Error uploading file: {str(e)}\n{error_trace}", is_error=True)
         return jsonify({"error": f"Error uploading file: {str(e)}"}), 500
 
+@bp.route('/uploads', methods=['POST'])
+def create_upload():
+    """Start or resume a chunked upload.
+
+    Expects JSON {filename, dir, size, sha256 (optional)}. Returns the upload
+    id, the fixed chunk size and the chunks already stored, so a client that
+    lost its connection only sends what is missing. If sha256 names content
+    that is already stored, the file is linked into place straight away and
+    the response has complete and deduplicated set.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        upload = upload_store.create(data.get('filename'), data.get('dir', ''), data.get('size'), data.get('sha256'))
+        return jsonify({"success": True, **upload})
+    except UploadError as e:
+        add_log_entry(f"Chunked upload rejected: {str(e)}", is_error=True)
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error starting chunked upload: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Error starting upload: {str(e)}"}), 500
+
+@bp.route('/uploads/<upload_id>', methods=['GET'])
+def upload_status(upload_id):
+    """Get the offset and stored chunks of a chunked upload."""
+    try:
+        return jsonify(upload_store.status(upload_id))
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+@bp.route('/uploads/<upload_id>/chunks/<int:index>', methods=['PUT'])
+def upload_chunk(upload_id, index):
+    """Store one chunk from the raw request body.
+
+    Sending a chunk again is harmless. An optional X-Chunk-SHA256 header is
+    checked against the received bytes.
+    """
+    try:
+        progress = upload_store.write_chunk(upload_id, index, request.stream, request.content_length,
+                                            request.headers.get('X-Chunk-SHA256'))
+        return jsonify({"success": True, **progress})
+    except UploadError as e:
+        add_log_entry(f"Chunk {index} of upload {upload_id} rejected: {str(e)}", is_error=True)
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error storing chunk {index} of upload {upload_id}: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Error storing chunk: {str(e)}"}), 500
+
+@bp.route('/uploads/<upload_id>/complete', methods=['POST'])
+def complete_upload(upload_id):
+    """Verify a chunked upload's hash and move it into place."""
+    data = request.get_json(silent=True) or {}
+    try:
+        result = upload_store.complete(upload_id, data.get('sha256'))
+        return jsonify({"success": True, **result})
+    except UploadError as e:
+        add_log_entry(f"Completing upload {upload_id} failed: {str(e)}", is_error=True)
+        return jsonify({"error": str(e)}), e.status
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error completing upload {upload_id}: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Error completing upload: {str(e)}"}), 500
+
+@bp.route('/uploads/<upload_id>', methods=['DELETE'])
+def abort_upload(upload_id):
+    """Discard an unfinished chunked upload."""
+    try:
+        upload_store.abort(upload_id)
+        add_log_entry(f"Chunked upload {upload_id} aborted")
+        return jsonify({"success": True})
+    except UploadError as e:
+        return jsonify({"error": str(e)}), e.status
+
+@bp.route('/objects/<sha256>', methods=['GET'])
+def get_object(sha256):
+    """Check whether content with this SHA-256 is already stored."""
+    size = content_store.has(sha256.lower())
+    return jsonify({"sha256": sha256.lower(), "exists": size is not None, "size": size})
+
 @bp.route('/create_dir', methods=['POST'])
 def create_directory():
     """Create a new directory."""
@@ -278,6 +380,8 @@ def delete_item():
             os.remove(full_path)
             add_log_entry(f"File deleted: {full_path}")
         
+        # Drop stored content that no folder links to any more
+        content_store.collect_garbage()
         return jsonify({"success": True})
     except Exception as e:
         error_trace = traceback.format_exc()
@@ -293,17 +397,29 @@ def status():
         from modules.tftp import TFTPManager
         manager = TFTPManager(TRANSFER_DIR)
         
-        # Check if the server is running
-        add_log_entry(f"Checking TFTP server status")
-        is_active = manager.get_server_status()
-        add_log_entry(f"TFTP server is {'active' if is_active else 'inactive'}")
+        # The built-in server and tftpd-hpa are alternatives; report either
+        embedded = manager.get_embedded_status()
+        is_active = embedded or manager.get_server_status()
+        add_log_entry(f"TFTP server is {'active' if is_active else 'inactive'}{' (embedded)' if embedded else ''}")
         
-        return jsonify({"running": is_active})
+        return jsonify({"running": is_active, "embedded": embedded})
     except Exception as e:
         error_trace = traceback.format_exc()
         add_log_entry(f"Failed to get TFTP server status: {str(e)}\n{error_trace}", is_error=True)
         return jsonify({"error": f"Failed to get TFTP server status: {str(e)}"}), 500
 
+@bp.route('/transfers', methods=['GET'])
+def transfers():
+    """Get active and recent transfers of the embedded TFTP server."""
+    try:
+        # Polled by the UI, so skip TFTPManager and its logging
+        from modules.tftp_server import get_embedded_server
+        return jsonify(get_embedded_server(TRANSFER_DIR).get_stats())
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Failed to get TFTP transfer stats: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Failed to get TFTP transfer stats: {str(e)}"}), 500
+
 @bp.route('/start', methods=['POST'])
 def start_server():
     """Start the TFTP server."""
@@ -328,7 +444,19 @@ def start_server():
         from modules.tftp import TFTPManager
         manager = TFTPManager(TRANSFER_DIR)
         
-        # Start the TFTP server
+        # Start the built-in server if requested, otherwise tftpd-hpa
+        data = request.get_json(silent=True) or {}
+        if data.get('mode') == 'embedded':
+            port = int(data.get('port', 69))
+            add_log_entry(f"Calling manager.start_embedded_server on port {port}")
+            if manager.start_embedded_server(port=port):
+                elapsed_time = time.time() - start_time
+                add_log_entry(f"Embedded TFTP server started successfully in {elapsed_time:.2f}s")
+                return jsonify({"success": True, "status": "running", "embedded": True})
+            error_msg = f"Failed to start embedded TFTP server on port {port} (is tftpd-hpa running?)"
+            add_log_entry(error_msg, is_error=True)
+            return jsonify({"error": error_msg}), 500
+        
         add_log_entry(f"Calling manager.start_server")
         if manager.start_server():
             elapsed_time = time.time() - start_time
@@ -353,6 +481,12 @@ def stop_server():
         from modules.tftp import TFTPManager
         manager = TFTPManager(TRANSFER_DIR)
         
+        # Stop the built-in server if that is what is running
+        if manager.get_embedded_status():
+            add_log_entry(f"Calling manager.stop_embedded_server")
+            manager.stop_embedded_server()
+            return jsonify({"success": True, "status": "stopped"})
+        
         # Stop the TFTP server
         add_log_entry(f"Calling manager.stop_server")
         if manager.stop_server():
@@ -396,28 +530,21 @@ def tftp_download():
         os.makedirs(target_path)
     
     try:
-        # Use TFTPManager to download the file
-        add_log_entry(f"Initializing TFTPManager for download")
+        # Transfers run as background jobs; progress is pushed on the /tftp namespace
         from modules.tftp import TFTPManager
         manager = TFTPManager(TRANSFER_DIR)
+        job = manager.queue_download(server, filename, target_dir)
         
-        add_log_entry(f"Starting TFTP download from {server} of file {filename}")
-        if manager.download_file(server, filename, target_dir):
+        # Callers that need the old blocking behaviour can ask to wait
+        if data.get('wait'):
+            job = tftp_jobs.wait(job['id'])
             elapsed_time = time.time() - start_time
+            if job['state'] != 'complete':
+                add_log_entry(f"TFTP download failed: {job['error']}", is_error=True)
+                return jsonify({"error": f"TFTP download failed: {job['error']}", "job": job}), 500
             add_log_entry(f"TFTP download successful, time: {elapsed_time:.2f}s")
-            
-            # Verify the file was downloaded
-            expected_file = os.path.join(target_path, filename)
-            if os.path.exists(expected_file):
-                file_size = os.path.getsize(expected_file)
-                add_log_entry(f"Downloaded file exists: {expected_file}, size: {file_size} bytes")
-            else:
-                add_log_entry(f"Warning: Download reported success but file not found at {expected_file}", is_error=True)
-            
-            return jsonify({"success": True})
-        else:
-            add_log_entry(f"TFTP download failed (manager returned False)", is_error=True)
-            return jsonify({"error": "TFTP download failed"}), 500
+        
+        return jsonify({"success": True, "job": job}), 200 if data.get('wait') else 202
     except Exception as e:
         error_trace = traceback.format_exc()
         add_log_entry(f"TFTP download error: {str(e)}\n{error_trace}", is_error=True)
@@ -451,26 +578,59 @@ def tftp_upload():
     add_log_entry(f"Source file exists, size: {file_size} bytes")
     
     try:
-        # Use TFTPManager to upload the file
-        add_log_entry(f"Initializing TFTPManager for upload")
+        # Transfers run as background jobs; progress is pushed on the /tftp namespace
         from modules.tftp import TFTPManager
         manager = TFTPManager(TRANSFER_DIR)
+        job = manager.queue_upload(server, filename, source_dir)
         
-        add_log_entry(f"Starting TFTP upload to {server} of file {filename}")
-        if manager.upload_file(server, filename, source_dir):
+        # Callers that need the old blocking behaviour can ask to wait
+        if data.get('wait'):
+            job = tftp_jobs.wait(job['id'])
             elapsed_time = time.time() - start_time
+            if job['state'] != 'complete':
+                add_log_entry(f"TFTP upload failed: {job['error']}", is_error=True)
+                return jsonify({"error": f"TFTP upload failed: {job['error']}", "job": job}), 500
             add_log_entry(f"TFTP upload successful, time: {elapsed_time:.2f}s")
-            return jsonify({"success": True})
-        else:
-            add_log_entry(f"TFTP upload failed (manager returned False)", is_error=True)
-            return jsonify({"error": "TFTP upload failed"}), 500
+        
+        return jsonify({"success": True, "job": job}), 200 if data.get('wait') else 202
     except Exception as e:
         error_trace = traceback.format_exc()
         add_log_entry(f"TFTP upload error: {str(e)}\n{error_trace}", is_error=True)
-        if 'current_dir' in locals():
-            os.chdir(current_dir)
         return jsonify({"error": f"TFTP upload error: {str(e)}"}), 500
 
+@bp.route('/jobs', methods=['GET'])
+def list_jobs():
+    """List queued, running and recently finished remote TFTP jobs."""
+    return jsonify({"jobs": tftp_jobs.list()})
+
+@bp.route('/jobs/<job_id>', methods=['GET'])
+def get_job(job_id):
+    """Get the state and progress of one remote TFTP job."""
+    job = tftp_jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Job not found"}), 404
+    return jsonify({"job": job.to_dict()})
+
+@bp.route('/jobs/<job_id>/cancel', methods=['POST'])
+def cancel_job(job_id):
+    """Cancel a queued or running remote TFTP job."""
+    if tftp_jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    if not tftp_jobs.cancel(job_id):
+        return jsonify({"error": "Job has already finished"}), 409
+    add_log_entry(f"TFTP job {job_id} cancel requested")
+    return jsonify({"success": True})
+
+@bp.route('/jobs/<job_id>/retry', methods=['POST'])
+def retry_job(job_id):
+    """Queue a failed or cancelled remote TFTP job again."""
+    if tftp_jobs.get(job_id) is None:
+        return jsonify({"error": "Job not found"}), 404
+    job = tftp_jobs.retry(job_id)
+    if job is None:
+        return jsonify({"error": "Only failed or cancelled jobs can be retried"}), 409
+    return jsonify({"success": True, "job": job.to_dict()}), 202
+
 @bp.route('/debug_logs', methods=['GET'])
 def debug_logs():
     """View the most recent debug logs to troubleshoot TFTP issues."""
@@ -513,13 +673,19 @@ def get_current_path():
 
 @bp.route('/files', methods=['GET'])
 def get_files():
-    """List files in a directory for file browser."""
+    """List files in a directory for file browser.
+
+    Takes the same sort, filter and pagination parameters as /list.
+    """
     path = request.args.get('path', '/')
-    add_log_entry(f"File listing requested for path: {path}")
     
     # Convert web path to actual file system path
     target_dir = os.path.join(TRANSFER_DIR, path.lstrip('/'))
-    add_log_entry(f"Target directory: {target_dir}")
+    
+    # Ensure the requested path is within TRANSFER_DIR
+    if not os.path.abspath(target_dir).startswith(os.path.abspath(TRANSFER_DIR)):
+        add_log_entry(f"Security error: Attempted directory traversal to {target_dir}", is_error=True)
+        return jsonify({"error": "Invalid directory path"}), 403
     
     try:
         # Ensure the directory exists
@@ -527,6 +693,10 @@ def get_files():
             add_log_entry(f"Creating directory: {target_dir}")
             os.makedirs(target_dir)
         
+        args = listing_args()
+        entries, total = directory_cache.list(target_dir, **args)
+        entries = with_hashes(entries)
+        queue_missing_hashes(target_dir, entries)
         files = []
         
         # Add parent directory entry if not at root
@@ -542,28 +712,20 @@ def get_files():
                 "size": 0
             })
         
-        # List files in directory
-        for item in os.listdir(target_dir):
-            item_path = os.path.join(target_dir, item)
-            item_type = "directory" if os.path.isdir(item_path) else "file"
-            item_size = os.path.getsize(item_path) if item_type == "file" else 0
-            
+        for entry in entries:
             # Create relative path for the item
-            rel_path = os.path.join(path, item)
+            rel_path = os.path.join(path, entry['name'])
             if rel_path.startswith('//'):
                 rel_path = rel_path[1:]
                 
-            files.append({
-                "name": item,
-                "path": rel_path,
-                "type": item_type,
-                "size": item_size
-            })
+            files.append({**entry, "path": rel_path})
             
-        add_log_entry(f"Found {len(files)} items in {target_dir}")
         return jsonify({
             "files": files,
-            "current_dir": path
+            "current_dir": path,
+            "total": total,
+            "page": args['page'],
+            "limit": args['limit']
         })
     except Exception as e:
         error_trace = traceback.format_exc()
@@ -638,7 +800,7 @@ def view_file():
         file_size = os.path.getsize(full_path)
         if file_size > 5 * 1024 * 1024:  # 5MB limit
             add_log_entry(f"File too large for viewing: {full_path}, size: {file_size} bytes", is_error=True)
-            return jsonify({"error": "File too large for viewing"}), 400
+            return jsonify({"error": "File too large for viewing, use /tftp/view/lines"}), 400
         
         # Read file content
         with open(full_path, 'r', errors='replace') as f:
@@ -652,4 +814,96 @@ def view_file():
     except Exception as e:
         error_trace = traceback.format_exc()
         add_log_entry(f"Error viewing file {full_path}: {str(e)}\n{error_trace}", is_error=True)
-        return jsonify({"error": f"Error viewing file: {str(e)}"}), 500 
\ No newline at end of file
+        return jsonify({"error": f"Error viewing file: {str(e)}"}), 500 
+
+def viewable_path(file_path):
+    """Resolve a viewer path inside TRANSFER_DIR; returns (full_path, error_response)"""
+    full_path = os.path.join(TRANSFER_DIR, file_path.lstrip('/'))
+    if not os.path.abspath(full_path).startswith(os.path.abspath(TRANSFER_DIR)):
+        add_log_entry(f"Security error: Attempted file access outside TRANSFER_DIR: {full_path}", is_error=True)
+        return None, (jsonify({"error": "Invalid file path"}), 403)
+    if not os.path.isfile(full_path):
+        return None, (jsonify({"error": "File not found"}), 404)
+    return full_path, None
+
+@bp.route('/view/lines', methods=['GET'])
+def view_lines():
+    """Return a window of lines from a text file of any size.
+
+    Takes path, start (1-based line number) and count. total_lines is null
+    until the file has been indexed to the end.
+    """
+    full_path, error = viewable_path(request.args.get('path', ''))
+    if error:
+        return error
+    try:
+        return jsonify(text_viewer.read_lines(full_path, request.args.get('start', 1, type=int),
+                                              request.args.get('count', 200, type=int)))
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error reading lines from {full_path}: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Error viewing file: {str(e)}"}), 500
+
+@bp.route('/view/bytes', methods=['GET'])
+def view_bytes():
+    """Return a byte window (offset, length) of a file as text."""
+    full_path, error = viewable_path(request.args.get('path', ''))
+    if error:
+        return error
+    try:
+        return jsonify(text_viewer.read_bytes(full_path, request.args.get('offset', 0, type=int),
+                                              request.args.get('length', 65536, type=int)))
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error reading bytes from {full_path}: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Error viewing file: {str(e)}"}), 500
+
+@bp.route('/view/grep', methods=['GET'])
+def view_grep():
+    """Search a file server-side.
+
+    Takes path, q, regex (0/1), case (1 for case-sensitive), max, and offset
+    plus line from a previous response's next_offset/next_line to continue.
+    """
+    full_path, error = viewable_path(request.args.get('path', ''))
+    if error:
+        return error
+    query = request.args.get('q', '')
+    if not query:
+        return jsonify({"error": "Search pattern is required"}), 400
+    try:
+        return jsonify(text_viewer.grep(
+            full_path, query,
+            regex=request.args.get('regex', '0') == '1',
+            ignore_case=request.args.get('case', '0') != '1',
+            offset=request.args.get('offset', 0, type=int),
+            line=request.args.get('line', 1, type=int),
+            max_matches=request.args.get('max', 200, type=int)))
+    except re.error as e:
+        return jsonify({"error": f"Invalid regular expression: {str(e)}"}), 400
+    except Exception as e:
+        error_trace = traceback.format_exc()
+        add_log_entry(f"Error searching {full_path}: {str(e)}\n{error_trace}", is_error=True)
+        return jsonify({"error": f"Error searching file: {str(e)}"}), 500
+
+# WebSocket events for remote TFTP job progress
+from app import socketio
+from modules.tftp_jobs import tftp_jobs
+
+def emit_job_update(job):
+    """Job queue hook: broadcast state changes and progress to the /tftp namespace"""
+    socketio.emit('tftp_job', job, namespace='/tftp')
+
+tftp_jobs.add_listener(emit_job_update)
+
+@socketio.on('connect', namespace='/tftp')
+def tftp_connect():
+    """Send the current job list so a reconnecting page can catch up"""
+    socketio.emit('tftp_jobs', {'jobs': tftp_jobs.list()}, namespace='/tftp', to=request.sid)
+
+def emit_upload_progress(progress):
+    """Upload store hook: report every stored chunk to the /tftp namespace"""
+    socketio.emit('upload_progress', {key: value for key, value in progress.items() if key != 'received'},
+                  namespace='/tftp')
+
+upload_store.add_listener(emit_upload_progress)
@@ -0,0 +1,92 @@
+#!/usr/bin/env python3
+"""
+Logging Micro-benchmark
+Measures add_log_entry calls per second for the original synchronous
+implementation (open/append/close of both log files on every call) and
+the current queued writer.
+
+Usage:
+    python3 scripts/bench_logging.py --calls 20000
+
+Log files are written to a temporary directory; console output is discarded.
+"""
+
+import argparse
+import datetime
+import json
+import os
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import logging as app_logging
+
+def legacy_add_log_entry(message, log_file, debug_log_file, entries, is_error=False):
+    """The synchronous add_log_entry this module used to ship, kept for comparison"""
+    timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    log_level = "ERROR" if is_error else "INFO"
+    log_entry = {
+        "timestamp": timestamp,
+        "level": log_level,
+        "message": message,
+        "type": "error" if is_error else "info"
+    }
+    entries.insert(0, log_entry)
+    while len(entries) > 50:
+        entries.pop()
+    frame = sys._getframe(1)
+    caller_info = f"[{os.path.basename(frame.f_code.co_filename)}:{frame.f_code.co_name}:{frame.f_lineno}]"
+    print(f"[{timestamp}] {log_level} {caller_info} {message}")
+    with open(log_file, "a") as f:
+        f.write(json.dumps(log_entry) + "\n")
+    with open(debug_log_file, "a") as f:
+        f.write(f"[{timestamp}] {log_level} {caller_info} {message}\n")
+    return log_entry
+
+def run(calls, log_call):
+    start = time.perf_counter()
+    for i in range(calls):
+        log_call(f"Benchmark message {i}")
+    return time.perf_counter() - start
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark add_log_entry throughput')
+    parser.add_argument('--calls', '-n', type=int, default=20000, help='Log calls per run (default: 20000)')
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        real_stdout = sys.stdout
+        sys.stdout = open(os.devnull, 'w')
+        try:
+            # Before: synchronous file appends on every call
+            entries = []
+            legacy_log = os.path.join(tmp_dir, "legacy_app_log.txt")
+            legacy_debug = os.path.join(tmp_dir, "legacy_debug_log.txt")
+            legacy_time = run(args.calls, lambda msg: legacy_add_log_entry(msg, legacy_log, legacy_debug, entries))
+
+            # After: queued writer with long-lived buffered handles
+            app_logging.LOG_FILE = os.path.join(tmp_dir, "app_log.txt")
+            app_logging.DEBUG_LOG_FILE = os.path.join(tmp_dir, "debug_log.txt")
+            app_logging.LOG_OVERFLOW_POLICY = 'block'  # Measure without dropping records
+            start = time.perf_counter()
+            queued_time = run(args.calls, app_logging.add_log_entry)
+            app_logging.flush_logs(timeout=60)
+            drained_time = time.perf_counter() - start
+        finally:
+            sys.stdout.close()
+            sys.stdout = real_stdout
+
+        with open(app_logging.LOG_FILE) as f:
+            written = sum(1 for _ in f)
+
+    print(f"Calls per run:            {args.calls}")
+    print(f"Synchronous (before):     {args.calls / legacy_time:,.0f} calls/s")
+    print(f"Queued writer (after):    {args.calls / queued_time:,.0f} calls/s")
+    print(f"  including disk drain:   {args.calls / drained_time:,.0f} calls/s")
+    print(f"Records written by queue: {written}")
+
+if __name__ == '__main__':
+    main()
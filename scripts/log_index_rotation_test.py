@@ -0,0 +1,121 @@
+#!/usr/bin/env python3
+"""
+Log Index Rotation Test
+Rotates a log file in a temporary directory while the SQLite log index
+syncs at the awkward moments, and checks that every line stays indexed
+exactly once and that every indexed segment still exists on disk.
+
+Covers a sync between the rename and the compression (while the partial
+gzip is being written), a sync after the archive is in place but before
+the uncompressed copy is removed, and more than nine rotations in the same
+second, whose archives must still list in the order they were made.
+
+Usage:
+    python3 scripts/log_index_rotation_test.py [--lines 2000]
+"""
+
+import argparse
+import os
+import shutil
+import sys
+import tempfile
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import logging as app_logging
+from modules.log_index import LogIndex
+
+class Hook:
+    """Stands in for a module in modules.logging, running a callback at one of its calls"""
+
+    def __init__(self, module, name, callback):
+        self.module = module
+        self.name = name
+        self.callback = callback
+        self.fired = False
+
+    def __getattr__(self, attr):
+        if attr != self.name:
+            return getattr(self.module, attr)
+        original = getattr(self.module, attr)
+
+        def hooked(*args, **kwargs):
+            if not self.fired:
+                self.fired = True
+                self.callback()
+            return original(*args, **kwargs)
+        return hooked
+
+def append_lines(path, start, count):
+    with open(path, 'a') as f:
+        for number in range(start, start + count):
+            f.write(f"[2026-01-01 00:00:00] [INFO] line {number}\n")
+    return start + count
+
+def check(index, path, expected, name):
+    total = index.summary(path)['total']
+    with index.lock:
+        segments = [row[0] for row in index.conn.execute(
+            "SELECT DISTINCT segment FROM entries WHERE path = ?", (path,))]
+    missing = [segment for segment in segments if not os.path.exists(segment)]
+    ok = total == expected and not missing
+    detail = f"{total} of {expected} lines indexed" + (f", missing segments {missing}" if missing else "")
+    print(f"{name:<34} {'ok' if ok else 'FAILED':<7} {detail}")
+    return ok
+
+def rotate_with_hook(path, attr, callback):
+    """rotate_log_file with callback run at the first call of one os or time function"""
+    module = app_logging.os if attr == 'remove' else app_logging.time
+    hook = Hook(module, attr, callback)
+    setattr(app_logging, 'os' if attr == 'remove' else 'time', hook)
+    try:
+        app_logging.rotate_log_file(path)
+    finally:
+        setattr(app_logging, 'os' if attr == 'remove' else 'time', module)
+    return hook.fired
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the log index across log rotations')
+    parser.add_argument('--lines', type=int, default=2000, help='Lines written per segment (default: 2000)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='log-index-')
+    try:
+        index = LogIndex(os.path.join(root, '.index', 'logs.sqlite3'))
+        path = os.path.join(root, 'debug_log.txt')
+        results = []
+
+        # Some lines indexed, some still only on disk when rotation starts
+        written = append_lines(path, 0, args.lines)
+        index.sync(path)
+        written = append_lines(path, written, args.lines // 2)
+        fired = rotate_with_hook(path, 'sleep', lambda: index.sync(path))
+        written = append_lines(path, written, args.lines // 4)
+        results.append(fired and check(index, path, written, 'sync while compressing'))
+
+        written = append_lines(path, written, args.lines)
+        fired = rotate_with_hook(path, 'remove', lambda: index.sync(path))
+        written = append_lines(path, written, 10)
+        results.append(fired and check(index, path, written, 'sync before removing the copy'))
+
+        # Rotations within one second get -1, -2, ... -10 suffixes
+        burst = os.path.join(root, 'burst.txt')
+        for number in range(12):
+            append_lines(burst, number, 1)
+            app_logging.rotate_log_file(burst)
+        order = []
+        for segment in app_logging.log_segments(burst):
+            with app_logging.open_log_segment(segment) as f:
+                order.append(int(f.readline().split()[-1]))
+        ok = order == sorted(order) and len(order) == 12
+        print(f"{'same-second archive order':<34} {'ok' if ok else 'FAILED':<7} {order}")
+        results.append(ok)
+
+        print(f"\n{sum(results)} of {len(results)} cases passed")
+        sys.exit(0 if all(results) else 1)
+    finally:
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
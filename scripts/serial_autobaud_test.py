@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Serial Auto-baud Test
+Runs the auto-baud probe against a pseudo-terminal whose far end answers
+each probe with a login prompt, and checks that the tty still marks
+framing and parity errors (INPCK and PARMRK set) after every sample.
+
+pyserial rewrites the termios input flags whenever the rate or the read
+timeout changes, so a probe that adjusts the port while sampling would
+silently stop seeing framing errors and score garbage as clean text.
+
+Usage:
+    python3 scripts/serial_autobaud_test.py [--prompt "login: "]
+"""
+
+import argparse
+import os
+import pty
+import select
+import sys
+import termios
+import threading
+import time
+import tty
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.serial_autobaud import BaudProbe, AUTOBAUD_PROBE
+
+MARK_FLAGS = termios.INPCK | termios.PARMRK
+
+class CheckedProbe(BaudProbe):
+    """BaudProbe that records the tty input flags right after each sample"""
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.flags = []
+
+    def _sample(self, port, deadline):
+        data = super()._sample(port, deadline)
+        self.flags.append(termios.tcgetattr(port.fileno())[0] & MARK_FLAGS)
+        return data
+
+def answer_probes(master, prompt, stop):
+    """Far end of the pty: reply to every probe with the prompt"""
+    while not stop.is_set():
+        ready, _, _ = select.select([master], [], [], 0.1)
+        if not ready:
+            continue
+        try:
+            data = os.read(master, 1024)
+        except OSError:
+            return
+        if AUTOBAUD_PROBE in data:
+            os.write(master, prompt)
+
+def main():
+    parser = argparse.ArgumentParser(description='Check the auto-baud probe against a pseudo-terminal')
+    parser.add_argument('--prompt', default='login: ', help='Text the far end prints per probe (default: "login: ")')
+    args = parser.parse_args()
+
+    master, slave = pty.openpty()
+    tty.setraw(master)
+    path = os.ttyname(slave)
+    stop = threading.Event()
+    responder = threading.Thread(target=answer_probes, args=(master, args.prompt.encode(), stop), daemon=True)
+    responder.start()
+    results = []
+    try:
+        probe = CheckedProbe(path, candidates=[9600, 115200, 38400])
+        probe.run(time.monotonic() + 5)
+        result = probe.to_dict()
+
+        ok = result['error'] is None and result['baudrate'] == 9600
+        print(f"{'prompt detected':<30} {'ok' if ok else 'FAILED':<7} "
+              f"baudrate {result['baudrate']}, score {result['score']}, error {result['error']}")
+        results.append(ok)
+
+        ok = bool(probe.flags) and all(flags == MARK_FLAGS for flags in probe.flags)
+        print(f"{'error marking kept':<30} {'ok' if ok else 'FAILED':<7} "
+              f"{len(probe.flags)} samples, INPCK|PARMRK set after each: "
+              f"{[flags == MARK_FLAGS for flags in probe.flags]}")
+        results.append(ok)
+
+        # Several rates in a row, no prompt: marking must survive every rate change
+        stop.set()
+        responder.join()
+        quiet = CheckedProbe(path, candidates=[9600, 115200, 38400], sample_time=0.1)
+        quiet.run(time.monotonic() + 5)
+        ok = len(quiet.flags) == 3 and all(flags == MARK_FLAGS for flags in quiet.flags)
+        print(f"{'error marking across rates':<30} {'ok' if ok else 'FAILED':<7} "
+              f"{[flags == MARK_FLAGS for flags in quiet.flags]}")
+        results.append(ok)
+    finally:
+        stop.set()
+        os.close(slave)
+        os.close(master)
+
+    print(f"\n{sum(results)} of {len(results)} cases passed")
+    sys.exit(0 if all(results) else 1)
+
+if __name__ == '__main__':
+    main()
@@ -5,20 +5,33 @@ Allows external programs to connect to serial devices via TCP sockets.
 
 Usage:
     python3 serial_bridge.py --device /dev/ttyUSB0 --baudrate 9600 --port 9000
-    
+    python3 serial_bridge.py -d /dev/ttyUSB0 -d /dev/ttyACM0:9100 -p 9000
+
 This creates a TCP server on port 9000 that bridges to /dev/ttyUSB0.
-Multiple clients can connect and all will see the same serial data.
+Multiple clients can connect and all will see the same serial data. Bytes are
+forwarded exactly as read from the device, with no line splitting or
+decoding, so binary protocols pass through unchanged.
+
+Every --device gets its own TCP port: the one given as DEVICE:PORT, or
+--port plus the device's position on the command line. All devices and
+clients are served by one asyncio event loop. Output for each client is
+buffered separately, so a client that stops reading is dropped (or skipped,
+with --slow-client discard) instead of holding up the others.
+
+Clients that speak Telnet with the RFC 2217 COM port option, such as
+pyserial's serial_for_url('rfc2217://host:9000'), can change the baud
+rate, data bits, parity, stop bits and flow control of the device. Plain
+TCP clients are bridged byte for byte until they send a Telnet command.
 """
 
 import argparse
-import socket
-import threading
-import time
-import select
-import sys
+import asyncio
 import os
 import signal
-import json
+import socket
+import struct
+import sys
+import time
 from datetime import datetime
 
 # Add parent directory to path to import modules
@@ -26,308 +39,594 @@ sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 try:
     import serial
-    from modules.serial_comm import SerialDevice
     from modules.logging import add_log_entry
 except ImportError as e:
     print(f"Error importing required modules: {e}")
     print("Please ensure pyserial is installed: pip install pyserial")
     sys.exit(1)
 
+# Bridge settings
+SERIAL_READ_SIZE = 4096             # Most bytes read from the device per wakeup
+SERIAL_WRITE_LIMIT = 64 * 1024      # Client input queued for the device before clients are paused
+SERIAL_RECONNECT_INTERVAL = 2.0     # Seconds between attempts to reopen a device that went away
+CLIENT_BUFFER_LIMIT = 256 * 1024    # Output queued for one client before it counts as slow
+CLIENT_BUFFER_MAX = 1024 * 1024     # A slow client this far behind is dropped at once
+SLOW_CLIENT_GRACE = 5.0             # Seconds a client may stay slow before it is dropped
+CLIENT_SOCKET_SNDBUF = 64 * 1024    # Fixed kernel send buffer per client, so the backlog shows up above
+SLOW_CLIENT_POLICIES = ('disconnect', 'discard')
+
+# Telnet commands and options (RFC 854, 856, 857, 858)
+IAC, DONT, DO, WONT, WILL, SB, SE = 255, 254, 253, 252, 251, 250, 240
+BINARY, ECHO, SGA = 0, 1, 3
+COM_PORT_OPTION = 44
+SUPPORTED_OPTIONS = (BINARY, ECHO, SGA, COM_PORT_OPTION)
+
+# RFC 2217 client commands; the server answers with the command + 100
+SET_BAUDRATE, SET_DATASIZE, SET_PARITY, SET_STOPSIZE, SET_CONTROL = 1, 2, 3, 4, 5
+NOTIFY_LINESTATE, NOTIFY_MODEMSTATE, FLOWCONTROL_SUSPEND, FLOWCONTROL_RESUME = 6, 7, 8, 9
+SET_LINESTATE_MASK, SET_MODEMSTATE_MASK, PURGE_DATA = 10, 11, 12
+SERVER_OFFSET = 100
+
+PARITIES = {1: serial.PARITY_NONE, 2: serial.PARITY_ODD, 3: serial.PARITY_EVEN,
+            4: serial.PARITY_MARK, 5: serial.PARITY_SPACE}
+STOPBITS = {1: serial.STOPBITS_ONE, 2: serial.STOPBITS_TWO, 3: serial.STOPBITS_ONE_POINT_FIVE}
+
+# Telnet input parser states
+TS_DATA, TS_IAC, TS_OPTION, TS_SB, TS_SB_IAC = range(5)
+
+class _ClientProtocol(asyncio.Protocol):
+    """One TCP client of a bridged device"""
+
+    def __init__(self, bridge):
+        self.bridge = bridge
+        self.transport = None
+        self.address = None
+        self.connected_time = None
+        self.bytes_sent = 0
+        self.bytes_received = 0
+        self.bytes_dropped = 0
+        self.slow_since = None
+        self.closed = False
+        # Telnet state; a client is raw until it sends its first IAC
+        self.telnet = False
+        self.state = TS_DATA
+        self.command = None
+        self.subnegotiation = bytearray()
+        self.local_options = set()      # Options we agreed to perform (WILL)
+        self.remote_options = set()     # Options we agreed the client performs (DO)
+
+    def connection_made(self, transport):
+        self.transport = transport
+        self.address = transport.get_extra_info('peername')
+        self.connected_time = datetime.now()
+        if len(self.bridge.clients) >= self.bridge.max_clients:
+            print(f"Refusing client {self.address}: {self.bridge.max_clients} clients already connected")
+            transport.write(b"Too many clients connected to this serial bridge\r\n")
+            transport.close()
+            self.closed = True
+            return
+        # Without a fixed size the kernel grows the send buffer to megabytes and hides a stalled client
+        sock = transport.get_extra_info('socket')
+        if sock is not None:
+            sock.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, CLIENT_SOCKET_SNDBUF)
+        # pause_writing() is called once this much output is queued for the client
+        transport.set_write_buffer_limits(high=CLIENT_BUFFER_LIMIT, low=CLIENT_BUFFER_LIMIT // 4)
+        self.bridge.add_client(self)
+        if self.bridge.banner:
+            welcome_msg = f"Connected to serial bridge: {self.bridge.device_path} @ {self.bridge.baudrate} baud\r\n"
+            transport.write(welcome_msg.encode())
+
+    def connection_lost(self, exc):
+        self.closed = True
+        self.bridge.remove_client(self)
+
+    def pause_writing(self):
+        self.slow_since = time.monotonic()
+
+    def resume_writing(self):
+        self.slow_since = None
+
+    def send(self, data, escaped):
+        """Queue device output for this client, applying the slow client policy"""
+        if self.closed:
+            return
+        if self.slow_since is not None:
+            if self.bridge.slow_client == 'discard':
+                self.bytes_dropped += len(data)
+                return
+            if (self.transport.get_write_buffer_size() >= CLIENT_BUFFER_MAX
+                    or time.monotonic() - self.slow_since >= SLOW_CLIENT_GRACE):
+                print(f"Dropping slow client {self.address}: "
+                      f"{self.transport.get_write_buffer_size()} bytes not yet read")
+                self.bridge.stats['clients_dropped'] += 1
+                self.closed = True
+                # abort() discards the queued output instead of trying to deliver it
+                self.transport.abort()
+                return
+        self.transport.write(escaped if self.telnet else data)
+        self.bytes_sent += len(data)
+
+    def data_received(self, data):
+        if self.telnet or self.state != TS_DATA or IAC in data:
+            data = self._telnet_input(data)
+        if data:
+            self.bytes_received += len(data)
+            self.bridge.stats['bytes_received'] += len(data)
+            self.bridge.write_serial(data)
+
+    def _telnet_input(self, data):
+        """Strip Telnet commands from client input and act on them; returns the payload"""
+        self.telnet = True
+        payload = bytearray()
+        for byte in data:
+            state = self.state
+            if state == TS_DATA:
+                if byte == IAC:
+                    self.state = TS_IAC
+                else:
+                    payload.append(byte)
+            elif state == TS_IAC:
+                if byte == IAC:
+                    payload.append(IAC)
+                    self.state = TS_DATA
+                elif byte in (DO, DONT, WILL, WONT):
+                    self.command = byte
+                    self.state = TS_OPTION
+                elif byte == SB:
+                    self.subnegotiation.clear()
+                    self.state = TS_SB
+                else:
+                    # NOP, AYT, GA and the like carry no data
+                    self.state = TS_DATA
+            elif state == TS_OPTION:
+                self._negotiate(self.command, byte)
+                self.state = TS_DATA
+            elif state == TS_SB:
+                if byte == IAC:
+                    self.state = TS_SB_IAC
+                else:
+                    self.subnegotiation.append(byte)
+            elif state == TS_SB_IAC:
+                if byte == SE:
+                    self._subnegotiate(bytes(self.subnegotiation))
+                    self.state = TS_DATA
+                else:
+                    self.subnegotiation.append(byte)
+                    self.state = TS_SB
+        return bytes(payload)
+
+    def _negotiate(self, command, option):
+        """Answer DO/DONT/WILL/WONT, only when our side of the option changes (RFC 854 loop rule)"""
+        if command == WILL:
+            if option in SUPPORTED_OPTIONS:
+                if option not in self.remote_options:
+                    self.remote_options.add(option)
+                    self._send_command(DO, option)
+            else:
+                self._send_command(DONT, option)
+        elif command == WONT:
+            if option in self.remote_options:
+                self.remote_options.discard(option)
+                self._send_command(DONT, option)
+        elif command == DO:
+            if option in SUPPORTED_OPTIONS:
+                if option not in self.local_options:
+                    self.local_options.add(option)
+                    self._send_command(WILL, option)
+            else:
+                self._send_command(WONT, option)
+        elif command == DONT:
+            if option in self.local_options:
+                self.local_options.discard(option)
+                self._send_command(WONT, option)
+
+    def _send_command(self, command, option):
+        if not self.closed:
+            self.transport.write(bytes((IAC, command, option)))
+
+    def _subnegotiate(self, data):
+        if len(data) < 2 or data[0] != COM_PORT_OPTION:
+            return
+        command, value = data[1], data[2:]
+        reply = self.bridge.com_port_command(command, value)
+        if reply is not None and not self.closed:
+            # Values are IAC-escaped inside a subnegotiation like anywhere else
+            reply = reply.replace(b'\xff', b'\xff\xff')
+            self.transport.write(bytes((IAC, SB, COM_PORT_OPTION, command + SERVER_OFFSET)) + reply + bytes((IAC, SE)))
+
 class SerialBridge:
-    """TCP to Serial bridge server"""
-    
-    def __init__(self, device_path, baudrate=9600, tcp_port=9000, max_clients=10):
+    """TCP to Serial bridge server for one device, running on an asyncio event loop"""
+
+    def __init__(self, device_path, baudrate=9600, tcp_port=9000, max_clients=10,
+                 host='0.0.0.0', slow_client='disconnect', banner=True):
         self.device_path = device_path
         self.baudrate = baudrate
         self.tcp_port = tcp_port
         self.max_clients = max_clients
-        
-        self.serial_device = None
+        self.host = host
+        self.slow_client = slow_client
+        self.banner = banner
+
+        self.serial = None
+        self.fd = None
         self.tcp_server = None
         self.clients = []
         self.running = False
-        
-        # Threading
-        self.serial_thread = None
-        self.server_thread = None
-        self.client_threads = []
-        
+        self.loop = None
+
+        # Client input waiting for the device
+        self.serial_out = bytearray()
+        self.writing = False
+        self.input_paused = False
+        self.reconnect_handle = None
+
         # Statistics
         self.stats = {
             'start_time': None,
             'bytes_sent': 0,
             'bytes_received': 0,
             'clients_connected': 0,
-            'clients_total': 0
+            'clients_total': 0,
+            'clients_dropped': 0
         }
-    
-    def start(self):
+
+    async def start(self):
         """Start the bridge server"""
+        self.loop = asyncio.get_running_loop()
+        try:
+            self._open_serial()
+        except (serial.SerialException, OSError, ValueError) as e:
+            print(f"Failed to connect to serial device: {e}")
+            return False
+        print(f"Connected to serial device: {self.device_path} at {self.baudrate} baud")
+
         try:
-            # Connect to serial device
-            self.serial_device = SerialDevice(self.device_path, self.baudrate)
-            success, message = self.serial_device.connect()
-            
-            if not success:
-                print(f"Failed to connect to serial device: {message}")
-                return False
-            
-            print(f"Connected to serial device: {self.device_path} at {self.baudrate} baud")
-            
-            # Start TCP server
-            self.tcp_server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.tcp_server.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.tcp_server.bind(('0.0.0.0', self.tcp_port))
-            self.tcp_server.listen(self.max_clients)
-            
-            print(f"TCP server listening on port {self.tcp_port}")
-            print(f"Bridge: {self.device_path} <-> TCP:{self.tcp_port}")
-            print(f"External programs can connect to: telnet localhost {self.tcp_port}")
-            
-            self.running = True
-            self.stats['start_time'] = datetime.now()
-            
-            # Start threads
-            self.serial_thread = threading.Thread(target=self._serial_reader, daemon=True)
-            self.server_thread = threading.Thread(target=self._tcp_server, daemon=True)
-            
-            self.serial_thread.start()
-            self.server_thread.start()
-            
-            return True
-            
-        except Exception as e:
+            self.tcp_server = await self.loop.create_server(
+                lambda: _ClientProtocol(self), self.host, self.tcp_port, reuse_address=True)
+        except OSError as e:
             print(f"Error starting bridge: {e}")
+            self._close_serial()
             return False
-    
-    def stop(self):
+
+        print(f"TCP server listening on port {self.tcp_port}")
+        print(f"Bridge: {self.device_path} <-> TCP:{self.tcp_port}")
+        print(f"External programs can connect to: telnet localhost {self.tcp_port}")
+
+        self.running = True
+        self.stats['start_time'] = datetime.now()
+        return True
+
+    async def stop(self):
         """Stop the bridge server"""
-        print("Stopping serial bridge...")
+        print(f"Stopping serial bridge for {self.device_path}...")
         self.running = False
-        
-        # Close all client connections
-        for client in self.clients[:]:
-            self._disconnect_client(client)
-        
-        # Close TCP server
+        if self.reconnect_handle:
+            self.reconnect_handle.cancel()
+            self.reconnect_handle = None
+
+        # Close TCP server and all client connections
         if self.tcp_server:
             self.tcp_server.close()
-        
+        for client in self.clients[:]:
+            client.transport.close()
+        if self.tcp_server:
+            await self.tcp_server.wait_closed()
+
         # Disconnect serial device
-        if self.serial_device:
-            self.serial_device.disconnect()
-        
+        self._close_serial()
         print("Serial bridge stopped")
-    
-    def _tcp_server(self):
-        """TCP server thread - accepts new connections"""
-        while self.running:
+
+    def _open_serial(self):
+        # timeout=0 opens the port non-blocking; the event loop waits for it instead
+        self.serial = serial.Serial(
+            port=self.device_path,
+            baudrate=self.baudrate,
+            timeout=0,
+            bytesize=serial.EIGHTBITS,
+            parity=serial.PARITY_NONE,
+            stopbits=serial.STOPBITS_ONE,
+            xonxoff=False,
+            rtscts=False,
+            dsrdtr=False
+        )
+        self.fd = self.serial.fileno()
+        self.loop.add_reader(self.fd, self._serial_readable)
+        if self.serial_out:
+            self._start_writing()
+        add_log_entry(f"Serial bridge connected to {self.device_path} at {self.baudrate} baud")
+
+    def _close_serial(self):
+        if self.fd is not None:
+            self.loop.remove_reader(self.fd)
+            if self.writing:
+                self.loop.remove_writer(self.fd)
+                self.writing = False
+            self.fd = None
+        if self.serial:
             try:
-                # Use select to make accept non-blocking
-                ready, _, _ = select.select([self.tcp_server], [], [], 1.0)
-                
-                if ready:
-                    client_socket, address = self.tcp_server.accept()
-                    print(f"New client connected from {address}")
-                    
-                    # Create client info
-                    client = {
-                        'socket': client_socket,
-                        'address': address,
-                        'connected_time': datetime.now(),
-                        'bytes_sent': 0,
-                        'bytes_received': 0
-                    }
-                    
-                    self.clients.append(client)
-                    self.stats['clients_connected'] += 1
-                    self.stats['clients_total'] += 1
-                    
-                    # Send welcome message
-                    welcome_msg = f"Connected to serial bridge: {self.device_path} @ {self.baudrate} baud\r\n"
-                    self._send_to_client(client, welcome_msg.encode())
-                    
-                    # Start client handler thread
-                    client_thread = threading.Thread(
-                        target=self._client_handler, 
-                        args=(client,), 
-                        daemon=True
-                    )
-                    client_thread.start()
-                    self.client_threads.append(client_thread)
-                    
-            except Exception as e:
-                if self.running:
-                    print(f"Error in TCP server: {e}")
-                break
-    
-    def _client_handler(self, client):
-        """Handle individual client connection"""
-        client_socket = client['socket']
-        
+                self.serial.close()
+            except (serial.SerialException, OSError):
+                pass
+            self.serial = None
+
+    def _serial_lost(self, error):
+        """The device went away (unplugged, or the port closed); keep trying to reopen it"""
+        message = f"Serial device {self.device_path} disconnected" + (f": {error}" if error else "")
+        print(message)
+        add_log_entry(message, is_error=True)
+        self._close_serial()
+        self.reconnect_handle = self.loop.call_later(SERIAL_RECONNECT_INTERVAL, self._reconnect)
+
+    def _reconnect(self):
+        self.reconnect_handle = None
+        if not self.running:
+            return
         try:
-            while self.running:
-                # Use select to make recv non-blocking
-                ready, _, error = select.select([client_socket], [], [client_socket], 1.0)
-                
-                if error:
-                    break
-                
-                if ready:
-                    data = client_socket.recv(1024)
-                    if not data:
-                        break
-                    
-                    # Send data to serial device
-                    if self.serial_device and self.serial_device.is_connected:
-                        success, message = self.serial_device.write(data)
-                        if success:
-                            client['bytes_received'] += len(data)
-                            self.stats['bytes_received'] += len(data)
-                        
-        except Exception as e:
-            print(f"Error handling client {client['address']}: {e}")
-        finally:
-            self._disconnect_client(client)
-    
-    def _serial_reader(self):
-        """Serial reader thread - broadcasts data to all clients"""
-        while self.running:
-            try:
-                if self.serial_device and self.serial_device.is_connected:
-                    # Get any available output
-                    output_lines = self.serial_device.read_output()
-                    
-                    for line in output_lines:
-                        data = line.encode()
-                        self._broadcast_to_clients(data)
-                        self.stats['bytes_sent'] += len(data)
-                
-                time.sleep(0.01)  # Small delay to prevent excessive CPU usage
-                
-            except Exception as e:
-                if self.running:
-                    print(f"Error reading from serial: {e}")
-                time.sleep(1)
-    
+            self._open_serial()
+            print(f"Reconnected to serial device: {self.device_path}")
+        except (serial.SerialException, OSError, ValueError):
+            self.reconnect_handle = self.loop.call_later(SERIAL_RECONNECT_INTERVAL, self._reconnect)
+
+    def _serial_readable(self):
+        """Device output is ready: broadcast it to all clients"""
+        try:
+            data = os.read(self.fd, SERIAL_READ_SIZE)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._serial_lost(e)
+            return
+        if not data:
+            self._serial_lost(None)
+            return
+        self.stats['bytes_sent'] += len(data)
+        self._broadcast_to_clients(data)
+
     def _broadcast_to_clients(self, data):
         """Send data to all connected clients"""
-        disconnected_clients = []
-        
-        for client in self.clients:
-            if not self._send_to_client(client, data):
-                disconnected_clients.append(client)
-        
-        # Remove disconnected clients
-        for client in disconnected_clients:
-            self._disconnect_client(client)
-    
-    def _send_to_client(self, client, data):
-        """Send data to a specific client"""
+        # Telnet clients need 0xFF doubled; do that once for all of them
+        escaped = data.replace(b'\xff', b'\xff\xff') if IAC in data else data
+        for client in self.clients[:]:
+            client.send(data, escaped)
+
+    def write_serial(self, data):
+        """Queue client input for the device without blocking the event loop"""
+        if self.fd is None:
+            return
+        if not self.serial_out:
+            try:
+                written = os.write(self.fd, data)
+            except BlockingIOError:
+                written = 0
+            except OSError as e:
+                self._serial_lost(e)
+                return
+            if written == len(data):
+                return
+            # Queue the rest without copying it first
+            data = memoryview(data)[written:]
+        if data:
+            self.serial_out += data
+            self._start_writing()
+            if len(self.serial_out) >= SERIAL_WRITE_LIMIT and not self.input_paused:
+                # The device is slower than the clients are typing; stop reading from them
+                self.input_paused = True
+                for client in self.clients:
+                    client.transport.pause_reading()
+
+    def _start_writing(self):
+        if not self.writing and self.fd is not None:
+            self.loop.add_writer(self.fd, self._serial_writable)
+            self.writing = True
+
+    def _serial_writable(self):
         try:
-            client['socket'].send(data)
-            client['bytes_sent'] += len(data)
-            return True
-        except:
-            return False
-    
-    def _disconnect_client(self, client):
+            written = os.write(self.fd, self.serial_out)
+        except BlockingIOError:
+            return
+        except OSError as e:
+            self._serial_lost(e)
+            return
+        del self.serial_out[:written]
+        if not self.serial_out:
+            self.loop.remove_writer(self.fd)
+            self.writing = False
+        if self.input_paused and len(self.serial_out) < SERIAL_WRITE_LIMIT // 2:
+            self.input_paused = False
+            for client in self.clients:
+                client.transport.resume_reading()
+
+    def add_client(self, client):
+        print(f"New client connected from {client.address}")
+        self.clients.append(client)
+        self.stats['clients_connected'] += 1
+        self.stats['clients_total'] += 1
+        if self.input_paused:
+            client.transport.pause_reading()
+
+    def remove_client(self, client):
         """Disconnect a client"""
+        if client in self.clients:
+            self.clients.remove(client)
+            self.stats['clients_connected'] -= 1
+
+            print(f"Client {client.address} disconnected")
+            print(f"  Connection time: {datetime.now() - client.connected_time}")
+            print(f"  Bytes sent: {client.bytes_sent}, received: {client.bytes_received}, "
+                  f"dropped: {client.bytes_dropped}")
+
+    def com_port_command(self, command, value):
+        """Apply an RFC 2217 COM port command; returns the value to acknowledge, or None"""
+        port = self.serial
         try:
-            if client in self.clients:
-                self.clients.remove(client)
-                self.stats['clients_connected'] -= 1
-                
-                print(f"Client {client['address']} disconnected")
-                print(f"  Connection time: {datetime.now() - client['connected_time']}")
-                print(f"  Bytes sent: {client['bytes_sent']}, received: {client['bytes_received']}")
-                
-            client['socket'].close()
-        except:
-            pass
-    
+            if command == SET_BAUDRATE and len(value) == 4:
+                baudrate = struct.unpack('!I', value)[0]
+                if baudrate and port:
+                    port.baudrate = baudrate
+                    self.baudrate = baudrate
+                    add_log_entry(f"Serial bridge set {self.device_path} to {baudrate} baud")
+                return struct.pack('!I', self.baudrate)
+            if command == SET_DATASIZE and len(value) == 1:
+                if 5 <= value[0] <= 8 and port:
+                    port.bytesize = value[0]
+                return bytes((port.bytesize if port else serial.EIGHTBITS,))
+            if command == SET_PARITY and len(value) == 1:
+                if value[0] in PARITIES and port:
+                    port.parity = PARITIES[value[0]]
+                current = port.parity if port else serial.PARITY_NONE
+                return bytes((next(code for code, parity in PARITIES.items() if parity == current),))
+            if command == SET_STOPSIZE and len(value) == 1:
+                if value[0] in STOPBITS and port:
+                    port.stopbits = STOPBITS[value[0]]
+                current = port.stopbits if port else serial.STOPBITS_ONE
+                return bytes((next(code for code, stopbits in STOPBITS.items() if stopbits == current),))
+            if command == SET_CONTROL and len(value) == 1:
+                return bytes((self._set_control(value[0]),))
+            if command == PURGE_DATA and len(value) == 1:
+                if value[0] in (1, 3):
+                    if port:
+                        port.reset_input_buffer()
+                if value[0] in (2, 3):
+                    self.serial_out.clear()
+                    if port:
+                        port.reset_output_buffer()
+                return value
+            if command in (SET_LINESTATE_MASK, SET_MODEMSTATE_MASK):
+                # Line and modem state notifications are not sent; acknowledge the mask
+                return value
+        except (serial.SerialException, OSError, ValueError) as e:
+            add_log_entry(f"Serial bridge could not apply RFC 2217 command {command} "
+                          f"to {self.device_path}: {str(e)}", is_error=True)
+            # Acknowledge with the current setting, which tells the client the change failed
+            if command == SET_BAUDRATE:
+                return struct.pack('!I', self.baudrate)
+            return value
+        return None
+
+    def _set_control(self, value):
+        """RFC 2217 SET-CONTROL: flow control, BREAK, DTR and RTS; returns the state to acknowledge"""
+        port = self.serial
+        if port is None:
+            return value
+        if value in (0, 1, 2, 3):
+            if value:
+                port.xonxoff = value == 2
+                port.rtscts = value == 3
+            return 3 if port.rtscts else 2 if port.xonxoff else 1
+        if value in (4, 5, 6):
+            if value != 4:
+                port.break_condition = value == 5
+            return 5 if port.break_condition else 6
+        if value in (7, 8, 9):
+            if value != 7:
+                port.dtr = value == 8
+            return 8 if port.dtr else 9
+        if value in (10, 11, 12):
+            if value != 10:
+                port.rts = value == 11
+            return 11 if port.rts else 12
+        return value
+
     def print_status(self):
         """Print current status"""
         if not self.running:
             print("Bridge is not running")
             return
-        
+
         uptime = datetime.now() - self.stats['start_time'] if self.stats['start_time'] else "Unknown"
-        
+
         print(f"\n=== Serial Bridge Status ===")
-        print(f"Device: {self.device_path} @ {self.baudrate} baud")
+        print(f"Device: {self.device_path} @ {self.baudrate} baud" + ("" if self.serial else " (disconnected)"))
         print(f"TCP Port: {self.tcp_port}")
         print(f"Uptime: {uptime}")
         print(f"Connected Clients: {self.stats['clients_connected']}")
         print(f"Total Clients: {self.stats['clients_total']}")
+        print(f"Slow Clients Dropped: {self.stats['clients_dropped']}")
         print(f"Bytes Sent: {self.stats['bytes_sent']}")
         print(f"Bytes Received: {self.stats['bytes_received']}")
-        
+
         if self.clients:
             print(f"\nActive Clients:")
             for i, client in enumerate(self.clients):
-                duration = datetime.now() - client['connected_time']
-                print(f"  {i+1}. {client['address']} (connected: {duration})")
+                duration = datetime.now() - client.connected_time
+                queued = client.transport.get_write_buffer_size()
+                print(f"  {i+1}. {client.address} (connected: {duration}, queued: {queued} bytes)")
+
+def parse_device(spec, default_port):
+    """Split DEVICE[:PORT] into (device, port)"""
+    device, _, port = spec.rpartition(':')
+    if device and port.isdigit():
+        return device, int(port)
+    return spec, default_port
+
+async def run_bridges(bridges, status_interval):
+    """Serve all bridges on this event loop until SIGINT or SIGTERM"""
+    loop = asyncio.get_running_loop()
+    stop = asyncio.Event()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
 
-def signal_handler(signum, frame):
-    """Handle shutdown signals"""
-    print("\nReceived shutdown signal")
-    if 'bridge' in globals():
-        bridge.stop()
-    sys.exit(0)
+    started = []
+    for bridge in bridges:
+        if not await bridge.start():
+            for running in started:
+                await running.stop()
+            return False
+        started.append(bridge)
+
+    print("Bridge started successfully!")
+    print("Press Ctrl+C to stop")
+    print()
+
+    # Status reporting loop
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), status_interval if status_interval > 0 else None)
+        except asyncio.TimeoutError:
+            for bridge in bridges:
+                bridge.print_status()
+
+    print("\nShutdown requested")
+    for bridge in bridges:
+        await bridge.stop()
+    return True
 
 def main():
     """Main function"""
     parser = argparse.ArgumentParser(description='Serial Bridge Server - TCP to Serial Bridge')
-    parser.add_argument('--device', '-d', required=True, help='Serial device path (e.g., /dev/ttyUSB0)')
+    parser.add_argument('--device', '-d', required=True, action='append',
+                        help='Serial device path, optionally with its TCP port (e.g., /dev/ttyUSB0 or /dev/ttyUSB0:9001); '
+                             'may be given more than once')
     parser.add_argument('--baudrate', '-b', type=int, default=9600, help='Baud rate (default: 9600)')
-    parser.add_argument('--port', '-p', type=int, default=9000, help='TCP port (default: 9000)')
-    parser.add_argument('--max-clients', '-m', type=int, default=10, help='Maximum clients (default: 10)')
+    parser.add_argument('--port', '-p', type=int, default=9000,
+                        help='TCP port of the first device; later devices use the following ports (default: 9000)')
+    parser.add_argument('--bind', default='0.0.0.0', help='Address to listen on (default: 0.0.0.0)')
+    parser.add_argument('--max-clients', '-m', type=int, default=10, help='Maximum clients per device (default: 10)')
+    parser.add_argument('--slow-client', choices=SLOW_CLIENT_POLICIES, default='disconnect',
+                        help='What to do with a client that falls behind: disconnect it, or discard '
+                             'output for it until it catches up (default: disconnect)')
+    parser.add_argument('--no-banner', action='store_true', help='Do not send a welcome line to new clients')
     parser.add_argument('--status-interval', '-s', type=int, default=30, help='Status print interval in seconds (0 to disable)')
-    
+
     args = parser.parse_args()
-    
-    # Set up signal handlers
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
+
+    bridges = []
+    for index, spec in enumerate(args.device):
+        device, port = parse_device(spec, args.port + index)
+        bridges.append(SerialBridge(device, args.baudrate, port, args.max_clients, args.bind,
+                                    args.slow_client, not args.no_banner))
+
     print(f"Starting Serial Bridge Server")
-    print(f"Device: {args.device}")
+    for bridge in bridges:
+        print(f"Device: {bridge.device_path} -> TCP Port: {bridge.tcp_port}")
     print(f"Baud Rate: {args.baudrate}")
-    print(f"TCP Port: {args.port}")
     print(f"Max Clients: {args.max_clients}")
+    print(f"Slow Clients: {args.slow_client}")
     print()
-    
-    # Create and start bridge
-    global bridge
-    bridge = SerialBridge(args.device, args.baudrate, args.port, args.max_clients)
-    
-    if not bridge.start():
+
+    if not asyncio.run(run_bridges(bridges, args.status_interval)):
         print("Failed to start bridge")
         sys.exit(1)
-    
-    print("Bridge started successfully!")
-    print("Press Ctrl+C to stop")
-    print()
-    
-    # Status reporting loop
-    last_status = time.time()
-    
-    try:
-        while bridge.running:
-            time.sleep(1)
-            
-            # Print status periodically
-            if args.status_interval > 0:
-                now = time.time()
-                if now - last_status >= args.status_interval:
-                    bridge.print_status()
-                    last_status = now
-                    
-    except KeyboardInterrupt:
-        print("\nShutdown requested")
-    finally:
-        bridge.stop()
 
 if __name__ == '__main__':
-    main() 
\ No newline at end of file
+    main()
@@ -0,0 +1,150 @@
+#!/usr/bin/env python3
+"""
+Serial Bridge Load Test
+Runs scripts/serial_bridge.py against a pseudo-terminal standing in for the
+serial device, connects an increasing number of local TCP clients, and
+measures the latency from a line being written by the "device" to it
+arriving at each client. A well-behaved bridge shows about the same latency
+for 1 client as for 100.
+
+One extra client connects with a tiny receive buffer and never reads, to
+check that it is dropped (or skipped) without slowing down the others.
+
+Usage:
+    python3 scripts/serial_bridge_loadtest.py --clients 100 --seconds 10
+"""
+
+import argparse
+import asyncio
+import os
+import pty
+import socket
+import statistics
+import subprocess
+import sys
+import time
+
+BRIDGE = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'serial_bridge.py')
+
+def start_bridge(slave_path, port, max_clients, slow_client):
+    process = subprocess.Popen(
+        [sys.executable, BRIDGE, '-d', f'{slave_path}:{port}', '--bind', '127.0.0.1',
+         '-m', str(max_clients), '--slow-client', slow_client, '--no-banner', '-s', '0'],
+        stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    deadline = time.monotonic() + 10
+    while time.monotonic() < deadline:
+        try:
+            socket.create_connection(('127.0.0.1', port), timeout=1).close()
+            return process
+        except OSError:
+            time.sleep(0.1)
+    process.kill()
+    raise RuntimeError(f"Bridge did not start listening on port {port}")
+
+def generate(master, rate, size, seconds):
+    """Write timestamped lines to the device side of the pty at a steady rate"""
+    count = int(rate * seconds)
+    padding = b'x' * max(0, size - 32)
+    start = time.monotonic()
+    for seq in range(count):
+        delay = start + seq / rate - time.monotonic()
+        if delay > 0:
+            time.sleep(delay)
+        line = b'%d %.9f ' % (seq, time.monotonic()) + padding + b'\n'
+        view = memoryview(line)
+        while view:
+            view = view[os.write(master, view):]
+    return count
+
+async def read_client(reader, count, latencies):
+    received = 0
+    while received < count:
+        line = await reader.readline()
+        if not line:
+            break
+        arrived = time.monotonic()
+        try:
+            seq, sent = line.split(b' ', 2)[:2]
+            int(seq)
+            latencies.append((arrived - float(sent)) * 1000)
+        except ValueError:
+            # The connection-time flush of earlier output; not a complete line
+            continue
+        received += 1
+    return received
+
+async def run_step(port, master, clients, rate, size, seconds):
+    loop = asyncio.get_running_loop()
+    connections = [await asyncio.open_connection('127.0.0.1', port, limit=size * 4) for _ in range(clients)]
+
+    # The slow client: small receive window and no reads at all
+    slow = socket.socket()
+    slow.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, 4096)
+    slow.connect(('127.0.0.1', port))
+    await asyncio.sleep(0.2)
+
+    count = int(rate * seconds)
+    latencies = []
+    readers = [asyncio.ensure_future(read_client(reader, count, latencies)) for reader, _ in connections]
+    sent = await loop.run_in_executor(None, generate, master, rate, size, seconds)
+    done, pending = await asyncio.wait(readers, timeout=30)
+    for task in pending:
+        task.cancel()
+    received = sum(task.result() for task in done)
+
+    # A dropped client finds the connection closed once it reads what the kernel still holds
+    slow.settimeout(0.5)
+    dropped = False
+    try:
+        while True:
+            if not slow.recv(65536):
+                dropped = True
+                break
+    except ConnectionResetError:
+        dropped = True
+    except socket.timeout:
+        pass
+    slow.close()
+    for _, writer in connections:
+        writer.close()
+    await asyncio.sleep(0.2)
+    return latencies, received, sent * clients, dropped
+
+async def run(args, master, port):
+    steps = sorted({n for n in (1, 10, 50, args.clients) if n <= args.clients})
+    print(f"{args.rate} lines/s of {args.size} bytes for {args.seconds}s per step, slow clients: {args.slow_client}\n")
+    print(f"{'clients':>8} {'p50':>9} {'p95':>9} {'p99':>9} {'max':>9} {'lost':>7}  slow client")
+    for clients in steps:
+        latencies, received, expected, dropped = await run_step(port, master, clients, args.rate, args.size, args.seconds)
+        latencies.sort()
+        if not latencies:
+            print(f"{clients:>8} no lines received")
+            continue
+        pick = lambda q: latencies[min(len(latencies) - 1, int(len(latencies) * q))]
+        slow_state = 'dropped' if dropped else 'still connected'
+        print(f"{clients:>8} {statistics.median(latencies):>7.2f}ms {pick(0.95):>7.2f}ms {pick(0.99):>7.2f}ms "
+              f"{latencies[-1]:>7.2f}ms {expected - received:>7}  {slow_state}")
+
+def main():
+    parser = argparse.ArgumentParser(description='Load test the TCP to serial bridge with many local clients')
+    parser.add_argument('--clients', '-c', type=int, default=100, help='Most clients to connect (default: 100)')
+    parser.add_argument('--rate', '-r', type=int, default=100, help='Device lines per second (default: 100)')
+    parser.add_argument('--size', type=int, default=1024, help='Bytes per line (default: 1024)')
+    parser.add_argument('--seconds', '-t', type=float, default=10, help='Duration of each step (default: 10)')
+    parser.add_argument('--port', '-p', type=int, default=9300, help='TCP port for the bridge (default: 9300)')
+    parser.add_argument('--slow-client', choices=('disconnect', 'discard'), default='disconnect',
+                        help='Slow client policy passed to the bridge (default: disconnect)')
+    args = parser.parse_args()
+
+    master, slave = pty.openpty()
+    bridge = start_bridge(os.ttyname(slave), args.port, args.clients + 10, args.slow_client)
+    try:
+        asyncio.run(run(args, master, args.port))
+    finally:
+        bridge.terminate()
+        bridge.wait(timeout=10)
+        os.close(master)
+        os.close(slave)
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+"""
+Serial File Transfer Loopback Test
+Pushes files through a pseudo-terminal standing in for a serial port, from
+the XMODEM/YMODEM senders in modules/serial_transfer.py to a minimal
+receiver on the other end of the pty, and checks that every file arrives
+intact.
+
+Covers XMODEM with checksum and CRC, XMODEM-1K, YMODEM and YMODEM-g, a
+receiver that rejects corrupted blocks, a YMODEM receiver that lost block 0
+and keeps asking for it, cancelling a transfer, and the console being
+locked out while a transfer has the port.
+
+Usage:
+    python3 scripts/serial_transfer_loopback_test.py [--size 200000]
+"""
+
+import argparse
+import binascii
+import os
+import pty
+import select
+import shutil
+import struct
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules.serial_comm import SerialDevice
+from modules.serial_transfer import (SerialTransferManager, SOH, STX, EOT, ACK, NAK, CAN, CRC_START,
+                                     STREAM_START, PAD, COMPLETE, CANCELLED)
+
+class Receiver:
+    """XMODEM/YMODEM receiver on the device side of the pty"""
+
+    def __init__(self, fd, start, ymodem=False, reject=(), lose_header=False):
+        self.fd = fd
+        self.start = start              # NAK (checksum), 'C' (CRC) or 'G' (YMODEM-g)
+        self.ymodem = ymodem
+        self.reject = set(reject)       # Block numbers answered with NAK the first time
+        self.lose_header = lose_header  # Drop the first block 0 and keep asking for it
+        self.buffer = bytearray()
+        self.naks = 0
+
+    def read(self, count, timeout=10):
+        deadline = time.monotonic() + timeout
+        while len(self.buffer) < count:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0 or not select.select([self.fd], [], [], remaining)[0]:
+                raise TimeoutError(f"Receiver waited {timeout}s for {count} bytes")
+            self.buffer += os.read(self.fd, 65536)
+        data = bytes(self.buffer[:count])
+        del self.buffer[:count]
+        return data
+
+    def send(self, byte):
+        os.write(self.fd, bytes((byte,)))
+
+    def block(self):
+        """Read one block; returns (number, payload), 'eot', or None if it failed its check"""
+        header = self.read(1)[0]
+        if header == EOT:
+            return 'eot'
+        if header == CAN:
+            raise RuntimeError("Sender cancelled")
+        if header not in (SOH, STX):
+            raise RuntimeError(f"Unexpected byte 0x{header:02x}")
+        size = 1024 if header == STX else 128
+        crc = self.start != NAK
+        number, complement = self.read(2)
+        data = self.read(size)
+        trailer = self.read(2 if crc else 1)
+        if crc:
+            valid = struct.unpack('>H', trailer)[0] == binascii.crc_hqx(data, 0)
+        else:
+            valid = trailer[0] == sum(data) & 0xFF
+        if not valid or number != 0xFF - complement:
+            return None
+        return number, data
+
+    def receive(self):
+        """Run one transfer; returns (file name or None, data)"""
+        streaming = self.start == STREAM_START
+        name = size = None
+        self.send(self.start)
+        if self.ymodem and self.lose_header:
+            self.block()
+            # Like a receiver that never saw block 0: repeat the start request every 2s
+            deadline = time.monotonic() + 30
+            while not select.select([self.fd], [], [], 2)[0]:
+                if time.monotonic() > deadline:
+                    raise TimeoutError("Sender never resent block 0")
+                self.send(self.start)
+        if self.ymodem:
+            number, header = self.block()
+            name, info = header.split(b'\0', 1)
+            size = int(info.split(b'\0')[0].split()[0])
+            if not streaming:
+                self.send(ACK)
+            self.send(self.start)
+
+        data = bytearray()
+        expected = 1
+        while True:
+            block = self.block()
+            if block == 'eot':
+                if self.ymodem and not streaming:
+                    # YMODEM: make the sender repeat EOT before accepting it
+                    self.send(NAK)
+                    assert self.read(1)[0] == EOT
+                self.send(ACK)
+                break
+            if block is None:
+                self.naks += 1
+                self.send(NAK)
+                continue
+            number, payload = block
+            if number == (expected & 0xFF) and number in self.reject:
+                self.reject.discard(number)
+                self.naks += 1
+                self.send(NAK)
+                continue
+            if number == (expected & 0xFF):
+                data += payload
+                expected += 1
+            # A repeated block (our ACK was lost) is acknowledged and dropped
+            if not streaming:
+                self.send(ACK)
+
+        if self.ymodem:
+            self.send(self.start)
+            number, header = self.block()
+            assert number == 0 and header.strip(b'\0') == b'', "Expected the empty block 0 that ends the batch"
+            if not streaming:
+                self.send(ACK)
+            return name.decode(), bytes(data[:size])
+        return None, bytes(data.rstrip(bytes((PAD,))))
+
+def wait_finished(manager, transfer_id, timeout=120):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        transfer = manager.get(transfer_id)
+        if transfer['state'] != 'running':
+            return transfer
+        time.sleep(0.05)
+    raise TimeoutError("Transfer did not finish")
+
+def run_case(manager, device, master, name, protocol, start, reject=(), lose_header=False):
+    receiver = Receiver(master, start, ymodem=protocol == 'ymodem', reject=reject, lose_header=lose_header)
+    transfer = manager.start(device, 'payload.bin', protocol)
+    started = time.monotonic()
+    received_name, data = receiver.receive()
+    result = wait_finished(manager, transfer.id)
+    elapsed = time.monotonic() - started
+    with open(os.path.join(manager.root, 'payload.bin'), 'rb') as f:
+        expected = f.read()
+    # XMODEM cannot tell trailing padding from data; the test file does not end in it
+    ok = result['state'] == COMPLETE and data == expected and received_name in (None, 'payload.bin')
+    stats = result['stats'] or {}
+    print(f"{name:<22} {'ok' if ok else 'FAILED':<7} {stats.get('mode', ''):<9} {stats.get('blocks', 0):>6} "
+          f"{stats.get('retries', 0):>7} {len(expected) / elapsed / 1024:>9.0f}")
+    return ok
+
+def main():
+    parser = argparse.ArgumentParser(description='Loopback test for the serial XMODEM/YMODEM senders')
+    parser.add_argument('--size', type=int, default=200000, help='Test file size in bytes (default: 200000)')
+    args = parser.parse_args()
+
+    root = tempfile.mkdtemp(prefix='serial-transfer-')
+    master, slave = pty.openpty()
+    device = SerialDevice(os.ttyname(slave), 115200)
+    try:
+        payload = os.urandom(args.size).rstrip(bytes((PAD,))) + b'end'
+        with open(os.path.join(root, 'payload.bin'), 'wb') as f:
+            f.write(payload)
+        success, message = device.connect()
+        if not success:
+            raise RuntimeError(message)
+        manager = SerialTransferManager(root)
+
+        print(f"{'case':<22} {'result':<7} {'mode':<9} {'blocks':>6} {'retries':>7} {'KiB/s':>9}")
+        results = [
+            run_case(manager, device, master, 'xmodem checksum', 'xmodem', NAK),
+            run_case(manager, device, master, 'xmodem crc', 'xmodem', CRC_START),
+            run_case(manager, device, master, 'xmodem-1k', 'xmodem1k', CRC_START),
+            run_case(manager, device, master, 'xmodem-1k rejects', 'xmodem1k', CRC_START, reject=(1, 7, 255)),
+            run_case(manager, device, master, 'ymodem', 'ymodem', CRC_START),
+            run_case(manager, device, master, 'ymodem-g', 'ymodem', STREAM_START),
+            run_case(manager, device, master, 'ymodem lost block 0', 'ymodem', CRC_START, lose_header=True),
+        ]
+
+        # The console is locked out while a transfer owns the port
+        transfer = manager.start(device, 'payload.bin', 'xmodem1k')
+        console_blocked = not device.write('show version\n')[0]
+        manager.cancel(transfer.id)
+        cancelled = wait_finished(manager, transfer.id)['state'] == CANCELLED
+        os.read(master, 65536)
+        console_back = device.write('x')[0] and os.read(master, 16) == b'x'
+        results.append(console_blocked and cancelled and console_back)
+        print(f"{'cancel and console':<22} {'ok' if results[-1] else 'FAILED'}")
+
+        print(f"\n{sum(results)} of {len(results)} cases passed")
+        sys.exit(0 if all(results) else 1)
+    finally:
+        device.disconnect()
+        os.close(master)
+        os.close(slave)
+        shutil.rmtree(root, ignore_errors=True)
+
+if __name__ == '__main__':
+    main()
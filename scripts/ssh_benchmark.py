@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+SSH Console Benchmark
+Measures bulk output throughput (MB/s) and keystroke echo latency of
+SSHSession against an in-process paramiko test server, for the original
+polling reader (4 KB per wakeup every 10 ms, under the session lock) and
+the current select()-based reader.
+
+Usage:
+    python3 scripts/ssh_benchmark.py --megabytes 20 --echoes 200
+
+The test server listens on 127.0.0.1 only and accepts the password 'benchmark'.
+"""
+
+import argparse
+import os
+import socket
+import statistics
+import sys
+import threading
+import time
+
+import paramiko
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import ssh_comm
+
+PASSWORD = 'benchmark'
+BULK_LINE = b'x' * 1023 + b'\n'
+BULK_END = 'BULK-END'
+
+class BenchmarkServer(paramiko.ServerInterface):
+    """Shell that echoes input, or streams N KiB of lines for 'bulk N'"""
+
+    def check_auth_password(self, username, password):
+        return paramiko.AUTH_SUCCESSFUL if password == PASSWORD else paramiko.AUTH_FAILED
+
+    def get_allowed_auths(self, username):
+        return 'password'
+
+    def check_channel_request(self, kind, chanid):
+        if kind == 'session':
+            return paramiko.OPEN_SUCCEEDED
+        return paramiko.OPEN_FAILED_ADMINISTRATIVELY_PROHIBITED
+
+    def check_channel_pty_request(self, channel, term, width, height, pixelwidth, pixelheight, modes):
+        return True
+
+    def check_channel_shell_request(self, channel):
+        threading.Thread(target=self.shell, args=(channel,), daemon=True).start()
+        return True
+
+    def shell(self, channel):
+        while True:
+            data = channel.recv(4096)
+            if not data:
+                break
+            if data.startswith(b'bulk '):
+                for _ in range(int(data.split()[1])):
+                    channel.sendall(BULK_LINE)
+                channel.sendall(BULK_END.encode() + b'\n')
+            else:
+                channel.sendall(data)
+
+def start_server():
+    host_key = paramiko.RSAKey.generate(2048)
+    listener = socket.socket()
+    listener.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    listener.bind(('127.0.0.1', 0))
+    listener.listen(5)
+
+    def accept_loop():
+        while True:
+            client, _ = listener.accept()
+            transport = paramiko.Transport(client)
+            transport.add_server_key(host_key)
+            transport.start_server(server=BenchmarkServer())
+
+    threading.Thread(target=accept_loop, daemon=True).start()
+    return listener.getsockname()[1]
+
+class LegacySSHSession(ssh_comm.SSHSession):
+    """SSHSession with the polling reader this module used to ship, kept for comparison"""
+
+    def _read_loop(self):
+        while not self.stop_flag.is_set() and self.is_connected:
+            try:
+                with self.lock:
+                    if not self.channel or self.channel.closed:
+                        break
+                    if self.channel.recv_ready():
+                        data = self.channel.recv(4096)
+                        if data:
+                            self.output_queue.put(data.decode('utf-8', errors='replace'))
+                time.sleep(0.01)
+            except Exception:
+                break
+
+def drain_until(session, marker, timeout=120):
+    """Collect output until marker appears; returns the number of characters received"""
+    received = 0
+    tail = ''
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        text = session.output_queue.get(timeout=deadline - time.monotonic())
+        received += len(text)
+        tail = (tail + text)[-len(marker) - 1:]
+        if marker in tail:
+            return received
+    raise TimeoutError(f"No '{marker}' within {timeout}s")
+
+def run(session_class, port, megabytes, echoes):
+    session = session_class('127.0.0.1', port, 'bench', PASSWORD)
+    success, message = session.connect()
+    if not success:
+        raise RuntimeError(message)
+    try:
+        # Keystroke echo: one character at a time, as typed in the console
+        latencies = []
+        for i in range(echoes):
+            key = chr(ord('a') + i % 26)
+            start = time.perf_counter()
+            session.write(key)
+            drain_until(session, key, timeout=10)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+        # Bulk output, like 'show running-config' on a large switch
+        lines = megabytes * 1024
+        start = time.perf_counter()
+        session.write(f'bulk {lines}')
+        received = drain_until(session, BULK_END)
+        elapsed = time.perf_counter() - start
+        return received / elapsed / (1024 * 1024), latencies
+    finally:
+        session.disconnect()
+        ssh_comm.ssh_pool.close_all()
+
+def main():
+    parser = argparse.ArgumentParser(description='Benchmark SSH console throughput and echo latency')
+    parser.add_argument('--megabytes', '-m', type=int, default=20, help='Bulk output size in MiB (default: 20)')
+    parser.add_argument('--echoes', '-e', type=int, default=200, help='Single-key echoes to time (default: 200)')
+    args = parser.parse_args()
+
+    port = start_server()
+    print(f"Test server on 127.0.0.1:{port}, {args.megabytes} MiB bulk output, {args.echoes} echoes\n")
+    print(f"{'reader':<10} {'MB/s':>8} {'echo p50':>10} {'echo p95':>10}")
+    for name, session_class in (('polling', LegacySSHSession), ('select', ssh_comm.SSHSession)):
+        throughput, latencies = run(session_class, port, args.megabytes, args.echoes)
+        latencies.sort()
+        p50 = statistics.median(latencies)
+        p95 = latencies[int(len(latencies) * 0.95) - 1]
+        print(f"{name:<10} {throughput:>8.1f} {p50:>8.2f}ms {p95:>8.2f}ms")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,249 @@
+#!/usr/bin/env python3
+"""
+TFTP Client Loopback Test
+Runs the in-process TFTP client against a minimal stand-in server on
+127.0.0.1 and checks that every transferred file arrives intact.
+
+Covers option negotiation (blksize, tsize, windowsize), servers that ignore
+options, 16 bit block number wrap-around, packet loss with retransmission,
+and many concurrent transfers on one event loop. The same round trips are
+then run against the embedded TFTP server.
+
+Usage:
+    python3 scripts/tftp_loopback_test.py [--loss 0.05] [--concurrent 20]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import random
+import struct
+import sys
+import tempfile
+import time
+
+# Add parent directory to path to import modules
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import logging as app_logging
+from modules.tftp_server import EmbeddedTFTPServer
+from modules.tftp_client import (TFTPClient, TFTPError, OP_RRQ, OP_WRQ, OP_DATA, OP_ACK, OP_ERROR,
+                                 ERR_FILE_NOT_FOUND, DEFAULT_BLKSIZE, build_data, build_ack, build_oack,
+                                 build_error, parse_request, block_distance)
+
+class StandInServer(asyncio.DatagramProtocol):
+    """Bare-bones TFTP server; each request gets its own socket (TID)"""
+
+    def __init__(self, root, loss=0.0, honour_options=True, timeout=0.5):
+        self.root = root
+        self.loss = loss
+        self.honour_options = honour_options
+        self.timeout = timeout
+
+    def datagram_received(self, data, addr):
+        asyncio.ensure_future(self.handle(data, addr))
+
+    async def handle(self, data, addr):
+        opcode, filename, mode, options = parse_request(data)
+        loop = asyncio.get_running_loop()
+        queue = asyncio.Queue()
+
+        class Endpoint(asyncio.DatagramProtocol):
+            def datagram_received(self, data, peer):
+                if peer == addr:
+                    queue.put_nowait(data)
+
+        transport, _ = await loop.create_datagram_endpoint(Endpoint, local_addr=('127.0.0.1', 0))
+
+        def send(packet):
+            # Simulated loss applies to everything but errors
+            if packet[:2] != struct.pack('!H', OP_ERROR) and random.random() < self.loss:
+                return
+            transport.sendto(packet, addr)
+
+        async def recv():
+            return await asyncio.wait_for(queue.get(), self.timeout)
+
+        try:
+            path = os.path.join(self.root, os.path.basename(filename))
+            blksize, windowsize, accepted = DEFAULT_BLKSIZE, 1, {}
+            if self.honour_options:
+                if 'blksize' in options:
+                    blksize = accepted['blksize'] = min(int(options['blksize']), 65464)
+                if 'windowsize' in options:
+                    windowsize = accepted['windowsize'] = min(int(options['windowsize']), 64)
+                if 'tsize' in options:
+                    accepted['tsize'] = os.path.getsize(path) if opcode == OP_RRQ and os.path.exists(path) else options['tsize']
+            if opcode == OP_RRQ:
+                if not os.path.exists(path):
+                    send(build_error(ERR_FILE_NOT_FOUND, "File not found"))
+                    return
+                with open(path, 'rb') as f:
+                    content = f.read()
+                await self.serve_read(send, recv, content, blksize, windowsize, accepted)
+            elif opcode == OP_WRQ:
+                content = await self.serve_write(send, recv, blksize, windowsize, accepted)
+                with open(path, 'wb') as f:
+                    f.write(content)
+                # Linger so a lost final ACK can be resent when the client retransmits
+                last_ack = build_ack(len(content) // blksize + 1)
+                while True:
+                    try:
+                        await recv()
+                    except asyncio.TimeoutError:
+                        break
+                    send(last_ack)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            transport.close()
+
+    async def serve_read(self, send, recv, content, blksize, windowsize, accepted):
+        if accepted:
+            for attempt in range(10):
+                send(build_oack(accepted))
+                try:
+                    packet = await recv()
+                except asyncio.TimeoutError:
+                    continue
+                if packet[:4] == build_ack(0):
+                    break
+        last_block = len(content) // blksize + 1
+        base = 1
+        misses = 0
+        while base <= last_block:
+            end = min(base + windowsize, last_block + 1)
+            for block in range(base, end):
+                send(build_data(block, content[(block - 1) * blksize:block * blksize]))
+            try:
+                packet = await recv()
+            except asyncio.TimeoutError:
+                misses += 1
+                if misses > 10:
+                    return
+                continue
+            misses = 0
+            opcode, number = struct.unpack('!HH', packet[:4])
+            if opcode == OP_ACK:
+                distance = block_distance(number, base - 1)
+                if distance <= end - base:
+                    base += distance
+
+    async def serve_write(self, send, recv, blksize, windowsize, accepted):
+        send(build_oack(accepted) if accepted else build_ack(0))
+        chunks = []
+        expected = 1
+        in_window = 0
+        misses = 0
+        while True:
+            try:
+                packet = await recv()
+            except asyncio.TimeoutError:
+                misses += 1
+                if misses > 10:
+                    raise
+                send(build_ack(expected - 1) if expected > 1 or not accepted else build_oack(accepted))
+                in_window = 0
+                continue
+            misses = 0
+            opcode, number = struct.unpack('!HH', packet[:4])
+            if opcode != OP_DATA:
+                continue
+            if number != expected & 0xFFFF:
+                send(build_ack(expected - 1))
+                in_window = 0
+                continue
+            payload = packet[4:]
+            chunks.append(payload)
+            expected += 1
+            in_window += 1
+            last = len(payload) < blksize
+            if last or in_window >= windowsize:
+                send(build_ack(expected - 1))
+                in_window = 0
+            if last:
+                return b''.join(chunks)
+
+async def start_server(root, embedded=False, **kwargs):
+    if embedded:
+        # The app's own server, run on this test's event loop
+        server = EmbeddedTFTPServer(root, host='127.0.0.1', port=0)
+        await server._start()
+        return server.listener, f"127.0.0.1:{server.listener.get_extra_info('sockname')[1]}"
+    loop = asyncio.get_running_loop()
+    transport, _ = await loop.create_datagram_endpoint(lambda: StandInServer(root, **kwargs),
+                                                       local_addr=('127.0.0.1', 0))
+    return transport, f"127.0.0.1:{transport.get_extra_info('sockname')[1]}"
+
+def sha256(path):
+    with open(path, 'rb') as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+async def check_round_trip(client, server, server_root, local_root, name, size):
+    """Upload a random file, download it again and compare all three copies"""
+    source = os.path.join(local_root, name)
+    with open(source, 'wb') as f:
+        f.write(os.urandom(size))
+    progress = []
+    await client.put(server, source, name, progress=lambda done, total: progress.append((done, total)))
+    copy = os.path.join(local_root, name + '.copy')
+    stats = await client.get(server, name, copy)
+    assert sha256(source) == sha256(os.path.join(server_root, name)), f"{name}: upload corrupted"
+    assert sha256(source) == sha256(copy), f"{name}: download corrupted"
+    assert size == 0 or progress[-1] == (size, size), f"{name}: progress ended at {progress[-1]}"
+    return stats
+
+async def run_case(title, server_kwargs, client, sizes, concurrent=1):
+    with tempfile.TemporaryDirectory() as server_root, tempfile.TemporaryDirectory() as local_root:
+        transport, server = await start_server(server_root, **server_kwargs)
+        try:
+            started = time.monotonic()
+            results = await asyncio.gather(*[
+                check_round_trip(client, server, server_root, local_root, f"file{i}-{size}.bin", size)
+                for i in range(concurrent) for size in sizes])
+            elapsed = time.monotonic() - started
+        finally:
+            transport.close()
+    total = sum(stats['bytes'] for stats in results)
+    retransmits = sum(stats['retransmits'] for stats in results)
+    print(f"  ok  {title}: {len(results)} round trips, {total * 2 / 1024:.0f} KB moved in {elapsed:.2f}s, "
+          f"blksize {results[0]['blksize']}, windowsize {results[0]['windowsize']}, {retransmits} retransmits")
+
+async def main(args):
+    sizes = [0, 1, 511, 512, 1468, 1468 * 8, 100000]
+    fast = TFTPClient(timeout=0.3)
+    await run_case("negotiated options", {}, fast, sizes)
+    await run_case("server ignores options", {'honour_options': False}, fast, sizes)
+    await run_case("block number wrap-around", {}, TFTPClient(blksize=8, windowsize=32, timeout=0.3), [8 * 70000 + 3])
+    await run_case(f"{args.loss:.0%} packet loss", {'loss': args.loss}, fast, sizes)
+    await run_case(f"{args.concurrent} concurrent transfers", {}, fast, [200000], concurrent=args.concurrent)
+    await run_case("embedded server", {'embedded': True}, fast, sizes)
+    await run_case("embedded server, plain RFC 1350 client", {'embedded': True},
+                   TFTPClient(blksize=512, windowsize=1, timeout=0.3), sizes)
+    await run_case(f"embedded server, {args.concurrent} concurrent transfers", {'embedded': True}, fast,
+                   [2000000], concurrent=args.concurrent)
+
+    with tempfile.TemporaryDirectory() as server_root, tempfile.TemporaryDirectory() as local_root:
+        transport, server = await start_server(server_root)
+        try:
+            await fast.get(server, 'missing.bin', os.path.join(local_root, 'missing.bin'))
+            raise AssertionError("missing file did not raise")
+        except TFTPError as e:
+            assert e.code == ERR_FILE_NOT_FOUND and not os.listdir(local_root), "missing file left debris"
+            print("  ok  missing file reported as TFTP error 1")
+        finally:
+            transport.close()
+
+if __name__ == '__main__':
+    # Keep the embedded server's log entries out of the application logs
+    log_dir = tempfile.mkdtemp()
+    app_logging.LOG_FILE = os.path.join(log_dir, "app_log.txt")
+    app_logging.DEBUG_LOG_FILE = os.path.join(log_dir, "debug_log.txt")
+    app_logging.LOG_CONSOLE_OUTPUT = False
+
+    parser = argparse.ArgumentParser(description='Test the TFTP client against a local stand-in server')
+    parser.add_argument('--loss', type=float, default=0.05, help='Simulated packet loss ratio (default: 0.05)')
+    parser.add_argument('--concurrent', type=int, default=20, help='Parallel transfers in the concurrency case')
+    asyncio.run(main(parser.parse_args()))
+    print("All TFTP client checks passed")
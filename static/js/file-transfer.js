@@ -8,6 +8,14 @@ document.addEventListener('DOMContentLoaded', function() {
     const stopTftpBtn = document.getElementById('stop-tftp');
     const tftpStatusEl = document.getElementById('tftp-status');
     const tftpInfoEl = document.getElementById('tftp-info');
+    const tftpModeEl = document.getElementById('tftp-mode');
+    const tftpTransfersEl = document.getElementById('tftp-transfers');
+    let transfersTimer = null;
+    
+    // Remote TFTP jobs
+    const tftpJobForm = document.getElementById('tftp-job-form');
+    const tftpJobListEl = document.getElementById('tftp-job-list');
+    const tftpJobs = {};
     
     // File Browser
     const currentPathEl = document.getElementById('current-path');
@@ -16,6 +24,12 @@ document.addEventListener('DOMContentLoaded', function() {
     const refreshFilesBtn = document.getElementById('refresh-files');
     const createFolderBtn = document.getElementById('create-folder');
     const browseTftpDirBtn = document.getElementById('browse-tftp-dir');
+    const fileFilterEl = document.getElementById('file-filter');
+    const fileSortEl = document.getElementById('file-sort');
+    const filePaginationEl = document.getElementById('file-pagination');
+    const FILES_PER_PAGE = 200;
+    let filePage = 1;
+    let filterTimer = null;
     
     // Modals
     const newFolderModal = document.getElementById('new-folder-modal');
@@ -36,6 +50,7 @@ document.addEventListener('DOMContentLoaded', function() {
     // Initialize
     loadCurrentPath();
     checkTftpStatus();
+    connectTftpJobs();
     
     // Add event listener for the browse button
     if (browseTftpDirBtn) {
@@ -59,8 +74,9 @@ document.addEventListener('DOMContentLoaded', function() {
                 return response.json();
             })
             .then(data => {
+                setTransfersPolling(data.embedded);
                 if (data.running) {
-                    tftpStatusEl.textContent = 'Active';
+                    tftpStatusEl.textContent = data.embedded ? 'Active (built-in)' : 'Active';
                     tftpStatusEl.className = 'badge badge-success';
                     startTftpBtn.disabled = true;
                     stopTftpBtn.disabled = false;
@@ -86,7 +102,11 @@ document.addEventListener('DOMContentLoaded', function() {
     }
     
     startTftpBtn.addEventListener('click', function() {
-        fetch('/tftp/start', { method: 'POST' })
+        fetch('/tftp/start', {
+            method: 'POST',
+            headers: { 'Content-Type': 'application/json' },
+            body: JSON.stringify({ mode: tftpModeEl.value })
+        })
             .then(response => response.json())
             .then(data => {
                 if (data.success) {
@@ -119,6 +139,166 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     });
     
+    // Poll transfer stats while the built-in server is running
+    function setTransfersPolling(enabled) {
+        tftpTransfersEl.style.display = enabled ? 'block' : 'none';
+        if (enabled && !transfersTimer) {
+            loadTransfers();
+            transfersTimer = setInterval(loadTransfers, 2000);
+        } else if (!enabled && transfersTimer) {
+            clearInterval(transfersTimer);
+            transfersTimer = null;
+        }
+    }
+    
+    function loadTransfers() {
+        fetch('/tftp/transfers')
+            .then(response => response.json())
+            .then(data => {
+                if (data.error) {
+                    throw new Error(data.error);
+                }
+                const totals = data.totals;
+                document.getElementById('tftp-transfer-totals').textContent =
+                    `(${data.active.length} active, ${totals.transfers} done, ${totals.failed} failed, ` +
+                    `${formatFileSize(totals.bytes_sent)} sent, ${formatFileSize(totals.bytes_received)} received)`;
+                
+                const rows = data.active.concat(data.recent).map(transfer => {
+                    const progress = transfer.total ?
+                        `${formatFileSize(transfer.bytes)} / ${formatFileSize(transfer.total)}` :
+                        formatFileSize(transfer.bytes);
+                    const status = transfer.error ? `${transfer.status}: ${escapeHtml(transfer.error)}` : transfer.status;
+                    return `
+                        <tr>
+                            <td>${escapeHtml(transfer.client)}</td>
+                            <td>${transfer.direction === 'read' ? '&darr;' : '&uarr;'} ${escapeHtml(transfer.filename)}</td>
+                            <td>${status}</td>
+                            <td>${progress}</td>
+                            <td>${formatFileSize(Math.round(transfer.rate))}/s</td>
+                            <td>${transfer.blksize}/${transfer.windowsize}</td>
+                        </tr>
+                    `;
+                });
+                document.getElementById('tftp-transfer-list').innerHTML = rows.length ?
+                    rows.join('') : '<tr><td colspan="6" class="text-center">No transfers yet</td></tr>';
+            })
+            .catch(error => console.error('Error loading TFTP transfers:', error));
+    }
+    
+    // Remote TFTP Job Functions
+    function connectTftpJobs() {
+        if (typeof io === 'undefined') {
+            return;
+        }
+        const socket = io('/tftp');
+        socket.on('tftp_jobs', function(data) {
+            data.jobs.forEach(job => { tftpJobs[job.id] = job; });
+            renderTftpJobs();
+        });
+        socket.on('tftp_job', function(job) {
+            const previous = tftpJobs[job.id];
+            tftpJobs[job.id] = job;
+            renderTftpJobs();
+            if (previous && previous.state !== job.state) {
+                if (job.state === 'complete') {
+                    showStatusMessage(`TFTP ${job.direction === 'get' ? 'download' : 'upload'} of ${job.filename} complete`, 'success');
+                    if (job.direction === 'get') {
+                        loadFiles(currentPathEl.textContent);
+                    }
+                } else if (job.state === 'failed') {
+                    showStatusMessage(`TFTP transfer of ${job.filename} failed: ${job.error}`, 'error');
+                }
+            }
+        });
+    }
+    
+    function formatEta(seconds) {
+        if (seconds === null || seconds === undefined) return '';
+        seconds = Math.round(seconds);
+        return seconds >= 60 ? `${Math.floor(seconds / 60)}m ${seconds % 60}s` : `${seconds}s`;
+    }
+    
+    function renderTftpJobs() {
+        const jobs = Object.values(tftpJobs).sort((a, b) => Number(b.id) - Number(a.id));
+        if (!jobs.length) {
+            tftpJobListEl.innerHTML = '<tr><td colspan="7" class="text-center">No remote transfers yet</td></tr>';
+            return;
+        }
+        tftpJobListEl.innerHTML = jobs.map(job => {
+            const progress = job.total ?
+                `${formatFileSize(job.bytes)} / ${formatFileSize(job.total)} (${Math.floor(job.bytes * 100 / job.total)}%)` :
+                formatFileSize(job.bytes);
+            const status = job.error ? `${job.state}: ${escapeHtml(job.error)}` : job.state;
+            let action = '';
+            if (job.state === 'queued' || job.state === 'running') {
+                action = `<button class="button button-sm button-danger" data-job-action="cancel" data-job-id="${job.id}">Cancel</button>`;
+            } else if (job.state === 'failed' || job.state === 'cancelled') {
+                action = `<button class="button button-sm" data-job-action="retry" data-job-id="${job.id}">Retry</button>`;
+            }
+            return `
+                <tr>
+                    <td>${job.direction === 'get' ? '&darr;' : '&uarr;'} ${escapeHtml(job.filename)}</td>
+                    <td>${escapeHtml(job.server)}</td>
+                    <td>${status}</td>
+                    <td>${progress}</td>
+                    <td>${job.state === 'running' || job.state === 'complete' ? formatFileSize(Math.round(job.rate)) + '/s' : ''}</td>
+                    <td>${job.state === 'running' ? formatEta(job.eta) : ''}</td>
+                    <td>${action}</td>
+                </tr>
+            `;
+        }).join('');
+    }
+    
+    if (tftpJobForm) {
+        tftpJobForm.addEventListener('submit', function(event) {
+            event.preventDefault();
+            const server = document.getElementById('tftp-job-server').value.trim();
+            const filePath = document.getElementById('tftp-job-filename').value.trim();
+            const download = document.getElementById('tftp-job-direction').value === 'download';
+            const dir = currentPathEl.textContent === '/' ? '' : currentPathEl.textContent;
+            let body;
+            if (download) {
+                body = { server: server, filename: filePath, target_dir: dir };
+            } else {
+                // Upload paths are relative to the transfers directory
+                const lastSlash = filePath.lastIndexOf('/');
+                body = {
+                    server: server,
+                    filename: filePath.substring(lastSlash + 1),
+                    source_dir: lastSlash === -1 ? '' : filePath.substring(0, lastSlash)
+                };
+            }
+            fetch(download ? '/tftp/tftp_download' : '/tftp/tftp_upload', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify(body)
+            })
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        throw new Error(data.error);
+                    }
+                    tftpJobs[data.job.id] = data.job;
+                    renderTftpJobs();
+                    showStatusMessage(`Queued TFTP ${download ? 'download' : 'upload'} of ${data.job.filename}`, 'info');
+                })
+                .catch(error => showStatusMessage('Error queueing TFTP transfer: ' + error.message, 'error'));
+        });
+        
+        tftpJobListEl.addEventListener('click', function(event) {
+            const button = event.target.closest('[data-job-action]');
+            if (!button) return;
+            fetch(`/tftp/jobs/${button.dataset.jobId}/${button.dataset.jobAction}`, { method: 'POST' })
+                .then(response => response.json())
+                .then(data => {
+                    if (!data.success) {
+                        throw new Error(data.error);
+                    }
+                })
+                .catch(error => showStatusMessage(`Error: ${error.message}`, 'error'));
+        });
+    }
+    
     // File Browser Functions
     function loadCurrentPath() {
         fetch('/tftp/current_path')
@@ -138,10 +318,37 @@ document.addEventListener('DOMContentLoaded', function() {
             });
     }
     
-    function loadFiles(path) {
+    // Sorting, filtering and paging are done server-side
+    fileFilterEl.addEventListener('input', () => {
+        clearTimeout(filterTimer);
+        filterTimer = setTimeout(() => loadFiles(currentPathEl.textContent), 300);
+    });
+    fileSortEl.addEventListener('change', () => loadFiles(currentPathEl.textContent));
+    document.getElementById('file-prev-page').addEventListener('click', () => loadFiles(currentPathEl.textContent, filePage - 1));
+    document.getElementById('file-next-page').addEventListener('click', () => loadFiles(currentPathEl.textContent, filePage + 1));
+    
+    function updatePagination(total) {
+        const pages = Math.max(1, Math.ceil(total / FILES_PER_PAGE));
+        filePaginationEl.style.display = pages > 1 ? 'flex' : 'none';
+        document.getElementById('file-page-info').textContent = `Page ${filePage} of ${pages} (${total} items)`;
+        document.getElementById('file-prev-page').disabled = filePage <= 1;
+        document.getElementById('file-next-page').disabled = filePage >= pages;
+    }
+    
+    function loadFiles(path, page = 1) {
         fileListEl.innerHTML = '<tr><td colspan="4" class="text-center">Loading files...</td></tr>';
+        filePage = page;
+        const [sortBy, sortOrder] = fileSortEl.value.split(':');
+        const params = new URLSearchParams({
+            path: path,
+            sort_by: sortBy,
+            sort_order: sortOrder,
+            filter: fileFilterEl.value.trim(),
+            page: page,
+            limit: FILES_PER_PAGE
+        });
         
-        fetch(`/tftp/files?path=${encodeURIComponent(path)}`)
+        fetch(`/tftp/files?${params}`)
             .then(response => response.json())
             .then(data => {
                 if (data.error) {
@@ -162,6 +369,7 @@ document.addEventListener('DOMContentLoaded', function() {
                 
                 if (data.files && Array.isArray(data.files)) {
                     fileListEl.innerHTML = '';
+                    updatePagination(data.total || 0);
                     
                     if (data.files.length === 0) {
                         fileListEl.innerHTML = '<tr><td colspan="4" class="text-center">No files in this directory</td></tr>';
@@ -189,6 +397,9 @@ document.addEventListener('DOMContentLoaded', function() {
                             fileIcon.className = 'icon-file';
                             nameSpan.appendChild(fileIcon);
                             nameSpan.appendChild(document.createTextNode(file.name));
+                            if (file.sha256) {
+                                nameSpan.title = `SHA-256: ${file.sha256}`;
+                            }
                         }
                         
                         nameCell.appendChild(nameSpan);
@@ -355,26 +566,110 @@ document.addEventListener('DOMContentLoaded', function() {
         window.location.href = `/tftp/download?path=${encodeURIComponent(path)}`;
     }
     
+    // Text viewer: the server sends line windows and search results, so
+    // files of any size can be browsed without loading them whole
+    const VIEW_LINES = 500;
+    
     function viewFile(path) {
         fileDetailsModal.style.display = 'block';
-        fileDetailsContent.innerHTML = '<div class="loading-text">Loading file content...</div>';
+        fileDetailsContent.innerHTML = `
+            <div class="flex-row" style="gap: 8px; flex-wrap: wrap; margin-bottom: 10px;">
+                <button class="button button-sm button-secondary" id="view-prev">Previous</button>
+                <button class="button button-sm button-secondary" id="view-next">Next</button>
+                <input type="number" id="view-goto" min="1" placeholder="Line" style="width: 90px;">
+                <span id="view-position" class="text-muted"></span>
+                <input type="text" id="view-query" placeholder="Search">
+                <label><input type="checkbox" id="view-regex"> Regex</label>
+                <button class="button button-sm button-primary" id="view-find">Find</button>
+            </div>
+            <div id="view-results" style="max-height: 150px; overflow-y: auto; display: none; margin-bottom: 10px;"></div>
+            <pre id="view-text"><div class="loading-text">Loading file content...</div></pre>
+        `;
+        const textEl = document.getElementById('view-text');
+        const resultsEl = document.getElementById('view-results');
+        const positionEl = document.getElementById('view-position');
+        let start = 1;
+        let totalLines = null;
+        let search = null;
         
-        fetch(`/tftp/view?path=${encodeURIComponent(path)}`)
-            .then(response => response.json())
-            .then(data => {
-                if (data.error) {
-                    fileDetailsContent.innerHTML = `<div class="error">${data.error}</div>`;
-                    return;
-                }
-                
-                if (data.content) {
-                    fileDetailsContent.innerHTML = `<pre>${escapeHtml(data.content)}</pre>`;
-                }
-            })
-            .catch(error => {
-                console.error('Error viewing file:', error);
-                fileDetailsContent.innerHTML = '<div class="error">Error loading file content</div>';
+        function showLines(line) {
+            start = Math.max(1, line);
+            fetch(`/tftp/view/lines?path=${encodeURIComponent(path)}&start=${start}&count=${VIEW_LINES}`)
+                .then(response => response.json())
+                .then(data => {
+                    if (data.error) {
+                        textEl.innerHTML = `<div class="error">${escapeHtml(data.error)}</div>`;
+                        return;
+                    }
+                    totalLines = data.total_lines;
+                    textEl.innerHTML = data.lines.map(item =>
+                        `<span class="text-muted">${String(item.line).padStart(7)}</span>  ${escapeHtml(item.text)}`
+                    ).join('\n');
+                    const last = data.lines.length ? data.lines[data.lines.length - 1].line : start;
+                    positionEl.textContent = `Lines ${start}-${last}` + (totalLines !== null ? ` of ${totalLines}` : '') +
+                        ` (${formatFileSize(data.size)})`;
+                    document.getElementById('view-prev').disabled = start <= 1;
+                    document.getElementById('view-next').disabled = data.eof;
+                })
+                .catch(error => {
+                    console.error('Error viewing file:', error);
+                    textEl.innerHTML = '<div class="error">Error loading file content</div>';
+                });
+        }
+        
+        function runSearch(more) {
+            if (!more) {
+                const query = document.getElementById('view-query').value;
+                if (!query) return;
+                search = { query: query, regex: document.getElementById('view-regex').checked, offset: 0, line: 1 };
+                resultsEl.innerHTML = '';
+            }
+            resultsEl.style.display = 'block';
+            const params = new URLSearchParams({
+                path: path, q: search.query, regex: search.regex ? '1' : '0', offset: search.offset, line: search.line
             });
+            fetch(`/tftp/view/grep?${params}`)
+                .then(response => response.json())
+                .then(data => {
+                    document.getElementById('view-more-results')?.remove();
+                    if (data.error) {
+                        resultsEl.innerHTML = `<div class="error">${escapeHtml(data.error)}</div>`;
+                        return;
+                    }
+                    search.offset = data.next_offset;
+                    search.line = data.next_line;
+                    resultsEl.insertAdjacentHTML('beforeend', data.matches.map(match => {
+                        const text = match.text;
+                        return `<div class="view-match" data-line="${match.line}" style="cursor: pointer;">` +
+                            `<span class="text-muted">${match.line}:</span> ` +
+                            `${escapeHtml(text.slice(0, match.match_start))}<mark>${escapeHtml(text.slice(match.match_start, match.match_end))}</mark>` +
+                            `${escapeHtml(text.slice(match.match_end))}</div>`;
+                    }).join(''));
+                    if (!data.done) {
+                        resultsEl.insertAdjacentHTML('beforeend',
+                            '<button class="button button-sm button-secondary" id="view-more-results">More results</button>');
+                        document.getElementById('view-more-results').addEventListener('click', () => runSearch(true));
+                    } else if (!resultsEl.querySelector('.view-match')) {
+                        resultsEl.innerHTML = '<div class="text-muted">No matches</div>';
+                    }
+                })
+                .catch(error => console.error('Error searching file:', error));
+        }
+        
+        document.getElementById('view-prev').addEventListener('click', () => showLines(start - VIEW_LINES));
+        document.getElementById('view-next').addEventListener('click', () => showLines(start + VIEW_LINES));
+        document.getElementById('view-goto').addEventListener('change', e => showLines(parseInt(e.target.value, 10) || 1));
+        document.getElementById('view-find').addEventListener('click', () => runSearch(false));
+        document.getElementById('view-query').addEventListener('keydown', e => {
+            if (e.key === 'Enter') runSearch(false);
+        });
+        resultsEl.addEventListener('click', e => {
+            const match = e.target.closest('.view-match');
+            if (match) {
+                showLines(Math.max(1, parseInt(match.dataset.line, 10) - 10));
+            }
+        });
+        showLines(1);
     }
     
     function showRenamePrompt(path, currentName) {
@@ -508,16 +803,13 @@ document.addEventListener('DOMContentLoaded', function() {
     
     function uploadFile(file, callback) {
         const currentPath = currentPathEl.textContent;
-        const formData = new FormData();
-        formData.append('file', file);
-        formData.append('dir', currentPath);
         
         // Create progress item
         const progressItem = document.createElement('div');
         progressItem.className = 'upload-progress-item';
         progressItem.innerHTML = `
             <div class="upload-progress-info">
-                <span class="upload-file-name">${file.name}</span>
+                <span class="upload-file-name">${escapeHtml(file.name)}</span>
                 <span class="upload-percentage">0%</span>
             </div>
             <div class="upload-progress-bar"></div>
@@ -526,47 +818,99 @@ document.addEventListener('DOMContentLoaded', function() {
         
         const progressBar = progressItem.querySelector('.upload-progress-bar');
         const percentageEl = progressItem.querySelector('.upload-percentage');
+        const infoDiv = progressItem.querySelector('.upload-progress-info');
         
-        const xhr = new XMLHttpRequest();
+        function showProgress(bytes) {
+            const percentage = file.size ? Math.floor((bytes * 100) / file.size) : 100;
+            progressBar.style.width = percentage + '%';
+            percentageEl.textContent = percentage + '%';
+        }
+        
+        function fail(message) {
+            progressBar.style.backgroundColor = '#dc3545';
+            percentageEl.textContent = 'Failed';
+            infoDiv.innerHTML += `<span class="upload-speed" style="color: #dc3545;">${escapeHtml(message)}</span>`;
+            callback(false);
+        }
+        
+        // Send one chunk; XHR rather than fetch for progress within the chunk
+        function sendChunk(upload, index, storedBytes) {
+            return new Promise((resolve, reject) => {
+                const start = index * upload.chunk_size;
+                const xhr = new XMLHttpRequest();
+                xhr.upload.addEventListener('progress', e => showProgress(storedBytes + e.loaded));
+                xhr.addEventListener('load', () => {
+                    if (xhr.status === 200) {
+                        resolve(JSON.parse(xhr.responseText));
+                    } else {
+                        let message = `HTTP ${xhr.status}`;
+                        try { message = JSON.parse(xhr.responseText).error; } catch (e) {}
+                        reject(Object.assign(new Error(message), { status: xhr.status }));
+                    }
+                });
+                xhr.addEventListener('error', () => reject(new Error('Network error')));
+                xhr.open('PUT', `/tftp/uploads/${upload.upload_id}/chunks/${index}`);
+                xhr.setRequestHeader('Content-Type', 'application/octet-stream');
+                xhr.send(file.slice(start, start + upload.chunk_size));
+            });
+        }
         
-        xhr.upload.addEventListener('progress', e => {
-            if (e.lengthComputable) {
-                const percentage = Math.round((e.loaded * 100) / e.total);
-                progressBar.style.width = percentage + '%';
-                percentageEl.textContent = percentage + '%';
+        // Retry network failures with a growing delay; client errors are final
+        async function sendChunkWithRetry(upload, index, storedBytes) {
+            for (let attempt = 1; ; attempt++) {
+                try {
+                    return await sendChunk(upload, index, storedBytes);
+                } catch (error) {
+                    if (attempt >= 5 || (error.status && error.status < 500)) {
+                        throw error;
+                    }
+                    percentageEl.textContent = `Retrying (${attempt})`;
+                    await new Promise(resolve => setTimeout(resolve, 1000 * attempt));
+                }
             }
-        });
+        }
         
-        xhr.addEventListener('load', () => {
-            if (xhr.status === 200) {
-                progressBar.style.width = '100%';
-                percentageEl.textContent = '100%';
-                
-                // Add success indicator
-                const infoDiv = progressItem.querySelector('.upload-progress-info');
+        // The server matches an unfinished upload of the same file and size,
+        // so starting again after a failure only sends the missing chunks
+        (async () => {
+            const response = await fetch('/tftp/uploads', {
+                method: 'POST',
+                headers: { 'Content-Type': 'application/json' },
+                body: JSON.stringify({ filename: file.name, dir: currentPath, size: file.size })
+            });
+            let upload = await response.json();
+            if (!upload.success) {
+                throw new Error(upload.error);
+            }
+            if (upload.deduplicated) {
+                // Identical content was already on the device
+                return upload;
+            }
+            const stored = new Set(upload.received);
+            let storedBytes = upload.received_bytes;
+            showProgress(storedBytes);
+            for (let index = 0; index < upload.chunks; index++) {
+                if (stored.has(index)) continue;
+                upload = Object.assign(upload, await sendChunkWithRetry(upload, index, storedBytes));
+                storedBytes = upload.received_bytes;
+                showProgress(storedBytes);
+            }
+            const result = await fetch(`/tftp/uploads/${upload.upload_id}/complete`, { method: 'POST' })
+                .then(response => response.json());
+            if (!result.success) {
+                throw new Error(result.error);
+            }
+            return result;
+        })()
+            .then(() => {
+                showProgress(file.size);
                 infoDiv.innerHTML += '<span class="upload-speed">Completed</span>';
-                
                 callback(true);
-            } else {
-                progressBar.style.backgroundColor = '#dc3545';
-                percentageEl.textContent = 'Failed';
-                
-                // Add error message
-                const infoDiv = progressItem.querySelector('.upload-progress-info');
-                infoDiv.innerHTML += '<span class="upload-speed" style="color: #dc3545;">Failed</span>';
-                
-                callback(false);
-            }
-        });
-        
-        xhr.addEventListener('error', () => {
-            progressBar.style.backgroundColor = '#dc3545';
-            percentageEl.textContent = 'Error';
-            callback(false);
-        });
-        
-        xhr.open('POST', '/tftp/upload');
-        xhr.send(formData);
+            })
+            .catch(error => {
+                console.error('Error uploading file:', error);
+                fail(error.message);
+            });
     }
     
     // Utility Functions
@@ -951,9 +951,13 @@ function testGateway(iface) {
         });
 }
 
+// Latest service list, kept so pushed state changes can be merged in
+let latestServiceData = null;
+
 // Function to update services table with new data
 function updateServicesTable(services) {
     console.log("Updating services with:", services);
+    latestServiceData = services;
     
     // First check if we're on the services page with a dedicated table
     const servicesPageTable = document.querySelector('#services-table tbody');
@@ -1761,6 +1765,38 @@ function updateSerialDevices(devices) {
 // Add a global variable to store the latest interface data
 let latestInterfaceData = null;
 
+// Subscribe to systemd unit state changes pushed by the server
+function subscribeServiceUpdates() {
+    if (typeof io === 'undefined' || !document.getElementById('services-table-body')) {
+        return;
+    }
+    
+    const servicesSocket = io('/services');
+    
+    servicesSocket.on('service_list', function(data) {
+        updateServicesTable(data.services);
+    });
+    
+    servicesSocket.on('service_update', function(data) {
+        if (!latestServiceData || !data.services) {
+            return;
+        }
+        
+        // Merge changed services into the current list
+        const merged = latestServiceData.slice();
+        data.services.forEach(changed => {
+            const index = merged.findIndex(svc => svc.name === changed.name);
+            if (index >= 0) {
+                merged[index] = changed;
+            } else {
+                merged.push(changed);
+            }
+        });
+        merged.sort((a, b) => (a.status !== 'active') - (b.status !== 'active') || a.name.localeCompare(b.name));
+        updateServicesTable(merged);
+    });
+}
+
 // Function to poll for updates from the server
 function pollForUpdates() {
     // Save which detail sections are currently open
@@ -1947,6 +1983,9 @@ window.onload = function() {
     // Then try to get real data
     pollForUpdates();
     
+    // Service state changes are pushed as they happen
+    subscribeServiceUpdates();
+    
     // Set up auto-refresh interval (every 30 seconds)
     setInterval(pollForUpdates, 30000);
     
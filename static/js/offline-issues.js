@@ -26,13 +26,14 @@ async function getStoredIssues() {
         }
         
         // If we're online, fetch from the server
-        const response = await fetch(API_URL);
+        const response = await fetch(`${API_URL}/?limit=500`);
         
         if (!response.ok) {
             throw new Error(`API request failed: ${response.status}`);
         }
         
-        return await response.json();
+        const data = await response.json();
+        return data.issues;
     } catch (error) {
         console.error('Error loading issues:', error);
         
@@ -81,14 +82,13 @@ async function syncOfflineIssues() {
         if (issues.length === 0) return;
         
         let syncCount = 0;
+        const unsynced = [];
         
         // Send each issue to the server
         for (const issue of issues) {
-            // Skip issues that already have an ID from the server
-            if (issue.id && issue.id.length > 10) continue;
-            
-            // Create issue on server
-            const response = await fetch(API_URL, {
+            // The local id doubles as client_id, so a sync that is retried
+            // after a lost response does not create the issue twice
+            const response = await fetch(`${API_URL}/`, {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
@@ -97,18 +97,25 @@ async function syncOfflineIssues() {
                     title: issue.title,
                     description: issue.description,
                     type: issue.type,
-                    status: issue.status
+                    status: issue.status,
+                    client_id: issue.id
                 })
-            });
+            }).catch(() => null);
             
-            if (response.ok) {
+            if (response && response.ok) {
                 syncCount++;
+            } else {
+                unsynced.push(issue);
             }
         }
         
         if (syncCount > 0) {
-            // Clear offline storage after sync
-            localStorage.removeItem(OFFLINE_ISSUES_KEY);
+            // Keep only the issues the server did not accept
+            if (unsynced.length) {
+                localStorage.setItem(OFFLINE_ISSUES_KEY, JSON.stringify(unsynced));
+            } else {
+                localStorage.removeItem(OFFLINE_ISSUES_KEY);
+            }
             showStatusMessage(`Synced ${syncCount} offline issues to server`, 'success');
             
             // Update the UI
@@ -122,6 +129,11 @@ async function syncOfflineIssues() {
     }
 }
 
+// Random id for a new issue, so a retried create is recognised by the server
+function newClientId() {
+    return Date.now().toString(36) + '-' + Math.random().toString(36).slice(2, 10);
+}
+
 // Add a new issue via API
 async function queueIssue(title, description, type) {
     try {
@@ -139,7 +151,7 @@ async function queueIssue(title, description, type) {
             
             const newIssue = {
                 ...issueData,
-                id: Date.now().toString(),
+                id: newClientId(),
                 timestamp: new Date().toISOString(),
                 retries: 0
             };
@@ -152,12 +164,12 @@ async function queueIssue(title, description, type) {
         }
         
         // If online, post to API
-        const response = await fetch(API_URL, {
+        const response = await fetch(`${API_URL}/`, {
             method: 'POST',
             headers: {
                 'Content-Type': 'application/json'
             },
-            body: JSON.stringify(issueData)
+            body: JSON.stringify({ ...issueData, client_id: newClientId() })
         });
         
         if (!response.ok) {
@@ -177,7 +189,7 @@ async function queueIssue(title, description, type) {
             title,
             description,
             type,
-            id: Date.now().toString(),
+            id: newClientId(),
             timestamp: new Date().toISOString(),
             status: IssueStatus.PENDING,
             retries: 0